@@ -0,0 +1,251 @@
+"""Fees and latency of a batch transfer against the same sales sent one by one.
+
+Each round mints --size NFTs twice over for the sellers and offers them all
+to one buyer. The buyer takes the first --size with --size enforcer
+transfers, sent together and waited for together, then the others with one
+enforcerTransferBatch. Reports the fees per NFT, the inner transactions per
+NFT and the submit to confirm latency of both.
+
+Runs against the algod and KMD configured with ROYALTY_ENFORCER_ALGOD_ADDRESS
+and ROYALTY_ENFORCER_KMD_ADDRESS (the sandbox by default), or in process with
+ROYALTY_ENFORCER_BACKEND=emulator.
+
+    python benchmarks/batchtransfer.py --size 15 --rounds 5
+    ROYALTY_ENFORCER_BACKEND=emulator python benchmarks/batchtransfer.py --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algosdk.atomic_transaction_composer import (  # noqa: E402
+    AtomicTransactionComposer,
+)
+from algosdk.future.transaction import SignedTransaction  # noqa: E402
+from algosdk.v2client.algod import AlgodClient  # noqa: E402
+
+from royalty_enforcer.utils.accounts import (  # noqa: E402
+    FUNDING_AMOUNT,
+    Account,
+    AccountPool,
+)
+from royalty_enforcer.utils.apps import (  # noqa: E402
+    MAX_BATCH_TRANSFERS,
+    App,
+    buildEnforcerTransfer,
+    buildEnforcerTransferBatch,
+    deployEnforcer,
+    optInToEnforcer,
+    setEnforcerOffers,
+    setEnforcerPolicy,
+)
+from royalty_enforcer.utils.artifacts import CONTRACTS  # noqa: E402
+from royalty_enforcer.utils.assets import mintNFT, optInToNFT  # noqa: E402
+from royalty_enforcer.utils.clients import (  # noqa: E402
+    getAlgodClient,
+    getKmdClient,
+)
+from royalty_enforcer.utils.params import getSuggestedParams  # noqa: E402
+from royalty_enforcer.utils.transactions import (  # noqa: E402
+    ZERO_ADDR,
+    getConfirmationTracker,
+)
+
+ROYALTY_BASIS = 1000
+
+# Offers are kept in the seller's local state, one byte slice each
+MAX_OFFERS = CONTRACTS["enforcer"].localSchema[1]
+
+
+class Sales:
+    """Fees, inner transactions and latency of one way of selling"""
+
+    def __init__(self) -> None:
+        self.nfts = 0
+        self.fees = 0
+        self.innerTxns = 0
+        self.latencies: List[float] = []
+
+    def record(self, nfts: int, fees: int, innerTxns: int, latency: float) -> None:
+        self.nfts += nfts
+        self.fees += fees
+        self.innerTxns += innerTxns
+        self.latencies.append(latency)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "nfts": self.nfts,
+            "fees-per-nft": self.fees // max(self.nfts, 1),
+            "inner-txns-per-nft": round(self.innerTxns / max(self.nfts, 1), 2),
+            "latency-ms": round(statistics.median(self.latencies) * 1000, 1),
+        }
+
+
+def countInner(info: Dict[str, Any]) -> int:
+    inner = info.get("inner-txns", [])
+    return len(inner) + sum(countInner(txn) for txn in inner)
+
+
+def send(
+    client: AlgodClient,
+    atcs: List[AtomicTransactionComposer],
+    nfts: int,
+    sales: Sales,
+) -> None:
+    """Send the groups back to back and wait until all of them confirmed"""
+    groups: List[List[SignedTransaction]] = [atc.gather_signatures() for atc in atcs]
+    tracker = getConfirmationTracker(client)
+
+    start = time.monotonic()
+    for signedTxns in groups:
+        client.send_transactions(signedTxns)
+    for signedTxns in groups:
+        tracker.wait(signedTxns[-1].get_txid())
+    latency = time.monotonic() - start
+
+    innerTxns = sum(
+        countInner(client.pending_transaction_info(stxn.get_txid()))
+        for signedTxns in groups
+        for stxn in signedTxns
+    )
+    fees = sum(stxn.transaction.fee for signedTxns in groups for stxn in signedTxns)
+    sales.record(nfts, fees, innerTxns, latency)
+
+
+def offerNFTs(
+    client: AlgodClient,
+    enforcer: App,
+    sellers: List[Account],
+    buyer: Account,
+    count: int,
+) -> List[List[int]]:
+    """Mint count NFTs, spread over the sellers, offered to the buyer"""
+    minted: List[List[int]] = [[] for _ in sellers]
+    for i in range(count):
+        minted[i % len(sellers)].append(
+            mintNFT(client, sellers[i % len(sellers)], enforcer.address)
+        )
+    for seller, nftIDs in zip(sellers, minted):
+        offers = [(nftID, 1, buyer.getAddress(), 0, ZERO_ADDR) for nftID in nftIDs]
+        for result in setEnforcerOffers(client, enforcer, seller, offers):
+            if result.error is not None:
+                raise result.error
+    for nftIDs in minted:
+        for nftID in nftIDs:
+            optInToNFT(client, buyer, nftID)
+    return minted
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=MAX_BATCH_TRANSFERS,
+        help="NFTs bought at once",
+    )
+    parser.add_argument("--sellers", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--price", type=int, default=1_000_000, help="microalgos")
+    parser.add_argument("--funder", help="mnemonic of the account funding others")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    if not 0 < args.size <= MAX_BATCH_TRANSFERS:
+        parser.error("a batch has at most {} NFTs".format(MAX_BATCH_TRANSFERS))
+    if -(-2 * args.size // args.sellers) > MAX_OFFERS:
+        parser.error("a seller can have at most {} open offers".format(MAX_OFFERS))
+
+    client = getAlgodClient()
+    funders = [Account.FromMnemonic(args.funder)] if args.funder else None
+    pool = AccountPool(
+        client,
+        None if funders else getKmdClient(),
+        size=args.sellers + 3,
+        low=0,
+        # the buyer pays for every NFT and the min balance of holding it
+        fundingAmount=max(
+            FUNDING_AMOUNT, 2 * args.size * args.rounds * (args.price + 200_000)
+        ),
+        path=None,
+        funders=funders,
+    )
+    creator = pool.get()
+    royalty = pool.get()
+    buyer = pool.get()
+    sellers = [pool.get() for _ in range(args.sellers)]
+
+    enforcer = deployEnforcer(client, creator)
+    setEnforcerPolicy(client, enforcer, creator, ROYALTY_BASIS, royalty.getAddress())
+    for seller in sellers:
+        optInToEnforcer(client, enforcer, seller)
+
+    single = Sales()
+    batch = Sales()
+    for _ in range(args.rounds):
+        minted = offerNFTs(client, enforcer, sellers, buyer, 2 * args.size)
+        owned = [
+            (nftID, seller.getAddress())
+            for seller, nftIDs in zip(sellers, minted)
+            for nftID in nftIDs
+        ]
+        sp = getSuggestedParams(client)
+        send(
+            client,
+            [
+                buildEnforcerTransfer(
+                    sp,
+                    enforcer,
+                    buyer,
+                    args.price,
+                    nftID,
+                    1,
+                    sellerAddress,
+                    royalty.getAddress(),
+                )
+                for nftID, sellerAddress in owned[: args.size]
+            ],
+            args.size,
+            single,
+        )
+        send(
+            client,
+            [
+                buildEnforcerTransferBatch(
+                    sp,
+                    enforcer,
+                    buyer,
+                    [
+                        (nftID, 1, sellerAddress, args.price)
+                        for nftID, sellerAddress in owned[args.size :]
+                    ],
+                    royalty.getAddress(),
+                )
+            ],
+            args.size,
+            batch,
+        )
+
+    report = {"single": single.report(), "batch": batch.report()}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print("{} rounds of {} NFTs".format(args.rounds, args.size))
+    print("  {:<8} {:>12} {:>12} {:>12}".format("", "fees/NFT", "inner/NFT", "ms"))
+    for name, r in report.items():
+        print(
+            "  {:<8} {:>12} {:>12} {:>12}".format(
+                name, r["fees-per-nft"], r["inner-txns-per-nft"], r["latency-ms"]
+            )
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""Local state decoding benchmark.
+
+Decodes the enforcer local state of many accounts, each with a number of
+offers, into Offer records: with decodeState followed by slicing out the
+offer fields (what the readers did before), with decodeOffers per account
+and with decodeOffersBatch for all accounts at once.
+
+    python benchmarks/decodestate.py
+    python benchmarks/decodestate.py --accounts 10000 --offers 16
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from base64 import b64encode
+from typing import Any, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from royalty_enforcer.utils.state import (  # noqa: E402
+    Offer,
+    decodeOffers,
+    decodeOffersBatch,
+    decodeState,
+)
+
+RUNS = 5
+
+
+def localState(account: int, offers: int) -> List[Any]:
+    state = []
+    for i in range(offers):
+        assetID = account * offers + i + 1
+        value = os.urandom(32) + (i + 1).to_bytes(8, "big")
+        state.append(
+            {
+                "key": b64encode(assetID.to_bytes(8, "big")).decode(),
+                "value": {"type": 1, "bytes": b64encode(value).decode()},
+            }
+        )
+    return state
+
+
+def withDecodeState(states: List[List[Any]]) -> None:
+    for state in states:
+        for key, value in decodeState(state).items():
+            if len(key) == 8 and isinstance(value, bytes):
+                Offer(
+                    int.from_bytes(key, "big"),
+                    value[:32],
+                    int.from_bytes(value[32:40], "big"),
+                )
+
+
+def withDecodeOffers(states: List[List[Any]]) -> None:
+    for state in states:
+        decodeOffers(state)
+
+
+def withDecodeOffersBatch(states: List[List[Any]]) -> None:
+    decodeOffersBatch(states)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--accounts", type=int, default=5000)
+    parser.add_argument("--offers", type=int, default=8, help="offers per account")
+    args = parser.parse_args()
+
+    states = [localState(a, args.offers) for a in range(args.accounts)]
+    total = args.accounts * args.offers
+
+    baseline = 0.0
+    for name, fn in [
+        ("decodeState", withDecodeState),
+        ("decodeOffers", withDecodeOffers),
+        ("decodeOffersBatch", withDecodeOffersBatch),
+    ]:
+        # the fastest run is the least disturbed by the rest of the machine
+        seconds = min(timeit.repeat(lambda: fn(states), number=1, repeat=RUNS))
+        baseline = baseline or seconds
+        print(
+            "{:>10.1f} ms  {:>8.0f} ns/offer  {:>5.2f}x  {}".format(
+                seconds * 1000, seconds / total * 1e9, baseline / seconds, name
+            )
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Import time benchmark for the royalty_enforcer package.
+
+Runs each statement below in a fresh interpreter with `python -X importtime`
+and sums the cumulative time of every top-level import it triggers, ignoring
+modules the interpreter imports on startup anyway. Times are compared as
+ratios to a reference import measured in the same run, so the baseline holds
+on machines of any speed. Fails when a statement gets slower than the
+recorded baseline allows.
+
+    python benchmarks/importtime.py           # check against the baseline
+    python benchmarks/importtime.py --update  # record a new baseline
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, Set
+
+STATEMENTS = [
+    "import royalty_enforcer.utils",
+    "from royalty_enforcer.utils import decodeState, getBalances",
+    "import royalty_enforcer.utils.apps",
+]
+
+# Measured in every run, the statements are timed relative to it
+REFERENCE = "import algosdk"
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "importtime_baseline.json")
+
+# Allowed slowdown: factor on the baseline plus a fixed slack for timer noise,
+# in units of the reference import time
+TOLERANCE_FACTOR = 1.5
+TOLERANCE_SLACK = 0.1
+
+RUNS = 5
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def importTimes(statement: str) -> Dict[str, int]:
+    """Cumulative time in microseconds of each top-level import"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    times: Dict[str, int] = dict()
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match and len(match.group(3)) == 1:
+            times[match.group(4)] = int(match.group(2))
+    return times
+
+
+def measure(statement: str, startup: Set[str]) -> int:
+    samples = []
+    for _ in range(RUNS):
+        times = importTimes(statement)
+        samples.append(sum(t for m, t in times.items() if m not in startup))
+    # the fastest run is the least disturbed by the rest of the machine
+    return min(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--update", action="store_true", help="record a new baseline")
+    args = parser.parse_args()
+
+    startup = set(importTimes("pass").keys())
+    reference = measure(REFERENCE, startup)
+    times = {statement: measure(statement, startup) for statement in STATEMENTS}
+    results = {statement: round(us / reference, 3) for statement, us in times.items()}
+    print("{:>10.1f} ms  reference  {}".format(reference / 1000, REFERENCE))
+
+    if args.update:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        for statement, ratio in results.items():
+            print(
+                "{:>10.1f} ms  {:>9.3f}x  {}".format(
+                    times[statement] / 1000, ratio, statement
+                )
+            )
+        return 0
+
+    with open(BASELINE_PATH) as f:
+        baseline: Dict[str, float] = json.load(f)
+
+    failed = False
+    for statement, ratio in results.items():
+        limit = baseline.get(statement, 0) * TOLERANCE_FACTOR + TOLERANCE_SLACK
+        status = "ok"
+        if ratio > limit:
+            status = "REGRESSED"
+            failed = True
+        print(
+            "{:>10.1f} ms  {:>9.3f}x  (limit {:.3f}x)  {:<9}  {}".format(
+                times[statement] / 1000, ratio, limit, status, statement
+            )
+        )
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
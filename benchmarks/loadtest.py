@@ -0,0 +1,394 @@
+"""End to end load test of enforcer sales.
+
+Provisions sellers and buyers, mints NFTs for the sellers with mintNFT, sets
+the royalty policy and one offer per NFT, then sells every NFT once, either
+with enforcer transfers or through a marketplace. Sales are sent at a target
+rate (open loop) or by a fixed number of concurrent buyers that each wait for
+their sale to confirm before sending the next (closed loop). Reports
+throughput, submit to confirm latency, rejection reasons and fees spent.
+
+Runs against the algod and KMD configured with ROYALTY_ENFORCER_ALGOD_ADDRESS
+and ROYALTY_ENFORCER_KMD_ADDRESS (the sandbox by default). On a network
+without KMD, pass --funder with the mnemonic of a funded account.
+
+    python benchmarks/loadtest.py --sellers 4 --buyers 8 --nfts 16 --rate 20
+    python benchmarks/loadtest.py --concurrency 16
+    python benchmarks/loadtest.py --mode marketplace --nfts 16 --concurrency 8
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Empty, Queue
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algosdk.atomic_transaction_composer import (  # noqa: E402
+    AtomicTransactionComposer,
+)
+from algosdk.future.transaction import SignedTransaction  # noqa: E402
+from algosdk.v2client.algod import AlgodClient  # noqa: E402
+
+from royalty_enforcer.utils.accounts import Account, AccountPool  # noqa: E402
+from royalty_enforcer.utils.apps import (  # noqa: E402
+    App,
+    buildEnforcerTransfer,
+    buildMarketplaceBuyNFT,
+    deployEnforcer,
+    deployMarketplace,
+    marketplaceListNFT,
+    optInToEnforcer,
+    optInToMarketplace,
+    setEnforcerOffers,
+    setEnforcerPolicy,
+)
+from royalty_enforcer.utils.artifacts import CONTRACTS  # noqa: E402
+from royalty_enforcer.utils.assets import mintNFT, optInToNFT  # noqa: E402
+from royalty_enforcer.utils.clients import (  # noqa: E402
+    getAlgodClient,
+    getKmdClient,
+)
+from royalty_enforcer.utils.params import getSuggestedParams  # noqa: E402
+from royalty_enforcer.utils.transactions import (  # noqa: E402
+    ZERO_ADDR,
+    getConfirmationTracker,
+)
+
+ROYALTY_BASIS = 1000
+
+# Offers and listings are kept in the seller's local state, one byte slice
+# each
+MAX_OFFERS = min(
+    CONTRACTS["enforcer"].localSchema[1], CONTRACTS["marketplace"].localSchema[1]
+)
+
+# Threads used to provision accounts, NFTs, offers and opt ins
+SETUP_THREADS = 16
+
+TXID = re.compile(r"\b[A-Z2-7]{52}\b")
+
+
+class Sale:
+    def __init__(self, seller: Account, buyer: Account, nftID: int) -> None:
+        self.seller = seller
+        self.buyer = buyer
+        self.nftID = nftID
+        # the marketplace the NFT is listed on, in marketplace mode
+        self.marketplace: Optional[App] = None
+
+
+class Results:
+    """Outcome of every sale, filled in from the submitting threads and the
+    confirmation tracker"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.rejections: Counter = Counter()
+        self.fees = 0
+        self.submitted = 0
+        self.start = time.monotonic()
+        self.end = self.start
+
+    def confirmed(self, latency: float, fee: int) -> None:
+        with self.lock:
+            self.latencies.append(latency)
+            self.fees += fee
+            self.end = time.monotonic()
+
+    def rejected(self, error: BaseException) -> None:
+        # the same failure for different transactions counts as one reason
+        reason = TXID.sub("<txid>", str(error))[:160]
+        with self.lock:
+            self.rejections[reason] += 1
+            self.end = time.monotonic()
+
+    def quantile(self, q: float) -> float:
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return 0.0
+        return latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+
+    def report(self) -> Dict[str, Any]:
+        seconds = max(self.end - self.start, 1e-9)
+        return {
+            "submitted": self.submitted,
+            "confirmed": len(self.latencies),
+            "rejected": sum(self.rejections.values()),
+            "seconds": round(seconds, 2),
+            "throughput": round(len(self.latencies) / seconds, 2),
+            "latency-ms": {
+                "p50": round(self.quantile(0.50) * 1000, 1),
+                "p95": round(self.quantile(0.95) * 1000, 1),
+                "p99": round(self.quantile(0.99) * 1000, 1),
+            },
+            "fees": self.fees,
+            "rejections": dict(self.rejections.most_common()),
+        }
+
+
+def inParallel(fn: Callable[..., Any], calls: List[Tuple]) -> List[Any]:
+    with ThreadPoolExecutor(SETUP_THREADS) as executor:
+        return list(executor.map(lambda args: fn(*args), calls))
+
+
+def provision(
+    client: AlgodClient, pool: AccountPool, args: argparse.Namespace
+) -> Tuple[App, Account, List[Sale]]:
+    creator = pool.get()
+    royalty = pool.get()
+    sellers = [pool.get() for _ in range(args.sellers)]
+    buyers = [pool.get() for _ in range(args.buyers)]
+
+    enforcer = deployEnforcer(client, creator)
+    setEnforcerPolicy(client, enforcer, creator, ROYALTY_BASIS, royalty.getAddress())
+
+    # a seller's mints are identical transactions, they are sent one after
+    # the other so each gets params past the round the previous confirmed in
+    minted = inParallel(
+        lambda seller: [
+            mintNFT(client, seller, enforcer.address) for _ in range(args.nfts)
+        ],
+        [(seller,) for seller in sellers],
+    )
+    nftIDs = [nftID for nfts in minted for nftID in nfts]
+    sales = [
+        Sale(sellers[i // args.nfts], buyers[i % len(buyers)], nftID)
+        for i, nftID in enumerate(nftIDs)
+    ]
+
+    # sellers opt in to hold their offers, listing on a marketplace makes one too
+    inParallel(
+        lambda seller: optInToEnforcer(client, enforcer, seller),
+        [(seller,) for seller in sellers],
+    )
+
+    if args.mode == "marketplace":
+        # every NFT is listed on one marketplace, in its seller's local state
+        marketplace = deployMarketplace(client, creator)
+        inParallel(
+            lambda seller: optInToMarketplace(client, marketplace, seller),
+            [(seller,) for seller in sellers],
+        )
+        for sale in sales:
+            sale.marketplace = marketplace
+        inParallel(
+            lambda sale: marketplaceListNFT(
+                client,
+                enforcer,
+                sale.marketplace,
+                sale.seller,
+                sale.nftID,
+                1,
+                args.price,
+            ),
+            [(sale,) for sale in sales],
+        )
+        return enforcer, royalty, sales
+
+    # buyers are authorized to take the NFTs they will buy
+    def offer(seller: Account) -> None:
+        offers = [
+            (sale.nftID, 1, sale.buyer.getAddress(), 0, ZERO_ADDR)
+            for sale in sales
+            if sale.seller is seller
+        ]
+        for result in setEnforcerOffers(client, enforcer, seller, offers):
+            if result.error is not None:
+                raise result.error
+
+    inParallel(offer, [(seller,) for seller in sellers])
+    inParallel(
+        lambda sale: optInToNFT(client, sale.buyer, sale.nftID),
+        [(sale,) for sale in sales],
+    )
+    return enforcer, royalty, sales
+
+
+def buildSale(
+    client: AlgodClient,
+    enforcer: App,
+    royalty: Account,
+    sale: Sale,
+    price: int,
+) -> AtomicTransactionComposer:
+    sp = getSuggestedParams(client)
+    if sale.marketplace is not None:
+        return buildMarketplaceBuyNFT(
+            sp,
+            enforcer,
+            sale.marketplace,
+            sale.seller.getAddress(),
+            royalty.getAddress(),
+            sale.buyer,
+            sale.nftID,
+            1,
+            price,
+        )
+    return buildEnforcerTransfer(
+        sp,
+        enforcer,
+        sale.buyer,
+        price,
+        sale.nftID,
+        1,
+        sale.seller.getAddress(),
+        royalty.getAddress(),
+    )
+
+
+def submit(
+    client: AlgodClient,
+    atc: AtomicTransactionComposer,
+    results: Results,
+) -> "Future[Any]":
+    """Send a sale, the future resolves once it is confirmed or rejected"""
+    signedTxns: List[SignedTransaction] = atc.gather_signatures()
+    fee = sum(stxn.transaction.fee for stxn in signedTxns)
+    with results.lock:
+        results.submitted += 1
+
+    start = time.monotonic()
+    try:
+        client.send_transactions(signedTxns)
+    except Exception as e:
+        results.rejected(e)
+        done: "Future[Any]" = Future()
+        done.set_result(None)
+        return done
+
+    confirmation = getConfirmationTracker(client).track(signedTxns[-1].get_txid())
+
+    def record(future: "Future[Any]") -> None:
+        error = future.exception()
+        if error is not None:
+            results.rejected(error)
+        else:
+            results.confirmed(time.monotonic() - start, fee)
+
+    confirmation.add_done_callback(record)
+    return confirmation
+
+
+def runOpenLoop(
+    send: Callable[[Sale], "Future[Any]"], sales: List[Sale], rate: float
+) -> None:
+    start = time.monotonic()
+    confirmations = []
+    with ThreadPoolExecutor(SETUP_THREADS) as executor:
+        for i, sale in enumerate(sales):
+            delay = start + i / rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            confirmations.append(executor.submit(send, sale))
+    for confirmation in confirmations:
+        # errors are already counted as rejections
+        confirmation.result().exception()
+
+
+def runClosedLoop(
+    send: Callable[[Sale], "Future[Any]"], sales: List[Sale], concurrency: int
+) -> None:
+    queue: "Queue[Sale]" = Queue()
+    for sale in sales:
+        queue.put(sale)
+
+    def worker() -> None:
+        while True:
+            try:
+                sale = queue.get_nowait()
+            except Empty:
+                return
+            send(sale).exception()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--mode", choices=["transfer", "marketplace"], default="transfer"
+    )
+    parser.add_argument("--sellers", type=int, default=4)
+    parser.add_argument("--buyers", type=int, default=8)
+    parser.add_argument("--nfts", type=int, default=16, help="NFTs per seller")
+    parser.add_argument("--price", type=int, default=1_000_000, help="microalgos")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rate", type=float, help="target sales per second")
+    load.add_argument("--concurrency", type=int, help="sales in flight")
+    parser.add_argument("--funder", help="mnemonic of the account funding others")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    if args.rate is None and args.concurrency is None:
+        args.concurrency = 8
+    if args.nfts > MAX_OFFERS:
+        parser.error(
+            "a seller can have at most {0} open offers, use --nfts {0}".format(
+                MAX_OFFERS
+            )
+        )
+
+    client = getAlgodClient()
+    funders = [Account.FromMnemonic(args.funder)] if args.funder else None
+    pool = AccountPool(
+        client,
+        None if funders else getKmdClient(),
+        size=args.sellers + args.buyers + 2,
+        low=0,
+        path=None,
+        funders=funders,
+    )
+
+    setupStart = time.monotonic()
+    enforcer, royalty, sales = provision(client, pool, args)
+    print(
+        "provisioned {} NFTs in {:.1f} s".format(
+            len(sales), time.monotonic() - setupStart
+        ),
+        file=sys.stderr,
+    )
+
+    results = Results()
+
+    def send(sale: Sale) -> "Future[Any]":
+        atc = buildSale(client, enforcer, royalty, sale, args.price)
+        return submit(client, atc, results)
+
+    if args.rate is not None:
+        runOpenLoop(send, sales, args.rate)
+    else:
+        runClosedLoop(send, sales, args.concurrency)
+
+    report = results.report()
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(
+        "{confirmed}/{submitted} sales confirmed in {seconds} s, "
+        "{throughput} sales/s".format(**report)
+    )
+    print(
+        "submit to confirm latency p50 {p50} ms, p95 {p95} ms, p99 {p99} ms".format(
+            **report["latency-ms"]
+        )
+    )
+    print("fees spent {} microalgos".format(report["fees"]))
+    for reason, count in report["rejections"].items():
+        print("{:>6} rejected: {}".format(count, reason))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""Opcode cost and program size of each contract, per ABI method.
+
+Profiles the compiled TEAL of every contract with royalty_enforcer.utils.costs:
+the cheapest and most expensive path of each route through approval(), the
+size and cost of each subroutine and the scratch slots used. Fails when a
+route got more expensive or a program got bigger than the recorded baseline.
+Uses the bundles in royalty_enforcer/bundles/ when they are up to date,
+otherwise compiles the contracts in process.
+
+    python benchmarks/programcost.py           # report and check the baseline
+    python benchmarks/programcost.py --update  # record a new baseline
+    python benchmarks/programcost.py --json    # the profile as JSON
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from royalty_enforcer.utils.apps import getArtifact  # noqa: E402
+from royalty_enforcer.utils.artifacts import CONTRACTS  # noqa: E402
+from royalty_enforcer.utils.avm import APP_BUDGET  # noqa: E402
+from royalty_enforcer.utils.costs import ProgramProfile, profileProgram  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "programcost_baseline.json")
+
+# Approval and clear program bytes allowed without extra pages
+MAX_PROGRAM_SIZE = 2048
+
+
+def profileContract(name: str) -> Dict[str, ProgramProfile]:
+    artifact = getArtifact(None, name)
+    return {
+        "approval": profileProgram(
+            name + " approval", artifact.approvalTeal, artifact.abi.methods
+        ),
+        "clear": profileProgram(name + " clear", artifact.clearTeal, routes=False),
+    }
+
+
+def summary(profiles: Dict[str, ProgramProfile]) -> Dict[str, Any]:
+    """What the baseline records: sizes and the worst cost of each route"""
+    return {
+        "size": {kind: p.size for kind, p in profiles.items()},
+        "cost": {
+            route: costs[1]
+            for route, costs in profiles["approval"].routes.items()
+            if costs is not None
+        },
+    }
+
+
+def printReport(name: str, profiles: Dict[str, ProgramProfile]) -> None:
+    approval, clear = profiles["approval"], profiles["clear"]
+    total = approval.size + clear.size
+    print(
+        "{}: approval {} bytes, clear {} bytes ({} of {}), {} scratch slots".format(
+            name,
+            approval.size,
+            clear.size,
+            total,
+            MAX_PROGRAM_SIZE,
+            len(approval.scratchSlots()),
+        )
+    )
+    print("  {:<28} {:>6} {:>6}".format("route", "min", "max"))
+    rejected = []
+    for route, costs in approval.routes.items():
+        if costs is None:
+            rejected.append(route)
+            continue
+        over = "  over budget" if costs[1] > APP_BUDGET else ""
+        print("  {:<28} {:>6} {:>6}{}".format(route, costs[0], costs[1], over))
+    if rejected:
+        print("  always rejected: {}".format(", ".join(rejected)))
+    print("  {:<28} {:>6} {:>6}  {}".format("subroutine", "bytes", "max", "scratch"))
+    for label, (size, costs) in approval.subroutines.items():
+        slots = approval.scratch.get(label, [])
+        print(
+            "  {:<28} {:>6} {:>6}  {}".format(
+                label,
+                size,
+                "-" if costs is None else costs[1],
+                " ".join("*" if s < 0 else str(s) for s in slots),
+            )
+        )
+    print()
+
+
+def regressions(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    found = []
+    for name, recorded in baseline.items():
+        now = current.get(name, {"size": {}, "cost": {}})
+        for kind, size in recorded["size"].items():
+            if now["size"].get(kind, 0) > size:
+                found.append(
+                    "{} {} grew from {} to {} bytes".format(
+                        name, kind, size, now["size"][kind]
+                    )
+                )
+        for route, cost in recorded["cost"].items():
+            if now["cost"].get(route, 0) > cost:
+                found.append(
+                    "{} {} costs {} opcodes, was {}".format(
+                        name, route, now["cost"][route], cost
+                    )
+                )
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--update", action="store_true", help="record a new baseline")
+    parser.add_argument("--json", action="store_true", help="print the profile as JSON")
+    args = parser.parse_args()
+
+    profiles = {name: profileContract(name) for name in CONTRACTS}
+    current = {name: summary(p) for name, p in profiles.items()}
+
+    if args.json:
+        print(json.dumps(current, indent=2))
+    else:
+        for name, p in profiles.items():
+            printReport(name, p)
+
+    if args.update:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(current, f, indent=2)
+            f.write("\n")
+        return 0
+
+    with open(BASELINE_PATH) as f:
+        baseline: Dict[str, Any] = json.load(f)
+    found = regressions(current, baseline)
+    for regression in found:
+        print("REGRESSED: " + regression, file=sys.stderr)
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Signing throughput benchmark.
+
+Signs the same payments with Transaction.sign one after the other (what an
+AtomicTransactionComposer does), then with a SigningPool in the calling
+process and with 1, 2, 4, ... worker processes up to the number of cores.
+
+    python benchmarks/signing.py
+    python benchmarks/signing.py --transactions 20000 --processes 8
+"""
+
+import argparse
+import os
+import sys
+import time
+from base64 import b64encode
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algosdk.account import generate_account  # noqa: E402
+from algosdk.future.transaction import PaymentTxn, SuggestedParams  # noqa: E402
+
+from royalty_enforcer.utils.accounts import Account  # noqa: E402
+from royalty_enforcer.utils.signing import SigningPool  # noqa: E402
+
+SP = SuggestedParams(
+    fee=1000,
+    first=1,
+    last=1000,
+    gh=b64encode(bytes(32)).decode(),
+    gen="sandnet-v1",
+    flat_fee=True,
+)
+
+
+def timed(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--transactions", type=int, default=10000)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    accounts = [Account(generate_account()[0]) for _ in range(16)]
+    receiver = accounts[0].getAddress()
+    txns = [
+        (
+            PaymentTxn(accounts[i % 16].getAddress(), SP, receiver, i),
+            accounts[i % 16],
+        )
+        for i in range(args.transactions)
+    ]
+
+    serial = timed(lambda: [t.sign(a.getPrivateKey()) for t, a in txns])
+    print(
+        "{:>10.0f} txn/s  {:>5.2f}x  Transaction.sign".format(len(txns) / serial, 1.0)
+    )
+
+    counts = [0]
+    while counts[-1] < args.processes:
+        counts.append(min(max(1, counts[-1] * 2), args.processes))
+    for processes in counts:
+        with SigningPool(processes=processes) as pool:
+            # start the workers before timing
+            list(pool.sign(txns[: pool.batchSize * max(processes, 1)]))
+            seconds = timed(lambda: list(pool.sign(txns)))
+        print(
+            "{:>10.0f} txn/s  {:>5.2f}x  SigningPool({} processes)".format(
+                len(txns) / seconds, serial / seconds, processes
+            )
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
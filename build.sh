@@ -11,4 +11,7 @@ poetry run python royalty_enforcer/contracts/enforcer_placeholder.py
 echo "Building marketplace contract..."
 poetry run python royalty_enforcer/contracts/marketplace.py
 
+echo "Checking opcode costs and program sizes..."
+poetry run python benchmarks/programcost.py
+
 echo "Done."
@@ -0,0 +1,617 @@
+"""Asyncio versions of the enforcer and marketplace helpers.
+
+Transactions are built by the same functions the blocking helpers in
+royalty_enforcer.utils.apps use, only sending and confirming them is async.
+Needs the optional aiohttp dependency: pip install royalty_enforcer[aio]
+"""
+
+import asyncio
+import json
+import time
+from base64 import b64decode
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+try:
+    import aiohttp
+except ImportError as e:
+    raise ImportError(
+        "royalty_enforcer.aio needs aiohttp, install royalty_enforcer[aio]"
+    ) from e
+
+from algosdk import constants, encoding, error
+from algosdk.atomic_transaction_composer import (
+    AtomicTransactionComposer,
+    AtomicTransactionResponse,
+)
+from algosdk.future.transaction import SignedTransaction, SuggestedParams
+from royalty_enforcer.utils.accounts import Account
+from royalty_enforcer.utils.apps import (
+    App,
+    buildAppCreate,
+    buildEnforcerOptIn,
+    buildEnforcerRoyaltyFreeMove,
+    buildEnforcerSetup,
+    buildEnforcerTransfer,
+    buildEnforcerTransferBatch,
+    buildGetEnforcerAdmin,
+    buildGetEnforcerOffer,
+    buildGetEnforcerPolicy,
+    buildMarketplaceBuyNFT,
+    buildMarketplaceListNFT,
+    buildMarketplaceOptIn,
+    buildMarketplaceSetup,
+    buildSetEnforcerAdmin,
+    buildSetEnforcerOffer,
+    buildSetEnforcerPolicy,
+    ASSEMBLER,
+    compileProgram,
+    compileTeal,
+    decodeOffer,
+    decodePolicy,
+)
+from royalty_enforcer.utils.artifacts import (
+    CONTRACTS,
+    Artifact,
+    ArtifactError,
+    buildArtifact,
+    loadArtifact,
+)
+from royalty_enforcer.utils.cache import getCompileCache, programKey
+from royalty_enforcer.utils.clients import (
+    ALGOD_ADDRESSES,
+    ALGOD_TOKEN,
+    ENDPOINT_SELECTION,
+    HTTP_RETRIES,
+    HTTP_TIMEOUT,
+    errorMessage,
+    isPinned,
+)
+from royalty_enforcer.utils.params import getParamsProvider
+from royalty_enforcer.utils.transactions import decodeABIResult
+from royalty_enforcer.utils.transport import Endpoint, Transport
+
+# Rounds to wait for a group to be confirmed, same as the blocking helpers
+WAIT_ROUNDS = 2
+
+
+class AsyncAlgodClient:
+    """Minimal async algod client for the helpers below.
+
+    At most maxConcurrency requests are open at once and at most maxInFlight
+    groups are waiting for confirmation. Every pending confirmation is checked
+    after each new block, which a single task waits for on behalf of all of
+    them. Endpoints are chosen, pinned and retried by the same Transport the
+    blocking clients use, only the requests themselves go through aiohttp.
+    """
+
+    def __init__(
+        self,
+        token: str = ALGOD_TOKEN,
+        addresses: List[str] = ALGOD_ADDRESSES,
+        maxConcurrency: int = 64,
+        maxInFlight: int = 1024,
+        timeout: float = HTTP_TIMEOUT,
+        retries: int = HTTP_RETRIES,
+        backoff: float = 0.1,
+        maxBackoff: float = 2.0,
+    ) -> None:
+        self.token = token
+        self.maxConcurrency = maxConcurrency
+        self.timeout = timeout
+        # only its endpoint selection, stats and retry policy are used
+        self.transport = Transport(
+            [a.rstrip("/") for a in addresses],
+            selection=ENDPOINT_SELECTION,
+            timeout=timeout,
+            retries=retries,
+            backoff=backoff,
+            maxBackoff=maxBackoff,
+        )
+
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.requests = asyncio.Semaphore(maxConcurrency)
+        self.groups = asyncio.Semaphore(maxInFlight)
+        self.paramsLock = asyncio.Lock()
+
+        self.lastRound = 0
+        self.roundChanged = asyncio.Condition()
+        self.watcher: Optional[asyncio.Task] = None
+        self.waiters = 0
+
+    async def __aenter__(self) -> "AsyncAlgodClient":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self.watcher is not None:
+            self.watcher.cancel()
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def getSession(self) -> aiohttp.ClientSession:
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.maxConcurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self.session
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        data: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        responseFormat: str = "json",
+    ) -> Any:
+        header = {constants.algod_auth_header: self.token}
+        if headers:
+            header.update(headers)
+        pinned = isPinned(path)
+        if path not in constants.unversioned_paths:
+            path = "/v2" + path
+        if params:
+            path = path + "?" + urlencode(params)
+
+        endpoint = self.transport.first(pinned)
+        attempt = 0
+        while True:
+            try:
+                status, body = await self.send(endpoint, method, path, data, header)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                nextEndpoint = self.transport.retry(endpoint, method, attempt, pinned)
+                if nextEndpoint is None:
+                    raise
+            else:
+                if status < 500:
+                    endpoint.succeeded()
+                    break
+                nextEndpoint = self.transport.retry(endpoint, method, attempt, pinned)
+                if nextEndpoint is None:
+                    break
+
+            await asyncio.sleep(self.transport.delay(attempt))
+            attempt += 1
+            endpoint = nextEndpoint
+
+        if status >= 400:
+            raise error.AlgodHTTPError(errorMessage(body), status)
+        if responseFormat == "json":
+            return json.loads(body)
+        return body
+
+    async def send(
+        self,
+        endpoint: Endpoint,
+        method: str,
+        path: str,
+        data: Optional[bytes],
+        headers: Dict[str, str],
+    ) -> Tuple[int, bytes]:
+        start = time.perf_counter()
+        async with self.requests:
+            async with self.getSession().request(
+                method, endpoint.address + path, data=data, headers=headers
+            ) as resp:
+                body = await resp.read()
+        endpoint.observe((time.perf_counter() - start) * 1000)
+        return resp.status, body
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        return self.transport.stats()
+
+    async def status(self) -> Dict[str, Any]:
+        return await self.request("GET", "/status")
+
+    async def statusAfterBlock(self, round: int) -> Dict[str, Any]:
+        return await self.request(
+            "GET", "/status/wait-for-block-after/{}".format(round)
+        )
+
+    async def pendingTransactionInfo(self, txID: str) -> Dict[str, Any]:
+        return await self.request("GET", "/transactions/pending/{}".format(txID))
+
+    async def applicationInfo(self, appID: int) -> Dict[str, Any]:
+        return await self.request("GET", "/applications/{}".format(appID))
+
+    async def compile(self, teal: str) -> bytes:
+        response = await self.request(
+            "POST",
+            "/teal/compile",
+            data=teal.encode(),
+            headers={"Content-Type": "application/x-binary"},
+        )
+        return b64decode(response["result"])
+
+    async def suggestedParams(self) -> SuggestedParams:
+        provider = getParamsProvider(self)
+        sp = provider.cached()
+        if sp is not None:
+            return sp
+
+        # One fetch for all coroutines that missed at the same time
+        async with self.paramsLock:
+            sp = provider.cached()
+            if sp is None:
+                params = await self.request("GET", "/transactions/params")
+                sp = provider.store(
+                    SuggestedParams(
+                        params["fee"],
+                        params["last-round"],
+                        params["last-round"] + 1000,
+                        params["genesis-hash"],
+                        params["genesis-id"],
+                        False,
+                        params["consensus-version"],
+                        params["min-fee"],
+                    )
+                )
+        return sp
+
+    async def sendTransactions(self, signedTxns: List[SignedTransaction]) -> str:
+        data = b"".join(b64decode(encoding.msgpack_encode(s)) for s in signedTxns)
+        response = await self.request(
+            "POST",
+            "/transactions",
+            data=data,
+            headers={"Content-Type": "application/x-binary"},
+        )
+        return response["txId"]
+
+    async def watchRounds(self) -> None:
+        while self.waiters > 0:
+            try:
+                if self.lastRound == 0:
+                    status = await self.status()
+                else:
+                    status = await self.statusAfterBlock(self.lastRound)
+            except (aiohttp.ClientError, asyncio.TimeoutError, error.AlgodHTTPError):
+                await asyncio.sleep(1)
+                continue
+
+            async with self.roundChanged:
+                self.lastRound = max(self.lastRound, status["last-round"])
+                self.roundChanged.notify_all()
+
+    async def waitForRound(self, round: int) -> int:
+        """Wait until the node has seen the given round, return the last round"""
+        self.waiters += 1
+        try:
+            if self.watcher is None or self.watcher.done():
+                self.watcher = asyncio.ensure_future(self.watchRounds())
+            async with self.roundChanged:
+                await self.roundChanged.wait_for(lambda: self.lastRound >= round)
+            return self.lastRound
+        finally:
+            self.waiters -= 1
+
+    async def waitForConfirmation(
+        self, txID: str, waitRounds: int = WAIT_ROUNDS
+    ) -> Dict[str, Any]:
+        # The watcher stops while nobody waits, so lastRound may be stale
+        startRound = (await self.status())["last-round"]
+        async with self.roundChanged:
+            self.lastRound = max(self.lastRound, startRound)
+        currentRound = startRound
+        while currentRound <= startRound + waitRounds:
+            try:
+                info = await self.pendingTransactionInfo(txID)
+                if info.get("pool-error"):
+                    raise error.TransactionRejectedError(
+                        "Transaction rejected: " + info["pool-error"]
+                    )
+                if info.get("confirmed-round", 0) > 0:
+                    getParamsProvider(self).observeRound(info["confirmed-round"])
+                    return info
+            except error.AlgodHTTPError:
+                # may be a node behind a load balancer that hasn't seen it yet
+                pass
+
+            currentRound = await self.waitForRound(currentRound + 1)
+
+        raise error.ConfirmationTimeoutError(
+            "Wait for transaction id {} timed out".format(txID)
+        )
+
+
+async def execute(
+    client: AsyncAlgodClient,
+    atc: AtomicTransactionComposer,
+    waitRounds: int = WAIT_ROUNDS,
+) -> AtomicTransactionResponse:
+    """Async equivalent of atc.execute"""
+    async with client.groups:
+        signedTxns = atc.gather_signatures()
+        txIDs = [stxn.get_txid() for stxn in signedTxns]
+        await client.sendTransactions(signedTxns)
+        info = await client.waitForConfirmation(txIDs[0], waitRounds)
+
+    results = []
+    for i, method in sorted(atc.method_dict.items()):
+        txInfo = info if i == 0 else await client.pendingTransactionInfo(txIDs[i])
+        results.append(decodeABIResult(txIDs[i], txInfo, method))
+
+    return AtomicTransactionResponse(info["confirmed-round"], txIDs, results)
+
+
+async def compileAlgodProgram(client: AsyncAlgodClient, teal: str) -> bytes:
+    """Async equivalent of compileProgram with the algod assembler"""
+    cache = getCompileCache()
+    key = programKey(teal, "algod")
+    program = cache.get(key)
+    if program is None:
+        program = await client.compile(teal)
+        cache.put(key, program)
+    return program
+
+
+async def getArtifact(client: AsyncAlgodClient, name: str) -> Artifact:
+    """Async equivalent of royalty_enforcer.utils.apps.getArtifact"""
+    try:
+        return loadArtifact(name)
+    except ArtifactError:
+        pass
+
+    # No bundle from ./build.sh, keep PyTeal and the assembler off the loop
+    loop = asyncio.get_running_loop()
+    spec = CONTRACTS[name]
+    approvalTeal, clearTeal = await loop.run_in_executor(
+        None,
+        lambda: (
+            compileTeal(spec.module, spec.approvalCompiler),
+            compileTeal(spec.module, spec.clearCompiler),
+        ),
+    )
+    if ASSEMBLER == "local":
+        approvalProgram, clearProgram = await loop.run_in_executor(
+            None,
+            lambda: (
+                compileProgram(None, approvalTeal),
+                compileProgram(None, clearTeal),
+            ),
+        )
+    else:
+        approvalProgram = await compileAlgodProgram(client, approvalTeal)
+        clearProgram = await compileAlgodProgram(client, clearTeal)
+
+    return Artifact(
+        buildArtifact(
+            name, approvalTeal, clearTeal, approvalProgram, clearProgram, ASSEMBLER
+        )
+    )
+
+
+async def deployApp(
+    client: AsyncAlgodClient, sender: Account, name: str
+) -> Tuple[int, Any]:
+    artifact = await getArtifact(client, name)
+    txn = buildAppCreate(await client.suggestedParams(), artifact, sender)
+    signedTxn = txn.sign(sender.getPrivateKey())
+    async with client.groups:
+        await client.sendTransactions([signedTxn])
+        info = await client.waitForConfirmation(signedTxn.get_txid())
+    appID = info.get("application-index")
+    assert appID is not None and appID > 0
+    return appID, artifact.abi
+
+
+async def deployEnforcer(client: AsyncAlgodClient, sender: Account) -> App:
+    app = App(*await deployApp(client, sender, "enforcer"))
+    await execute(
+        client, buildEnforcerSetup(await client.suggestedParams(), app, sender)
+    )
+    return app
+
+
+async def optInToEnforcer(
+    client: AsyncAlgodClient, enforcer: App, sender: Account
+) -> None:
+    await execute(
+        client, buildEnforcerOptIn(await client.suggestedParams(), enforcer, sender)
+    )
+
+
+async def deployMarketplace(client: AsyncAlgodClient, sender: Account) -> App:
+    app = App(*await deployApp(client, sender, "marketplace"))
+    await execute(
+        client, buildMarketplaceSetup(await client.suggestedParams(), app, sender)
+    )
+    return app
+
+
+async def optInToMarketplace(
+    client: AsyncAlgodClient, marketplace: App, sender: Account
+) -> None:
+    await execute(
+        client,
+        buildMarketplaceOptIn(await client.suggestedParams(), marketplace, sender),
+    )
+
+
+async def setEnforcerPolicy(
+    client: AsyncAlgodClient,
+    enforcer: App,
+    sender: Account,
+    royaltyBasisPoints: int,
+    royaltyRecipientAddress: str,
+):
+    atc = buildSetEnforcerPolicy(
+        await client.suggestedParams(),
+        enforcer,
+        sender,
+        royaltyBasisPoints,
+        royaltyRecipientAddress,
+    )
+    await execute(client, atc)
+
+
+async def getEnforcerPolicy(
+    client: AsyncAlgodClient, enforcer: App, sender: Account
+) -> Tuple[str, int]:
+    atc = buildGetEnforcerPolicy(await client.suggestedParams(), enforcer, sender)
+    result = await execute(client, atc)
+    return decodePolicy(result.abi_results[0].return_value)
+
+
+async def setEnforcerAdmin(
+    client: AsyncAlgodClient, enforcer: App, sender: Account, adminAddress: str
+):
+    atc = buildSetEnforcerAdmin(
+        await client.suggestedParams(), enforcer, sender, adminAddress
+    )
+    await execute(client, atc)
+
+
+async def getEnforcerAdmin(
+    client: AsyncAlgodClient, enforcer: App, sender: Account
+) -> str:
+    atc = buildGetEnforcerAdmin(await client.suggestedParams(), enforcer, sender)
+    result = await execute(client, atc)
+    adminAddress = result.abi_results[0].return_value
+    assert isinstance(adminAddress, str)
+    return adminAddress
+
+
+async def setEnforcerOffer(
+    client: AsyncAlgodClient,
+    enforcer: App,
+    sender: Account,
+    nftID: int,
+    amount: int,
+    authAddress: str,
+    expectedAmount: int,
+    expectedAuthAddress: str,
+):
+    atc = buildSetEnforcerOffer(
+        await client.suggestedParams(),
+        enforcer,
+        sender,
+        nftID,
+        amount,
+        authAddress,
+        expectedAmount,
+        expectedAuthAddress,
+    )
+    await execute(client, atc)
+
+
+async def getEnforcerOffer(
+    client: AsyncAlgodClient,
+    enforcer: App,
+    sender: Account,
+    nftID: int,
+    sellerAddress: str,
+) -> Tuple[str, int]:
+    atc = buildGetEnforcerOffer(
+        await client.suggestedParams(), enforcer, sender, nftID, sellerAddress
+    )
+    result = await execute(client, atc)
+    return decodeOffer(result.abi_results[0].return_value)
+
+
+async def enforcerTransfer(
+    client: AsyncAlgodClient,
+    enforcer: App,
+    buyer: Account,
+    price: int,
+    nftID: int,
+    amount: int,
+    sellerAddress: str,
+    royaltyAddress: str,
+):
+    atc = buildEnforcerTransfer(
+        await client.suggestedParams(),
+        enforcer,
+        buyer,
+        price,
+        nftID,
+        amount,
+        sellerAddress,
+        royaltyAddress,
+    )
+    await execute(client, atc)
+
+
+async def enforcerTransferBatch(
+    client: AsyncAlgodClient,
+    enforcer: App,
+    buyer: Account,
+    transfers: List[Tuple[int, int, str, int]],
+    royaltyAddress: str,
+):
+    atc = buildEnforcerTransferBatch(
+        await client.suggestedParams(), enforcer, buyer, transfers, royaltyAddress
+    )
+    await execute(client, atc)
+
+
+async def enforcerRoyaltyFreeMove(
+    client: AsyncAlgodClient,
+    enforcer: App,
+    sender: Account,
+    nftID: int,
+    amount: int,
+    ownerAddress: str,
+    buyerAddress: str,
+):
+    atc = buildEnforcerRoyaltyFreeMove(
+        await client.suggestedParams(),
+        enforcer,
+        sender,
+        nftID,
+        amount,
+        ownerAddress,
+        buyerAddress,
+    )
+    await execute(client, atc)
+
+
+async def marketplaceListNFT(
+    client: AsyncAlgodClient,
+    enforcer: App,
+    marketplace: App,
+    sender: Account,
+    nftID: int,
+    amount: int,
+    price: int,
+):
+    atc = buildMarketplaceListNFT(
+        await client.suggestedParams(),
+        enforcer,
+        marketplace,
+        sender,
+        nftID,
+        amount,
+        price,
+    )
+    await execute(client, atc)
+
+
+async def marketplaceBuyNFT(
+    client: AsyncAlgodClient,
+    enforcer: App,
+    marketplace: App,
+    sellerAddress: str,
+    royaltyAddress: str,
+    buyer: Account,
+    nftID: int,
+    amount: int,
+    price: int,
+):
+    atc = buildMarketplaceBuyNFT(
+        await client.suggestedParams(),
+        enforcer,
+        marketplace,
+        sellerAddress,
+        royaltyAddress,
+        buyer,
+        nftID,
+        amount,
+        price,
+    )
+    await execute(client, atc)
@@ -1,5 +1,7 @@
 from pyteal import *
 
+from royalty_enforcer.contracts.router import dispatch
+
 
 class Keys:
     # Holds the current administrator
@@ -16,6 +18,10 @@ class Constants:
     # 10_000 basis points = 100%
     basis_point_multiplier = 10_000
 
+    # Scratch slot where each call of a batch transfer leaves what is left of
+    # the payment, read by the next call with gloads
+    batch_remaining_slot = 200
+
 
 class Selectors:
     # ARC-18 modifiers
@@ -29,6 +35,9 @@ class Selectors:
     royalty_free_move = MethodSignature(
         "royalty_free_move(asset,uint64,account,account,uint64)void"
     )
+    transfer_batch = MethodSignature(
+        "transfer_batch(asset,uint64,account,account,account,asset,uint64,uint64)void"
+    )
 
     # ARC-18 readonly
     get_policy = MethodSignature("get_policy()(address,uint64)")
@@ -475,6 +484,170 @@ def transfer():
     )
 
 
+@Subroutine(TealType.none)
+def pay_purchase(receiver, amt):
+    purchase_txn = Gtxn[0]
+    # Pays out of the purchase in what it was made with, algos or an asset
+    return Seq(
+        InnerTxnBuilder.Begin(),
+        If(
+            purchase_txn.type_enum() == TxnType.AssetTransfer,
+            InnerTxnBuilder.SetFields(
+                {
+                    TxnField.type_enum: TxnType.AssetTransfer,
+                    TxnField.xfer_asset: purchase_txn.xfer_asset(),
+                    TxnField.asset_amount: amt,
+                    TxnField.asset_receiver: receiver,
+                    TxnField.fee: Int(0),
+                }
+            ),
+            InnerTxnBuilder.SetFields(
+                {
+                    TxnField.type_enum: TxnType.Payment,
+                    TxnField.amount: amt,
+                    TxnField.receiver: receiver,
+                    TxnField.fee: Int(0),
+                }
+            ),
+        ),
+        InnerTxnBuilder.Submit(),
+    )
+
+
+@Subroutine(TealType.uint64)
+def is_batch_transfer(txn_index):
+    call = Gtxn[txn_index]
+    return And(
+        call.type_enum() == TxnType.ApplicationCall,
+        call.application_id() == Global.current_application_id(),
+        call.on_completion() == OnComplete.NoOp,
+        call.application_args[0] == Selectors.transfer_batch,
+    )
+
+
+@Subroutine(TealType.uint64)
+def transfer_batch():
+    # The group is one payment followed by one call of this method for each
+    # asset bought with it, the payment is shared by all of them
+    asset_id = Txn.assets[Btoi(Txn.application_args[1])]
+    asset_amt = Btoi(Txn.application_args[2])
+    owner_acct = Txn.accounts[Btoi(Txn.application_args[3])]
+    buyer_acct = Txn.accounts[Btoi(Txn.application_args[4])]
+    expected_royalty_acct = Txn.accounts[Btoi(Txn.application_args[5])]
+    # Unused, just passed in args to let the app have access in foreign assets
+    # asset_idx  = Txn.application_args[6]
+    expected_offer_amt = Btoi(Txn.application_args[7])
+    # Share of the payment for this asset, royalty included
+    price = Btoi(Txn.application_args[8])
+    purchase_txn = Gtxn[0]
+
+    first = Txn.group_index() == Int(1)
+    last = Txn.group_index() == Global.group_size() - Int(1)
+
+    offer = App.localGet(owner_acct, Itob(asset_id))
+    offer_auth = extract_offer_auth(offer)
+    offer_amt = extract_offer_amount(offer)
+
+    purchase_amt = ScratchVar(TealType.uint64)
+    royalty_amt = ScratchVar(TealType.uint64)
+    owner_amt = ScratchVar(TealType.uint64)
+    remaining = ScratchVar(TealType.uint64, Constants.batch_remaining_slot)
+
+    valid_transfer_group = And(
+        Txn.group_index() > Int(0),
+        # App call sent by authorizing address
+        Txn.sender() == offer_auth,
+        # No funny business
+        purchase_txn.rekey_to() == Global.zero_address(),
+        # payment txn should be from auth
+        purchase_txn.sender() == offer_auth,
+        # transfer amount <= offered amount
+        asset_amt <= offer_amt,
+        Or(
+            And(
+                purchase_txn.type_enum() == TxnType.AssetTransfer,
+                # Just to be sure
+                purchase_txn.asset_close_to() == Global.zero_address(),
+                # Make sure payments go to the right participants
+                purchase_txn.asset_receiver() == Global.current_application_address(),
+            ),
+            And(
+                purchase_txn.type_enum() == TxnType.Payment,
+                # Just to be sure
+                purchase_txn.close_remainder_to() == Global.zero_address(),
+                # Make sure payments are going to the right participants
+                purchase_txn.receiver() == Global.current_application_address(),
+            ),
+        ),
+        # Passed the correct account according to the policy
+        expected_royalty_acct == get_royalty_receiver(),
+    )
+
+    return Seq(
+        # initialize values to check rekey
+        (owner_auth := AccountParam.authAddr(owner_acct)),
+        (buyer_auth := AccountParam.authAddr(buyer_acct)),
+        # Make sure neither owner/buyer have been rekeyed (OPTIONAL)
+        Assert(owner_auth.value() == Global.zero_address()),
+        Assert(buyer_auth.value() == Global.zero_address()),
+        # Make sure transactions look right
+        Assert(valid_transfer_group),
+        # Every other transaction of the group calls this method, so what is
+        # left of the payment is always in the previous call's scratch
+        Assert(If(first, Int(1), is_batch_transfer(Txn.group_index() - Int(1)))),
+        Assert(If(last, Int(1), is_batch_transfer(Txn.group_index() + Int(1)))),
+        If(
+            first,
+            Seq(
+                # Royalty is paid once, on the whole payment
+                purchase_amt.store(
+                    If(
+                        purchase_txn.type_enum() == TxnType.AssetTransfer,
+                        purchase_txn.asset_amount(),
+                        purchase_txn.amount(),
+                    )
+                ),
+                royalty_amt.store(
+                    royalty_amount(purchase_amt.load(), get_royalty_basis())
+                ),
+                If(
+                    royalty_amt.load() > Int(0),
+                    pay_purchase(expected_royalty_acct, royalty_amt.load()),
+                ),
+                remaining.store(purchase_amt.load() - royalty_amt.load()),
+            ),
+            remaining.store(
+                ImportScratchValue(
+                    Txn.group_index() - Int(1), Constants.batch_remaining_slot
+                )
+            ),
+        ),
+        # The owner gets the price less the royalty on it, the last one gets
+        # what is left, which takes the rounding
+        owner_amt.store(
+            If(
+                last,
+                remaining.load(),
+                price - royalty_amount(price, get_royalty_basis()),
+            )
+        ),
+        pay_purchase(owner_acct, owner_amt.load()),
+        remaining.store(remaining.load() - owner_amt.load()),
+        # Perform asset move
+        move_asset(asset_id, owner_acct, buyer_acct, asset_amt),
+        # Clear listing from local state of owner
+        update_offered(
+            owner_acct,
+            Itob(asset_id),
+            offer_auth,
+            offer_amt - asset_amt,
+            Txn.sender(),
+            expected_offer_amt,
+        ),
+        Int(1),
+    )
+
+
 @Subroutine(TealType.uint64)
 def royalty_free_move():
     asset_id = Txn.assets[Btoi(Txn.application_args[1])]
@@ -520,37 +693,28 @@ def royalty_free_move():
 def approval():
     from_administrator = Txn.sender() == administrator()
 
-    action_router = Cond(
+    action_router = dispatch(
         [
-            And(
-                Txn.application_args[0] == Selectors.royalty_free_move,
-                from_administrator,
+            (
+                Selectors.royalty_free_move,
+                Seq(Assert(from_administrator), royalty_free_move()),
             ),
-            royalty_free_move(),
-        ],
-        [
-            And(Txn.application_args[0] == Selectors.set_policy, from_administrator),
-            set_policy(),
-        ],
-        [
-            And(
-                Txn.application_args[0] == Selectors.set_payment_asset,
-                from_administrator,
+            (Selectors.set_policy, Seq(Assert(from_administrator), set_policy())),
+            (
+                Selectors.set_payment_asset,
+                Seq(Assert(from_administrator), set_payment_asset()),
             ),
-            set_payment_asset(),
-        ],
-        [
-            And(
-                Txn.application_args[0] == Selectors.set_administrator,
-                from_administrator,
+            (
+                Selectors.set_administrator,
+                Seq(Assert(from_administrator), set_administrator()),
             ),
-            set_administrator(),
-        ],
-        [Txn.application_args[0] == Selectors.transfer, transfer()],
-        [Txn.application_args[0] == Selectors.offer, offer()],
-        [Txn.application_args[0] == Selectors.get_offer, get_offer()],
-        [Txn.application_args[0] == Selectors.get_policy, get_policy()],
-        [Txn.application_args[0] == Selectors.get_administrator, get_administrator()],
+            (Selectors.transfer, transfer()),
+            (Selectors.transfer_batch, transfer_batch()),
+            (Selectors.offer, offer()),
+            (Selectors.get_offer, get_offer()),
+            (Selectors.get_policy, get_policy()),
+            (Selectors.get_administrator, get_administrator()),
+        ]
     )
 
     return Cond(
@@ -592,7 +756,19 @@ def compile_enforcer_clear():
 
 
 if __name__ == "__main__":
-    with open("assets/enforcer_approval.teal", "w") as f:
-        f.write(compile_enforcer_approval())
-    with open("assets/enforcer_clear.teal", "w") as f:
-        f.write(compile_enforcer_clear())
+    import os
+
+    from royalty_enforcer.utils.apps import ASSEMBLER, assembleArtifact
+    from royalty_enforcer.utils.artifacts import ASSETS_DIR, writeArtifact
+    from royalty_enforcer.utils.clients import getAlgodClient
+
+    approval_teal = compile_enforcer_approval()
+    clear_teal = compile_enforcer_clear()
+
+    with open(os.path.join(ASSETS_DIR, "enforcer_approval.teal"), "w") as f:
+        f.write(approval_teal)
+    with open(os.path.join(ASSETS_DIR, "enforcer_clear.teal"), "w") as f:
+        f.write(clear_teal)
+
+    client = getAlgodClient() if ASSEMBLER == "algod" else None
+    writeArtifact(assembleArtifact(client, "enforcer", approval_teal, clear_teal))
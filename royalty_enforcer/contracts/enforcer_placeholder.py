@@ -1,6 +1,7 @@
 from pyteal import *
 
 from royalty_enforcer.contracts.enforcer import *
+from royalty_enforcer.contracts.router import dispatch
 
 
 def approval():
@@ -8,44 +9,18 @@ def approval():
     from_creator = Txn.sender() == Global.creator_address()
     from_admin_or_creator = Or(from_administrator, from_creator)
 
-    action_router = Cond(
-        # Only support policy and administrator actions until TEAL v7
+    action_router = dispatch(
+        # Only support policy and administrator actions until TEAL v7, the
+        # other methods are rejected like unknown selectors
         [
-            And(Txn.application_args[0] == Selectors.set_policy, from_admin_or_creator),
-            set_policy(),
-        ],
-        [Txn.application_args[0] == Selectors.get_policy, get_policy()],
-        [
-            And(
-                Txn.application_args[0] == Selectors.set_administrator,
-                from_admin_or_creator,
+            (Selectors.set_policy, Seq(Assert(from_admin_or_creator), set_policy())),
+            (Selectors.get_policy, get_policy()),
+            (
+                Selectors.set_administrator,
+                Seq(Assert(from_admin_or_creator), set_administrator()),
             ),
-            set_administrator(),
-        ],
-        [Txn.application_args[0] == Selectors.get_administrator, get_administrator()],
-        # The following methods are not yet implemented while waiting for TEAL v7
-        [Txn.application_args[0] == Selectors.royalty_free_move, Int(0)],
-        [Txn.application_args[0] == Selectors.set_payment_asset, Int(0)],
-        [Txn.application_args[0] == Selectors.transfer, Int(0)],
-        [Txn.application_args[0] == Selectors.offer, Int(0)],
-        [Txn.application_args[0] == Selectors.get_offer, Int(0)],
-        [Txn.application_args[0] == Selectors.asset_transfer, Int(0)],
-        [Txn.application_args[0] == Selectors.asset_create, Int(0)],
-        [Txn.application_args[0] == Selectors.asset_config, Int(0)],
-        [Txn.application_args[0] == Selectors.asset_destroy, Int(0)],
-        [Txn.application_args[0] == Selectors.asset_freeze, Int(0)],
-        [Txn.application_args[0] == Selectors.is_asset_frozen, Int(0)],
-        [Txn.application_args[0] == Selectors.get_asset_name, Int(0)],
-        [Txn.application_args[0] == Selectors.get_clawback_addr, Int(0)],
-        [Txn.application_args[0] == Selectors.get_decimals, Int(0)],
-        [Txn.application_args[0] == Selectors.get_default_frozen, Int(0)],
-        [Txn.application_args[0] == Selectors.get_freeze_addr, Int(0)],
-        [Txn.application_args[0] == Selectors.get_manager_addr, Int(0)],
-        [Txn.application_args[0] == Selectors.get_metadata_hash, Int(0)],
-        [Txn.application_args[0] == Selectors.get_reserve_addr, Int(0)],
-        [Txn.application_args[0] == Selectors.get_total, Int(0)],
-        [Txn.application_args[0] == Selectors.get_unit_name, Int(0)],
-        [Txn.application_args[0] == Selectors.get_url, Int(0)],
+            (Selectors.get_administrator, get_administrator()),
+        ]
     )
 
     return Cond(
@@ -87,7 +62,21 @@ def compile_enforcer_placeholder_clear():
 
 
 if __name__ == "__main__":
-    with open("assets/enforcer_placeholder_approval.teal", "w") as f:
-        f.write(compile_enforcer_placeholder_approval())
-    with open("assets/enforcer_placeholder_clear.teal", "w") as f:
-        f.write(compile_enforcer_placeholder_clear())
+    import os
+
+    from royalty_enforcer.utils.apps import ASSEMBLER, assembleArtifact
+    from royalty_enforcer.utils.artifacts import ASSETS_DIR, writeArtifact
+    from royalty_enforcer.utils.clients import getAlgodClient
+
+    approval_teal = compile_enforcer_placeholder_approval()
+    clear_teal = compile_enforcer_placeholder_clear()
+
+    with open(os.path.join(ASSETS_DIR, "enforcer_placeholder_approval.teal"), "w") as f:
+        f.write(approval_teal)
+    with open(os.path.join(ASSETS_DIR, "enforcer_placeholder_clear.teal"), "w") as f:
+        f.write(clear_teal)
+
+    client = getAlgodClient() if ASSEMBLER == "algod" else None
+    writeArtifact(
+        assembleArtifact(client, "enforcer_placeholder", approval_teal, clear_teal)
+    )
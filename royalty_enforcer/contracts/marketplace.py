@@ -1,14 +1,6 @@
 from pyteal import *
 
 
-class Keys:
-    app = Bytes("app")
-    asset = Bytes("asset")
-    price = Bytes("price")
-    amount = Bytes("amount")
-    account = Bytes("account")
-
-
 class Selectors:
     list = MethodSignature("list(asset,application,uint64,uint64,appl)void")
 
@@ -38,8 +30,6 @@ def list_nft():
         # Check stuff
         Assert(
             And(
-                # We don't have anything there yet
-                App.globalGet(Keys.app) == Int(0),
                 # The app call to trigger offered is present and same as app id
                 offer_txn.application_id() == app_id,
                 # The caller has the asset
@@ -53,12 +43,13 @@ def list_nft():
                 ExtractUint64(offered.value(), Int(32)) <= asset_amount,
             )
         ),
-        # Set appropriate parameters
-        App.globalPut(Keys.app, app_id),
-        App.globalPut(Keys.asset, asset_id),
-        App.globalPut(Keys.amount, asset_amount),
-        App.globalPut(Keys.price, price),
-        App.globalPut(Keys.account, Txn.sender()),
+        # Listings are kept in the seller's local state by asset, listing the
+        # same asset again replaces its listing
+        App.localPut(
+            Txn.sender(),
+            Itob(asset_id),
+            Concat(Itob(app_id), Itob(asset_amount), Itob(price)),
+        ),
         Int(1),
     )
 
@@ -78,14 +69,14 @@ def buy_nft():
     # Issue inner app call to royalty to move asset
     return Seq(
         current_offer := App.localGetEx(owner_acct, app_id, Itob(asset_id)),
+        listing := App.localGetEx(owner_acct, Int(0), Itob(asset_id)),
         Assert(
             And(
-                # Matches what we have in global state
-                owner_acct == App.globalGet(Keys.account),
-                app_id == App.globalGet(Keys.app),
-                asset_id == App.globalGet(Keys.asset),
-                pay_txn.amount() >= App.globalGet(Keys.price),
-                asset_amount <= App.globalGet(Keys.amount),
+                # Matches what the owner listed for this asset
+                listing.hasValue(),
+                app_id == listed_app(listing.value()),
+                pay_txn.amount() >= listed_price(listing.value()),
+                asset_amount <= listed_amount(listing.value()),
                 # Pay me plz
                 pay_txn.receiver() == Global.current_application_address(),
                 current_offer.hasValue(),
@@ -122,15 +113,26 @@ def buy_nft():
         ),
         InnerTxnBuilder.Submit(),
         # Wipe listing
-        App.globalDel(Keys.asset),
-        App.globalDel(Keys.amount),
-        App.globalDel(Keys.app),
-        App.globalDel(Keys.account),
-        App.globalDel(Keys.price),
+        App.localDel(owner_acct, Itob(asset_id)),
         Int(1),
     )
 
 
+@Subroutine(TealType.uint64)
+def listed_app(listing):
+    return ExtractUint64(listing, Int(0))
+
+
+@Subroutine(TealType.uint64)
+def listed_amount(listing):
+    return ExtractUint64(listing, Int(8))
+
+
+@Subroutine(TealType.uint64)
+def listed_price(listing):
+    return ExtractUint64(listing, Int(16))
+
+
 @Subroutine(TealType.uint64)
 def offered_amount(offer):
     return ExtractUint64(offer, Int(32))
@@ -172,7 +174,19 @@ def compile_marketplace_clear():
 
 
 if __name__ == "__main__":
-    with open("assets/marketplace_approval.teal", "w") as f:
-        f.write(compile_marketplace_approval())
-    with open("assets/marketplace_clear.teal", "w") as f:
-        f.write(compile_marketplace_clear())
+    import os
+
+    from royalty_enforcer.utils.apps import ASSEMBLER, assembleArtifact
+    from royalty_enforcer.utils.artifacts import ASSETS_DIR, writeArtifact
+    from royalty_enforcer.utils.clients import getAlgodClient
+
+    approval_teal = compile_marketplace_approval()
+    clear_teal = compile_marketplace_clear()
+
+    with open(os.path.join(ASSETS_DIR, "marketplace_approval.teal"), "w") as f:
+        f.write(approval_teal)
+    with open(os.path.join(ASSETS_DIR, "marketplace_clear.teal"), "w") as f:
+        f.write(clear_teal)
+
+    client = getAlgodClient() if ASSEMBLER == "algod" else None
+    writeArtifact(assembleArtifact(client, "marketplace", approval_teal, clear_teal))
@@ -0,0 +1,41 @@
+from typing import List, Tuple
+
+from algosdk.abi import Method
+from pyteal import *
+
+# TEAL v6 has no switch or match, so instead of comparing the selector with
+# each method in turn, the methods are found with a binary search over their
+# selectors read as integers. A method costs a few comparisons whatever its
+# position and the number of methods, and the selector is compared in full
+# only once, at the leaf.
+
+
+def selector_value(signature: MethodSignature) -> int:
+    return int.from_bytes(
+        Method.from_signature(signature.methodName).get_selector(), "big"
+    )
+
+
+def dispatch(routes: List[Tuple[MethodSignature, Expr]]) -> Expr:
+    """Evaluates the expression of the method called, fails for any other
+    selector"""
+    selector = ScratchVar(TealType.uint64)
+    ordered = sorted(routes, key=lambda route: selector_value(route[0]))
+
+    def search(routes: List[Tuple[MethodSignature, Expr]]) -> Expr:
+        if len(routes) == 1:
+            signature, action = routes[0]
+            return Seq(Assert(Txn.application_args[0] == signature), action)
+        middle = len(routes) // 2
+        return If(
+            selector.load() < Int(selector_value(routes[middle][0])),
+            search(routes[:middle]),
+            search(routes[middle:]),
+        )
+
+    return Seq(
+        # anything that isn't a selector fails the comparison at the leaf, or
+        # here when it's longer than 8 bytes
+        selector.store(Btoi(Txn.application_args[0])),
+        search(ordered),
+    )
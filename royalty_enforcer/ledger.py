@@ -0,0 +1,442 @@
+"""Ledger of the royalties paid by enforcer transfers.
+
+Every confirmed enforcer transfer call becomes one sale record, decoded from
+the app call arguments and the inner payments the enforcer made to the owner
+and the royalty receiver. A batch transfer is a call per asset, each recorded
+at what its owner was paid plus its share of the royalty the first call paid
+on the whole batch. Records are kept in NumPy structured arrays of a
+fixed chunk size, optionally saved as one .npy file per chunk, and totals
+are computed per chunk with vectorized grouping.
+Needs the optional numpy dependency: pip install royalty_enforcer[ledger]
+"""
+
+import bisect
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+try:
+    import numpy
+except ImportError as e:
+    raise ImportError(
+        "royalty_enforcer.ledger needs numpy, install royalty_enforcer[ledger]"
+    ) from e
+
+from algosdk.encoding import decode_address, encode_address
+from algosdk.v2client.algod import AlgodClient
+from royalty_enforcer.utils.abi import MethodIndex, toAddress, toBytes
+from royalty_enforcer.utils.artifacts import loadInterface
+from royalty_enforcer.utils.transactions import (
+    ConfirmationTracker,
+    PendingTxnResponse,
+    decodeBlock,
+)
+
+# Addresses are stored as indexes into the ledger's address table
+SALE_DTYPE = numpy.dtype(
+    [
+        ("round", "<u8"),
+        ("time", "<i8"),
+        ("app", "<u8"),
+        ("asset", "<u8"),
+        ("assetAmount", "<u8"),
+        ("seller", "<u4"),
+        ("buyer", "<u4"),
+        ("receiver", "<u4"),
+        # 0 for payments in algos
+        ("paymentAsset", "<u8"),
+        ("price", "<u8"),
+        ("royalty", "<u8"),
+    ]
+)
+
+CHUNK_SIZE = 65536
+
+# A batch transfer call as response, transaction, round and timestamp
+BatchCall = Tuple[Dict[str, Any], Dict[str, Any], int, int]
+
+SECONDS_PER_DAY = 86400
+
+ADDRESSES_FILE = "addresses.bin"
+CHUNK_FILE = "sales-{:08d}.npy"
+
+
+def groupSum(keys: numpy.ndarray, values: numpy.ndarray) -> Dict[int, int]:
+    """Sum of values per distinct key, in exact uint64 arithmetic"""
+    if len(keys) == 0:
+        return dict()
+    order = numpy.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = numpy.flatnonzero(numpy.r_[True, keys[1:] != keys[:-1]])
+    sums = numpy.add.reduceat(values[order].astype(numpy.uint64), starts)
+    return dict(zip(keys[starts].tolist(), sums.tolist()))
+
+
+def salePayments(response: Dict[str, Any]) -> Tuple[int, List[int]]:
+    """Payment asset (0 for algos) and amounts of the payments an enforcer
+    call made, in order"""
+    inners = [i["txn"]["txn"] for i in response.get("inner-txns", [])]
+    payments = [i for i in inners if "asnd" not in i]
+    if not payments:
+        return 0, []
+    amountField = "aamt" if payments[0].get("type") == "axfer" else "amt"
+    return payments[0].get("xaid", 0), [p.get(amountField, 0) for p in payments]
+
+
+def addRound(ranges: List[List[int]], round: int) -> bool:
+    """Add the round to sorted, disjoint [first, last] ranges of rounds,
+    returns whether it wasn't in them yet"""
+    i = bisect.bisect_right(ranges, round, key=lambda r: r[0])
+    before = ranges[i - 1] if i > 0 else None
+    if before is not None and before[1] >= round:
+        return False
+    joinsBefore = before is not None and before[1] == round - 1
+    joinsAfter = i < len(ranges) and ranges[i][0] == round + 1
+    if joinsBefore and joinsAfter:
+        before[1] = ranges.pop(i)[1]
+    elif joinsBefore:
+        before[1] = round
+    elif joinsAfter:
+        ranges[i][0] = round
+    else:
+        ranges.insert(i, [round, round])
+    return True
+
+
+def hasRound(ranges: List[List[int]], round: int) -> bool:
+    i = bisect.bisect_right(ranges, round, key=lambda r: r[0])
+    return i > 0 and ranges[i - 1][1] >= round
+
+
+def mergeTotals(totals: Dict[int, int], more: Dict[int, int]) -> None:
+    for key, value in more.items():
+        totals[key] = totals.get(key, 0) + value
+
+
+class RoyaltyLedger:
+    """Sale records of enforcer transfers, with royalty totals.
+
+    Pass confirmed transactions to observe(), or the transactions of a group
+    to observeGroup(), attach() the ledger to a ConfirmationTracker to record
+    sales from new blocks, or walk past blocks with ingestBlocks(). Only calls to the given enforcer apps are recorded,
+    or to every app with the enforcer's transfer methods if none are given.
+
+    With a directory, full chunks are saved there as they fill up and flush()
+    saves the rest. Saved chunks are memory mapped when the ledger is opened
+    again.
+
+    Blocks are ingested at most once: the ingested rounds are kept as ranges,
+    and blocks from the tracker and from ingestBlocks() in them are skipped,
+    so a backfill can run while the ledger is attached. A reopened ledger
+    counts every round up to the round of its last saved sale as ingested.
+    """
+
+    def __init__(
+        self,
+        appIDs: Optional[List[int]] = None,
+        directory: Optional[str] = None,
+        chunkSize: int = CHUNK_SIZE,
+    ) -> None:
+        self.appIDs: Optional[Set[int]] = set(appIDs) if appIDs else None
+        self.directory = directory
+        self.chunkSize = chunkSize
+        self.lock = threading.Lock()
+
+        self.methods = MethodIndex(loadInterface("enforcer_abi.json"))
+        self.transferSelector = self.methods.getSelector("transfer")
+        self.batchSelector = self.methods.getSelector("transfer_batch")
+
+        self.addresses: List[bytes] = []
+        self.addressIDs: Dict[bytes, int] = dict()
+
+        self.chunks: List[numpy.ndarray] = []
+        self.savedChunks = 0
+        self.savedAddresses = 0
+        self.buffer = numpy.zeros(chunkSize, dtype=SALE_DTYPE)
+        self.count = 0
+        # sorted, disjoint [first, last] ranges of the rounds ingested
+        self.rounds: List[List[int]] = []
+
+        if directory is not None:
+            self.open()
+
+    def open(self) -> None:
+        assert self.directory is not None
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, ADDRESSES_FILE)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            for i in range(0, len(data), 32):
+                self.addressID(data[i : i + 32])
+        while os.path.exists(self.chunkPath(len(self.chunks))):
+            self.chunks.append(
+                numpy.load(self.chunkPath(len(self.chunks)), mmap_mode="r")
+            )
+        self.savedChunks = len(self.chunks)
+        self.savedAddresses = len(self.addresses)
+        lastRound = max(
+            (int(chunk["round"].max()) for chunk in self.chunks if len(chunk)),
+            default=0,
+        )
+        if lastRound:
+            self.rounds = [[0, lastRound]]
+
+    def chunkPath(self, index: int) -> str:
+        assert self.directory is not None
+        return os.path.join(self.directory, CHUNK_FILE.format(index))
+
+    def addressID(self, address: Union[str, bytes]) -> int:
+        # called with the lock held
+        if isinstance(address, str):
+            address = decode_address(address)
+        index = self.addressIDs.get(address)
+        if index is None:
+            index = len(self.addresses)
+            self.addresses.append(address)
+            self.addressIDs[address] = index
+        return index
+
+    def address(self, index: int) -> str:
+        return encode_address(self.addresses[index])
+
+    def __len__(self) -> int:
+        return sum(len(c) for c in self.chunks) + self.count
+
+    def observe(
+        self,
+        response: Union[PendingTxnResponse, Dict[str, Any]],
+        timestamp: Optional[int] = None,
+        round: Optional[int] = None,
+    ) -> bool:
+        """Record the transaction if it is an enforcer transfer, returns
+        whether it was one. Responses from blocks carry their timestamp,
+        others are recorded at the given or the current time. Responses
+        without a confirmed round, like inner transactions, are recorded at
+        the given round. Batch transfer calls are observed with the rest of
+        their group by observeGroup()."""
+        return self.observeGroup([response], timestamp, round)
+
+    def observeGroup(
+        self,
+        responses: List[Union[PendingTxnResponse, Dict[str, Any]]],
+        timestamp: Optional[int] = None,
+        round: Optional[int] = None,
+    ) -> bool:
+        """Record the enforcer transfers among the transactions, returns
+        whether there were any. The calls of a batch transfer share one
+        royalty payment, so they are recorded together per group."""
+        recorded = False
+        # group ID -> batch transfer calls in group order
+        batches: Dict[Optional[str], List[BatchCall]] = dict()
+        for response in responses:
+            if isinstance(response, PendingTxnResponse):
+                response = response.raw
+
+            txn = response.get("txn", {}).get("txn", {})
+            appID = txn.get("apid", 0)
+            callTime = timestamp
+            if callTime is None:
+                callTime = response.get("round-time") or int(time.time())
+            callRound = response.get("confirmed-round") or round or 0
+            if (
+                appID
+                and (self.appIDs is None or appID in self.appIDs)
+                and txn.get("apaa")
+            ):
+                selector = toBytes(txn["apaa"][0])[:4]
+                if selector == self.transferSelector:
+                    if self.recordTransfer(response, txn, callRound, callTime):
+                        recorded = True
+                elif selector == self.batchSelector:
+                    batches.setdefault(txn.get("grp"), []).append(
+                        (response, txn, callRound, callTime)
+                    )
+
+            # Enforcers may be called from other apps, e.g. a marketplace
+            inners = response.get("inner-txns", [])
+            if inners and self.observeGroup(
+                inners, response.get("round-time", callTime), callRound
+            ):
+                recorded = True
+
+        for calls in batches.values():
+            if self.recordBatch(calls):
+                recorded = True
+        return recorded
+
+    def recordTransfer(
+        self, response: Dict[str, Any], txn: Dict[str, Any], round: int, timestamp: int
+    ) -> bool:
+        # owner payment, royalty payment if there is a royalty, asset move
+        paymentAsset, amounts = salePayments(response)
+        if not amounts:
+            return False
+        royalty = amounts[1] if len(amounts) > 1 else 0
+        self.record(txn, round, timestamp, paymentAsset, sum(amounts), royalty)
+        return True
+
+    def recordBatch(self, calls: List[BatchCall]) -> bool:
+        # The first call pays the royalty on the whole payment, then each
+        # call pays its owner the price argument less the royalty on it, and
+        # the last call pays its owner what is left. Each asset is recorded
+        # at what its owner got plus the royalty on its price, the last one
+        # with the rest of the royalty.
+        sales = []
+        batchRoyalty = 0
+        for response, txn, round, timestamp in calls:
+            paymentAsset, amounts = salePayments(response)
+            if not amounts:
+                continue
+            if len(amounts) > 1:
+                # royalty payment, owner payment, asset move
+                batchRoyalty += amounts[0]
+            price = self.methods.decodeCall(txn)[1][7]
+            sales.append((txn, round, timestamp, paymentAsset, price, amounts[-1]))
+        if not sales:
+            return False
+
+        royaltyLeft = batchRoyalty
+        for txn, round, timestamp, paymentAsset, price, paid in sales[:-1]:
+            royalty = price - paid
+            royaltyLeft -= royalty
+            self.record(txn, round, timestamp, paymentAsset, paid + royalty, royalty)
+        txn, round, timestamp, paymentAsset, _, paid = sales[-1]
+        self.record(
+            txn, round, timestamp, paymentAsset, paid + royaltyLeft, royaltyLeft
+        )
+        return True
+
+    def record(
+        self,
+        txn: Dict[str, Any],
+        round: int,
+        timestamp: int,
+        paymentAsset: int,
+        price: int,
+        royalty: int,
+    ) -> None:
+        args = self.methods.decodeCall(txn)[1]
+        assetID, assetAmount, owner, buyer, royaltyReceiver = args[:5]
+
+        with self.lock:
+            if self.count == self.chunkSize:
+                self.sealChunk()
+            record = self.buffer[self.count]
+            record["round"] = round
+            record["time"] = timestamp
+            record["app"] = txn["apid"]
+            record["asset"] = assetID
+            record["assetAmount"] = assetAmount
+            record["seller"] = self.addressID(toAddress(owner))
+            record["buyer"] = self.addressID(toAddress(buyer))
+            record["receiver"] = self.addressID(toAddress(royaltyReceiver))
+            record["paymentAsset"] = paymentAsset
+            record["price"] = price
+            record["royalty"] = royalty
+            self.count += 1
+
+    def sealChunk(self) -> None:
+        # called with the lock held
+        chunk = self.buffer[: self.count].copy()
+        self.chunks.append(chunk)
+        self.buffer = numpy.zeros(self.chunkSize, dtype=SALE_DTYPE)
+        self.count = 0
+        if self.directory is not None:
+            self.save()
+
+    def save(self) -> None:
+        # called with the lock held
+        with open(os.path.join(self.directory, ADDRESSES_FILE), "ab") as f:
+            f.write(b"".join(self.addresses[self.savedAddresses :]))
+        self.savedAddresses = len(self.addresses)
+        for index in range(self.savedChunks, len(self.chunks)):
+            numpy.save(self.chunkPath(index), self.chunks[index])
+        self.savedChunks = len(self.chunks)
+
+    def flush(self) -> None:
+        """Save the records that don't fill a chunk yet"""
+        with self.lock:
+            if self.count:
+                self.sealChunk()
+            elif self.directory is not None:
+                self.save()
+
+    def observeBlock(
+        self,
+        round: int,
+        responses: Dict[str, Union[PendingTxnResponse, Dict[str, Any]]],
+    ) -> None:
+        with self.lock:
+            if not addRound(self.rounds, round):
+                # already ingested
+                return
+        self.observeGroup(list(responses.values()), round=round)
+
+    def attach(self, tracker: ConfirmationTracker) -> None:
+        tracker.subscribe(self.observeBlock)
+
+    def detach(self, tracker: ConfirmationTracker) -> None:
+        tracker.unsubscribe(self.observeBlock)
+
+    def ingestBlocks(self, client: AlgodClient, first: int, last: int) -> int:
+        """Record the sales in rounds first to last, returns how many. Rounds
+        already ingested are skipped."""
+        before = len(self)
+        for round in range(first, last + 1):
+            with self.lock:
+                if hasRound(self.rounds, round):
+                    continue
+            data = client.block_info(round, response_format="msgpack")
+            self.observeBlock(round, decodeBlock(data))
+        return len(self) - before
+
+    def iterChunks(self) -> Iterator[numpy.ndarray]:
+        with self.lock:
+            chunks = list(self.chunks) + [self.buffer[: self.count].copy()]
+        for chunk in chunks:
+            if len(chunk):
+                yield chunk
+
+    def totals(
+        self,
+        key: str,
+        paymentAsset: int = 0,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> Dict[int, int]:
+        """Royalties paid in paymentAsset per value of the key column, for
+        sales with start <= time < end"""
+        totals: Dict[int, int] = dict()
+        for chunk in self.iterChunks():
+            mask = chunk["paymentAsset"] == paymentAsset
+            if start is not None:
+                mask &= chunk["time"] >= start
+            if end is not None:
+                mask &= chunk["time"] < end
+            selected = chunk[mask]
+            keys = selected[key]
+            if key == "time":
+                keys = keys // SECONDS_PER_DAY
+            mergeTotals(totals, groupSum(keys, selected["royalty"]))
+        return totals
+
+    def totalsByReceiver(self, paymentAsset: int = 0, **window: int) -> Dict[str, int]:
+        """Royalty receiver address -> royalties paid in paymentAsset"""
+        return {
+            self.address(index): total
+            for index, total in self.totals("receiver", paymentAsset, **window).items()
+        }
+
+    def totalsByAsset(self, paymentAsset: int = 0, **window: int) -> Dict[int, int]:
+        """NFT asset ID -> royalties paid in paymentAsset"""
+        return self.totals("asset", paymentAsset, **window)
+
+    def totalsByDay(self, paymentAsset: int = 0, **window: int) -> Dict[int, int]:
+        """Day (unix time // 86400) -> royalties paid in paymentAsset"""
+        return self.totals("time", paymentAsset, **window)
+
+    def sales(self) -> numpy.ndarray:
+        """Every sale record as one array"""
+        return numpy.concatenate(list(self.iterChunks()) or [self.buffer[:0]])
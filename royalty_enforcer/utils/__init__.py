@@ -0,0 +1,37 @@
+from importlib import import_module
+from typing import Any
+
+# Helpers are loaded from their module on first access so that importing this
+# package stays cheap. In particular the state readers don't load algosdk.
+EXPORTS = {
+    "decodeState": "royalty_enforcer.utils.state",
+    "getBalances": "royalty_enforcer.utils.state",
+    "decodeOffers": "royalty_enforcer.utils.state",
+    "decodeOffersBatch": "royalty_enforcer.utils.state",
+    "decodePolicyState": "royalty_enforcer.utils.state",
+    "Account": "royalty_enforcer.utils.accounts",
+    "getGenesisAccounts": "royalty_enforcer.utils.accounts",
+    "getTemporaryAccount": "royalty_enforcer.utils.accounts",
+    "App": "royalty_enforcer.utils.apps",
+    "deployEnforcer": "royalty_enforcer.utils.apps",
+    "deployMarketplace": "royalty_enforcer.utils.apps",
+    "getAppGlobalState": "royalty_enforcer.utils.apps",
+    "mintNFT": "royalty_enforcer.utils.assets",
+    "optInToNFT": "royalty_enforcer.utils.assets",
+    "getAlgodClient": "royalty_enforcer.utils.clients",
+    "getKmdClient": "royalty_enforcer.utils.clients",
+    "getIndexerClient": "royalty_enforcer.utils.clients",
+    "OfferIndex": "royalty_enforcer.utils.offerindex",
+    "getSuggestedParams": "royalty_enforcer.utils.params",
+    "waitForTransaction": "royalty_enforcer.utils.transactions",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in EXPORTS:
+        return getattr(import_module(EXPORTS[name]), name)
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(EXPORTS.keys()))
@@ -1,9 +1,143 @@
-from algosdk.abi import Interface, Method
+from base64 import b64decode
+from typing import Any, Dict, List, Tuple, Union
+
+from algosdk.abi import (
+    ABIReferenceType,
+    ABIType,
+    Interface,
+    Method,
+    TupleType,
+    is_abi_reference_type,
+    is_abi_transaction_type,
+)
+from algosdk.encoding import encode_address
+
+# Method arguments past this many are packed into a tuple in the last app arg
+MAX_APP_ARGS = 15
+
+# References are encoded as uint8 indexes into the foreign arrays
+REFERENCE_TYPE = ABIType.from_string("uint8")
+
+
+class MethodIndex:
+    """Name and selector lookup tables for the methods of an ABI interface"""
+
+    def __init__(self, i: Interface) -> None:
+        self.interface = i
+        self.byName: Dict[str, Method] = dict()
+        self.bySelector: Dict[bytes, Method] = dict()
+        self.selectors: Dict[str, bytes] = dict()
+
+        for method in i.methods:
+            selector = method.get_selector()
+            # First match wins, like a linear scan over the methods
+            self.byName.setdefault(method.name, method)
+            self.selectors.setdefault(method.name, selector)
+            self.bySelector[selector] = method
+
+    def getMethod(self, name: str) -> Method:
+        try:
+            return self.byName[name]
+        except KeyError:
+            raise Exception("No method with the name {}".format(name))
+
+    def getSelector(self, name: str) -> bytes:
+        try:
+            return self.selectors[name]
+        except KeyError:
+            raise Exception("No method with the name {}".format(name))
+
+    def getMethodBySelector(self, selector: bytes) -> Method:
+        try:
+            return self.bySelector[bytes(selector[:4])]
+        except KeyError:
+            raise Exception("No method with the selector {}".format(selector.hex()))
+
+    def decodeCall(self, txn: Dict[str, Any]) -> Tuple[Method, List[Any]]:
+        """Decode the method and arguments of an app call transaction.
+
+        Accepts the "txn" field of a confirmed transaction either as returned
+        by algod as JSON or decoded from msgpack. Transaction arguments are
+        not part of the app call itself and are decoded as None. Reference
+        arguments are resolved to the address or ID they point at.
+        """
+        appArgs = [toBytes(arg) for arg in txn.get("apaa", [])]
+        if not appArgs:
+            raise Exception("Transaction is not an ABI method call")
+        method = self.getMethodBySelector(appArgs[0])
+
+        encodedArgs = [a for a in method.args if not is_abi_transaction_type(a.type)]
+        rawArgs: List[Any] = list(appArgs[1:])
+        if len(encodedArgs) > MAX_APP_ARGS:
+            packed = TupleType(
+                [argType(a) for a in encodedArgs[MAX_APP_ARGS - 1 :]]
+            ).decode(appArgs[MAX_APP_ARGS])
+            rawArgs = rawArgs[: MAX_APP_ARGS - 1] + packed
+
+        values: List[Any] = []
+        encoded = iter(rawArgs)
+        for arg in method.args:
+            if is_abi_transaction_type(arg.type):
+                values.append(None)
+                continue
+            value = next(encoded)
+            if is_abi_reference_type(arg.type):
+                if isinstance(value, (bytes, bytearray)):
+                    value = REFERENCE_TYPE.decode(value)
+                values.append(resolveReference(arg.type, value, txn))
+            elif isinstance(value, (bytes, bytearray)):
+                values.append(arg.type.decode(value))
+            else:
+                # already decoded from the packed tuple
+                values.append(value)
+
+        return method, values
+
+
+def argType(arg: Any) -> ABIType:
+    if is_abi_reference_type(arg.type):
+        return REFERENCE_TYPE
+    return arg.type
+
+
+def toBytes(value: Union[str, bytes]) -> bytes:
+    if isinstance(value, str):
+        return b64decode(value)
+    return value
+
+
+def toAddress(value: Union[str, bytes]) -> str:
+    if isinstance(value, str):
+        return value
+    return encode_address(value)
+
+
+def resolveReference(refType: str, index: int, txn: Dict[str, Any]) -> Any:
+    if refType == ABIReferenceType.ACCOUNT:
+        if index == 0:
+            return toAddress(txn["snd"])
+        return toAddress(txn.get("apat", [])[index - 1])
+    if refType == ABIReferenceType.ASSET:
+        return txn.get("apas", [])[index]
+    if refType == ABIReferenceType.APPLICATION:
+        if index == 0:
+            return txn.get("apid", 0)
+        return txn.get("apfa", [])[index - 1]
+    raise Exception("Unknown reference type: {}".format(refType))
+
+
+methodIndexes: Dict[int, MethodIndex] = dict()
+
+
+def getMethodIndex(i: Interface) -> MethodIndex:
+    # Interfaces aren't hashable, key by identity and keep the interface alive
+    index = methodIndexes.get(id(i))
+    if index is None or index.interface is not i:
+        index = MethodIndex(i)
+        methodIndexes[id(i)] = index
+    return index
 
 
 # Utility method til one is provided
 def getMethod(i: Interface, name: str) -> Method:
-    for m in i.methods:
-        if m.name == name:
-            return m
-    raise Exception("No method with the name {}".format(name))
+    return getMethodIndex(i).getMethod(name)
@@ -1,4 +1,11 @@
-from typing import Any, Dict, List, Optional
+import atexit
+import fcntl
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import IO, Any, Deque, Dict, Iterator, List, Optional, Tuple
 
 from algosdk.account import address_from_private_key, generate_account
 from algosdk.atomic_transaction_composer import (
@@ -6,11 +13,18 @@ from algosdk.atomic_transaction_composer import (
     TransactionSigner,
 )
 from algosdk.encoding import decode_address
-from algosdk.future.transaction import PaymentTxn, Transaction, assign_group_id
+from algosdk.future.transaction import PaymentTxn, assign_group_id
 from algosdk.kmd import KMDClient
 from algosdk.mnemonic import from_private_key, to_private_key
 from algosdk.v2client.algod import AlgodClient
-from royalty_enforcer.utils.transactions import waitForTransaction
+from royalty_enforcer.utils.cache import CACHE_DIR
+from royalty_enforcer.utils.params import getSuggestedParams
+from royalty_enforcer.utils.state import getBalances
+from royalty_enforcer.utils.transactions import (
+    MAX_GROUP_SIZE,
+    chunked,
+    getConfirmationTracker,
+)
 
 
 class Account:
@@ -40,93 +54,280 @@ class Account:
         return cls(to_private_key(m))
 
 
+@contextmanager
+def lockedFile(path: str) -> Iterator[IO[str]]:
+    """Open a file for reading and writing, holding an exclusive lock on it"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    with os.fdopen(fd, "r+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield f
+        finally:
+            f.flush()
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
 KMD_WALLET_NAME = "unencrypted-default-wallet"
 KMD_WALLET_PASSWORD = ""
 
+# Exported genesis keys shared by every process on this machine, "" to disable
+KMD_KEY_CACHE = os.environ.get(
+    "ROYALTY_ENFORCER_KMD_CACHE", os.path.join(CACHE_DIR, "kmd-keys.json")
+)
+
 kmdAccounts: Optional[List[Account]] = None
+# Pool refill threads ask for the genesis accounts too
+kmdAccountsLock = threading.Lock()
 
 
 def getGenesisAccounts(kmd: KMDClient) -> List[Account]:
     global kmdAccounts
 
-    if kmdAccounts is None:
-        wallets = kmd.list_wallets()
-        walletID = None
-        for wallet in wallets:
-            if wallet["name"] == KMD_WALLET_NAME:
-                walletID = wallet["id"]
-                break
-
-        if walletID is None:
-            raise Exception("Wallet not found: {}".format(KMD_WALLET_NAME))
-
-        walletHandle = kmd.init_wallet_handle(walletID, KMD_WALLET_PASSWORD)
-
+    with kmdAccountsLock:
+        if kmdAccounts is None:
+            kmdAccounts = loadGenesisAccounts(kmd)
+        return kmdAccounts
+
+
+def loadGenesisAccounts(kmd: KMDClient) -> List[Account]:
+    wallets = kmd.list_wallets()
+    walletID = None
+    for wallet in wallets:
+        if wallet["name"] == KMD_WALLET_NAME:
+            walletID = wallet["id"]
+            break
+
+    if walletID is None:
+        raise Exception("Wallet not found: {}".format(KMD_WALLET_NAME))
+
+    if KMD_KEY_CACHE:
+        os.makedirs(os.path.dirname(KMD_KEY_CACHE) or ".", exist_ok=True)
+        with lockedFile(KMD_KEY_CACHE) as f:
+            # other processes wait here and then find the keys exported
+            try:
+                cache = json.loads(f.read() or "{}")
+            except ValueError:
+                cache = dict()
+            cacheKey = "{} {}".format(kmd.kmd_address, walletID)
+            entry = cache.get(cacheKey, {})
+            privateKeys, entry = exportGenesisKeys(kmd, walletID, entry)
+            cache[cacheKey] = entry
+            f.seek(0)
+            f.truncate()
+            json.dump(cache, f)
+    else:
+        privateKeys, _ = exportGenesisKeys(kmd, walletID, {})
+
+    return [Account(sk) for sk in privateKeys]
+
+
+def exportGenesisKeys(
+    kmd: KMDClient, walletID: str, entry: Dict[str, Any]
+) -> Tuple[List[str], Dict[str, Any]]:
+    """Private keys of every key in the wallet, exporting only the ones the
+    cache entry doesn't have. Returns the keys and the updated entry."""
+    walletHandle = None
+    if entry.get("handle"):
+        # a handle from an earlier process is renewed if it hasn't expired
         try:
-            addresses = kmd.list_keys(walletHandle)
-            privateKeys = [
-                kmd.export_key(walletHandle, KMD_WALLET_PASSWORD, addr)
-                for addr in addresses
-            ]
-            kmdAccounts = [Account(sk) for sk in privateKeys]
-        finally:
-            kmd.release_wallet_handle(walletHandle)
-
-    return kmdAccounts
-
-
-def getBalances(client: AlgodClient, account: str) -> Dict[int, int]:
-    balances: Dict[int, int] = dict()
-
-    accountInfo = client.account_info(account)
-
-    # set key 0 to Algo balance
-    balances[0] = accountInfo["amount"]
-
-    assets: List[Dict[str, Any]] = accountInfo.get("assets", [])
-    for assetHolding in assets:
-        assetID = assetHolding["asset-id"]
-        amount = assetHolding["amount"]
-        balances[assetID] = amount
+            kmd.renew_wallet_handle(entry["handle"])
+            walletHandle = entry["handle"]
+        except Exception:
+            pass
+    if walletHandle is None:
+        walletHandle = kmd.init_wallet_handle(walletID, KMD_WALLET_PASSWORD)
 
-    return balances
+    # keys are only trusted while the wallet still lists them
+    addresses = kmd.list_keys(walletHandle)
+    cachedKeys: Dict[str, str] = entry.get("keys", {})
+    keys = {
+        address: cachedKeys.get(address)
+        or kmd.export_key(walletHandle, KMD_WALLET_PASSWORD, address)
+        for address in addresses
+    }
+    return [keys[address] for address in addresses], {
+        "handle": walletHandle,
+        "keys": keys,
+    }
 
 
 FUNDING_AMOUNT = 100_000_000
 
-accountList: List[Account] = []
-
+# Accounts kept funded and ready, refilled in the background below ACCOUNT_POOL_LOW
+ACCOUNT_POOL_SIZE = int(os.environ.get("ROYALTY_ENFORCER_ACCOUNT_POOL_SIZE", "16"))
+ACCOUNT_POOL_LOW = int(
+    os.environ.get("ROYALTY_ENFORCER_ACCOUNT_POOL_LOW", str(ACCOUNT_POOL_SIZE // 4))
+)
 
-def getTemporaryAccount(client: AlgodClient, kmd: KMDClient) -> Account:
-    global accountList
-
-    if len(accountList) == 0:
-        sks = [generate_account()[0] for i in range(16)]
-        accountList = [Account(sk) for sk in sks]
-
-        genesisAccounts = getGenesisAccounts(kmd)
-        suggestedParams = client.suggested_params()
-
-        txns: List[Transaction] = []
-        for i, a in enumerate(accountList):
-            fundingAccount = genesisAccounts[i % len(genesisAccounts)]
-            txns.append(
-                PaymentTxn(
-                    sender=fundingAccount.getAddress(),
-                    receiver=a.getAddress(),
-                    amt=FUNDING_AMOUNT,
-                    sp=suggestedParams,
-                )
+# File the mnemonics of funded but unused accounts are kept in between runs,
+# unset or "" to always fund new accounts
+ACCOUNT_POOL_FILE = os.environ.get("ROYALTY_ENFORCER_ACCOUNT_POOL_FILE") or None
+
+
+class AccountPool:
+    """Funded temporary accounts, handed out one at a time.
+
+    Accounts are funded by the genesis accounts in groups of 16, one group per
+    genesis account sent together and confirmed together. When fewer than
+    low accounts are left the pool is refilled to size in a background
+    thread, get() only waits when the pool is empty.
+
+    With a path, accounts that were funded but never handed out are saved
+    there when the process exits and used by the next pool before funding
+    new ones, as long as they still hold at least half the funding amount.
+    The file is locked while it is read or written, so pools of several
+    processes (e.g. pytest-xdist workers) never share an account.
+    """
+
+    def __init__(
+        self,
+        client: AlgodClient,
+        kmd: Optional[KMDClient],
+        size: int = ACCOUNT_POOL_SIZE,
+        low: int = ACCOUNT_POOL_LOW,
+        fundingAmount: int = FUNDING_AMOUNT,
+        path: Optional[str] = ACCOUNT_POOL_FILE,
+        funders: Optional[List[Account]] = None,
+    ) -> None:
+        self.client = client
+        self.kmd = kmd
+        # genesis accounts from KMD unless given, e.g. on a network without KMD
+        self.funders = funders
+        self.size = size
+        self.low = low
+        self.fundingAmount = fundingAmount
+        self.path = path or None
+
+        self.accounts: Deque[Account] = deque()
+        self.condition = threading.Condition()
+        self.refilling = False
+        self.error: Optional[Exception] = None
+
+        self.funded = 0
+        self.reused = 0
+
+        if path is not None:
+            atexit.register(self.save)
+
+    def get(self) -> Account:
+        with self.condition:
+            if len(self.accounts) <= self.low:
+                self.startRefill()
+            while not self.accounts:
+                if self.error is not None:
+                    error, self.error = self.error, None
+                    raise error
+                if not self.refilling:
+                    self.startRefill()
+                self.condition.wait()
+            return self.accounts.popleft()
+
+    def startRefill(self) -> None:
+        # called with the condition held
+        if not self.refilling:
+            self.refilling = True
+            threading.Thread(target=self.refill, daemon=True).start()
+
+    def refill(self) -> None:
+        try:
+            with self.condition:
+                count = self.size - len(self.accounts)
+            accounts = self.load(count)
+            self.reused += len(accounts)
+            with self.condition:
+                self.accounts.extend(accounts)
+                self.condition.notify_all()
+
+            if len(accounts) < count:
+                accounts = self.fund(count - len(accounts))
+                with self.condition:
+                    self.accounts.extend(accounts)
+        except Exception as e:
+            with self.condition:
+                self.error = e
+        finally:
+            with self.condition:
+                self.refilling = False
+                self.condition.notify_all()
+
+    def fund(self, count: int) -> List[Account]:
+        accounts = [Account(generate_account()[0]) for _ in range(count)]
+        funders = self.funders or getGenesisAccounts(self.kmd)
+        sp = getSuggestedParams(self.client)
+        tracker = getConfirmationTracker(self.client)
+
+        confirmations = []
+        for i, chunk in enumerate(chunked(accounts, MAX_GROUP_SIZE)):
+            funder = funders[i % len(funders)]
+            txns = assign_group_id(
+                [
+                    PaymentTxn(
+                        sender=funder.getAddress(),
+                        receiver=a.getAddress(),
+                        amt=self.fundingAmount,
+                        sp=sp,
+                    )
+                    for a in chunk
+                ]
             )
+            signedTxns = [txn.sign(funder.getPrivateKey()) for txn in txns]
+            self.client.send_transactions(signedTxns)
+            # a group is confirmed as a whole
+            confirmations.append(tracker.track(signedTxns[0].get_txid()))
+
+        for confirmation in confirmations:
+            confirmation.result()
+        self.funded += count
+        return accounts
+
+    def load(self, count: int) -> List[Account]:
+        """Take up to count saved accounts that are still funded"""
+        if self.path is None or count <= 0:
+            return []
+        with lockedFile(self.path) as f:
+            mnemonics = f.read().split("\n")
+            taken = [m for m in mnemonics if m][:count]
+            rest = [m for m in mnemonics if m][count:]
+            f.seek(0)
+            f.truncate()
+            f.write("".join(m + "\n" for m in rest))
+
+        accounts = []
+        for m in taken:
+            account = Account.FromMnemonic(m)
+            info = self.client.account_info(account.getAddress())
+            if info["amount"] >= self.fundingAmount // 2:
+                accounts.append(account)
+        return accounts
+
+    def save(self) -> None:
+        """Give accounts that were never handed out back to the file"""
+        if self.path is None:
+            return
+        with self.condition:
+            accounts = list(self.accounts)
+            self.accounts.clear()
+        if not accounts:
+            return
+        with lockedFile(self.path) as f:
+            f.seek(0, os.SEEK_END)
+            f.write("".join(a.getMnemonic() + "\n" for a in accounts))
+
+
+# Pools hold their client and are saved at exit, so they live as long as the
+# process and so does every client they were created for
+accountPools: Dict[AlgodClient, AccountPool] = dict()
+accountPoolsLock = threading.Lock()
+
+
+def getAccountPool(client: AlgodClient, kmd: KMDClient) -> AccountPool:
+    with accountPoolsLock:
+        pool = accountPools.get(client)
+        if pool is None:
+            pool = AccountPool(client, kmd)
+            accountPools[client] = pool
+        return pool
 
-        txns = assign_group_id(txns)
-        signedTxns = [
-            txn.sign(genesisAccounts[i % len(genesisAccounts)].getPrivateKey())
-            for i, txn in enumerate(txns)
-        ]
 
-        client.send_transactions(signedTxns)
-
-        waitForTransaction(client, signedTxns[0].get_txid())
-
-    return accountList.pop()
+def getTemporaryAccount(client: AlgodClient, kmd: KMDClient) -> Account:
+    return getAccountPool(client, kmd).get()
@@ -1,5 +1,10 @@
+import os
+from copy import copy
 from base64 import b64decode
-from typing import Any, Dict, List, Union, Tuple
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from importlib import import_module
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Union, Tuple
 
 from algosdk.atomic_transaction_composer import (
     AtomicTransactionComposer,
@@ -11,29 +16,62 @@ from algosdk.future.transaction import (
     OnComplete,
     PaymentTxn,
     StateSchema,
+    SuggestedParams,
     AssetOptInTxn,
+    assign_group_id,
 )
-from algosdk.abi import Interface
+from algosdk.abi import Interface, Method
 from algosdk.logic import get_application_address
 from algosdk.v2client.algod import AlgodClient
-from royalty_enforcer.contracts.enforcer import (
-    compile_enforcer_approval,
-    compile_enforcer_clear,
+from royalty_enforcer.utils.abi import MethodIndex
+from royalty_enforcer.utils.accounts import Account
+from royalty_enforcer.utils.artifacts import (
+    CONTRACTS,
+    Artifact,
+    ArtifactError,
+    buildArtifact,
+    loadArtifact,
+    loadInterface,
 )
-from royalty_enforcer.contracts.marketplace import (
-    compile_marketplace_approval,
-    compile_marketplace_clear,
+from royalty_enforcer.utils.assembler import assemble
+from royalty_enforcer.utils.cache import getCompileCache, tealKey
+from royalty_enforcer.utils.params import getSuggestedParams
+from royalty_enforcer.utils.signing import SigningPool
+from royalty_enforcer.utils.state import decodeState
+from royalty_enforcer.utils.transactions import (
+    MAX_GROUP_SIZE,
+    ZERO_ADDR,
+    chunked,
+    executeComposer,
+    waitForTransaction,
 )
-from royalty_enforcer.utils.abi import getMethod
-from royalty_enforcer.utils.accounts import Account
-from royalty_enforcer.utils.transactions import ZERO_ADDR, waitForTransaction
 
+# Min balance paid to a new enforcer so it can send inner transactions
+ENFORCER_FUNDING_AMOUNT = int(1e6)
+
+# Assets one enforcerTransferBatch can buy: the payment and a call per asset
+# have to fit in one group
+MAX_BATCH_TRANSFERS = MAX_GROUP_SIZE - 1
+
+# Set to "local" to assemble programs with the bundled assembler instead of
+# sending them to the algod compile endpoint
+ASSEMBLER = os.environ.get("ROYALTY_ENFORCER_ASSEMBLER", "algod")
+
+# Programs from the local assembler are not deployed until it matches the algod
+# bytecode recorded in tests/fixtures/algod_programs.json for every contract
+DEPLOY_LOCAL_PROGRAMS = False
 
-with open("assets/enforcer_abi.json") as f:
-    enforcerABI = Interface.from_json(f.read())
+ABI_FILES = {
+    "enforcerABI": "enforcer_abi.json",
+    "marketplaceABI": "marketplace_abi.json",
+}
 
-with open("assets/marketplace_abi.json") as f:
-    marketplaceABI = Interface.from_json(f.read())
+
+def __getattr__(name: str) -> Interface:
+    # Read the ABI interfaces on first use instead of at import time
+    if name in ABI_FILES:
+        return loadInterface(ABI_FILES[name])
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
 
 
 def fullyCompileContract(client: AlgodClient, teal: str) -> bytes:
@@ -41,44 +79,99 @@ def fullyCompileContract(client: AlgodClient, teal: str) -> bytes:
     return b64decode(response["result"])
 
 
+def compileTeal(module: str, compiler: str) -> str:
+    # Only build the PyTeal AST when the cache misses
+    return getCompileCache().getTeal(
+        tealKey(module, compiler), lambda: getattr(import_module(module), compiler)()
+    )
+
+
+def programAssembler(client: Optional[AlgodClient]) -> str:
+    """The assembler compileProgram uses with the client: algod or local"""
+    # Without a blocking client (e.g. from asyncio code) assemble in process
+    return "local" if ASSEMBLER == "local" or client is None else "algod"
+
+
+def compileProgram(client: Optional[AlgodClient], teal: str) -> bytes:
+    cache = getCompileCache()
+    if programAssembler(client) == "local":
+        return cache.getProgram(teal, "local", assemble)
+    return cache.getProgram(teal, "algod", lambda t: fullyCompileContract(client, t))
+
+
+def assembleArtifact(
+    client: Optional[AlgodClient], name: str, approvalTeal: str, clearTeal: str
+) -> Dict[str, Any]:
+    """Bundle a contract, assembled with the configured assembler"""
+    return buildArtifact(
+        name,
+        approvalTeal,
+        clearTeal,
+        compileProgram(client, approvalTeal),
+        compileProgram(client, clearTeal),
+        programAssembler(client),
+    )
+
+
+def getArtifact(client: Optional[AlgodClient], name: str) -> Artifact:
+    try:
+        return loadArtifact(name)
+    except ArtifactError:
+        pass
+
+    # No bundle from ./build.sh (e.g. a source checkout), compile in process
+    spec = CONTRACTS[name]
+    return Artifact(
+        assembleArtifact(
+            client,
+            name,
+            compileTeal(spec.module, spec.approvalCompiler),
+            compileTeal(spec.module, spec.clearCompiler),
+        )
+    )
+
+
 class App:
     def __init__(self, appID: int, abi: Interface):
         self.id = appID
         self.address = get_application_address(appID)
         self.abi = abi
-        pass
+        self.methods = MethodIndex(abi)
 
-    def getMethod(self, methodName: str):
-        for method in self.abi.methods:
-            if method.name == methodName:
-                return method
-        raise Exception("No method with the name {}".format(methodName))
+    def getMethod(self, methodName: str) -> Method:
+        return self.methods.getMethod(methodName)
 
+    def decodeCall(self, txn: Dict[str, Any]) -> Tuple[Method, List[Any]]:
+        return self.methods.decodeCall(txn)
 
-def deployEnforcer(client: AlgodClient, sender: Account) -> App:
-    approval = fullyCompileContract(client, compile_enforcer_approval())
-    clear = fullyCompileContract(client, compile_enforcer_clear())
-    txn = ApplicationCreateTxn(
+
+def buildAppCreate(
+    sp: SuggestedParams,
+    artifact: Artifact,
+    sender: Account,
+    note: Optional[bytes] = None,
+) -> ApplicationCreateTxn:
+    if artifact.assembler == "local" and not DEPLOY_LOCAL_PROGRAMS:
+        raise ArtifactError(
+            "{} was assembled locally, which is not checked against algod yet; "
+            "deploy it with ROYALTY_ENFORCER_ASSEMBLER=algod".format(artifact.name)
+        )
+    return ApplicationCreateTxn(
         sender=sender.getAddress(),
         on_complete=OnComplete.NoOpOC,
-        approval_program=approval,
-        clear_program=clear,
-        global_schema=StateSchema(1, 2),
-        local_schema=StateSchema(0, 16),
-        sp=client.suggested_params(),
+        approval_program=artifact.approvalProgram,
+        clear_program=artifact.clearProgram,
+        global_schema=StateSchema(*artifact.globalSchema),
+        local_schema=StateSchema(*artifact.localSchema),
+        sp=sp,
+        note=note,
     )
 
-    signedTxn = txn.sign(sender.getPrivateKey())
-    client.send_transaction(signedTxn)
-
-    response = waitForTransaction(client, signedTxn.get_txid())
-    appID = response.applicationIndex
-    assert appID is not None and appID > 0
-    # appAddress = get_application_address(appID)
-    app = App(appID, enforcerABI)
 
+def buildEnforcerSetup(
+    sp: SuggestedParams, app: App, sender: Account
+) -> AtomicTransactionComposer:
     # Pay min balance to enforcer account and opt-in to contract to enable making offers
-    sp = client.suggested_params()
     atc = AtomicTransactionComposer()
 
     # Enforcer contract needs min balance to be able to send transactions
@@ -86,7 +179,7 @@ def deployEnforcer(client: AlgodClient, sender: Account) -> App:
         TransactionWithSigner(
             txn=PaymentTxn(
                 sender=sender.getAddress(),
-                amt=int(1e6),
+                amt=ENFORCER_FUNDING_AMOUNT,
                 receiver=app.address,
                 sp=sp,
             ),
@@ -106,23 +199,12 @@ def deployEnforcer(client: AlgodClient, sender: Account) -> App:
             signer=sender.getSigner(),
         )
     )
-    atc.execute(client, 2)
-
-    return app
+    return atc
 
 
-def deployMarketplace(client: AlgodClient, sender: Account) -> App:
-    approval = fullyCompileContract(client, compile_marketplace_approval())
-    clear = fullyCompileContract(client, compile_marketplace_clear())
-    txn = ApplicationCreateTxn(
-        sender=sender.getAddress(),
-        on_complete=OnComplete.NoOpOC,
-        approval_program=approval,
-        clear_program=clear,
-        global_schema=StateSchema(4, 1),
-        local_schema=StateSchema(0, 16),
-        sp=client.suggested_params(),
-    )
+def deployEnforcer(client: AlgodClient, sender: Account) -> App:
+    artifact = getArtifact(client, "enforcer")
+    txn = buildAppCreate(getSuggestedParams(client), artifact, sender)
 
     signedTxn = txn.sign(sender.getPrivateKey())
     client.send_transaction(signedTxn)
@@ -130,13 +212,144 @@ def deployMarketplace(client: AlgodClient, sender: Account) -> App:
     response = waitForTransaction(client, signedTxn.get_txid())
     appID = response.applicationIndex
     assert appID is not None and appID > 0
-    app = App(appID, marketplaceABI)
+    app = App(appID, artifact.abi)
 
-    # Pay min balance to enforcer account and opt-in to contract to enable making offers
-    sp = client.suggested_params()
+    executeComposer(client, buildEnforcerSetup(getSuggestedParams(client), app, sender))
+
+    return app
+
+
+def buildAppOptIn(
+    sp: SuggestedParams, app: App, sender: Account
+) -> AtomicTransactionComposer:
     atc = AtomicTransactionComposer()
+    atc.add_transaction(
+        TransactionWithSigner(
+            txn=ApplicationCallTxn(
+                sender=sender.getAddress(),
+                index=app.id,
+                on_complete=OnComplete.OptInOC,
+                sp=sp,
+            ),
+            signer=sender.getSigner(),
+        )
+    )
+    return atc
 
-    # Enforcer contract needs min balance to be able to send transactions
+
+def buildEnforcerOptIn(
+    sp: SuggestedParams, enforcer: App, sender: Account
+) -> AtomicTransactionComposer:
+    # Offers are kept in the seller's local state, so sellers opt in first
+    return buildAppOptIn(sp, enforcer, sender)
+
+
+def optInToEnforcer(client: AlgodClient, enforcer: App, sender: Account) -> None:
+    executeComposer(
+        client, buildEnforcerOptIn(getSuggestedParams(client), enforcer, sender)
+    )
+
+
+def deployEnforcers(
+    client: AlgodClient, sender: Account, n: int
+) -> Tuple[List[Optional[App]], Dict[int, Exception]]:
+    """Deploy, fund and opt in to n enforcers using grouped transactions.
+
+    Creates are sent in groups of up to 16. As soon as a create group is
+    confirmed, the funding payments and opt-ins for its apps are sent in groups
+    of 8 apps while the remaining creates are still being confirmed.
+
+    Returns the apps in order along with the errors of any app that failed,
+    keyed by index. A failed app is None if it was never created, otherwise
+    it was created but could not be funded or opted in to.
+    """
+    artifact = getArtifact(client, "enforcer")
+    sp = getSuggestedParams(client)
+    # Unique notes keep otherwise identical create transactions apart
+    batchID = os.urandom(8)
+
+    apps: List[Optional[App]] = [None] * n
+    failures: Dict[int, Exception] = dict()
+
+    def sendGroup(txns: List[Any], indexes: List[int]) -> List[str]:
+        signedTxns = [txn.sign(sender.getPrivateKey()) for txn in txns]
+        try:
+            client.send_transactions(signedTxns)
+        except Exception as e:
+            for i in indexes:
+                failures[i] = e
+            return []
+        return [stxn.get_txid() for stxn in signedTxns]
+
+    createGroups: List[Tuple[List[int], List[str]]] = []
+    for indexes in chunked(range(n), MAX_GROUP_SIZE):
+        txns = [
+            buildAppCreate(sp, artifact, sender, batchID + i.to_bytes(4, "big"))
+            for i in indexes
+        ]
+        if len(txns) > 1:
+            txns = assign_group_id(txns)
+        createGroups.append((indexes, sendGroup(txns, indexes)))
+
+    fundGroups: List[Tuple[List[int], List[str]]] = []
+    for indexes, txIDs in createGroups:
+        if not txIDs:
+            continue
+
+        try:
+            for i, txID in zip(indexes, txIDs):
+                appID = waitForTransaction(client, txID).applicationIndex
+                assert appID is not None and appID > 0
+                apps[i] = App(appID, artifact.abi)
+        except Exception as e:
+            for i in indexes:
+                failures[i] = e
+            continue
+
+        # Pay min balance and opt-in, two transactions per app
+        for fundIndexes in chunked(indexes, MAX_GROUP_SIZE // 2):
+            txns = []
+            for i in fundIndexes:
+                app = apps[i]
+                assert app is not None
+                txns.append(
+                    PaymentTxn(
+                        sender=sender.getAddress(),
+                        amt=ENFORCER_FUNDING_AMOUNT,
+                        receiver=app.address,
+                        sp=sp,
+                    )
+                )
+                txns.append(
+                    ApplicationCallTxn(
+                        sender=sender.getAddress(),
+                        index=app.id,
+                        on_complete=OnComplete.OptInOC,
+                        sp=sp,
+                    )
+                )
+            fundGroups.append(
+                (fundIndexes, sendGroup(assign_group_id(txns), fundIndexes))
+            )
+
+    for indexes, txIDs in fundGroups:
+        if not txIDs:
+            continue
+        try:
+            waitForTransaction(client, txIDs[0])
+        except Exception as e:
+            for i in indexes:
+                failures[i] = e
+
+    return apps, failures
+
+
+def buildMarketplaceSetup(
+    sp: SuggestedParams, app: App, sender: Account
+) -> AtomicTransactionComposer:
+    atc = AtomicTransactionComposer()
+
+    # Marketplace contract needs min balance to be able to send transactions
     atc.add_transaction(
         TransactionWithSigner(
             txn=PaymentTxn(
@@ -148,32 +361,39 @@ def deployMarketplace(client: AlgodClient, sender: Account) -> App:
             signer=sender.getSigner(),
         )
     )
-    atc.execute(client, 2)
+    return atc
 
-    return app
 
+def deployMarketplace(client: AlgodClient, sender: Account) -> App:
+    artifact = getArtifact(client, "marketplace")
+    txn = buildAppCreate(getSuggestedParams(client), artifact, sender)
+
+    signedTxn = txn.sign(sender.getPrivateKey())
+    client.send_transaction(signedTxn)
+
+    response = waitForTransaction(client, signedTxn.get_txid())
+    appID = response.applicationIndex
+    assert appID is not None and appID > 0
+    app = App(appID, artifact.abi)
 
-def decodeState(stateArray: List[Any]) -> Dict[bytes, Union[int, bytes]]:
-    state: Dict[bytes, Union[int, bytes]] = dict()
+    executeComposer(
+        client, buildMarketplaceSetup(getSuggestedParams(client), app, sender)
+    )
 
-    for pair in stateArray:
-        key = b64decode(pair["key"])
+    return app
 
-        value = pair["value"]
-        valueType = value["type"]
 
-        if valueType == 2:
-            # value is uint64
-            value = value.get("uint", 0)
-        elif valueType == 1:
-            # value is byte array
-            value = b64decode(value.get("bytes", ""))
-        else:
-            raise Exception(f"Unexpected state type: {valueType}")
+def buildMarketplaceOptIn(
+    sp: SuggestedParams, marketplace: App, sender: Account
+) -> AtomicTransactionComposer:
+    # Listings are kept in the seller's local state, so sellers opt in first
+    return buildAppOptIn(sp, marketplace, sender)
 
-        state[key] = value
 
-    return state
+def optInToMarketplace(client: AlgodClient, marketplace: App, sender: Account) -> None:
+    executeComposer(
+        client, buildMarketplaceOptIn(getSuggestedParams(client), marketplace, sender)
+    )
 
 
 def getAppCreator(client: AlgodClient, appID: int) -> str:
@@ -188,14 +408,13 @@ def getAppGlobalState(
     return decodeState(appInfo["params"]["global-state"])
 
 
-def setEnforcerPolicy(
-    client: AlgodClient,
+def buildSetEnforcerPolicy(
+    sp: SuggestedParams,
     enforcer: App,
     sender: Account,
     royaltyBasisPoints: int,
     royaltyRecipientAddress: str,
-):
-    sp = client.suggested_params()
+) -> AtomicTransactionComposer:
     atc = AtomicTransactionComposer()
     atc.add_method_call(
         enforcer.id,
@@ -205,13 +424,29 @@ def setEnforcerPolicy(
         sender.getSigner(),
         method_args=[royaltyBasisPoints, royaltyRecipientAddress],
     )
-    atc.execute(client, 2)
+    return atc
 
 
-def getEnforcerPolicy(
-    client: AlgodClient, enforcer: App, sender: Account
-) -> Tuple[str, int]:
-    sp = client.suggested_params()
+def setEnforcerPolicy(
+    client: AlgodClient,
+    enforcer: App,
+    sender: Account,
+    royaltyBasisPoints: int,
+    royaltyRecipientAddress: str,
+):
+    atc = buildSetEnforcerPolicy(
+        getSuggestedParams(client),
+        enforcer,
+        sender,
+        royaltyBasisPoints,
+        royaltyRecipientAddress,
+    )
+    executeComposer(client, atc)
+
+
+def buildGetEnforcerPolicy(
+    sp: SuggestedParams, enforcer: App, sender: Account
+) -> AtomicTransactionComposer:
     atc = AtomicTransactionComposer()
     atc.add_method_call(
         enforcer.id,
@@ -220,20 +455,27 @@ def getEnforcerPolicy(
         sp,
         sender.getSigner(),
     )
-    result = atc.execute(client, 2)
-    royaltyRecipientAddress, royaltyBasisPoints = result.abi_results[0].return_value
+    return atc
+
+
+def decodePolicy(returnValue: Any) -> Tuple[str, int]:
+    royaltyRecipientAddress, royaltyBasisPoints = returnValue
     assert isinstance(royaltyRecipientAddress, str)
     assert isinstance(royaltyBasisPoints, int)
     return royaltyRecipientAddress, royaltyBasisPoints
 
 
-def setEnforcerAdmin(
-    client: AlgodClient,
-    enforcer: App,
-    sender: Account,
-    adminAddress: str,
-):
-    sp = client.suggested_params()
+def getEnforcerPolicy(
+    client: AlgodClient, enforcer: App, sender: Account
+) -> Tuple[str, int]:
+    atc = buildGetEnforcerPolicy(getSuggestedParams(client), enforcer, sender)
+    result = executeComposer(client, atc)
+    return decodePolicy(result.abi_results[0].return_value)
+
+
+def buildSetEnforcerAdmin(
+    sp: SuggestedParams, enforcer: App, sender: Account, adminAddress: str
+) -> AtomicTransactionComposer:
     atc = AtomicTransactionComposer()
     atc.add_method_call(
         enforcer.id,
@@ -243,11 +485,24 @@ def setEnforcerAdmin(
         sender.getSigner(),
         method_args=[adminAddress],
     )
-    atc.execute(client, 2)
+    return atc
 
 
-def getEnforcerAdmin(client: AlgodClient, enforcer: App, sender: Account) -> str:
-    sp = client.suggested_params()
+def setEnforcerAdmin(
+    client: AlgodClient,
+    enforcer: App,
+    sender: Account,
+    adminAddress: str,
+):
+    atc = buildSetEnforcerAdmin(
+        getSuggestedParams(client), enforcer, sender, adminAddress
+    )
+    executeComposer(client, atc)
+
+
+def buildGetEnforcerAdmin(
+    sp: SuggestedParams, enforcer: App, sender: Account
+) -> AtomicTransactionComposer:
     atc = AtomicTransactionComposer()
     atc.add_method_call(
         enforcer.id,
@@ -256,14 +511,19 @@ def getEnforcerAdmin(client: AlgodClient, enforcer: App, sender: Account) -> str
         sp,
         sender.getSigner(),
     )
-    result = atc.execute(client, 2)
+    return atc
+
+
+def getEnforcerAdmin(client: AlgodClient, enforcer: App, sender: Account) -> str:
+    atc = buildGetEnforcerAdmin(getSuggestedParams(client), enforcer, sender)
+    result = executeComposer(client, atc)
     adminAddress = result.abi_results[0].return_value
     assert isinstance(adminAddress, str)
     return adminAddress
 
 
-def setEnforcerOffer(
-    client: AlgodClient,
+def buildSetEnforcerOffer(
+    sp: SuggestedParams,
     enforcer: App,
     sender: Account,
     nftID: int,
@@ -271,8 +531,7 @@ def setEnforcerOffer(
     authAddress: str,
     expectedAmount: int,
     expectedAuthAddress: str,
-):
-    sp = client.suggested_params()
+) -> AtomicTransactionComposer:
     atc = AtomicTransactionComposer()
     atc.add_method_call(
         enforcer.id,
@@ -282,17 +541,163 @@ def setEnforcerOffer(
         sender.getSigner(),
         [nftID, amount, authAddress, expectedAmount, expectedAuthAddress],
     )
-    atc.execute(client, 2)
+    return atc
 
 
-def getEnforcerOffer(
+def setEnforcerOffer(
+    client: AlgodClient,
+    enforcer: App,
+    sender: Account,
+    nftID: int,
+    amount: int,
+    authAddress: str,
+    expectedAmount: int,
+    expectedAuthAddress: str,
+):
+    atc = buildSetEnforcerOffer(
+        getSuggestedParams(client),
+        enforcer,
+        sender,
+        nftID,
+        amount,
+        authAddress,
+        expectedAmount,
+        expectedAuthAddress,
+    )
+    executeComposer(client, atc)
+
+
+class OfferResult:
+    """Outcome of one offer submitted through setEnforcerOffers"""
+
+    def __init__(
+        self,
+        index: int,
+        nftID: int,
+        txID: Optional[str] = None,
+        confirmedRound: Optional[int] = None,
+        error: Optional[Exception] = None,
+    ) -> None:
+        # position of the offer in the iterable passed to setEnforcerOffers
+        self.index = index
+        self.nftID = nftID
+        self.txID = txID
+        self.confirmedRound = confirmedRound
+        self.error = error
+
+
+def setEnforcerOffers(
     client: AlgodClient,
     enforcer: App,
     sender: Account,
+    offers: Iterable[Tuple[int, int, str, int, str]],
+    start: int = 0,
+    maxInFlight: int = 4,
+    signingThreads: int = 4,
+    signingPool: Optional[SigningPool] = None,
+) -> Iterator[OfferResult]:
+    """Submit many offers in groups of 16 and stream back one result per offer.
+
+    Each offer is a (nftID, amount, authAddress, expectedAmount,
+    expectedAuthAddress) tuple, the same arguments setEnforcerOffer takes.
+    Groups are signed in a thread pool, or in the worker processes of
+    signingPool if given, and at most maxInFlight groups are waiting for
+    confirmation at any time.
+
+    Results are yielded in input order. A group succeeds or fails as a whole,
+    so every offer in a failed group reports that group's error. To resume an
+    interrupted run, pass the same offers again with start set to the index
+    of the first offer that didn't report a result. Offers before start are
+    skipped.
+    """
+    sp = getSuggestedParams(client)
+    method = enforcer.getMethod("offer")
+
+    def buildGroup(
+        chunk: List[Tuple[int, Tuple[int, int, str, int, str]]]
+    ) -> AtomicTransactionComposer:
+        atc = AtomicTransactionComposer()
+        for _, offer in chunk:
+            atc.add_method_call(
+                enforcer.id,
+                method,
+                sender.getAddress(),
+                sp,
+                sender.getSigner(),
+                list(offer),
+            )
+        return atc
+
+    def signGroup(
+        chunk: List[Tuple[int, Tuple[int, int, str, int, str]]]
+    ) -> Tuple[List[Tuple[int, int]], List[Any]]:
+        signedTxns = buildGroup(chunk).gather_signatures()
+        return [(i, offer[0]) for i, offer in chunk], signedTxns
+
+    def confirmGroup(
+        offered: List[Tuple[int, int]], txIDs: List[str], error: Optional[Exception]
+    ) -> Iterator[OfferResult]:
+        confirmedRound = None
+        if error is None:
+            try:
+                confirmedRound = waitForTransaction(client, txIDs[0]).confirmedRound
+            except Exception as e:
+                error = e
+        for (i, nftID), txID in zip(offered, txIDs):
+            yield OfferResult(i, nftID, txID, confirmedRound, error)
+
+    signing: Deque[Future] = deque()
+    inFlight: Deque[Tuple[List[Tuple[int, int]], List[str], Optional[Exception]]]
+    inFlight = deque()
+
+    def send(
+        offered: List[Tuple[int, int]], signedTxns: List[Any]
+    ) -> Iterator[OfferResult]:
+        txIDs = [stxn.get_txid() for stxn in signedTxns]
+        error: Optional[Exception] = None
+        try:
+            client.send_transactions(signedTxns)
+        except Exception as e:
+            error = e
+        inFlight.append((offered, txIDs, error))
+        while len(inFlight) > maxInFlight:
+            yield from confirmGroup(*inFlight.popleft())
+
+    def sendNext() -> Iterator[OfferResult]:
+        yield from send(*signing.popleft().result())
+
+    remaining = ((i, offer) for i, offer in enumerate(offers) if i >= start)
+    if signingPool is not None:
+        offered: Deque[List[Tuple[int, int]]] = deque()
+
+        def groups() -> Iterator[AtomicTransactionComposer]:
+            for chunk in chunked(remaining, MAX_GROUP_SIZE):
+                offered.append([(i, offer[0]) for i, offer in chunk])
+                yield buildGroup(chunk)
+
+        for atc in signingPool.signComposers(groups()):
+            yield from send(offered.popleft(), atc.gather_signatures())
+    else:
+        with ThreadPoolExecutor(signingThreads) as executor:
+            for chunk in chunked(remaining, MAX_GROUP_SIZE):
+                signing.append(executor.submit(signGroup, chunk))
+                if len(signing) >= signingThreads:
+                    yield from sendNext()
+
+            while signing:
+                yield from sendNext()
+
+    while inFlight:
+        yield from confirmGroup(*inFlight.popleft())
+
+
+def buildGetEnforcerOffer(
+    sp: SuggestedParams,
+    enforcer: App,
+    sender: Account,
     nftID: int,
     sellerAddress: str,
-) -> Tuple[str, int]:
-    sp = client.suggested_params()
+) -> AtomicTransactionComposer:
     atc = AtomicTransactionComposer()
     atc.add_method_call(
         enforcer.id,
@@ -302,24 +707,40 @@ def getEnforcerOffer(
         sender.getSigner(),
         [nftID, sellerAddress],
     )
-    result = atc.execute(client, 2)
-    authAddress, amount = result.abi_results[0].return_value
+    return atc
+
+
+def decodeOffer(returnValue: Any) -> Tuple[str, int]:
+    authAddress, amount = returnValue
     assert isinstance(authAddress, str)
     assert isinstance(amount, int)
     return authAddress, amount
 
 
-def enforcerTransfer(
+def getEnforcerOffer(
     client: AlgodClient,
     enforcer: App,
+    sender: Account,
+    nftID: int,
+    sellerAddress: str,
+) -> Tuple[str, int]:
+    atc = buildGetEnforcerOffer(
+        getSuggestedParams(client), enforcer, sender, nftID, sellerAddress
+    )
+    result = executeComposer(client, atc)
+    return decodeOffer(result.abi_results[0].return_value)
+
+
+def buildEnforcerTransfer(
+    sp: SuggestedParams,
+    enforcer: App,
     buyer: Account,
     price: int,
     nftID: int,
     amount: int,
     sellerAddress: str,
     royaltyAddress: str,
-):
-    sp = client.suggested_params()
+) -> AtomicTransactionComposer:
     payTxn = TransactionWithSigner(
         signer=buyer.getSigner(),
         txn=PaymentTxn(
@@ -329,6 +750,8 @@ def enforcerTransfer(
             receiver=enforcer.address,
         ),
     )
+    sp = copy(sp)
+    sp.flat_fee = True
     sp.fee = 4000  # need to pay for inner txn fee (for asset transfer + payments)
     atc = AtomicTransactionComposer()
     atc.add_method_call(
@@ -348,19 +771,116 @@ def enforcerTransfer(
             amount,
         ],
     )
-    atc.execute(client, 2)
+    return atc
 
 
-def enforcerRoyaltyFreeMove(
+def enforcerTransfer(
     client: AlgodClient,
     enforcer: App,
+    buyer: Account,
+    price: int,
+    nftID: int,
+    amount: int,
+    sellerAddress: str,
+    royaltyAddress: str,
+):
+    atc = buildEnforcerTransfer(
+        getSuggestedParams(client),
+        enforcer,
+        buyer,
+        price,
+        nftID,
+        amount,
+        sellerAddress,
+        royaltyAddress,
+    )
+    executeComposer(client, atc)
+
+
+def buildEnforcerTransferBatch(
+    sp: SuggestedParams,
+    enforcer: App,
+    buyer: Account,
+    transfers: List[Tuple[int, int, str, int]],
+    royaltyAddress: str,
+) -> AtomicTransactionComposer:
+    """Buy several offered assets with one payment.
+
+    Each transfer is a (nftID, amount, sellerAddress, price) tuple, the price
+    being the part of the payment for that asset, royalty included. The
+    group is the payment of the total price and one transfer_batch call per
+    asset, so at most MAX_BATCH_TRANSFERS assets can be bought at once.
+    Royalty is paid once, on the total.
+    """
+    if not 0 < len(transfers) <= MAX_BATCH_TRANSFERS:
+        raise ValueError(
+            "Between 1 and {} transfers can be batched, got {}".format(
+                MAX_BATCH_TRANSFERS, len(transfers)
+            )
+        )
+    atc = AtomicTransactionComposer()
+    atc.add_transaction(
+        TransactionWithSigner(
+            signer=buyer.getSigner(),
+            txn=PaymentTxn(
+                sender=buyer.getAddress(),
+                sp=sp,
+                amt=sum(price for _, _, _, price in transfers),
+                receiver=enforcer.address,
+            ),
+        )
+    )
+    method = enforcer.getMethod("transfer_batch")
+    for i, (nftID, amount, sellerAddress, price) in enumerate(transfers):
+        callSp = copy(sp)
+        callSp.flat_fee = True
+        # need to pay for inner txn fee (for asset transfer + payment), the
+        # first call also pays the royalty
+        callSp.fee = 4000 if i == 0 else 3000
+        atc.add_method_call(
+            enforcer.id,
+            method,
+            buyer.getAddress(),
+            callSp,
+            buyer.getSigner(),
+            [
+                nftID,
+                amount,
+                sellerAddress,
+                buyer.getAddress(),
+                royaltyAddress,
+                0,
+                amount,
+                price,
+            ],
+        )
+    return atc
+
+
+def enforcerTransferBatch(
+    client: AlgodClient,
+    enforcer: App,
+    buyer: Account,
+    transfers: List[Tuple[int, int, str, int]],
+    royaltyAddress: str,
+):
+    atc = buildEnforcerTransferBatch(
+        getSuggestedParams(client), enforcer, buyer, transfers, royaltyAddress
+    )
+    executeComposer(client, atc)
+
+
+def buildEnforcerRoyaltyFreeMove(
+    sp: SuggestedParams,
+    enforcer: App,
     sender: Account,
     nftID: int,
     amount: int,
     ownerAddress: str,
     buyerAddress: str,
-):
-    sp = client.suggested_params()
+) -> AtomicTransactionComposer:
+    sp = copy(sp)
+    sp.flat_fee = True
     sp.fee = 2000  # need to pay for inner txn fee (for asset transfer)
     atc = AtomicTransactionComposer()
     atc.add_method_call(
@@ -371,25 +891,46 @@ def enforcerRoyaltyFreeMove(
         sender.getSigner(),
         [nftID, amount, ownerAddress, buyerAddress, amount],
     )
-    atc.execute(client, 2)
+    return atc
 
 
-def marketplaceListNFT(
+def enforcerRoyaltyFreeMove(
     client: AlgodClient,
     enforcer: App,
+    sender: Account,
+    nftID: int,
+    amount: int,
+    ownerAddress: str,
+    buyerAddress: str,
+):
+    atc = buildEnforcerRoyaltyFreeMove(
+        getSuggestedParams(client),
+        enforcer,
+        sender,
+        nftID,
+        amount,
+        ownerAddress,
+        buyerAddress,
+    )
+    executeComposer(client, atc)
+
+
+def buildMarketplaceListNFT(
+    sp: SuggestedParams,
+    enforcer: App,
     marketplace: App,
     sender: Account,
     nftID: int,
     amount: int,
     price: int,
-):
+) -> AtomicTransactionComposer:
     # Won't send this, just using ATC to help serialize the transaction
     atc = AtomicTransactionComposer()
     atc.add_method_call(
         enforcer.id,
         enforcer.getMethod("offer"),
         sender.getAddress(),
-        sp=client.suggested_params(),
+        sp=sp,
         signer=sender.getSigner(),
         method_args=[nftID, amount, marketplace.address, 0, ZERO_ADDR],
     )
@@ -401,29 +942,50 @@ def marketplaceListNFT(
         app_id=marketplace.id,
         method=marketplace.getMethod("list"),
         sender=sender.getAddress(),
-        sp=client.suggested_params(),
+        sp=sp,
         signer=sender.getSigner(),
         method_args=[nftID, enforcer.id, amount, price, group[0]],
     )
-    atc.execute(client, 2)
+    return atc
 
 
-def marketplaceBuyNFT(
+def marketplaceListNFT(
     client: AlgodClient,
     enforcer: App,
     marketplace: App,
+    sender: Account,
+    nftID: int,
+    amount: int,
+    price: int,
+):
+    atc = buildMarketplaceListNFT(
+        getSuggestedParams(client),
+        enforcer,
+        marketplace,
+        sender,
+        nftID,
+        amount,
+        price,
+    )
+    executeComposer(client, atc)
+
+
+def buildMarketplaceBuyNFT(
+    sp: SuggestedParams,
+    enforcer: App,
+    marketplace: App,
     sellerAddress: str,
     royaltyAddress: str,
     buyer: Account,
     nftID: int,
     amount: int,
     price: int,
-):
+) -> AtomicTransactionComposer:
     atc = AtomicTransactionComposer()
     paymentTxn = TransactionWithSigner(
         txn=PaymentTxn(
             sender=buyer.getAddress(),
-            sp=client.suggested_params(),
+            sp=sp,
             amt=price,
             receiver=marketplace.address,
         ),
@@ -433,15 +995,17 @@ def marketplaceBuyNFT(
         TransactionWithSigner(
             txn=AssetOptInTxn(
                 sender=buyer.getAddress(),
-                sp=client.suggested_params(),
+                sp=sp,
                 index=nftID,
             ),
             signer=buyer.getSigner(),
         )
     )
-    sp = client.suggested_params()
-    # provide additional txn fee to pay for inner txns
-    sp.fee = 4000
+    sp = copy(sp)
+    # provide additional txn fee to pay for inner txns: the payment and call
+    # to the enforcer, and the enforcer's asset transfer and two payments
+    sp.flat_fee = True
+    sp.fee = 6000
     atc.add_method_call(
         app_id=marketplace.id,
         method=marketplace.getMethod("buy"),
@@ -458,4 +1022,29 @@ def marketplaceBuyNFT(
             paymentTxn,
         ],
     )
-    atc.execute(client, 2)
+    return atc
+
+
+def marketplaceBuyNFT(
+    client: AlgodClient,
+    enforcer: App,
+    marketplace: App,
+    sellerAddress: str,
+    royaltyAddress: str,
+    buyer: Account,
+    nftID: int,
+    amount: int,
+    price: int,
+):
+    atc = buildMarketplaceBuyNFT(
+        getSuggestedParams(client),
+        enforcer,
+        marketplace,
+        sellerAddress,
+        royaltyAddress,
+        buyer,
+        nftID,
+        amount,
+        price,
+    )
+    executeComposer(client, atc)
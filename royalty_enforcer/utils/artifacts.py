@@ -0,0 +1,181 @@
+import json
+import os
+from base64 import b64decode, b64encode
+from typing import Any, Dict, Tuple
+
+from algosdk.abi import Interface
+from royalty_enforcer import __version__
+from royalty_enforcer.utils.cache import contractSourceHash
+
+# Bump when the layout of the bundle changes
+ARTIFACT_VERSION = 2
+
+ASSETS_DIR = os.environ.get(
+    "ROYALTY_ENFORCER_ASSETS",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "assets",
+    ),
+)
+
+# Bundles are package data, so installed packages can deploy without pyteal
+BUNDLES_DIR = os.environ.get(
+    "ROYALTY_ENFORCER_BUNDLES",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bundles"
+    ),
+)
+
+
+class ContractSpec:
+    def __init__(
+        self,
+        module: str,
+        approvalCompiler: str,
+        clearCompiler: str,
+        abiFile: str,
+        globalSchema: Tuple[int, int],
+        localSchema: Tuple[int, int],
+    ) -> None:
+        self.module = module
+        self.approvalCompiler = approvalCompiler
+        self.clearCompiler = clearCompiler
+        self.abiFile = abiFile
+        # (num uints, num byte slices)
+        self.globalSchema = globalSchema
+        self.localSchema = localSchema
+
+
+CONTRACTS: Dict[str, ContractSpec] = {
+    "enforcer": ContractSpec(
+        "royalty_enforcer.contracts.enforcer",
+        "compile_enforcer_approval",
+        "compile_enforcer_clear",
+        "enforcer_abi.json",
+        globalSchema=(1, 2),
+        localSchema=(0, 16),
+    ),
+    "enforcer_placeholder": ContractSpec(
+        "royalty_enforcer.contracts.enforcer_placeholder",
+        "compile_enforcer_placeholder_approval",
+        "compile_enforcer_placeholder_clear",
+        "enforcer_abi.json",
+        globalSchema=(1, 2),
+        localSchema=(0, 16),
+    ),
+    "marketplace": ContractSpec(
+        "royalty_enforcer.contracts.marketplace",
+        "compile_marketplace_approval",
+        "compile_marketplace_clear",
+        "marketplace_abi.json",
+        globalSchema=(0, 0),
+        localSchema=(0, 16),
+    ),
+}
+
+
+class ArtifactError(Exception):
+    pass
+
+
+class Artifact:
+    """Precompiled contract: programs, TEAL, ABI and state schema"""
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        if data.get("version") != ARTIFACT_VERSION:
+            raise ArtifactError(
+                "Unsupported artifact version: {}".format(data.get("version"))
+            )
+
+        self.name: str = data["name"]
+        self.sourceHash: str = data["source-hash"]
+        # "algod" or "local", whichever assembled the programs
+        self.assembler: str = data["assembler"]
+        self.approvalTeal: str = data["approval-teal"]
+        self.clearTeal: str = data["clear-teal"]
+        self.approvalProgram = b64decode(data["approval-program"])
+        self.clearProgram = b64decode(data["clear-program"])
+        self.abiJSON: Dict[str, Any] = data["abi"]
+        self.globalSchema: Tuple[int, int] = tuple(data["global-schema"])
+        self.localSchema: Tuple[int, int] = tuple(data["local-schema"])
+        self.abi = Interface.undictify(self.abiJSON)
+
+
+def artifactPath(name: str) -> str:
+    return os.path.join(BUNDLES_DIR, "{}_artifact.json".format(name))
+
+
+def readABI(abiFile: str) -> Dict[str, Any]:
+    path = os.path.join(ASSETS_DIR, abiFile)
+    if not os.path.exists(path):
+        # Installed packages have no assets/, but the bundles carry the ABI
+        for name, spec in CONTRACTS.items():
+            if spec.abiFile == abiFile and os.path.exists(artifactPath(name)):
+                with open(artifactPath(name)) as f:
+                    return json.load(f)["abi"]
+    with open(path) as f:
+        return json.load(f)
+
+
+loadedInterfaces: Dict[str, Interface] = dict()
+
+
+def loadInterface(abiFile: str) -> Interface:
+    if abiFile not in loadedInterfaces:
+        loadedInterfaces[abiFile] = Interface.undictify(readABI(abiFile))
+    return loadedInterfaces[abiFile]
+
+
+def buildArtifact(
+    name: str,
+    approvalTeal: str,
+    clearTeal: str,
+    approvalProgram: bytes,
+    clearProgram: bytes,
+    assembler: str,
+) -> Dict[str, Any]:
+    spec = CONTRACTS[name]
+    return {
+        "version": ARTIFACT_VERSION,
+        "package-version": __version__,
+        "name": name,
+        "source-hash": contractSourceHash(),
+        "assembler": assembler,
+        "approval-teal": approvalTeal,
+        "clear-teal": clearTeal,
+        "approval-program": b64encode(approvalProgram).decode(),
+        "clear-program": b64encode(clearProgram).decode(),
+        "abi": readABI(spec.abiFile),
+        "global-schema": list(spec.globalSchema),
+        "local-schema": list(spec.localSchema),
+    }
+
+
+def writeArtifact(data: Dict[str, Any]) -> str:
+    os.makedirs(BUNDLES_DIR, exist_ok=True)
+    path = artifactPath(data["name"])
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+    return path
+
+
+loadedArtifacts: Dict[str, Artifact] = dict()
+
+
+def loadArtifact(name: str) -> Artifact:
+    """Load a bundle written by ./build.sh, without importing pyteal"""
+    if name in loadedArtifacts:
+        return loadedArtifacts[name]
+
+    try:
+        with open(artifactPath(name)) as f:
+            artifact = Artifact(json.load(f))
+    except FileNotFoundError:
+        raise ArtifactError("Artifact not found: {}".format(artifactPath(name)))
+
+    if artifact.sourceHash != contractSourceHash():
+        raise ArtifactError("Artifact is out of date: {}".format(artifactPath(name)))
+
+    loadedArtifacts[name] = artifact
+    return artifact
@@ -0,0 +1,651 @@
+"""Pure Python TEAL assembler.
+
+Covers the subset of TEAL v6 that PyTeal emits for the contracts in this
+package and follows the go-algorand assembler byte for byte, including its
+constant block optimization (constants ordered by reference count, constants
+referenced once pushed inline with pushint/pushbytes).
+"""
+
+import re
+from base64 import b32decode, b64decode
+from typing import Dict, List, Optional, Tuple, Union
+
+from algosdk.encoding import checksum, decode_address
+
+MAX_VERSION = 6
+
+# Constant blocks are sorted by frequency and singletons inlined from v4
+OPTIMIZE_CONSTANTS_VERSION = 4
+
+TXN_FIELDS = [
+    "Sender",
+    "Fee",
+    "FirstValid",
+    "FirstValidTime",
+    "LastValid",
+    "Note",
+    "Lease",
+    "Receiver",
+    "Amount",
+    "CloseRemainderTo",
+    "VotePK",
+    "SelectionPK",
+    "VoteFirst",
+    "VoteLast",
+    "VoteKeyDilution",
+    "Type",
+    "TypeEnum",
+    "XferAsset",
+    "AssetAmount",
+    "AssetSender",
+    "AssetReceiver",
+    "AssetCloseTo",
+    "GroupIndex",
+    "TxID",
+    "ApplicationID",
+    "OnCompletion",
+    "ApplicationArgs",
+    "NumAppArgs",
+    "Accounts",
+    "NumAccounts",
+    "ApprovalProgram",
+    "ClearStateProgram",
+    "RekeyTo",
+    "ConfigAsset",
+    "ConfigAssetTotal",
+    "ConfigAssetDecimals",
+    "ConfigAssetDefaultFrozen",
+    "ConfigAssetUnitName",
+    "ConfigAssetName",
+    "ConfigAssetURL",
+    "ConfigAssetMetadataHash",
+    "ConfigAssetManager",
+    "ConfigAssetReserve",
+    "ConfigAssetFreeze",
+    "ConfigAssetClawback",
+    "FreezeAsset",
+    "FreezeAssetAccount",
+    "FreezeAssetFrozen",
+    "Assets",
+    "NumAssets",
+    "Applications",
+    "NumApplications",
+    "GlobalNumUint",
+    "GlobalNumByteSlice",
+    "LocalNumUint",
+    "LocalNumByteSlice",
+    "ExtraProgramPages",
+    "Nonparticipation",
+    "Logs",
+    "NumLogs",
+    "CreatedAssetID",
+    "CreatedApplicationID",
+    "LastLog",
+    "StateProofPK",
+]
+
+GLOBAL_FIELDS = [
+    "MinTxnFee",
+    "MinBalance",
+    "MaxTxnLife",
+    "ZeroAddress",
+    "GroupSize",
+    "LogicSigVersion",
+    "Round",
+    "LatestTimestamp",
+    "CurrentApplicationID",
+    "CreatorAddress",
+    "CurrentApplicationAddress",
+    "GroupID",
+    "OpcodeBudget",
+    "CallerApplicationID",
+    "CallerApplicationAddress",
+]
+
+ASSET_HOLDING_FIELDS = ["AssetBalance", "AssetFrozen"]
+
+ASSET_PARAMS_FIELDS = [
+    "AssetTotal",
+    "AssetDecimals",
+    "AssetDefaultFrozen",
+    "AssetUnitName",
+    "AssetName",
+    "AssetURL",
+    "AssetMetadataHash",
+    "AssetManager",
+    "AssetReserve",
+    "AssetFreeze",
+    "AssetClawback",
+    "AssetCreator",
+]
+
+APP_PARAMS_FIELDS = [
+    "AppApprovalProgram",
+    "AppClearStateProgram",
+    "AppGlobalNumUint",
+    "AppGlobalNumByteSlice",
+    "AppLocalNumUint",
+    "AppLocalNumByteSlice",
+    "AppExtraProgramPages",
+    "AppCreator",
+    "AppAddress",
+]
+
+ACCT_PARAMS_FIELDS = ["AcctBalance", "AcctMinBalance", "AcctAuthAddr"]
+
+FIELD_GROUPS: Dict[str, List[str]] = {
+    "txn": TXN_FIELDS,
+    "global": GLOBAL_FIELDS,
+    "asset_holding": ASSET_HOLDING_FIELDS,
+    "asset_params": ASSET_PARAMS_FIELDS,
+    "app_params": APP_PARAMS_FIELDS,
+    "acct_params": ACCT_PARAMS_FIELDS,
+}
+
+# Named integer constants accepted by the int pseudo-op
+TXN_TYPES = ["unknown", "pay", "keyreg", "acfg", "axfer", "afrz", "appl"]
+ON_COMPLETIONS = [
+    "NoOp",
+    "OptIn",
+    "CloseOut",
+    "ClearState",
+    "UpdateApplication",
+    "DeleteApplication",
+]
+NAMED_INTS: Dict[str, int] = {
+    **{name: i for i, name in enumerate(TXN_TYPES)},
+    **{name: i for i, name in enumerate(ON_COMPLETIONS)},
+}
+
+# Opcode byte and immediate argument kinds for each op. Immediates are either
+# "uint8", "label" or the name of a field group.
+OPS: Dict[str, Tuple[int, Tuple[str, ...]]] = {
+    "err": (0x00, ()),
+    "sha256": (0x01, ()),
+    "keccak256": (0x02, ()),
+    "sha512_256": (0x03, ()),
+    "ed25519verify": (0x04, ()),
+    "ecdsa_verify": (0x05, ("uint8",)),
+    "ecdsa_pk_decompress": (0x06, ("uint8",)),
+    "ecdsa_pk_recover": (0x07, ("uint8",)),
+    "+": (0x08, ()),
+    "-": (0x09, ()),
+    "/": (0x0A, ()),
+    "*": (0x0B, ()),
+    "<": (0x0C, ()),
+    ">": (0x0D, ()),
+    "<=": (0x0E, ()),
+    ">=": (0x0F, ()),
+    "&&": (0x10, ()),
+    "||": (0x11, ()),
+    "==": (0x12, ()),
+    "!=": (0x13, ()),
+    "!": (0x14, ()),
+    "len": (0x15, ()),
+    "itob": (0x16, ()),
+    "btoi": (0x17, ()),
+    "%": (0x18, ()),
+    "|": (0x19, ()),
+    "&": (0x1A, ()),
+    "^": (0x1B, ()),
+    "~": (0x1C, ()),
+    "mulw": (0x1D, ()),
+    "addw": (0x1E, ()),
+    "divmodw": (0x1F, ()),
+    "intc": (0x21, ("uint8",)),
+    "intc_0": (0x22, ()),
+    "intc_1": (0x23, ()),
+    "intc_2": (0x24, ()),
+    "intc_3": (0x25, ()),
+    "bytec": (0x27, ("uint8",)),
+    "bytec_0": (0x28, ()),
+    "bytec_1": (0x29, ()),
+    "bytec_2": (0x2A, ()),
+    "bytec_3": (0x2B, ()),
+    "arg": (0x2C, ("uint8",)),
+    "arg_0": (0x2D, ()),
+    "arg_1": (0x2E, ()),
+    "arg_2": (0x2F, ()),
+    "arg_3": (0x30, ()),
+    "txn": (0x31, ("txn",)),
+    "global": (0x32, ("global",)),
+    "gtxn": (0x33, ("uint8", "txn")),
+    "load": (0x34, ("uint8",)),
+    "store": (0x35, ("uint8",)),
+    "txna": (0x36, ("txn", "uint8")),
+    "gtxna": (0x37, ("uint8", "txn", "uint8")),
+    "gtxns": (0x38, ("txn",)),
+    "gtxnsa": (0x39, ("txn", "uint8")),
+    "gload": (0x3A, ("uint8", "uint8")),
+    "gloads": (0x3B, ("uint8",)),
+    "gaid": (0x3C, ("uint8",)),
+    "gaids": (0x3D, ()),
+    "loads": (0x3E, ()),
+    "stores": (0x3F, ()),
+    "bnz": (0x40, ("label",)),
+    "bz": (0x41, ("label",)),
+    "b": (0x42, ("label",)),
+    "return": (0x43, ()),
+    "assert": (0x44, ()),
+    "pop": (0x48, ()),
+    "dup": (0x49, ()),
+    "dup2": (0x4A, ()),
+    "dig": (0x4B, ("uint8",)),
+    "swap": (0x4C, ()),
+    "select": (0x4D, ()),
+    "cover": (0x4E, ("uint8",)),
+    "uncover": (0x4F, ("uint8",)),
+    "concat": (0x50, ()),
+    "substring": (0x51, ("uint8", "uint8")),
+    "substring3": (0x52, ()),
+    "getbit": (0x53, ()),
+    "setbit": (0x54, ()),
+    "getbyte": (0x55, ()),
+    "setbyte": (0x56, ()),
+    "extract": (0x57, ("uint8", "uint8")),
+    "extract3": (0x58, ()),
+    "extract_uint16": (0x59, ()),
+    "extract_uint32": (0x5A, ()),
+    "extract_uint64": (0x5B, ()),
+    "balance": (0x60, ()),
+    "app_opted_in": (0x61, ()),
+    "app_local_get": (0x62, ()),
+    "app_local_get_ex": (0x63, ()),
+    "app_global_get": (0x64, ()),
+    "app_global_get_ex": (0x65, ()),
+    "app_local_put": (0x66, ()),
+    "app_global_put": (0x67, ()),
+    "app_local_del": (0x68, ()),
+    "app_global_del": (0x69, ()),
+    "asset_holding_get": (0x70, ("asset_holding",)),
+    "asset_params_get": (0x71, ("asset_params",)),
+    "app_params_get": (0x72, ("app_params",)),
+    "acct_params_get": (0x73, ("acct_params",)),
+    "min_balance": (0x78, ()),
+    "callsub": (0x88, ("label",)),
+    "retsub": (0x89, ()),
+    "shl": (0x90, ()),
+    "shr": (0x91, ()),
+    "sqrt": (0x92, ()),
+    "bitlen": (0x93, ()),
+    "exp": (0x94, ()),
+    "expw": (0x95, ()),
+    "bsqrt": (0x96, ()),
+    "divw": (0x97, ()),
+    "b+": (0xA0, ()),
+    "b-": (0xA1, ()),
+    "b/": (0xA2, ()),
+    "b*": (0xA3, ()),
+    "b<": (0xA4, ()),
+    "b>": (0xA5, ()),
+    "b<=": (0xA6, ()),
+    "b>=": (0xA7, ()),
+    "b==": (0xA8, ()),
+    "b!=": (0xA9, ()),
+    "b%": (0xAA, ()),
+    "b|": (0xAB, ()),
+    "b&": (0xAC, ()),
+    "b^": (0xAD, ()),
+    "b~": (0xAE, ()),
+    "bzero": (0xAF, ()),
+    "log": (0xB0, ()),
+    "itxn_begin": (0xB1, ()),
+    "itxn_field": (0xB2, ("txn",)),
+    "itxn_submit": (0xB3, ()),
+    "itxn": (0xB4, ("txn",)),
+    "itxna": (0xB5, ("txn", "uint8")),
+    "itxn_next": (0xB6, ()),
+    "gitxn": (0xB7, ("uint8", "txn")),
+    "gitxna": (0xB8, ("uint8", "txn", "uint8")),
+    "txnas": (0xC0, ("txn",)),
+    "gtxnas": (0xC1, ("uint8", "txn")),
+    "gtxnsas": (0xC2, ("txn",)),
+    "args": (0xC3, ()),
+    "gloadss": (0xC4, ()),
+    "itxnas": (0xC5, ("txn",)),
+    "gitxnas": (0xC6, ("uint8", "txn")),
+}
+
+OPCODE_INTCBLOCK = 0x20
+OPCODE_BYTECBLOCK = 0x26
+OPCODE_PUSHBYTES = 0x80
+OPCODE_PUSHINT = 0x81
+
+# txn F I style shorthands that select the array variant of an op
+ARRAY_VARIANTS = {
+    ("txn", 2): "txna",
+    ("gtxn", 3): "gtxna",
+    ("gtxns", 2): "gtxnsa",
+    ("itxn", 2): "itxna",
+    ("gitxn", 3): "gitxna",
+}
+
+Constant = Tuple[str, Union[int, bytes]]
+
+
+class AssemblerError(Exception):
+    def __init__(self, line: int, message: str) -> None:
+        super().__init__("{}: {}".format(line, message))
+        self.line = line
+
+
+class AssembledProgram:
+    """Program bytes along with where each label and source line ended up"""
+
+    def __init__(
+        self,
+        version: int,
+        bytecode: bytes,
+        labels: Dict[str, int],
+        pcToLine: Dict[int, int],
+    ) -> None:
+        self.version = version
+        self.bytecode = bytecode
+        self.labels = labels
+        self.pcToLine = pcToLine
+
+
+def encodeUvarint(value: int) -> bytes:
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def tokenize(line: str) -> List[str]:
+    tokens: List[str] = []
+    i = 0
+    while i < len(line):
+        if line[i].isspace():
+            i += 1
+            continue
+        if line.startswith("//", i):
+            break
+        start = i
+        if line[i] == '"':
+            i += 1
+            while i < len(line) and line[i] != '"':
+                i += 2 if line[i] == "\\" else 1
+            i += 1
+        else:
+            while i < len(line) and not line[i].isspace():
+                if line[i] == '"':
+                    i += 1
+                    while i < len(line) and line[i] != '"':
+                        i += 2 if line[i] == "\\" else 1
+                i += 1
+        tokens.append(line[start:i])
+    return tokens
+
+
+def parseStringLiteral(token: str) -> bytes:
+    if len(token) < 2 or token[0] != '"' or token[-1] != '"':
+        raise ValueError("string literal must be quoted: {}".format(token))
+
+    body = token[1:-1]
+    out = bytearray()
+    escapes = {"n": b"\n", "r": b"\r", "t": b"\t", "\\": b"\\", '"': b'"'}
+    i = 0
+    while i < len(body):
+        c = body[i]
+        if c != "\\":
+            out += c.encode()
+            i += 1
+            continue
+        if i + 1 >= len(body):
+            raise ValueError("unterminated escape in {}".format(token))
+        e = body[i + 1]
+        if e in escapes:
+            out += escapes[e]
+            i += 2
+        elif e == "x":
+            out.append(int(body[i + 2 : i + 4], 16))
+            i += 4
+        else:
+            raise ValueError("invalid escape \\{} in {}".format(e, token))
+    return bytes(out)
+
+
+def decodeBase32(value: str) -> bytes:
+    return b32decode(value + "=" * (-len(value) % 8))
+
+
+def parseBytes(args: List[str]) -> bytes:
+    if len(args) == 2 and args[0] in ("base64", "b64"):
+        return b64decode(args[1], validate=True)
+    if len(args) == 2 and args[0] in ("base32", "b32"):
+        return decodeBase32(args[1])
+    if len(args) != 1:
+        raise ValueError("byte expects one argument")
+
+    arg = args[0]
+    match = re.fullmatch(r"(base64|b64|base32|b32)\((.*)\)", arg)
+    if match:
+        if match.group(1) in ("base64", "b64"):
+            return b64decode(match.group(2), validate=True)
+        return decodeBase32(match.group(2))
+    if arg.startswith("0x"):
+        return bytes.fromhex(arg[2:])
+    return parseStringLiteral(arg)
+
+
+def parseUint(token: str) -> int:
+    if token in NAMED_INTS:
+        return NAMED_INTS[token]
+    # strconv.ParseUint(s, 0, 64): a bare leading zero means octal
+    if re.fullmatch(r"0[0-7]+", token):
+        value = int(token, 8)
+    else:
+        value = int(token, 0)
+    if value < 0 or value >= 1 << 64:
+        raise ValueError("{} does not fit in a uint64".format(token))
+    return value
+
+
+def parseConstant(op: str, args: List[str]) -> Constant:
+    if op == "int":
+        if len(args) != 1:
+            raise ValueError("int expects one argument")
+        return ("int", parseUint(args[0]))
+    if op == "byte":
+        return ("byte", parseBytes(args))
+    if op == "addr":
+        if len(args) != 1:
+            raise ValueError("addr expects one argument")
+        return ("byte", decode_address(args[0]))
+    if op == "method":
+        if len(args) != 1:
+            raise ValueError("method expects one argument")
+        return ("byte", checksum(parseStringLiteral(args[0]))[:4])
+    raise ValueError("not a constant pseudo-op: {}".format(op))
+
+
+def parseImmediate(kind: str, token: str) -> int:
+    if kind in FIELD_GROUPS:
+        fields = FIELD_GROUPS[kind]
+        if token in fields:
+            return fields.index(token)
+        raise ValueError("unknown {} field: {}".format(kind, token))
+
+    value = int(token, 0)
+    if kind == "uint8" and not 0 <= value <= 0xFF:
+        raise ValueError("{} does not fit in a uint8".format(token))
+    return value
+
+
+class Line:
+    def __init__(self, number: int, op: str, args: List[str]) -> None:
+        self.number = number
+        self.op = op
+        self.args = args
+        self.constant: Optional[Constant] = None
+
+
+def parse(teal: str) -> Tuple[int, List[Union[Line, str]]]:
+    """Split TEAL source into instructions and label definitions"""
+    version = 1
+    items: List[Union[Line, str]] = []
+
+    for number, text in enumerate(teal.splitlines(), start=1):
+        tokens = tokenize(text)
+        if not tokens:
+            continue
+
+        if tokens[0] == "#pragma":
+            if len(tokens) == 3 and tokens[1] == "version":
+                version = int(tokens[2])
+                if version > MAX_VERSION:
+                    raise AssemblerError(
+                        number, "unsupported version {}".format(version)
+                    )
+                continue
+            raise AssemblerError(number, "unknown pragma: {}".format(text.strip()))
+
+        if tokens[0].endswith(":"):
+            items.append(tokens[0][:-1])
+            tokens = tokens[1:]
+            if not tokens:
+                continue
+
+        op, args = tokens[0], tokens[1:]
+        op = ARRAY_VARIANTS.get((op, len(args)), op)
+
+        line = Line(number, op, args)
+        if op in ("int", "byte", "addr", "method"):
+            try:
+                line.constant = parseConstant(op, args)
+            except ValueError as e:
+                raise AssemblerError(number, str(e)) from e
+        elif op in ("intcblock", "bytecblock", "pushint", "pushbytes"):
+            # Explicit constants are not needed by PyTeal output
+            raise AssemblerError(number, "{} is not supported".format(op))
+        elif op not in OPS:
+            raise AssemblerError(number, "unknown opcode: {}".format(op))
+        items.append(line)
+
+    return version, items
+
+
+def buildConstantBlocks(
+    version: int, lines: List[Line]
+) -> Tuple[Dict[Constant, int], List[int], List[bytes]]:
+    """Return the block index of each constant (-1 if pushed inline) and blocks"""
+    counts: Dict[Constant, int] = dict()
+    for line in lines:
+        if line.constant is not None:
+            counts[line.constant] = counts.get(line.constant, 0) + 1
+
+    indexes: Dict[Constant, int] = dict()
+    intc: List[int] = []
+    bytec: List[bytes] = []
+    optimize = version >= OPTIMIZE_CONSTANTS_VERSION
+
+    # Stable sort keeps first referenced first among equally frequent constants
+    ordered = list(counts.keys())
+    if optimize:
+        ordered.sort(key=lambda c: counts[c], reverse=True)
+
+    for constant in ordered:
+        kind, value = constant
+        if optimize and counts[constant] == 1:
+            indexes[constant] = -1
+        elif kind == "int":
+            indexes[constant] = len(intc)
+            intc.append(value)  # type: ignore
+        else:
+            indexes[constant] = len(bytec)
+            bytec.append(value)  # type: ignore
+
+    return indexes, intc, bytec
+
+
+def encodeConstantRef(constant: Constant, index: int) -> bytes:
+    kind, value = constant
+    if kind == "int":
+        if index < 0:
+            return bytes([OPCODE_PUSHINT]) + encodeUvarint(value)  # type: ignore
+        if index < 4:
+            return bytes([OPS["intc_0"][0] + index])
+        return bytes([OPS["intc"][0], index])
+
+    if index < 0:
+        return bytes([OPCODE_PUSHBYTES]) + encodeUvarint(len(value)) + value  # type: ignore
+    if index < 4:
+        return bytes([OPS["bytec_0"][0] + index])
+    return bytes([OPS["bytec"][0], index])
+
+
+def assembleProgram(teal: str) -> AssembledProgram:
+    version, items = parse(teal)
+    lines = [item for item in items if isinstance(item, Line)]
+    indexes, intc, bytec = buildConstantBlocks(version, lines)
+
+    header = bytearray(encodeUvarint(version))
+    if intc:
+        header.append(OPCODE_INTCBLOCK)
+        header += encodeUvarint(len(intc))
+        for value in intc:
+            header += encodeUvarint(value)
+    if bytec:
+        header.append(OPCODE_BYTECBLOCK)
+        header += encodeUvarint(len(bytec))
+        for value in bytec:
+            header += encodeUvarint(len(value)) + value
+
+    code = bytearray(header)
+    labels: Dict[str, int] = dict()
+    references: List[Tuple[int, str, int]] = []
+    pcToLine: Dict[int, int] = dict()
+
+    for item in items:
+        if isinstance(item, str):
+            if item in labels:
+                raise AssemblerError(0, "duplicate label: {}".format(item))
+            labels[item] = len(code)
+            continue
+
+        pcToLine[len(code)] = item.number
+
+        if item.constant is not None:
+            code += encodeConstantRef(item.constant, indexes[item.constant])
+            continue
+
+        opcode, immediates = OPS[item.op]
+        if len(item.args) != len(immediates):
+            raise AssemblerError(
+                item.number,
+                "{} expects {} immediate arguments".format(item.op, len(immediates)),
+            )
+
+        position = len(code)
+        code.append(opcode)
+        for kind, arg in zip(immediates, item.args):
+            if kind == "label":
+                references.append((position, arg, item.number))
+                code += b"\x00\x00"
+                continue
+            try:
+                code.append(parseImmediate(kind, arg))
+            except ValueError as e:
+                raise AssemblerError(item.number, str(e)) from e
+
+    for position, label, number in references:
+        if label not in labels:
+            raise AssemblerError(
+                number, "reference to undefined label {}".format(label)
+            )
+        # Offsets are relative to the end of the 3 byte branch instruction
+        offset = labels[label] - (position + 3)
+        if offset < 0 and version < 4:
+            raise AssemblerError(number, "backward branches need version 4")
+        if not -0x8000 <= offset <= 0x7FFF:
+            raise AssemblerError(number, "branch to {} is too far".format(label))
+        code[position + 1 : position + 3] = (offset & 0xFFFF).to_bytes(2, "big")
+
+    return AssembledProgram(version, bytes(code), labels, pcToLine)
+
+
+def assemble(teal: str) -> bytes:
+    return assembleProgram(teal).bytecode
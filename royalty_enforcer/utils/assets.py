@@ -5,12 +5,13 @@ from algosdk.atomic_transaction_composer import (
 from algosdk.future.transaction import AssetCreateTxn, AssetTransferTxn
 from algosdk.v2client.algod import AlgodClient
 from royalty_enforcer.utils.accounts import Account
-from royalty_enforcer.utils.transactions import waitForTransaction
+from royalty_enforcer.utils.params import getSuggestedParams
+from royalty_enforcer.utils.transactions import executeComposer, waitForTransaction
 
 
 def mintNFT(client: AlgodClient, creator: Account, enforcer_address: str) -> int:
     signer = creator.getSigner()
-    sp = client.suggested_params()
+    sp = getSuggestedParams(client)
     atc = AtomicTransactionComposer()
     atc.add_transaction(
         TransactionWithSigner(
@@ -31,14 +32,14 @@ def mintNFT(client: AlgodClient, creator: Account, enforcer_address: str) -> int
             ),
         )
     )
-    result = atc.execute(client, 2)
+    result = executeComposer(client, atc)
     response = waitForTransaction(client, result.tx_ids[0])
     assert response.assetIndex is not None and response.assetIndex > 0
     return response.assetIndex
 
 
 def optInToNFT(client: AlgodClient, sender: Account, nftID: int):
-    sp = client.suggested_params()
+    sp = getSuggestedParams(client)
     atc = AtomicTransactionComposer()
     atc.add_transaction(
         TransactionWithSigner(
@@ -52,4 +53,4 @@ def optInToNFT(client: AlgodClient, sender: Account, nftID: int):
             ),
         )
     )
-    atc.execute(client, 2)
+    executeComposer(client, atc)
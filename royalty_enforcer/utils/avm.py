@@ -0,0 +1,1743 @@
+"""Pure Python evaluator for TEAL v6 application programs.
+
+Programs are decoded once, with the opcode table of the bundled assembler,
+into instructions that are then run against an EvalContext: the transaction
+group, the ledger and the opcode budget. The ledger side lives in
+royalty_enforcer.utils.emulator. Only application mode is supported, logic
+signatures are not.
+"""
+
+import hashlib
+import math
+from base64 import b32decode
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from algosdk.encoding import checksum, encode_address
+from royalty_enforcer.utils.assembler import (
+    FIELD_GROUPS,
+    OPCODE_BYTECBLOCK,
+    OPCODE_INTCBLOCK,
+    OPCODE_PUSHBYTES,
+    OPCODE_PUSHINT,
+    OPS,
+    TXN_TYPES,
+)
+
+StackValue = Union[int, bytes]
+
+MAX_VERSION = 6
+
+MAX_UINT64 = (1 << 64) - 1
+MAX_STACK_DEPTH = 1000
+MAX_BYTES_LENGTH = 4096
+MAX_BYTE_MATH_LENGTH = 64
+MAX_LOG_CALLS = 32
+MAX_LOG_SIZE = 1024
+MAX_APP_ARGS = 16
+MAX_APP_TOTAL_ARG_LENGTH = 2048
+MAX_KEY_LENGTH = 64
+MAX_KEY_VALUE_LENGTH = 128
+MAX_INNER_TXNS = 16
+MAX_APP_CALL_DEPTH = 8
+SCRATCH_SLOTS = 256
+
+MIN_TXN_FEE = 1000
+MIN_BALANCE = 100_000
+MAX_TXN_LIFE = 1000
+APP_BUDGET = 700
+
+ZERO_ADDRESS = bytes(32)
+
+# Opcodes cost 1 unless listed here, see the TEAL v6 opcode reference
+OP_COSTS: Dict[str, int] = {
+    "sha256": 35,
+    "keccak256": 130,
+    "sha512_256": 45,
+    "ed25519verify": 1900,
+    "ecdsa_verify": 1700,
+    "ecdsa_pk_decompress": 650,
+    "ecdsa_pk_recover": 2000,
+    "divmodw": 20,
+    "sqrt": 4,
+    "expw": 10,
+    "bsqrt": 40,
+    "b+": 10,
+    "b-": 10,
+    "b/": 20,
+    "b*": 20,
+    "b%": 20,
+    "b|": 6,
+    "b&": 6,
+    "b^": 6,
+    "b~": 4,
+}
+
+
+def opCost(op: str) -> int:
+    return OP_COSTS.get(op, 1)
+
+
+class EvalError(Exception):
+    def __init__(self, message: str, pc: Optional[int] = None) -> None:
+        super().__init__(message if pc is None else "pc={} {}".format(pc, message))
+        self.pc = pc
+
+
+class Instruction:
+    __slots__ = ("pc", "index", "op", "immediates", "cost", "handler", "target")
+
+    def __init__(self, pc: int, index: int, op: str, immediates: List[Any]) -> None:
+        self.pc = pc
+        self.index = index
+        self.op = op
+        self.immediates = immediates
+        self.cost = opCost(op)
+        self.handler: Callable[["Evaluation", "Instruction"], Optional[int]]
+        # index of the instruction a branch or callsub goes to
+        self.target = -1
+
+
+# opcode byte -> (op, immediate kinds)
+OPCODES: Dict[int, Tuple[str, Tuple[str, ...]]] = {
+    code: (op, immediates) for op, (code, immediates) in OPS.items()
+}
+
+
+def readUvarint(program: bytes, pos: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(program):
+            raise EvalError("program ends inside a varint")
+        b = program[pos]
+        pos += 1
+        value |= (b & 0x7F) << shift
+        if b < 0x80:
+            return value, pos
+        shift += 7
+        if shift > 63:
+            raise EvalError("varint overflows a uint64")
+
+
+class Program:
+    """Decoded program bytes, ready to be evaluated any number of times"""
+
+    def __init__(self, bytecode: bytes) -> None:
+        self.bytecode = bytecode
+        self.version, pos = readUvarint(bytecode, 0)
+        if not 1 <= self.version <= MAX_VERSION:
+            raise EvalError("unsupported program version {}".format(self.version))
+
+        self.instructions: List[Instruction] = []
+        index: Dict[int, int] = dict()
+        while pos < len(bytecode):
+            start = pos
+            opcode = bytecode[pos]
+            pos += 1
+            immediates: List[Any] = []
+            if opcode == OPCODE_INTCBLOCK:
+                op = "intcblock"
+                count, pos = readUvarint(bytecode, pos)
+                for _ in range(count):
+                    value, pos = readUvarint(bytecode, pos)
+                    immediates.append(value)
+            elif opcode == OPCODE_BYTECBLOCK:
+                op = "bytecblock"
+                count, pos = readUvarint(bytecode, pos)
+                for _ in range(count):
+                    length, pos = readUvarint(bytecode, pos)
+                    immediates.append(bytecode[pos : pos + length])
+                    pos += length
+            elif opcode == OPCODE_PUSHINT:
+                op = "pushint"
+                value, pos = readUvarint(bytecode, pos)
+                immediates.append(value)
+            elif opcode == OPCODE_PUSHBYTES:
+                op = "pushbytes"
+                length, pos = readUvarint(bytecode, pos)
+                immediates.append(bytecode[pos : pos + length])
+                pos += length
+            elif opcode in OPCODES:
+                op, kinds = OPCODES[opcode]
+                for kind in kinds:
+                    if pos + (2 if kind == "label" else 1) > len(bytecode):
+                        raise EvalError("program ends inside {}".format(op), start)
+                    if kind == "label":
+                        offset = int.from_bytes(bytecode[pos : pos + 2], "big")
+                        if offset >= 0x8000:
+                            offset -= 0x10000
+                        immediates.append(start + 3 + offset)
+                        pos += 2
+                    elif kind == "uint8":
+                        immediates.append(bytecode[pos])
+                        pos += 1
+                    else:
+                        fields = FIELD_GROUPS[kind]
+                        if bytecode[pos] >= len(fields):
+                            raise EvalError("invalid {} field".format(kind), start)
+                        immediates.append(fields[bytecode[pos]])
+                        pos += 1
+            else:
+                raise EvalError("invalid opcode 0x{:02x}".format(opcode), start)
+
+            if pos > len(bytecode):
+                raise EvalError("program ends inside {}".format(op), start)
+            instruction = Instruction(start, len(self.instructions), op, immediates)
+            instruction.handler = HANDLERS[op]
+            index[start] = len(self.instructions)
+            self.instructions.append(instruction)
+
+        # branching to the end of the program ends it
+        index[len(bytecode)] = len(self.instructions)
+        for instruction in self.instructions:
+            if instruction.op in ("b", "bz", "bnz", "callsub"):
+                target = instruction.immediates[0]
+                if target not in index:
+                    raise EvalError(
+                        "branch target is not an instruction", instruction.pc
+                    )
+                instruction.target = index[target]
+
+
+programCache: Dict[bytes, Program] = dict()
+
+
+def loadProgram(bytecode: bytes) -> Program:
+    program = programCache.get(bytecode)
+    if program is None:
+        program = Program(bytecode)
+        programCache[bytecode] = program
+    return program
+
+
+class EvalTxn:
+    """A transaction of a group, in msgpack form, with what evaluating it
+    produced for the transactions after it to read"""
+
+    def __init__(self, fields: Dict[str, Any], groupIndex: int = 0, txID: str = ""):
+        self.fields = fields
+        self.groupIndex = groupIndex
+        self.txID = txID
+        self.logs: List[bytes] = []
+        self.createdAssetID = 0
+        self.createdAppID = 0
+        self.scratch: Optional[List[StackValue]] = None
+        # whether it was applied, only applied transactions can be looked back at
+        self.applied = False
+
+    def get(self, key: str, default: Any = 0) -> Any:
+        return self.fields.get(key, default)
+
+
+class Budget:
+    """Opcode budget and inner transaction allowance shared by a group"""
+
+    def __init__(self, appCalls: int) -> None:
+        self.remaining = APP_BUDGET * appCalls
+        self.innerTxns = MAX_INNER_TXNS * appCalls
+        # fees paid beyond the minimum, spent on inner transactions
+        self.feeCredit = 0
+
+
+class EvalContext:
+    """What a program sees of the group and the ledger.
+
+    The emulator's ledger implements the state accessors, addresses are raw
+    32 byte keys throughout.
+    """
+
+    group: List[EvalTxn]
+    txn: EvalTxn
+    appID: int
+    appAddress: bytes
+    creator: bytes
+    callerAppID: int
+    round: int
+    timestamp: int
+    budget: Budget
+    depth: int
+    # assets and apps created earlier in the group are available from v6
+    createdAssets: List[int]
+    createdApps: List[int]
+
+    def balance(self, address: bytes) -> int:
+        raise NotImplementedError
+
+    def minBalance(self, address: bytes) -> int:
+        raise NotImplementedError
+
+    def authAddr(self, address: bytes) -> bytes:
+        raise NotImplementedError
+
+    def optedIn(self, address: bytes, appID: int) -> bool:
+        raise NotImplementedError
+
+    def localGet(self, address: bytes, appID: int, key: bytes) -> Optional[StackValue]:
+        raise NotImplementedError
+
+    def localPut(self, address: bytes, key: bytes, value: StackValue) -> None:
+        raise NotImplementedError
+
+    def localDel(self, address: bytes, key: bytes) -> None:
+        raise NotImplementedError
+
+    def globalGet(self, appID: int, key: bytes) -> Optional[StackValue]:
+        raise NotImplementedError
+
+    def globalPut(self, key: bytes, value: StackValue) -> None:
+        raise NotImplementedError
+
+    def globalDel(self, key: bytes) -> None:
+        raise NotImplementedError
+
+    def assetHolding(self, address: bytes, assetID: int) -> Optional[Tuple[int, bool]]:
+        raise NotImplementedError
+
+    def assetParams(self, assetID: int) -> Optional[Dict[str, StackValue]]:
+        """Asset params keyed by their asset_params_get field name"""
+        raise NotImplementedError
+
+    def appParams(self, appID: int) -> Optional[Dict[str, StackValue]]:
+        """App params keyed by their app_params_get field name"""
+        raise NotImplementedError
+
+    def submitInner(self, txns: List[Dict[str, Any]]) -> List[EvalTxn]:
+        raise NotImplementedError
+
+
+# region Transaction fields
+
+ADDRESS_FIELDS = {
+    "Sender": "snd",
+    "Receiver": "rcv",
+    "CloseRemainderTo": "close",
+    "AssetSender": "asnd",
+    "AssetReceiver": "arcv",
+    "AssetCloseTo": "aclose",
+    "RekeyTo": "rekey",
+    "FreezeAssetAccount": "fadd",
+}
+
+UINT_FIELDS = {
+    "Fee": "fee",
+    "FirstValid": "fv",
+    "LastValid": "lv",
+    "Amount": "amt",
+    "VoteFirst": "votefst",
+    "VoteLast": "votelst",
+    "VoteKeyDilution": "votekd",
+    "XferAsset": "xaid",
+    "AssetAmount": "aamt",
+    "ApplicationID": "apid",
+    "OnCompletion": "apan",
+    "ConfigAsset": "caid",
+    "FreezeAsset": "faid",
+    "FreezeAssetFrozen": "afrz",
+    "ExtraProgramPages": "apep",
+    "Nonparticipation": "nonpart",
+}
+
+# bytes fields and their length when unset
+BYTES_FIELDS = {
+    "Note": ("note", 0),
+    "Lease": ("lx", 32),
+    "VotePK": ("votekey", 32),
+    "SelectionPK": ("selkey", 32),
+    "ApprovalProgram": ("apap", 0),
+    "ClearStateProgram": ("apsu", 0),
+    "StateProofPK": ("sprfkey", 64),
+}
+
+# fields of the asset params ("apar") of an asset config
+ASSET_CONFIG_FIELDS = {
+    "ConfigAssetTotal": ("t", "uint"),
+    "ConfigAssetDecimals": ("dc", "uint"),
+    "ConfigAssetDefaultFrozen": ("df", "uint"),
+    "ConfigAssetUnitName": ("un", "string"),
+    "ConfigAssetName": ("an", "string"),
+    "ConfigAssetURL": ("au", "string"),
+    "ConfigAssetMetadataHash": ("am", "hash"),
+    "ConfigAssetManager": ("m", "address"),
+    "ConfigAssetReserve": ("r", "address"),
+    "ConfigAssetFreeze": ("f", "address"),
+    "ConfigAssetClawback": ("c", "address"),
+}
+
+SCHEMA_FIELDS = {
+    "GlobalNumUint": ("apgs", "nui"),
+    "GlobalNumByteSlice": ("apgs", "nbs"),
+    "LocalNumUint": ("apls", "nui"),
+    "LocalNumByteSlice": ("apls", "nbs"),
+}
+
+ARRAY_FIELDS = {"ApplicationArgs", "Accounts", "Assets", "Applications", "Logs"}
+
+# fields only known once a transaction was applied
+RESULT_FIELDS = {"Logs", "NumLogs", "LastLog", "CreatedAssetID", "CreatedApplicationID"}
+
+# types inner transactions can have in v6
+INNER_TYPES = {"pay", "keyreg", "acfg", "axfer", "afrz", "appl"}
+
+
+def uvarintBool(value: Any) -> int:
+    return 1 if value else 0
+
+
+def txnField(
+    t: EvalTxn, field: str, index: Optional[int] = None, pc: Optional[int] = None
+) -> StackValue:
+    """Value of a transaction field, index selects an element of array fields"""
+    if field in ARRAY_FIELDS:
+        if index is None:
+            raise EvalError("{} is an array field".format(field), pc)
+        items = txnArray(t, field)
+        if index >= len(items):
+            raise EvalError("invalid {} index {}".format(field, index), pc)
+        return items[index]
+    if index is not None:
+        raise EvalError("{} is not an array field".format(field), pc)
+
+    fields = t.fields
+    if field in ADDRESS_FIELDS:
+        return fields.get(ADDRESS_FIELDS[field], ZERO_ADDRESS)
+    if field in UINT_FIELDS:
+        value = fields.get(UINT_FIELDS[field], 0)
+        return uvarintBool(value) if isinstance(value, bool) else value
+    if field in BYTES_FIELDS:
+        key, length = BYTES_FIELDS[field]
+        return fields.get(key, bytes(length))
+    if field in ASSET_CONFIG_FIELDS:
+        key, kind = ASSET_CONFIG_FIELDS[field]
+        value = fields.get("apar", {}).get(key)
+        if kind == "uint":
+            return uvarintBool(value) if isinstance(value, bool) else value or 0
+        if kind == "string":
+            return value.encode() if isinstance(value, str) else value or b""
+        if kind == "hash":
+            return value or bytes(32)
+        return value or ZERO_ADDRESS
+    if field in SCHEMA_FIELDS:
+        schema, key = SCHEMA_FIELDS[field]
+        return fields.get(schema, {}).get(key, 0)
+
+    if field == "Type":
+        return fields.get("type", "").encode()
+    if field == "TypeEnum":
+        return TXN_TYPES.index(fields.get("type", "unknown"))
+    if field == "GroupIndex":
+        return t.groupIndex
+    if field == "TxID":
+        return decodeTxID(t.txID)
+    if field == "NumAppArgs":
+        return len(fields.get("apaa", []))
+    if field == "NumAccounts":
+        return len(fields.get("apat", []))
+    if field == "NumAssets":
+        return len(fields.get("apas", []))
+    if field == "NumApplications":
+        return len(fields.get("apfa", []))
+    if field == "NumLogs":
+        return len(t.logs)
+    if field == "LastLog":
+        return t.logs[-1] if t.logs else b""
+    if field == "CreatedAssetID":
+        return t.createdAssetID
+    if field == "CreatedApplicationID":
+        return t.createdAppID
+    raise EvalError("{} is not supported".format(field), pc)
+
+
+def txnArray(t: EvalTxn, field: str) -> List[StackValue]:
+    fields = t.fields
+    if field == "ApplicationArgs":
+        return fields.get("apaa", [])
+    if field == "Accounts":
+        return [fields.get("snd", ZERO_ADDRESS)] + fields.get("apat", [])
+    if field == "Assets":
+        return fields.get("apas", [])
+    if field == "Applications":
+        return [fields.get("apid", 0)] + fields.get("apfa", [])
+    return list(t.logs)
+
+
+def decodeTxID(txID: str) -> bytes:
+    return b32decode(txID + "=" * (-len(txID) % 8))
+
+
+# endregion
+
+
+class Evaluation:
+    """One run of a program for the transaction in the context"""
+
+    def __init__(self, program: Program, cx: EvalContext) -> None:
+        self.program = program
+        self.cx = cx
+        self.stack: List[StackValue] = []
+        self.scratch: List[StackValue] = [0] * SCRATCH_SLOTS
+        self.callstack: List[int] = []
+        self.intc: List[int] = []
+        self.bytec: List[bytes] = []
+        self.logs: List[bytes] = []
+        self.logSize = 0
+        self.cost = 0
+        # inner transactions being built and the last submitted group
+        self.building: Optional[List[Dict[str, Any]]] = None
+        self.lastInner: List[EvalTxn] = []
+        self.pc = 0
+
+    def run(self) -> bool:
+        """Evaluate the program, returns whether it approved"""
+        code = self.program.instructions
+        budget = self.cx.budget
+        end = len(code)
+        i = 0
+        while i < end:
+            instruction = code[i]
+            self.pc = instruction.pc
+            budget.remaining -= instruction.cost
+            self.cost += instruction.cost
+            if budget.remaining < 0:
+                raise EvalError(
+                    "dynamic cost budget exceeded, executing {}".format(instruction.op),
+                    instruction.pc,
+                )
+            next = instruction.handler(self, instruction)
+            i = i + 1 if next is None else next
+            if len(self.stack) > MAX_STACK_DEPTH:
+                raise EvalError("stack overflow", instruction.pc)
+
+        if len(self.stack) != 1:
+            raise EvalError("stack len is {} instead of 1".format(len(self.stack)))
+        result = self.stack[0]
+        if not isinstance(result, int):
+            raise EvalError("stack finished with bytes not int")
+        return result != 0
+
+    def fail(self, message: str) -> EvalError:
+        return EvalError(message, self.pc)
+
+    def pop(self) -> StackValue:
+        if not self.stack:
+            raise self.fail("stack underflow")
+        return self.stack.pop()
+
+    def popUint(self) -> int:
+        value = self.pop()
+        if not isinstance(value, int):
+            raise self.fail("expected uint64, got bytes")
+        return value
+
+    def popBytes(self) -> bytes:
+        value = self.pop()
+        if not isinstance(value, bytes):
+            raise self.fail("expected bytes, got uint64")
+        return value
+
+    def pushBytes(self, value: bytes) -> None:
+        if len(value) > MAX_BYTES_LENGTH:
+            raise self.fail("bytes too long: {}".format(len(value)))
+        self.stack.append(value)
+
+    def pushUint(self, value: int) -> None:
+        if not 0 <= value <= MAX_UINT64:
+            raise self.fail("uint64 overflow")
+        self.stack.append(value)
+
+    # region References
+
+    def accountReference(self, value: StackValue) -> bytes:
+        txn = self.cx.txn.fields
+        accounts = txn.get("apat", [])
+        if isinstance(value, int):
+            if value == 0:
+                return txn["snd"]
+            if value <= len(accounts):
+                return accounts[value - 1]
+            raise self.fail("invalid Account reference {}".format(value))
+        if len(value) != 32:
+            raise self.fail("not an address: {} bytes".format(len(value)))
+        if value == txn["snd"] or value in accounts or value == self.cx.appAddress:
+            return value
+        # accounts of foreign apps and of apps created earlier in the group
+        for appID in txn.get("apfa", []) + self.cx.createdApps:
+            if value == appAddress(appID):
+                return value
+        raise self.fail("invalid Account reference {}".format(encode_address(value)))
+
+    def assetReference(self, value: int) -> int:
+        assets = self.cx.txn.fields.get("apas", [])
+        if value in assets or value in self.cx.createdAssets:
+            return value
+        if value < len(assets):
+            return assets[value]
+        raise self.fail("invalid Asset reference {}".format(value))
+
+    def appReference(self, value: int) -> int:
+        apps = self.cx.txn.fields.get("apfa", [])
+        if value == 0 or value == self.cx.appID:
+            return self.cx.appID
+        if value in apps or value in self.cx.createdApps:
+            return value
+        if value <= len(apps):
+            return apps[value - 1]
+        raise self.fail("invalid App reference {}".format(value))
+
+    def availableAsset(self, value: int) -> int:
+        if (
+            value in self.cx.txn.fields.get("apas", [])
+            or value in self.cx.createdAssets
+        ):
+            return value
+        raise self.fail("unavailable Asset {}".format(value))
+
+    def availableApp(self, value: int) -> int:
+        if (
+            value == self.cx.appID
+            or value in self.cx.txn.fields.get("apfa", [])
+            or value in self.cx.createdApps
+        ):
+            return value
+        raise self.fail("unavailable App {}".format(value))
+
+    def groupTxn(self, index: int, result: bool = False) -> EvalTxn:
+        group = self.cx.group
+        if index >= len(group):
+            raise self.fail("txn index {} out of group of {}".format(index, len(group)))
+        t = group[index]
+        if result and not t.applied and t is not self.cx.txn:
+            raise self.fail("can't read results of future transaction {}".format(index))
+        return t
+
+    # endregion
+
+
+@lru_cache(maxsize=4096)
+def appAddress(appID: int) -> bytes:
+    """Raw address of an app's account, as get_application_address"""
+    return checksum(b"appID" + appID.to_bytes(8, "big"))
+
+
+# region Handlers
+
+Handler = Callable[[Evaluation, Instruction], Optional[int]]
+HANDLERS: Dict[str, Handler] = dict()
+
+
+def handler(*ops: str) -> Callable[[Handler], Handler]:
+    def register(fn: Handler) -> Handler:
+        for op in ops:
+            HANDLERS[op] = fn
+        return fn
+
+    return register
+
+
+@handler("err")
+def opErr(ev: Evaluation, ins: Instruction) -> None:
+    raise ev.fail("err opcode executed")
+
+
+@handler("sha256", "keccak256", "sha512_256")
+def opHash(ev: Evaluation, ins: Instruction) -> None:
+    data = ev.popBytes()
+    if ins.op == "sha256":
+        ev.stack.append(hashlib.sha256(data).digest())
+    elif ins.op == "sha512_256":
+        ev.stack.append(checksum(data))
+    else:
+        from Cryptodome.Hash import keccak
+
+        ev.stack.append(keccak.new(data=data, digest_bits=256).digest())
+
+
+@handler("ed25519verify")
+def opEd25519Verify(ev: Evaluation, ins: Instruction) -> None:
+    from nacl.exceptions import BadSignatureError
+    from nacl.signing import VerifyKey
+
+    publicKey = ev.popBytes()
+    signature = ev.popBytes()
+    data = ev.popBytes()
+    if len(publicKey) != 32 or len(signature) != 64:
+        raise ev.fail("invalid public key or signature length")
+    message = b"ProgData" + checksum(b"Program" + ev.program.bytecode) + data
+    try:
+        VerifyKey(publicKey).verify(message, signature)
+        ev.stack.append(1)
+    except BadSignatureError:
+        ev.stack.append(0)
+
+
+@handler("ecdsa_verify", "ecdsa_pk_decompress", "ecdsa_pk_recover")
+def opUnsupported(ev: Evaluation, ins: Instruction) -> None:
+    raise ev.fail("{} is not supported by the emulator".format(ins.op))
+
+
+@handler("+")
+def opPlus(ev: Evaluation, ins: Instruction) -> None:
+    b = ev.popUint()
+    a = ev.popUint()
+    if a + b > MAX_UINT64:
+        raise ev.fail("+ overflowed")
+    ev.stack.append(a + b)
+
+
+@handler("-")
+def opMinus(ev: Evaluation, ins: Instruction) -> None:
+    b = ev.popUint()
+    a = ev.popUint()
+    if b > a:
+        raise ev.fail("- would result negative")
+    ev.stack.append(a - b)
+
+
+@handler("/")
+def opDiv(ev: Evaluation, ins: Instruction) -> None:
+    b = ev.popUint()
+    a = ev.popUint()
+    if b == 0:
+        raise ev.fail("/ 0")
+    ev.stack.append(a // b)
+
+
+@handler("%")
+def opModulo(ev: Evaluation, ins: Instruction) -> None:
+    b = ev.popUint()
+    a = ev.popUint()
+    if b == 0:
+        raise ev.fail("% 0")
+    ev.stack.append(a % b)
+
+
+@handler("*")
+def opMul(ev: Evaluation, ins: Instruction) -> None:
+    b = ev.popUint()
+    a = ev.popUint()
+    if a * b > MAX_UINT64:
+        raise ev.fail("* overflowed")
+    ev.stack.append(a * b)
+
+
+COMPARISONS: Dict[str, Callable[[int, int], bool]] = {
+    "<": lambda a, b: a < b,
+    ">": lambda a, b: a > b,
+    "<=": lambda a, b: a <= b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+@handler("<", ">", "<=", ">=")
+def opCompare(ev: Evaluation, ins: Instruction) -> None:
+    b = ev.popUint()
+    a = ev.popUint()
+    ev.stack.append(1 if COMPARISONS[ins.op](a, b) else 0)
+
+
+@handler("&&")
+def opAnd(ev: Evaluation, ins: Instruction) -> None:
+    b = ev.popUint()
+    a = ev.popUint()
+    ev.stack.append(1 if a and b else 0)
+
+
+@handler("||")
+def opOr(ev: Evaluation, ins: Instruction) -> None:
+    b = ev.popUint()
+    a = ev.popUint()
+    ev.stack.append(1 if a or b else 0)
+
+
+@handler("==", "!=")
+def opEquals(ev: Evaluation, ins: Instruction) -> None:
+    b = ev.pop()
+    a = ev.pop()
+    if type(a) is not type(b):
+        raise ev.fail("cannot compare uint64 to bytes")
+    equal = a == b
+    ev.stack.append(1 if equal == (ins.op == "==") else 0)
+
+
+@handler("!")
+def opNot(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(0 if ev.popUint() else 1)
+
+
+@handler("len")
+def opLen(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(len(ev.popBytes()))
+
+
+@handler("itob")
+def opItob(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(ev.popUint().to_bytes(8, "big"))
+
+
+@handler("btoi")
+def opBtoi(ev: Evaluation, ins: Instruction) -> None:
+    value = ev.popBytes()
+    if len(value) > 8:
+        raise ev.fail("btoi arg too long, got [{}]bytes".format(len(value)))
+    ev.stack.append(int.from_bytes(value, "big"))
+
+
+@handler("|", "&", "^")
+def opBitwise(ev: Evaluation, ins: Instruction) -> None:
+    b = ev.popUint()
+    a = ev.popUint()
+    if ins.op == "|":
+        ev.stack.append(a | b)
+    elif ins.op == "&":
+        ev.stack.append(a & b)
+    else:
+        ev.stack.append(a ^ b)
+
+
+@handler("~")
+def opBitNot(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(ev.popUint() ^ MAX_UINT64)
+
+
+@handler("mulw")
+def opMulw(ev: Evaluation, ins: Instruction) -> None:
+    b = ev.popUint()
+    a = ev.popUint()
+    product = a * b
+    ev.stack += [product >> 64, product & MAX_UINT64]
+
+
+@handler("addw")
+def opAddw(ev: Evaluation, ins: Instruction) -> None:
+    b = ev.popUint()
+    a = ev.popUint()
+    total = a + b
+    ev.stack += [total >> 64, total & MAX_UINT64]
+
+
+@handler("divmodw")
+def opDivmodw(ev: Evaluation, ins: Instruction) -> None:
+    divisorLow = ev.popUint()
+    divisorHigh = ev.popUint()
+    dividendLow = ev.popUint()
+    dividendHigh = ev.popUint()
+    divisor = (divisorHigh << 64) | divisorLow
+    if divisor == 0:
+        raise ev.fail("divmodw 0")
+    quotient, remainder = divmod((dividendHigh << 64) | dividendLow, divisor)
+    ev.stack += [
+        quotient >> 64,
+        quotient & MAX_UINT64,
+        remainder >> 64,
+        remainder & MAX_UINT64,
+    ]
+
+
+@handler("divw")
+def opDivw(ev: Evaluation, ins: Instruction) -> None:
+    divisor = ev.popUint()
+    low = ev.popUint()
+    high = ev.popUint()
+    if divisor == 0:
+        raise ev.fail("divw 0")
+    ev.pushUint(((high << 64) | low) // divisor)
+
+
+@handler("intcblock")
+def opIntcblock(ev: Evaluation, ins: Instruction) -> None:
+    ev.intc = ins.immediates
+
+
+@handler("bytecblock")
+def opBytecblock(ev: Evaluation, ins: Instruction) -> None:
+    ev.bytec = ins.immediates
+
+
+def constant(values: Sequence[StackValue], index: int, ev: Evaluation) -> StackValue:
+    if index >= len(values):
+        raise ev.fail(
+            "constant index {} beyond {} constants".format(index, len(values))
+        )
+    return values[index]
+
+
+@handler("intc")
+def opIntc(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(constant(ev.intc, ins.immediates[0], ev))
+
+
+@handler("intc_0", "intc_1", "intc_2", "intc_3")
+def opIntcN(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(constant(ev.intc, int(ins.op[-1]), ev))
+
+
+@handler("bytec")
+def opBytec(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(constant(ev.bytec, ins.immediates[0], ev))
+
+
+@handler("bytec_0", "bytec_1", "bytec_2", "bytec_3")
+def opBytecN(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(constant(ev.bytec, int(ins.op[-1]), ev))
+
+
+@handler("pushint", "pushbytes")
+def opPush(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(ins.immediates[0])
+
+
+@handler("arg", "arg_0", "arg_1", "arg_2", "arg_3", "args")
+def opArg(ev: Evaluation, ins: Instruction) -> None:
+    raise ev.fail("{} is only available to logic signatures".format(ins.op))
+
+
+@handler("txn", "txna")
+def opTxn(ev: Evaluation, ins: Instruction) -> None:
+    index = ins.immediates[1] if ins.op == "txna" else None
+    ev.stack.append(txnField(ev.cx.txn, ins.immediates[0], index, ev.pc))
+
+
+@handler("txnas")
+def opTxnas(ev: Evaluation, ins: Instruction) -> None:
+    index = ev.popUint()
+    ev.stack.append(txnField(ev.cx.txn, ins.immediates[0], index, ev.pc))
+
+
+@handler("gtxn", "gtxna")
+def opGtxn(ev: Evaluation, ins: Instruction) -> None:
+    field = ins.immediates[1]
+    t = ev.groupTxn(ins.immediates[0], field in RESULT_FIELDS)
+    index = ins.immediates[2] if ins.op == "gtxna" else None
+    ev.stack.append(txnField(t, field, index, ev.pc))
+
+
+@handler("gtxnas")
+def opGtxnas(ev: Evaluation, ins: Instruction) -> None:
+    index = ev.popUint()
+    field = ins.immediates[1]
+    t = ev.groupTxn(ins.immediates[0], field in RESULT_FIELDS)
+    ev.stack.append(txnField(t, field, index, ev.pc))
+
+
+@handler("gtxns", "gtxnsa")
+def opGtxns(ev: Evaluation, ins: Instruction) -> None:
+    field = ins.immediates[0]
+    t = ev.groupTxn(ev.popUint(), field in RESULT_FIELDS)
+    index = ins.immediates[1] if ins.op == "gtxnsa" else None
+    ev.stack.append(txnField(t, field, index, ev.pc))
+
+
+@handler("gtxnsas")
+def opGtxnsas(ev: Evaluation, ins: Instruction) -> None:
+    index = ev.popUint()
+    field = ins.immediates[0]
+    t = ev.groupTxn(ev.popUint(), field in RESULT_FIELDS)
+    ev.stack.append(txnField(t, field, index, ev.pc))
+
+
+GLOBALS: Dict[str, Callable[[Evaluation], StackValue]] = {
+    "MinTxnFee": lambda ev: MIN_TXN_FEE,
+    "MinBalance": lambda ev: MIN_BALANCE,
+    "MaxTxnLife": lambda ev: MAX_TXN_LIFE,
+    "ZeroAddress": lambda ev: ZERO_ADDRESS,
+    "GroupSize": lambda ev: len(ev.cx.group),
+    "LogicSigVersion": lambda ev: MAX_VERSION,
+    "Round": lambda ev: ev.cx.round,
+    "LatestTimestamp": lambda ev: ev.cx.timestamp,
+    "CurrentApplicationID": lambda ev: ev.cx.appID,
+    "CreatorAddress": lambda ev: ev.cx.creator,
+    "CurrentApplicationAddress": lambda ev: ev.cx.appAddress,
+    "GroupID": lambda ev: ev.cx.txn.fields.get("grp", bytes(32)),
+    "OpcodeBudget": lambda ev: ev.cx.budget.remaining,
+    "CallerApplicationID": lambda ev: ev.cx.callerAppID,
+    "CallerApplicationAddress": lambda ev: (
+        appAddress(ev.cx.callerAppID) if ev.cx.callerAppID else ZERO_ADDRESS
+    ),
+}
+
+
+@handler("global")
+def opGlobal(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(GLOBALS[ins.immediates[0]](ev))
+
+
+def scratchSlot(ev: Evaluation, slot: int) -> int:
+    if slot >= SCRATCH_SLOTS:
+        raise ev.fail("invalid scratch slot {}".format(slot))
+    return slot
+
+
+@handler("load")
+def opLoad(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(ev.scratch[ins.immediates[0]])
+
+
+@handler("store")
+def opStore(ev: Evaluation, ins: Instruction) -> None:
+    ev.scratch[ins.immediates[0]] = ev.pop()
+
+
+@handler("loads")
+def opLoads(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(ev.scratch[scratchSlot(ev, ev.popUint())])
+
+
+@handler("stores")
+def opStores(ev: Evaluation, ins: Instruction) -> None:
+    value = ev.pop()
+    ev.scratch[scratchSlot(ev, ev.popUint())] = value
+
+
+def groupScratch(ev: Evaluation, index: int, slot: int) -> StackValue:
+    t = ev.groupTxn(index)
+    if index >= ev.cx.txn.groupIndex:
+        raise ev.fail(
+            "can't read scratch of txn {} from txn {}".format(
+                index, ev.cx.txn.groupIndex
+            )
+        )
+    if t.scratch is None:
+        raise ev.fail("txn {} is not an app call".format(index))
+    return t.scratch[scratchSlot(ev, slot)]
+
+
+@handler("gload")
+def opGload(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(groupScratch(ev, ins.immediates[0], ins.immediates[1]))
+
+
+@handler("gloads")
+def opGloads(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(groupScratch(ev, ev.popUint(), ins.immediates[0]))
+
+
+@handler("gloadss")
+def opGloadss(ev: Evaluation, ins: Instruction) -> None:
+    slot = ev.popUint()
+    ev.stack.append(groupScratch(ev, ev.popUint(), slot))
+
+
+def createdID(ev: Evaluation, index: int) -> int:
+    t = ev.groupTxn(index)
+    if index >= ev.cx.txn.groupIndex:
+        raise ev.fail("gaid can't get creatable ID of txn ahead of the current one")
+    if t.createdAssetID:
+        return t.createdAssetID
+    if t.createdAppID:
+        return t.createdAppID
+    raise ev.fail("txn {} did not create an asset or app".format(index))
+
+
+@handler("gaid")
+def opGaid(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(createdID(ev, ins.immediates[0]))
+
+
+@handler("gaids")
+def opGaids(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(createdID(ev, ev.popUint()))
+
+
+@handler("bnz")
+def opBnz(ev: Evaluation, ins: Instruction) -> Optional[int]:
+    return ins.target if ev.popUint() != 0 else None
+
+
+@handler("bz")
+def opBz(ev: Evaluation, ins: Instruction) -> Optional[int]:
+    return ins.target if ev.popUint() == 0 else None
+
+
+@handler("b")
+def opB(ev: Evaluation, ins: Instruction) -> int:
+    return ins.target
+
+
+@handler("return")
+def opReturn(ev: Evaluation, ins: Instruction) -> int:
+    ev.stack[:] = [ev.popUint()]
+    return len(ev.program.instructions)
+
+
+@handler("assert")
+def opAssert(ev: Evaluation, ins: Instruction) -> None:
+    if ev.popUint() == 0:
+        raise ev.fail("assert failed")
+
+
+@handler("callsub")
+def opCallsub(ev: Evaluation, ins: Instruction) -> int:
+    ev.callstack.append(ins.index + 1)
+    return ins.target
+
+
+@handler("retsub")
+def opRetsub(ev: Evaluation, ins: Instruction) -> int:
+    if not ev.callstack:
+        raise ev.fail("retsub with empty callstack")
+    return ev.callstack.pop()
+
+
+@handler("pop")
+def opPop(ev: Evaluation, ins: Instruction) -> None:
+    ev.pop()
+
+
+@handler("dup")
+def opDup(ev: Evaluation, ins: Instruction) -> None:
+    value = ev.pop()
+    ev.stack += [value, value]
+
+
+@handler("dup2")
+def opDup2(ev: Evaluation, ins: Instruction) -> None:
+    if len(ev.stack) < 2:
+        raise ev.fail("stack underflow")
+    ev.stack += ev.stack[-2:]
+
+
+@handler("dig")
+def opDig(ev: Evaluation, ins: Instruction) -> None:
+    depth = ins.immediates[0]
+    if depth >= len(ev.stack):
+        raise ev.fail("dig {} with stack size {}".format(depth, len(ev.stack)))
+    ev.stack.append(ev.stack[-1 - depth])
+
+
+@handler("swap")
+def opSwap(ev: Evaluation, ins: Instruction) -> None:
+    if len(ev.stack) < 2:
+        raise ev.fail("stack underflow")
+    ev.stack[-1], ev.stack[-2] = ev.stack[-2], ev.stack[-1]
+
+
+@handler("select")
+def opSelect(ev: Evaluation, ins: Instruction) -> None:
+    condition = ev.popUint()
+    b = ev.pop()
+    a = ev.pop()
+    ev.stack.append(b if condition else a)
+
+
+@handler("cover")
+def opCover(ev: Evaluation, ins: Instruction) -> None:
+    depth = ins.immediates[0]
+    if depth >= len(ev.stack):
+        raise ev.fail("cover {} with stack size {}".format(depth, len(ev.stack)))
+    ev.stack.insert(len(ev.stack) - 1 - depth, ev.stack.pop())
+
+
+@handler("uncover")
+def opUncover(ev: Evaluation, ins: Instruction) -> None:
+    depth = ins.immediates[0]
+    if depth >= len(ev.stack):
+        raise ev.fail("uncover {} with stack size {}".format(depth, len(ev.stack)))
+    ev.stack.append(ev.stack.pop(len(ev.stack) - 1 - depth))
+
+
+@handler("concat")
+def opConcat(ev: Evaluation, ins: Instruction) -> None:
+    b = ev.popBytes()
+    a = ev.popBytes()
+    ev.pushBytes(a + b)
+
+
+def substring(ev: Evaluation, value: bytes, start: int, end: int) -> bytes:
+    if end < start:
+        raise ev.fail("substring end before start")
+    if end > len(value):
+        raise ev.fail("substring range beyond length of string")
+    return value[start:end]
+
+
+@handler("substring")
+def opSubstring(ev: Evaluation, ins: Instruction) -> None:
+    start, end = ins.immediates
+    ev.stack.append(substring(ev, ev.popBytes(), start, end))
+
+
+@handler("substring3")
+def opSubstring3(ev: Evaluation, ins: Instruction) -> None:
+    end = ev.popUint()
+    start = ev.popUint()
+    ev.stack.append(substring(ev, ev.popBytes(), start, end))
+
+
+@handler("extract")
+def opExtract(ev: Evaluation, ins: Instruction) -> None:
+    start, length = ins.immediates
+    value = ev.popBytes()
+    # a length of 0 extracts to the end
+    end = len(value) if length == 0 else start + length
+    if start > len(value) or end > len(value):
+        raise ev.fail("extract range beyond length of string")
+    ev.stack.append(value[start:end])
+
+
+@handler("extract3")
+def opExtract3(ev: Evaluation, ins: Instruction) -> None:
+    length = ev.popUint()
+    start = ev.popUint()
+    value = ev.popBytes()
+    if start + length > len(value):
+        raise ev.fail("extract range beyond length of string")
+    ev.stack.append(value[start : start + length])
+
+
+@handler("extract_uint16", "extract_uint32", "extract_uint64")
+def opExtractUint(ev: Evaluation, ins: Instruction) -> None:
+    size = int(ins.op[len("extract_uint") :]) // 8
+    start = ev.popUint()
+    value = ev.popBytes()
+    if start + size > len(value):
+        raise ev.fail("extract range beyond length of string")
+    ev.stack.append(int.from_bytes(value[start : start + size], "big"))
+
+
+@handler("getbit")
+def opGetbit(ev: Evaluation, ins: Instruction) -> None:
+    index = ev.popUint()
+    value = ev.pop()
+    if isinstance(value, int):
+        if index >= 64:
+            raise ev.fail("getbit index {} beyond 64 bits".format(index))
+        ev.stack.append((value >> index) & 1)
+        return
+    if index >= len(value) * 8:
+        raise ev.fail("getbit index {} beyond byteslice".format(index))
+    ev.stack.append((value[index // 8] >> (7 - index % 8)) & 1)
+
+
+@handler("setbit")
+def opSetbit(ev: Evaluation, ins: Instruction) -> None:
+    bit = ev.popUint()
+    index = ev.popUint()
+    value = ev.pop()
+    if bit > 1:
+        raise ev.fail("setbit value > 1")
+    if isinstance(value, int):
+        if index >= 64:
+            raise ev.fail("setbit index {} beyond 64 bits".format(index))
+        mask = 1 << index
+        ev.stack.append(value | mask if bit else value & ~mask)
+        return
+    if index >= len(value) * 8:
+        raise ev.fail("setbit index {} beyond byteslice".format(index))
+    data = bytearray(value)
+    mask = 1 << (7 - index % 8)
+    if bit:
+        data[index // 8] |= mask
+    else:
+        data[index // 8] &= ~mask & 0xFF
+    ev.stack.append(bytes(data))
+
+
+@handler("getbyte")
+def opGetbyte(ev: Evaluation, ins: Instruction) -> None:
+    index = ev.popUint()
+    value = ev.popBytes()
+    if index >= len(value):
+        raise ev.fail("getbyte index {} beyond length".format(index))
+    ev.stack.append(value[index])
+
+
+@handler("setbyte")
+def opSetbyte(ev: Evaluation, ins: Instruction) -> None:
+    byte = ev.popUint()
+    index = ev.popUint()
+    value = ev.popBytes()
+    if index >= len(value):
+        raise ev.fail("setbyte index {} beyond length".format(index))
+    if byte > 0xFF:
+        raise ev.fail("setbyte value {} > 255".format(byte))
+    ev.stack.append(value[:index] + bytes([byte]) + value[index + 1 :])
+
+
+@handler("shl", "shr")
+def opShift(ev: Evaluation, ins: Instruction) -> None:
+    shift = ev.popUint()
+    value = ev.popUint()
+    if shift >= 64:
+        raise ev.fail("{} arg too big, ({} >= 64)".format(ins.op, shift))
+    if ins.op == "shl":
+        ev.stack.append((value << shift) & MAX_UINT64)
+    else:
+        ev.stack.append(value >> shift)
+
+
+@handler("sqrt")
+def opSqrt(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(math.isqrt(ev.popUint()))
+
+
+@handler("bitlen")
+def opBitlen(ev: Evaluation, ins: Instruction) -> None:
+    value = ev.pop()
+    if isinstance(value, bytes):
+        value = int.from_bytes(value, "big")
+    ev.stack.append(value.bit_length())
+
+
+@handler("exp")
+def opExp(ev: Evaluation, ins: Instruction) -> None:
+    exponent = ev.popUint()
+    base = ev.popUint()
+    if base == 0 and exponent == 0:
+        raise ev.fail("0^0 is undefined")
+    if base > 1 and exponent >= 64:
+        raise ev.fail("{}^{} overflow".format(base, exponent))
+    ev.pushUint(base**exponent)
+
+
+@handler("expw")
+def opExpw(ev: Evaluation, ins: Instruction) -> None:
+    exponent = ev.popUint()
+    base = ev.popUint()
+    if base == 0 and exponent == 0:
+        raise ev.fail("0^0 is undefined")
+    if base > 1 and exponent >= 128:
+        raise ev.fail("{}^{} overflow".format(base, exponent))
+    result = base**exponent
+    if result >> 128:
+        raise ev.fail("{}^{} overflow".format(base, exponent))
+    ev.stack += [result >> 64, result & MAX_UINT64]
+
+
+def popBigint(ev: Evaluation) -> int:
+    value = ev.popBytes()
+    if len(value) > MAX_BYTE_MATH_LENGTH:
+        raise ev.fail("math attempted on large byte-array")
+    return int.from_bytes(value, "big")
+
+
+def bigintBytes(value: int) -> bytes:
+    return value.to_bytes((value.bit_length() + 7) // 8, "big")
+
+
+@handler("b+", "b-", "b/", "b*", "b%")
+def opByteMath(ev: Evaluation, ins: Instruction) -> None:
+    b = popBigint(ev)
+    a = popBigint(ev)
+    if ins.op == "b+":
+        result = a + b
+    elif ins.op == "b-":
+        if b > a:
+            raise ev.fail("byte math would have negative result")
+        result = a - b
+    elif ins.op == "b*":
+        result = a * b
+    elif b == 0:
+        raise ev.fail("division by zero")
+    elif ins.op == "b/":
+        result = a // b
+    else:
+        result = a % b
+    ev.stack.append(bigintBytes(result))
+
+
+BYTE_COMPARISONS: Dict[str, Callable[[int, int], bool]] = {
+    "b<": lambda a, b: a < b,
+    "b>": lambda a, b: a > b,
+    "b<=": lambda a, b: a <= b,
+    "b>=": lambda a, b: a >= b,
+    "b==": lambda a, b: a == b,
+    "b!=": lambda a, b: a != b,
+}
+
+
+@handler("b<", "b>", "b<=", "b>=", "b==", "b!=")
+def opByteCompare(ev: Evaluation, ins: Instruction) -> None:
+    b = popBigint(ev)
+    a = popBigint(ev)
+    ev.stack.append(1 if BYTE_COMPARISONS[ins.op](a, b) else 0)
+
+
+@handler("b|", "b&", "b^")
+def opByteBitwise(ev: Evaluation, ins: Instruction) -> None:
+    b = ev.popBytes()
+    a = ev.popBytes()
+    # the shorter operand is zero padded on the left
+    size = max(len(a), len(b))
+    x = int.from_bytes(a, "big")
+    y = int.from_bytes(b, "big")
+    if ins.op == "b|":
+        result = x | y
+    elif ins.op == "b&":
+        result = x & y
+    else:
+        result = x ^ y
+    ev.stack.append(result.to_bytes(size, "big"))
+
+
+@handler("b~")
+def opByteNot(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(bytes(b ^ 0xFF for b in ev.popBytes()))
+
+
+@handler("bsqrt")
+def opBsqrt(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(bigintBytes(math.isqrt(popBigint(ev))))
+
+
+@handler("bzero")
+def opBzero(ev: Evaluation, ins: Instruction) -> None:
+    size = ev.popUint()
+    if size > MAX_BYTES_LENGTH:
+        raise ev.fail("bzero attempted to create a too large string")
+    ev.stack.append(bytes(size))
+
+
+@handler("balance")
+def opBalance(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(ev.cx.balance(ev.accountReference(ev.pop())))
+
+
+@handler("min_balance")
+def opMinBalance(ev: Evaluation, ins: Instruction) -> None:
+    ev.stack.append(ev.cx.minBalance(ev.accountReference(ev.pop())))
+
+
+@handler("app_opted_in")
+def opAppOptedIn(ev: Evaluation, ins: Instruction) -> None:
+    appID = ev.appReference(ev.popUint())
+    address = ev.accountReference(ev.pop())
+    ev.stack.append(1 if ev.cx.optedIn(address, appID) else 0)
+
+
+@handler("app_local_get")
+def opAppLocalGet(ev: Evaluation, ins: Instruction) -> None:
+    key = ev.popBytes()
+    address = ev.accountReference(ev.pop())
+    value = ev.cx.localGet(address, ev.cx.appID, key)
+    ev.stack.append(0 if value is None else value)
+
+
+@handler("app_local_get_ex")
+def opAppLocalGetEx(ev: Evaluation, ins: Instruction) -> None:
+    key = ev.popBytes()
+    appID = ev.appReference(ev.popUint())
+    address = ev.accountReference(ev.pop())
+    value = ev.cx.localGet(address, appID, key)
+    ev.stack += [0, 0] if value is None else [value, 1]
+
+
+@handler("app_global_get")
+def opAppGlobalGet(ev: Evaluation, ins: Instruction) -> None:
+    value = ev.cx.globalGet(ev.cx.appID, ev.popBytes())
+    ev.stack.append(0 if value is None else value)
+
+
+@handler("app_global_get_ex")
+def opAppGlobalGetEx(ev: Evaluation, ins: Instruction) -> None:
+    key = ev.popBytes()
+    appID = ev.appReference(ev.popUint())
+    value = ev.cx.globalGet(appID, key)
+    ev.stack += [0, 0] if value is None else [value, 1]
+
+
+def checkKeyValue(ev: Evaluation, key: bytes, value: StackValue) -> None:
+    if len(key) > MAX_KEY_LENGTH:
+        raise ev.fail("key too long: length was {}".format(len(key)))
+    if isinstance(value, bytes) and len(key) + len(value) > MAX_KEY_VALUE_LENGTH:
+        raise ev.fail("key/value total too long for key {!r}".format(key))
+
+
+@handler("app_local_put")
+def opAppLocalPut(ev: Evaluation, ins: Instruction) -> None:
+    value = ev.pop()
+    key = ev.popBytes()
+    address = ev.accountReference(ev.pop())
+    checkKeyValue(ev, key, value)
+    if not ev.cx.optedIn(address, ev.cx.appID):
+        raise ev.fail(
+            "{} has not opted in to app {}".format(encode_address(address), ev.cx.appID)
+        )
+    ev.cx.localPut(address, key, value)
+
+
+@handler("app_global_put")
+def opAppGlobalPut(ev: Evaluation, ins: Instruction) -> None:
+    value = ev.pop()
+    key = ev.popBytes()
+    checkKeyValue(ev, key, value)
+    ev.cx.globalPut(key, value)
+
+
+@handler("app_local_del")
+def opAppLocalDel(ev: Evaluation, ins: Instruction) -> None:
+    key = ev.popBytes()
+    address = ev.accountReference(ev.pop())
+    if not ev.cx.optedIn(address, ev.cx.appID):
+        raise ev.fail(
+            "{} has not opted in to app {}".format(encode_address(address), ev.cx.appID)
+        )
+    ev.cx.localDel(address, key)
+
+
+@handler("app_global_del")
+def opAppGlobalDel(ev: Evaluation, ins: Instruction) -> None:
+    ev.cx.globalDel(ev.popBytes())
+
+
+@handler("asset_holding_get")
+def opAssetHoldingGet(ev: Evaluation, ins: Instruction) -> None:
+    assetID = ev.assetReference(ev.popUint())
+    address = ev.accountReference(ev.pop())
+    holding = ev.cx.assetHolding(address, assetID)
+    if holding is None:
+        ev.stack += [0, 0]
+    elif ins.immediates[0] == "AssetBalance":
+        ev.stack += [holding[0], 1]
+    else:
+        ev.stack += [1 if holding[1] else 0, 1]
+
+
+ZERO_VALUES: Dict[str, StackValue] = {
+    "AssetTotal": 0,
+    "AssetDecimals": 0,
+    "AssetDefaultFrozen": 0,
+    "AppGlobalNumUint": 0,
+    "AppGlobalNumByteSlice": 0,
+    "AppLocalNumUint": 0,
+    "AppLocalNumByteSlice": 0,
+    "AppExtraProgramPages": 0,
+}
+
+
+@handler("asset_params_get")
+def opAssetParamsGet(ev: Evaluation, ins: Instruction) -> None:
+    params = ev.cx.assetParams(ev.assetReference(ev.popUint()))
+    field = ins.immediates[0]
+    if params is None:
+        ev.stack += [ZERO_VALUES.get(field, b""), 0]
+    else:
+        ev.stack += [params[field], 1]
+
+
+@handler("app_params_get")
+def opAppParamsGet(ev: Evaluation, ins: Instruction) -> None:
+    params = ev.cx.appParams(ev.appReference(ev.popUint()))
+    field = ins.immediates[0]
+    if params is None:
+        ev.stack += [ZERO_VALUES.get(field, b""), 0]
+    else:
+        ev.stack += [params[field], 1]
+
+
+@handler("acct_params_get")
+def opAcctParamsGet(ev: Evaluation, ins: Instruction) -> None:
+    address = ev.accountReference(ev.pop())
+    balance = ev.cx.balance(address)
+    field = ins.immediates[0]
+    if field == "AcctBalance":
+        value: StackValue = balance
+    elif field == "AcctMinBalance":
+        value = ev.cx.minBalance(address)
+    else:
+        value = ev.cx.authAddr(address)
+    ev.stack += [value, 1 if balance > 0 else 0]
+
+
+@handler("log")
+def opLog(ev: Evaluation, ins: Instruction) -> None:
+    message = ev.popBytes()
+    ev.logSize += len(message)
+    if len(ev.logs) == MAX_LOG_CALLS:
+        raise ev.fail(
+            "too many log calls in program. up to {} is allowed".format(MAX_LOG_CALLS)
+        )
+    if ev.logSize > MAX_LOG_SIZE:
+        raise ev.fail(
+            "program logs too large. {} bytes > {} bytes limit".format(
+                ev.logSize, MAX_LOG_SIZE
+            )
+        )
+    ev.logs.append(message)
+
+
+# region Inner transactions
+
+
+def newInnerTxn(ev: Evaluation) -> Dict[str, Any]:
+    budget = ev.cx.budget
+    if budget.innerTxns <= 0:
+        raise ev.fail("too many inner transactions")
+    budget.innerTxns -= 1
+    outer = ev.cx.txn.fields
+    txn: Dict[str, Any] = {"snd": ev.cx.appAddress, "fv": outer.get("fv", 0)}
+    if outer.get("lv"):
+        txn["lv"] = outer["lv"]
+    # the fee defaults to what the fee credit doesn't cover
+    fee = max(MIN_TXN_FEE - budget.feeCredit, 0)
+    if fee:
+        txn["fee"] = fee
+    return txn
+
+
+@handler("itxn_begin")
+def opItxnBegin(ev: Evaluation, ins: Instruction) -> None:
+    if ev.building is not None:
+        raise ev.fail("itxn_begin without itxn_submit")
+    if ev.cx.depth >= MAX_APP_CALL_DEPTH:
+        raise ev.fail("too many levels of inner transactions")
+    ev.building = [newInnerTxn(ev)]
+
+
+@handler("itxn_next")
+def opItxnNext(ev: Evaluation, ins: Instruction) -> None:
+    if ev.building is None:
+        raise ev.fail("itxn_next without itxn_begin")
+    ev.building.append(newInnerTxn(ev))
+
+
+def setUnlessZero(txn: Dict[str, Any], key: str, value: Any) -> None:
+    # transactions are kept in canonical form, without zero values
+    if value:
+        txn[key] = value
+    else:
+        txn.pop(key, None)
+
+
+@handler("itxn_field")
+def opItxnField(ev: Evaluation, ins: Instruction) -> None:
+    if ev.building is None:
+        raise ev.fail("itxn_field without itxn_begin")
+    txn = ev.building[-1]
+    field = ins.immediates[0]
+    value = ev.pop()
+
+    def uint() -> int:
+        if not isinstance(value, int):
+            raise ev.fail("{} must be a uint64".format(field))
+        return value
+
+    def raw() -> bytes:
+        if not isinstance(value, bytes):
+            raise ev.fail("{} must be bytes".format(field))
+        return value
+
+    if field in ADDRESS_FIELDS:
+        address = ev.accountReference(raw())
+        setUnlessZero(txn, ADDRESS_FIELDS[field], address)
+        if field == "Sender":
+            # the sender is always present
+            txn["snd"] = address
+    elif field == "TypeEnum":
+        if uint() >= len(TXN_TYPES) or TXN_TYPES[value] not in INNER_TYPES:  # type: ignore
+            raise ev.fail("{} is not a valid type for itxn_field".format(value))
+        txn["type"] = TXN_TYPES[value]  # type: ignore
+    elif field == "Type":
+        kind = raw().decode(errors="replace")
+        if kind not in INNER_TYPES:
+            raise ev.fail("{} is not a valid type for itxn_field".format(kind))
+        txn["type"] = kind
+    elif field in ("XferAsset", "FreezeAsset") or (
+        field == "ConfigAsset" and uint() != 0
+    ):
+        setUnlessZero(txn, UINT_FIELDS[field], ev.availableAsset(uint()))
+    elif field == "ApplicationID":
+        setUnlessZero(txn, "apid", ev.availableApp(uint()) if uint() else 0)
+    elif field in ("FreezeAssetFrozen", "Nonparticipation"):
+        if uint() > 1:
+            raise ev.fail("{} must be 0 or 1".format(field))
+        setUnlessZero(txn, UINT_FIELDS[field], bool(value))
+    elif field == "OnCompletion":
+        if uint() > 5:
+            raise ev.fail("{} is not a valid OnCompletion".format(value))
+        setUnlessZero(txn, "apan", value)
+    elif field in UINT_FIELDS:
+        setUnlessZero(txn, UINT_FIELDS[field], uint())
+    elif field in BYTES_FIELDS:
+        setUnlessZero(txn, BYTES_FIELDS[field][0], raw())
+    elif field in ASSET_CONFIG_FIELDS:
+        key, kind = ASSET_CONFIG_FIELDS[field]
+        params = txn.setdefault("apar", {})
+        if kind == "uint":
+            setUnlessZero(params, key, bool(uint()) if key == "df" else uint())
+        elif kind == "string":
+            setUnlessZero(params, key, raw().decode(errors="replace"))
+        elif kind == "hash":
+            setUnlessZero(params, key, raw())
+        else:
+            setUnlessZero(params, key, ev.accountReference(raw()))
+        if not params:
+            del txn["apar"]
+    elif field in SCHEMA_FIELDS:
+        schema, key = SCHEMA_FIELDS[field]
+        setUnlessZero(txn.setdefault(schema, {}), key, uint())
+        if not txn[schema]:
+            del txn[schema]
+    elif field == "ApplicationArgs":
+        args = txn.setdefault("apaa", [])
+        if len(args) == MAX_APP_ARGS:
+            raise ev.fail("too many application args")
+        args.append(value if isinstance(value, bytes) else value.to_bytes(8, "big"))
+    elif field == "Accounts":
+        txn.setdefault("apat", []).append(ev.accountReference(raw()))
+    elif field == "Assets":
+        txn.setdefault("apas", []).append(ev.availableAsset(uint()))
+    elif field == "Applications":
+        txn.setdefault("apfa", []).append(ev.availableApp(uint()))
+    else:
+        raise ev.fail("{} is not allowed in itxn_field".format(field))
+
+
+@handler("itxn_submit")
+def opItxnSubmit(ev: Evaluation, ins: Instruction) -> None:
+    if ev.building is None:
+        raise ev.fail("itxn_submit without itxn_begin")
+    txns, ev.building = ev.building, None
+    for txn in txns:
+        if "type" not in txn:
+            raise ev.fail("inner transaction without a type")
+        total = sum(len(arg) for arg in txn.get("apaa", []))
+        if total > MAX_APP_TOTAL_ARG_LENGTH:
+            raise ev.fail("application args total length too long")
+    try:
+        ev.lastInner = ev.cx.submitInner(txns)
+    except EvalError:
+        raise
+    except Exception as e:
+        raise ev.fail(str(e)) from e
+
+
+def lastInner(ev: Evaluation, index: int = -1) -> EvalTxn:
+    if not ev.lastInner:
+        raise ev.fail("no inner transaction available")
+    if index >= len(ev.lastInner):
+        raise ev.fail("inner txn index {} beyond group".format(index))
+    return ev.lastInner[index]
+
+
+@handler("itxn", "itxna")
+def opItxn(ev: Evaluation, ins: Instruction) -> None:
+    index = ins.immediates[1] if ins.op == "itxna" else None
+    ev.stack.append(txnField(lastInner(ev), ins.immediates[0], index, ev.pc))
+
+
+@handler("itxnas")
+def opItxnas(ev: Evaluation, ins: Instruction) -> None:
+    index = ev.popUint()
+    ev.stack.append(txnField(lastInner(ev), ins.immediates[0], index, ev.pc))
+
+
+@handler("gitxn", "gitxna")
+def opGitxn(ev: Evaluation, ins: Instruction) -> None:
+    t = lastInner(ev, ins.immediates[0])
+    index = ins.immediates[2] if ins.op == "gitxna" else None
+    ev.stack.append(txnField(t, ins.immediates[1], index, ev.pc))
+
+
+@handler("gitxnas")
+def opGitxnas(ev: Evaluation, ins: Instruction) -> None:
+    index = ev.popUint()
+    t = lastInner(ev, ins.immediates[0])
+    ev.stack.append(txnField(t, ins.immediates[1], index, ev.pc))
+
+
+# endregion
+
+# endregion
+
+missing = set(OPS) - set(HANDLERS)
+assert not missing, "no handler for {}".format(sorted(missing))
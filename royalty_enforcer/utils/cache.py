@@ -0,0 +1,165 @@
+import os
+from functools import lru_cache
+from hashlib import sha256
+from importlib.metadata import PackageNotFoundError, version
+from typing import Callable, Dict, Optional
+
+CACHE_DIR = os.environ.get(
+    "ROYALTY_ENFORCER_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "royalty_enforcer"),
+)
+CACHE_SIZE = int(os.environ.get("ROYALTY_ENFORCER_CACHE_SIZE", 64 * 1024 * 1024))
+
+CONTRACTS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "contracts"
+)
+
+
+class CompileCache:
+    """Content-addressed on-disk cache for generated TEAL and compiled programs.
+
+    Entries are evicted least recently used first once the total size of the
+    cache directory grows past maxBytes. Recency is tracked with file mtimes so
+    that the cache can be shared between processes.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, maxBytes: int = CACHE_SIZE) -> None:
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.memory: Dict[str, bytes] = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        if key in self.memory:
+            self.hits += 1
+            return self.memory[key]
+
+        try:
+            with open(self.path(key), "rb") as f:
+                data = f.read()
+            # mark as recently used
+            os.utime(self.path(key))
+        except OSError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.memory[key] = data
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        self.memory[key] = data
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # write to a temporary file first so concurrent readers never see
+            # a partially written entry
+            tmpPath = "{}.{}.tmp".format(self.path(key), os.getpid())
+            with open(tmpPath, "wb") as f:
+                f.write(data)
+            os.replace(tmpPath, self.path(key))
+        except OSError:
+            # the cache is an optimization, failing to persist is not an error
+            return
+
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                continue
+            try:
+                stat = os.stat(self.path(name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, name in entries:
+            if total <= self.maxBytes:
+                break
+            try:
+                os.remove(self.path(name))
+            except OSError:
+                continue
+            self.memory.pop(name, None)
+            total -= size
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(self.path(name))
+            except OSError:
+                pass
+
+    def getTeal(self, sourceKey: str, build: Callable[[], str]) -> str:
+        key = "teal-" + sourceKey
+        data = self.get(key)
+        if data is None:
+            teal = build()
+            self.put(key, teal.encode())
+            return teal
+        return data.decode()
+
+    def getProgram(
+        self, teal: str, assembler: str, assemble: Callable[[str], bytes]
+    ) -> bytes:
+        key = programKey(teal, assembler)
+        program = self.get(key)
+        if program is None:
+            program = assemble(teal)
+            self.put(key, program)
+        return program
+
+
+@lru_cache(maxsize=None)
+def contractSourceHash() -> str:
+    """Hash of the PyTeal contract sources, computed without importing pyteal"""
+    h = sha256()
+    for name in sorted(os.listdir(CONTRACTS_DIR)):
+        if not name.endswith(".py"):
+            continue
+        h.update(name.encode())
+        with open(os.path.join(CONTRACTS_DIR, name), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def pytealVersion() -> str:
+    try:
+        return version("pyteal")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def programKey(teal: str, assembler: str) -> str:
+    # Keyed by assembler too, so bundles record the one that really ran
+    return "prog-" + sha256("\0".join([assembler, teal]).encode()).hexdigest()
+
+
+def tealKey(module: str, compiler: str) -> str:
+    parts = [contractSourceHash(), pytealVersion(), module, compiler]
+    return sha256("\0".join(parts).encode()).hexdigest()
+
+
+compileCache: Optional[CompileCache] = None
+
+
+def getCompileCache() -> CompileCache:
+    global compileCache
+
+    if compileCache is None:
+        compileCache = CompileCache()
+
+    return compileCache
@@ -1,17 +1,198 @@
+import json
+import os
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
+
+from algosdk import constants, error
 from algosdk.kmd import KMDClient
-from algosdk.v2client.algod import AlgodClient
+from algosdk.v2client.algod import AlgodClient, api_version_path_prefix
+from algosdk.v2client.indexer import IndexerClient
+from royalty_enforcer.utils.transport import ROUND_ROBIN, Transport
+
+
+# "sandbox" talks to the algod and KMD below, "emulator" runs the contracts in
+# process against an in-memory ledger, see royalty_enforcer.utils.emulator
+BACKEND = os.environ.get("ROYALTY_ENFORCER_BACKEND", "sandbox")
+
+
+def addressesFromEnv(name: str, default: str) -> List[str]:
+    return [a.strip() for a in os.environ.get(name, default).split(",") if a.strip()]
+
+
+ALGOD_ADDRESSES = addressesFromEnv(
+    "ROYALTY_ENFORCER_ALGOD_ADDRESS", "http://localhost:4001"
+)
+ALGOD_ADDRESS = ALGOD_ADDRESSES[0]
+ALGOD_TOKEN = os.environ.get(
+    "ROYALTY_ENFORCER_ALGOD_TOKEN",
+    "aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa",
+)
+
+KMD_ADDRESSES = addressesFromEnv(
+    "ROYALTY_ENFORCER_KMD_ADDRESS", "http://localhost:4002"
+)
+KMD_ADDRESS = KMD_ADDRESSES[0]
+KMD_TOKEN = os.environ.get(
+    "ROYALTY_ENFORCER_KMD_TOKEN",
+    "aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa",
+)
+
+INDEXER_ADDRESS = os.environ.get(
+    "ROYALTY_ENFORCER_INDEXER_ADDRESS", "http://localhost:8980"
+)
+INDEXER_TOKEN = os.environ.get("ROYALTY_ENFORCER_INDEXER_TOKEN", "")
+
+# "round-robin" or "least-latency"
+ENDPOINT_SELECTION = os.environ.get("ROYALTY_ENFORCER_ENDPOINT_SELECTION", ROUND_ROBIN)
+HTTP_POOL_SIZE = int(os.environ.get("ROYALTY_ENFORCER_HTTP_POOL_SIZE", "8"))
+HTTP_TIMEOUT = float(os.environ.get("ROYALTY_ENFORCER_HTTP_TIMEOUT", "30"))
+HTTP_RETRIES = int(os.environ.get("ROYALTY_ENFORCER_HTTP_RETRIES", "3"))
+
+
+def isPinned(requrl: str) -> bool:
+    """Whether an algod request is about transactions in the node's pool, and
+    so has to go to the node they were sent to"""
+    return requrl == "/transactions" or requrl.startswith("/transactions/pending")
+
+
+def buildTransport(addresses: List[str]) -> Transport:
+    return Transport(
+        addresses,
+        selection=ENDPOINT_SELECTION,
+        poolSize=HTTP_POOL_SIZE,
+        timeout=HTTP_TIMEOUT,
+        retries=HTTP_RETRIES,
+    )
+
+
+def errorMessage(body: bytes) -> str:
+    text = body.decode("utf-8", errors="replace")
+    try:
+        return json.loads(text)["message"]
+    except Exception:
+        return text
+
+
+class PooledAlgodClient(AlgodClient):
+    """AlgodClient sending requests over keep-alive connections to several nodes"""
+
+    def __init__(
+        self,
+        algod_token: str,
+        transport: Transport,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        super().__init__(algod_token, transport.endpoints[0].address, headers)
+        self.transport = transport
 
-ALGOD_ADDRESS = "http://localhost:4001"
-ALGOD_TOKEN = "aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa"
+    def algod_request(
+        self,
+        method: str,
+        requrl: str,
+        params: Optional[Dict[str, Any]] = None,
+        data: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        response_format: str = "json",
+    ) -> Any:
+        header = {"User-Agent": "py-algorand-sdk"}
+        if self.headers:
+            header.update(self.headers)
+        if headers:
+            header.update(headers)
+        if requrl not in constants.no_auth:
+            header[constants.algod_auth_header] = self.algod_token
+
+        pinned = isPinned(requrl)
+        if requrl not in constants.unversioned_paths:
+            requrl = api_version_path_prefix + requrl
+        if params:
+            requrl = requrl + "?" + urlencode(params)
+
+        status, body = self.transport.request(method, requrl, data, header, pinned)
+        if status >= 400:
+            raise error.AlgodHTTPError(errorMessage(body), status)
+
+        if response_format == "json":
+            try:
+                return json.loads(body)
+            except Exception as e:
+                raise error.AlgodResponseError(
+                    "Failed to parse JSON response from algod"
+                ) from e
+        return body
+
+
+class PooledKMDClient(KMDClient):
+    """KMDClient sending requests over keep-alive connections. Wallet handles
+    only exist on the KMD that issued them, so every request is pinned to one
+    endpoint."""
+
+    def __init__(self, kmd_token: str, transport: Transport) -> None:
+        super().__init__(kmd_token, transport.endpoints[0].address)
+        self.transport = transport
+
+    def kmd_request(
+        self,
+        method: str,
+        requrl: str,
+        params: Optional[Dict[str, Any]] = None,
+        data: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        header = dict()
+        if requrl not in constants.no_auth:
+            header[constants.kmd_auth_header] = self.kmd_token
+
+        if requrl not in constants.unversioned_paths:
+            requrl = api_version_path_prefix + requrl
+        if params:
+            requrl = requrl + "?" + urlencode(params)
+
+        body = None
+        if data:
+            body = json.dumps(data).encode("utf-8")
+
+        status, response = self.transport.request(
+            method, requrl, body, header, pinned=True
+        )
+        if status >= 400:
+            raise error.KMDHTTPError(errorMessage(response))
+        return json.loads(response.decode("utf-8"))
+
+
+algodClient: Optional[AlgodClient] = None
 
 
 def getAlgodClient() -> AlgodClient:
-    return AlgodClient(ALGOD_TOKEN, ALGOD_ADDRESS)
+    global algodClient
+
+    # One shared client per process, so connections and cached params are reused
+    if algodClient is None:
+        if BACKEND == "emulator":
+            from royalty_enforcer.utils.emulator import EmulatedAlgodClient
+
+            algodClient = EmulatedAlgodClient()
+        else:
+            algodClient = PooledAlgodClient(
+                ALGOD_TOKEN, buildTransport(ALGOD_ADDRESSES)
+            )
+    return algodClient
 
 
-KMD_ADDRESS = "http://localhost:4002"
-KMD_TOKEN = "aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa"
+kmdClient: Optional[KMDClient] = None
 
 
 def getKmdClient() -> KMDClient:
-    return KMDClient(KMD_TOKEN, KMD_ADDRESS)
+    global kmdClient
+
+    if kmdClient is None:
+        if BACKEND == "emulator":
+            from royalty_enforcer.utils.emulator import EmulatedKMDClient
+
+            kmdClient = EmulatedKMDClient()
+        else:
+            kmdClient = PooledKMDClient(KMD_TOKEN, buildTransport(KMD_ADDRESSES))
+    return kmdClient
+
+
+def getIndexerClient() -> IndexerClient:
+    return IndexerClient(INDEXER_TOKEN, INDEXER_ADDRESS)
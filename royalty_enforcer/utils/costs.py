@@ -0,0 +1,480 @@
+"""Static opcode cost and size profile of application programs.
+
+The approval program is walked once per route (each ABI method selector and
+each bare on-completion call) with the fields the route fixes, txn
+OnCompletion, ApplicationID and the first app arg, known. Branches on those
+are followed one way, any other branch both ways, so each route gets the
+cheapest and the most expensive path that doesn't fail. Subroutines are
+walked once and their cost added at every callsub.
+
+Costs are static: the opcode costs of algod, with no dynamic costs and no
+loops, which the contracts in this repo don't have.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from algosdk.abi import Method
+from royalty_enforcer.utils.assembler import assembleProgram
+from royalty_enforcer.utils.avm import Instruction, Program
+
+# Cheapest and most expensive cost of the paths through a route
+CostRange = Tuple[int, int]
+
+
+class CostError(Exception):
+    pass
+
+
+class Unknown:
+    def __repr__(self) -> str:
+        return "?"
+
+
+# a value only known at run time, and one only known not to be zero
+UNKNOWN = Unknown()
+NONZERO = Unknown()
+
+ON_COMPLETION = {
+    "create": 0,
+    "opt_in": 1,
+    "close_out": 2,
+    "update": 4,
+    "delete": 5,
+}
+
+# (pops, pushes) of the ops the walk doesn't evaluate, all others are (2, 1)
+STACK_EFFECTS: Dict[str, Tuple[int, int]] = {
+    **{
+        op: (0, 1)
+        for op in (
+            "intc",
+            "bytec",
+            "arg",
+            "arg_0",
+            "arg_1",
+            "arg_2",
+            "arg_3",
+            "global",
+            "gtxn",
+            "load",
+            "gtxna",
+            "gload",
+            "gaid",
+            "itxn",
+            "itxna",
+            "gitxn",
+            "gitxna",
+        )
+    },
+    **{
+        op: (0, 0)
+        for op in ("intcblock", "bytecblock", "itxn_begin", "itxn_next", "itxn_submit")
+    },
+    **{
+        op: (1, 0)
+        for op in ("store", "log", "itxn_field", "app_global_del", "pop", "assert")
+    },
+    **{
+        op: (1, 1)
+        for op in (
+            "sha256",
+            "keccak256",
+            "sha512_256",
+            "len",
+            "itob",
+            "btoi",
+            "~",
+            "gtxns",
+            "gtxnsa",
+            "gloads",
+            "gaids",
+            "loads",
+            "substring",
+            "extract",
+            "sqrt",
+            "bitlen",
+            "bsqrt",
+            "b~",
+            "bzero",
+            "txnas",
+            "gtxnas",
+            "args",
+            "itxnas",
+            "gitxnas",
+            "app_global_get",
+            "balance",
+            "min_balance",
+        )
+    },
+    **{
+        op: (1, 2)
+        for op in (
+            "app_params_get",
+            "acct_params_get",
+            "asset_params_get",
+            "ecdsa_pk_decompress",
+        )
+    },
+    **{op: (2, 0) for op in ("stores", "app_global_put", "app_local_del")},
+    **{
+        op: (2, 2)
+        for op in (
+            "mulw",
+            "addw",
+            "expw",
+            "asset_holding_get",
+            "app_global_get_ex",
+        )
+    },
+    **{
+        op: (3, 1)
+        for op in (
+            "select",
+            "substring3",
+            "setbit",
+            "setbyte",
+            "extract3",
+            "divw",
+            "ed25519verify",
+        )
+    },
+    "app_local_put": (3, 0),
+    "app_local_get_ex": (3, 2),
+    "divmodw": (4, 4),
+    "ecdsa_verify": (5, 1),
+    "ecdsa_pk_recover": (4, 2),
+    "dup": (1, 2),
+    "dup2": (2, 4),
+}
+
+
+def isKnown(value: Any) -> bool:
+    return value is not UNKNOWN
+
+
+def truth(value: Any) -> Optional[bool]:
+    """Whether a value is non zero, None when that's not known"""
+    if value is NONZERO:
+        return True
+    if isinstance(value, int):
+        return value != 0
+    return None
+
+
+def addRanges(a: CostRange, b: CostRange) -> CostRange:
+    return a[0] + b[0], a[1] + b[1]
+
+
+def unionRanges(a: Optional[CostRange], b: Optional[CostRange]) -> Optional[CostRange]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), max(a[1], b[1])
+
+
+class Paths:
+    """Costs of the paths from an instruction on, split by how they end:
+    ending the program or returning from the current subroutine. Paths that
+    fail aren't counted. Effect is the stack effect of the returning paths
+    as (lowest depth, final depth) relative to the depth at the start."""
+
+    def __init__(
+        self,
+        exit: Optional[CostRange] = None,
+        ret: Optional[CostRange] = None,
+        effect: Optional[Tuple[int, int]] = None,
+    ) -> None:
+        self.exit = exit
+        self.ret = ret
+        self.effect = effect
+
+    def after(self, cost: int, low: int, depth: int) -> "Paths":
+        """These paths, reached through cost opcodes that left the stack at
+        depth after going as low as low"""
+        shift = (cost, cost)
+        return Paths(
+            addRanges(shift, self.exit) if self.exit else None,
+            addRanges(shift, self.ret) if self.ret else None,
+            (min(low, depth + self.effect[0]), depth + self.effect[1])
+            if self.effect
+            else None,
+        )
+
+    def union(self, other: "Paths") -> "Paths":
+        effect = self.effect or other.effect
+        if self.effect and other.effect:
+            if self.effect[1] != other.effect[1]:
+                raise CostError("subroutine returns with different stack depths")
+            effect = (min(self.effect[0], other.effect[0]), self.effect[1])
+        return Paths(
+            unionRanges(self.exit, other.exit),
+            unionRanges(self.ret, other.ret),
+            effect,
+        )
+
+
+class CostWalk:
+    """Walks a program with some transaction fields known"""
+
+    def __init__(self, program: Program, fields: Dict[Any, Any]) -> None:
+        self.program = program
+        self.code = program.instructions
+        # txn fields by name, txna fields by (name, index)
+        self.fields = fields
+        self.intc: List[int] = []
+        self.bytec: List[bytes] = []
+        for instruction in self.code:
+            if instruction.op == "intcblock":
+                self.intc = instruction.immediates
+            elif instruction.op == "bytecblock":
+                self.bytec = instruction.immediates
+        self.memo: Dict[Tuple[int, Tuple[Any, ...]], Paths] = dict()
+        self.walking: set = set()
+
+    def route(self) -> Optional[CostRange]:
+        return self.walk(0, []).exit
+
+    def subroutine(self, index: int) -> Paths:
+        return self.walk(index, [])
+
+    def walk(self, index: int, stack: List[Any]) -> Paths:
+        # values below the first known one don't matter
+        while stack and not isKnown(stack[0]):
+            stack = stack[1:]
+        key = (index, tuple(stack))
+        if key in self.memo:
+            return self.memo[key]
+        if key in self.walking:
+            raise CostError(
+                "loop through pc {}".format(self.code[index].pc)
+                if index < len(self.code)
+                else "loop at the end of the program"
+            )
+        self.walking.add(key)
+        try:
+            paths = self.walkFrom(index, list(stack))
+        finally:
+            self.walking.discard(key)
+        self.memo[key] = paths
+        return paths
+
+    def walkFrom(self, index: int, stack: List[Any]) -> Paths:
+        cost = 0
+        depth = 0
+        low = 0
+
+        def pop() -> Any:
+            nonlocal depth, low
+            depth -= 1
+            low = min(low, depth)
+            return stack.pop() if stack else UNKNOWN
+
+        def push(value: Any) -> None:
+            nonlocal depth
+            depth += 1
+            stack.append(value)
+
+        seen = set()
+        while True:
+            if index >= len(self.code):
+                return Paths(exit=(cost, cost))
+            if index in seen:
+                raise CostError("loop through pc {}".format(self.code[index].pc))
+            seen.add(index)
+            instruction = self.code[index]
+            op = instruction.op
+            cost += instruction.cost
+            index += 1
+
+            if op == "err":
+                return Paths()
+            elif op == "return":
+                if truth(pop()) is False:
+                    return Paths()
+                return Paths(exit=(cost, cost))
+            elif op == "retsub":
+                return Paths(ret=(cost, cost), effect=(low, depth))
+            elif op == "b":
+                index = instruction.target
+            elif op in ("bz", "bnz"):
+                taken = truth(pop())
+                if taken is not None:
+                    if taken == (op == "bnz"):
+                        index = instruction.target
+                    continue
+                branched = self.walk(instruction.target, stack)
+                following = self.walk(index, stack)
+                return branched.union(following).after(cost, low, depth)
+            elif op == "callsub":
+                return self.callsub(instruction, stack).after(cost, low, depth)
+            elif op == "assert":
+                if truth(pop()) is False:
+                    return Paths()
+            else:
+                self.evaluate(instruction, pop, push, stack)
+
+    def callsub(self, instruction: Instruction, stack: List[Any]) -> Paths:
+        called = self.subroutine(instruction.target)
+        if called.ret is None:
+            # the subroutine never returns
+            return Paths(exit=called.exit)
+        low, depth = called.effect or (0, 0)
+        # what the subroutine took and left is no longer known
+        stack = stack[: max(len(stack) + low, 0)]
+        stack += [UNKNOWN] * (depth - low)
+        following = self.walk(instruction.index + 1, stack)
+        paths = following.after(called.ret[0], low, depth)
+        # the cost of the subroutine varies, not only its cheapest path
+        spread = called.ret[1] - called.ret[0]
+        return Paths(
+            unionRanges(
+                called.exit,
+                (paths.exit[0], paths.exit[1] + spread) if paths.exit else None,
+            ),
+            (paths.ret[0], paths.ret[1] + spread) if paths.ret else None,
+            paths.effect,
+        )
+
+    def evaluate(self, instruction: Instruction, pop, push, stack: List[Any]) -> None:
+        op = instruction.op
+        immediates = instruction.immediates
+        if op in ("pushint", "pushbytes"):
+            push(immediates[0])
+        elif (
+            op.startswith("intc_")
+            or op.startswith("bytec_")
+            or op
+            in (
+                "intc",
+                "bytec",
+            )
+        ):
+            values = self.intc if op.startswith("intc") else self.bytec
+            slot = immediates[0] if op in ("intc", "bytec") else int(op[-1])
+            push(values[slot] if slot < len(values) else UNKNOWN)
+        elif op == "txn":
+            push(self.fields.get(immediates[0], UNKNOWN))
+        elif op == "txna":
+            push(self.fields.get((immediates[0], immediates[1]), UNKNOWN))
+        elif op in ("==", "!="):
+            b, a = pop(), pop()
+            if isKnown(a) and isKnown(b) and NONZERO not in (a, b):
+                push(int((a == b) == (op == "==")))
+            elif {a, b} == {NONZERO, 0}:
+                push(int(op == "!="))
+            else:
+                push(UNKNOWN)
+        elif op in ("&&", "||"):
+            b, a = truth(pop()), truth(pop())
+            decides = op == "||"
+            if decides in (a, b):
+                push(int(decides))
+            elif a is not None and b is not None:
+                push(int(not decides))
+            else:
+                push(UNKNOWN)
+        elif op == "!":
+            value = truth(pop())
+            push(UNKNOWN if value is None else int(not value))
+        elif op == "dup":
+            value = pop()
+            push(value)
+            push(value)
+        elif op == "swap":
+            b, a = pop(), pop()
+            push(b)
+            push(a)
+        elif op in ("dig", "cover", "uncover"):
+            n = immediates[0]
+            values = [pop() for _ in range(n + 1)][::-1]
+            if op == "dig":
+                values.append(values[0])
+            elif op == "cover":
+                values.insert(0, values.pop())
+            else:
+                values.append(values.pop(0))
+            for value in values:
+                push(value)
+        else:
+            pops, pushes = STACK_EFFECTS.get(op, (2, 1))
+            for _ in range(pops):
+                pop()
+            for _ in range(pushes):
+                push(UNKNOWN)
+
+
+class ProgramProfile:
+    """Size, per route cost, per subroutine size and scratch use of a program"""
+
+    def __init__(self, name: str, size: int) -> None:
+        self.name = name
+        self.size = size
+        self.routes: Dict[str, Optional[CostRange]] = dict()
+        # label -> (bytes, cost range when it returns)
+        self.subroutines: Dict[str, Tuple[int, Optional[CostRange]]] = dict()
+        # label (or "main") -> scratch slots, -1 for loads/stores
+        self.scratch: Dict[str, List[int]] = dict()
+
+    def scratchSlots(self) -> List[int]:
+        return sorted({s for slots in self.scratch.values() for s in slots if s >= 0})
+
+
+def routeFields(route: str, method: Optional[Method]) -> Dict[Any, Any]:
+    if method is not None:
+        return {
+            "OnCompletion": 0,
+            "ApplicationID": NONZERO,
+            ("ApplicationArgs", 0): method.get_selector(),
+        }
+    return {
+        "OnCompletion": ON_COMPLETION[route],
+        "ApplicationID": 0 if route == "create" else NONZERO,
+    }
+
+
+def profileProgram(
+    name: str, teal: str, methods: Iterable[Method] = (), routes: bool = True
+) -> ProgramProfile:
+    """Profile a program, routes are only walked for approval programs"""
+    assembled = assembleProgram(teal)
+    program = Program(assembled.bytecode)
+    profile = ProgramProfile(name, len(assembled.bytecode))
+
+    if routes:
+        for method in methods:
+            walk = CostWalk(program, routeFields(method.name, method))
+            profile.routes[method.name] = walk.route()
+        for route in ON_COMPLETION:
+            profile.routes[route] = CostWalk(program, routeFields(route, None)).route()
+    else:
+        profile.routes["program"] = CostWalk(program, {}).route()
+
+    # subroutines are laid out one after the other after the main program
+    entries = sorted(
+        {i.target for i in program.instructions if i.op == "callsub"}
+        | {0, len(program.instructions)}
+    )
+    labelAt = {pc: label for label, pc in sorted(assembled.labels.items())}
+    walk = CostWalk(program, {})
+    for start, end in zip(entries, entries[1:]):
+        code = program.instructions[start:end]
+        label = "main" if start == 0 else labelAt.get(code[0].pc, str(code[0].pc))
+        endPC = (
+            program.instructions[end].pc
+            if end < len(program.instructions)
+            else len(assembled.bytecode)
+        )
+        if start != 0:
+            profile.subroutines[label] = (
+                endPC - code[0].pc,
+                walk.subroutine(start).ret,
+            )
+        profile.scratch[label] = sorted(
+            {
+                i.immediates[0] if i.op in ("load", "store") else -1
+                for i in code
+                if i.op in ("load", "store", "loads", "stores")
+            }
+        )
+    return profile
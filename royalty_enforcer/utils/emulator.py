@@ -0,0 +1,1365 @@
+"""In-process stand-in for algod and KMD.
+
+Ledger keeps accounts, assets and applications in memory and applies
+transaction groups with the AVM evaluator in royalty_enforcer.utils.avm,
+one block per group as a sandbox in dev mode would. EmulatedAlgodClient and
+EmulatedKMDClient serve the REST routes the helpers in this package use from
+a ledger, so code written against algod runs unchanged:
+
+    client = EmulatedAlgodClient()
+    kmd = EmulatedKMDClient()
+    creator = getTemporaryAccount(client, kmd)
+    enforcer = deployEnforcer(client, creator)
+
+Set ROYALTY_ENFORCER_BACKEND=emulator to have getAlgodClient() and
+getKmdClient() return them. Only what the contracts in this package need is
+modelled: no logic signatures, multisigs, rewards, leases or key
+registration effects.
+"""
+
+import re
+import threading
+import time
+from base64 import b64decode, b64encode
+from hashlib import sha256
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import msgpack
+from algosdk import constants, error
+from algosdk.encoding import (
+    checksum,
+    decode_address,
+    encode_address,
+    msgpack_encode,
+)
+from algosdk.future.transaction import SignedTransaction, Transaction
+from algosdk.kmd import KMDClient
+from algosdk.v2client.algod import AlgodClient
+from nacl.exceptions import BadSignatureError
+from nacl.signing import SigningKey, VerifyKey
+from royalty_enforcer.utils.assembler import AssemblerError, assemble
+from royalty_enforcer.utils.avm import (
+    APP_BUDGET,
+    MAX_APP_CALL_DEPTH,
+    MAX_INNER_TXNS,
+    MAX_TXN_LIFE,
+    MIN_BALANCE,
+    MIN_TXN_FEE,
+    Budget,
+    EvalContext,
+    EvalError,
+    EvalTxn,
+    Evaluation,
+    StackValue,
+    appAddress,
+    decodeTxID,
+    loadProgram,
+)
+from royalty_enforcer.utils.transactions import (
+    MAX_GROUP_SIZE,
+    blockTxnResponse,
+    jsonValue,
+    txnID,
+)
+
+GENESIS_ID = "emulator-v1"
+GENESIS_HASH = sha256(GENESIS_ID.encode()).digest()
+CONSENSUS_VERSION = "emulator-v6"
+
+# Funded accounts in the KMD wallet, the same in every process
+GENESIS_ACCOUNTS = 3
+GENESIS_BALANCE = 1_000_000_000_000_000
+
+# Min balance of holding an asset, creating an app or opting in to one
+ASSET_MIN_BALANCE = 100_000
+APP_MIN_BALANCE = 100_000
+# Min balance per state schema entry, on top of the flat entry cost
+SCHEMA_MIN_BALANCE = 25_000
+SCHEMA_UINT_MIN_BALANCE = 3_500
+SCHEMA_BYTES_MIN_BALANCE = 25_000
+
+MAX_APP_ARGS = 16
+MAX_APP_TOTAL_ARG_LENGTH = 2048
+MAX_APP_ACCOUNTS = 4
+MAX_APP_FOREIGN_APPS = 8
+MAX_APP_FOREIGN_ASSETS = 8
+MAX_APP_TOTAL_REFERENCES = 8
+MAX_APP_PROGRAM_LENGTH = 2048
+
+# Seconds status_after_block waits for a new round, as algod does
+STATUS_WAIT = 60.0
+
+
+def genesisKeys() -> List[str]:
+    """Private keys of the genesis accounts, in algosdk form"""
+    keys = []
+    for i in range(GENESIS_ACCOUNTS):
+        seed = sha256("{} genesis {}".format(GENESIS_ID, i).encode()).digest()
+        publicKey = bytes(SigningKey(seed).verify_key)
+        keys.append(b64encode(seed + publicKey).decode())
+    return keys
+
+
+class LedgerError(Exception):
+    """A transaction group the ledger rejected, along with the offending txn"""
+
+    def __init__(self, message: str, txID: str = "") -> None:
+        super().__init__(message)
+        self.txID = txID
+
+
+MISSING = object()
+
+
+class Journal:
+    """Undo log of changes made to the ledger's dicts"""
+
+    def __init__(self) -> None:
+        self.entries: List[Tuple[Dict, Any, Any]] = []
+
+    def set(self, d: Dict, key: Any, value: Any) -> None:
+        self.entries.append((d, key, d.get(key, MISSING)))
+        d[key] = value
+
+    def delete(self, d: Dict, key: Any) -> None:
+        if key in d:
+            self.entries.append((d, key, d[key]))
+            del d[key]
+
+    def mark(self) -> int:
+        return len(self.entries)
+
+    def rollback(self, mark: int) -> None:
+        while len(self.entries) > mark:
+            d, key, old = self.entries.pop()
+            if old is MISSING:
+                d.pop(key, None)
+            else:
+                d[key] = old
+
+    def commit(self) -> None:
+        self.entries.clear()
+
+
+def newAccount() -> Dict[str, Any]:
+    # holdings are (amount, frozen), local states are key -> value
+    return {"amount": 0, "assets": {}, "createdAssets": {}, "apps": {}, "local": {}}
+
+
+class GroupState:
+    """What the transactions of one top level group share"""
+
+    def __init__(self, appCalls: int) -> None:
+        self.budget = Budget(appCalls)
+        self.createdAssets: List[int] = []
+        self.createdApps: List[int] = []
+        # apps on the call stack, inner calls can't re-enter them
+        self.callStack: List[int] = []
+
+
+class Ledger:
+    """Accounts, assets and apps of an emulated network.
+
+    submit() applies a group of signed transactions given as msgpack dicts
+    and commits it as a new block, or raises LedgerError and leaves the
+    ledger as it was. Every method is thread safe.
+    """
+
+    def __init__(self, verifySignatures: bool = True) -> None:
+        self.verifySignatures = verifySignatures
+        self.lock = threading.RLock()
+        self.newRound = threading.Condition(self.lock)
+        self.journal = Journal()
+
+        self.accounts: Dict[bytes, Dict[str, Any]] = dict()
+        self.assets: Dict[int, Dict[str, Any]] = dict()
+        self.apps: Dict[int, Dict[str, Any]] = dict()
+        # next asset or app ID, kept in a dict so it is journaled too
+        self.counters = {"id": 1000}
+
+        self.round = 0
+        self.timestamp = int(time.time())
+        self.blocks: Dict[int, bytes] = dict()
+        # txID -> confirmed transaction in its block and the block's round,
+        # converted to algod's JSON form only when it is asked for
+        self.confirmed: Dict[str, Tuple[Dict[str, Any], int]] = dict()
+        # txID -> last valid round, to reject duplicates
+        self.txIDs: Dict[str, int] = dict()
+
+        for privateKey in genesisKeys():
+            self.fund(b64decode(privateKey)[32:], GENESIS_BALANCE)
+        with self.lock:
+            self.commitBlock([])
+
+    # region Accounts
+
+    def fund(self, address: bytes, amount: int) -> None:
+        """Credit an account outside of any transaction"""
+        with self.lock:
+            self.credit(address, amount)
+            self.journal.commit()
+
+    def account(self, address: bytes) -> Dict[str, Any]:
+        account = self.accounts.get(address)
+        if account is None:
+            account = newAccount()
+            self.journal.set(self.accounts, address, account)
+        return account
+
+    def credit(self, address: bytes, amount: int) -> None:
+        account = self.account(address)
+        self.journal.set(account, "amount", account["amount"] + amount)
+
+    def debit(self, address: bytes, amount: int) -> None:
+        account = self.account(address)
+        if account["amount"] < amount:
+            raise LedgerError(
+                "overspend (account {}, balance {}, tried to spend {})".format(
+                    encode_address(address), account["amount"], amount
+                )
+            )
+        self.journal.set(account, "amount", account["amount"] - amount)
+
+    def minBalance(self, address: bytes) -> int:
+        account = self.accounts.get(address)
+        if account is None:
+            return MIN_BALANCE
+        total = MIN_BALANCE + ASSET_MIN_BALANCE * len(account["assets"])
+        for appID in account["apps"]:
+            app = self.apps[appID]
+            total += APP_MIN_BALANCE * (1 + app["extraPages"])
+            total += schemaMinBalance(app["globalSchema"])
+        for appID in account["local"]:
+            total += APP_MIN_BALANCE + schemaMinBalance(self.apps[appID]["localSchema"])
+        return total
+
+    def checkMinBalance(self, address: bytes) -> None:
+        account = self.accounts.get(address)
+        if account is None or (account["amount"] == 0 and isEmpty(account)):
+            return
+        required = self.minBalance(address)
+        if account["amount"] < required:
+            raise LedgerError(
+                "account {} balance {} below min {} ({} assets)".format(
+                    encode_address(address),
+                    account["amount"],
+                    required,
+                    len(account["assets"]),
+                )
+            )
+
+    def authAddr(self, address: bytes) -> bytes:
+        account = self.accounts.get(address)
+        return account.get("auth", bytes(32)) if account else bytes(32)
+
+    # endregion
+
+    # region Submitting
+
+    def execute(
+        self, txns: Sequence[Union[Transaction, SignedTransaction]]
+    ) -> List[Dict[str, Any]]:
+        """Submit a group of algosdk transactions and return the pending
+        transaction info of each. Transactions can be left unsigned when the
+        ledger doesn't verify signatures, which is the fast path for tests
+        that run many contract calls."""
+        stxns = []
+        for txn in txns:
+            if isinstance(txn, Transaction):
+                txn = SignedTransaction(txn, None)
+            stxns.append(msgpack.unpackb(b64decode(msgpack_encode(txn)), raw=False))
+        with self.lock:
+            return [
+                blockTxnResponse(*self.confirmed[txID]) for txID in self.submit(stxns)
+            ]
+
+    def submit(self, stxns: List[Dict[str, Any]]) -> List[str]:
+        """Apply and commit a group, returns the IDs of its transactions"""
+        with self.lock:
+            txIDs = [txnID(stxn["txn"]) for stxn in stxns]
+            self.checkGroup(stxns, txIDs)
+            mark = self.journal.mark()
+            try:
+                applied = self.applyGroup([s["txn"] for s in stxns], txIDs)
+            except LedgerError:
+                self.journal.rollback(mark)
+                raise
+            self.journal.commit()
+
+            stibs = []
+            for stxn, txID, applyData in zip(stxns, txIDs, applied):
+                self.txIDs[txID] = stxn["txn"].get("lv", 0)
+                stibs.append(
+                    dict(
+                        applyData,
+                        txn=stxn["txn"],
+                        **{k: v for k, v in stxn.items() if k != "txn"},
+                    )
+                )
+            self.commitBlock(stibs)
+            for txID, stib in zip(txIDs, stibs):
+                self.confirmed[txID] = (stib, self.round)
+            return txIDs
+
+    def checkGroup(self, stxns: List[Dict[str, Any]], txIDs: List[str]) -> None:
+        if not 0 < len(stxns) <= MAX_GROUP_SIZE:
+            raise LedgerError("group size {} is invalid".format(len(stxns)))
+
+        group = None
+        if len(stxns) > 1:
+            # the group ID hashes the transactions as they were before it was set
+            group = groupID(
+                [
+                    txnID({k: v for k, v in stxn["txn"].items() if k != "grp"})
+                    for stxn in stxns
+                ]
+            )
+        fees = 0
+        for stxn, txID in zip(stxns, txIDs):
+            txn = stxn["txn"]
+            try:
+                if txn.get("grp") != group:
+                    raise LedgerError("transactionGroup: incomplete group")
+                if txn.get("gh") != GENESIS_HASH:
+                    raise LedgerError("genesis hash mismatch")
+                if txn.get("gen", GENESIS_ID) != GENESIS_ID:
+                    raise LedgerError("genesis ID mismatch")
+                first, last = txn.get("fv", 0), txn.get("lv", 0)
+                if not first <= self.round + 1 <= last:
+                    raise LedgerError(
+                        "txn dead: round {} outside of {}--{}".format(
+                            self.round + 1, first, last
+                        )
+                    )
+                if last - first > MAX_TXN_LIFE:
+                    raise LedgerError("transaction window size excessive")
+                if self.txIDs.get(txID, 0) >= self.round + 1:
+                    raise LedgerError("transaction already in ledger")
+                if self.verifySignatures:
+                    self.checkSignature(stxn, txID)
+            except LedgerError as e:
+                e.txID = txID
+                raise
+            fees += txn.get("fee", 0)
+
+        if fees < MIN_TXN_FEE * len(stxns):
+            raise LedgerError(
+                "txgroup had {} in fees, which is less than the minimum {} * {}".format(
+                    fees, len(stxns), MIN_TXN_FEE
+                ),
+                txIDs[0],
+            )
+
+    def checkSignature(self, stxn: Dict[str, Any], txID: str) -> None:
+        if "msig" in stxn or "lsig" in stxn:
+            raise LedgerError("only single signatures are supported by the emulator")
+        if "sig" not in stxn:
+            raise LedgerError("signedtxn has no sig")
+        sender = stxn["txn"]["snd"]
+        expected = self.authAddr(sender)
+        if expected == bytes(32):
+            expected = sender
+        signer = stxn.get("sgnr", sender)
+        if signer != expected:
+            raise LedgerError(
+                "should have been authorized by {} but was actually authorized by {}".format(
+                    encode_address(expected), encode_address(signer)
+                )
+            )
+        message = constants.txid_prefix + b64decode(msgpack_encode(stxn["txn"]))
+        try:
+            VerifyKey(signer).verify(message, stxn["sig"])
+        except BadSignatureError:
+            raise LedgerError("signature validation failed")
+
+    def applyGroup(self, txns: List[Dict[str, Any]], txIDs: List[str]) -> List[Dict]:
+        group = GroupState(sum(1 for txn in txns if txn.get("type") == "appl"))
+        fees = sum(txn.get("fee", 0) for txn in txns)
+        group.budget.feeCredit = fees - MIN_TXN_FEE * len(txns)
+
+        evalTxns = [
+            EvalTxn(txn, i, txID) for i, (txn, txID) in enumerate(zip(txns, txIDs))
+        ]
+        applied = []
+        for t in evalTxns:
+            try:
+                applied.append(self.applyTxn(t, evalTxns, group, 0, 0))
+            except EvalError as e:
+                raise LedgerError("logic eval error: {}".format(e), t.txID)
+            except LedgerError as e:
+                e.txID = e.txID or t.txID
+                raise
+        return applied
+
+    def applyTxn(
+        self,
+        t: EvalTxn,
+        groupTxns: List[EvalTxn],
+        group: GroupState,
+        depth: int,
+        callerAppID: int,
+    ) -> Dict[str, Any]:
+        """Apply one transaction, returns its apply data for the block"""
+        txn = t.fields
+        sender = txn["snd"]
+        self.debit(sender, txn.get("fee", 0))
+        if "rekey" in txn:
+            account = self.account(sender)
+            if txn["rekey"] == sender:
+                self.journal.delete(account, "auth")
+            else:
+                self.journal.set(account, "auth", txn["rekey"])
+
+        kind = txn.get("type")
+        applyData: Dict[str, Any] = dict()
+        touched = [sender]
+        if kind == "pay":
+            touched += self.applyPayment(txn, applyData)
+        elif kind == "axfer":
+            touched += self.applyAssetTransfer(txn, applyData)
+        elif kind == "acfg":
+            self.applyAssetConfig(t, group, applyData)
+        elif kind == "afrz":
+            self.applyAssetFreeze(txn)
+        elif kind == "appl":
+            self.applyAppCall(t, groupTxns, group, depth, callerAppID, applyData)
+        elif kind != "keyreg":
+            raise LedgerError("unknown transaction type {}".format(kind))
+
+        for address in touched:
+            self.checkMinBalance(address)
+        t.applied = True
+        return applyData
+
+    def applyPayment(self, txn: Dict[str, Any], applyData: Dict) -> List[bytes]:
+        sender = txn["snd"]
+        receiver = txn.get("rcv", bytes(32))
+        amount = txn.get("amt", 0)
+        self.debit(sender, amount)
+        self.credit(receiver, amount)
+        if "close" not in txn:
+            return [receiver]
+
+        account = self.accounts[sender]
+        if not isEmpty(account):
+            raise LedgerError(
+                "cannot close account {} while it holds assets or apps".format(
+                    encode_address(sender)
+                )
+            )
+        remainder = account["amount"]
+        self.credit(txn["close"], remainder)
+        self.journal.delete(self.accounts, sender)
+        if remainder:
+            applyData["ca"] = remainder
+        return [receiver, txn["close"]]
+
+    def holding(self, address: bytes, assetID: int) -> Tuple[int, bool]:
+        holding = self.account(address)["assets"].get(assetID)
+        if holding is None:
+            raise LedgerError(
+                "asset {} missing from {}".format(assetID, encode_address(address))
+            )
+        return holding
+
+    def moveAsset(
+        self, assetID: int, source: bytes, receiver: bytes, amount: int, clawback: bool
+    ) -> None:
+        sourceAmount, sourceFrozen = self.holding(source, assetID)
+        receiverAmount, receiverFrozen = self.holding(receiver, assetID)
+        if not clawback:
+            for address, frozen in ((source, sourceFrozen), (receiver, receiverFrozen)):
+                if frozen:
+                    raise LedgerError(
+                        "asset {} frozen in {}".format(assetID, encode_address(address))
+                    )
+        if sourceAmount < amount:
+            raise LedgerError(
+                "underflow on subtracting {} from sender amount {}".format(
+                    amount, sourceAmount
+                )
+            )
+        if source == receiver:
+            return
+        assets = self.accounts[source]["assets"]
+        self.journal.set(assets, assetID, (sourceAmount - amount, sourceFrozen))
+        assets = self.accounts[receiver]["assets"]
+        self.journal.set(assets, assetID, (receiverAmount + amount, receiverFrozen))
+
+    def applyAssetTransfer(self, txn: Dict[str, Any], applyData: Dict) -> List[bytes]:
+        sender = txn["snd"]
+        assetID = txn.get("xaid", 0)
+        receiver = txn.get("arcv", bytes(32))
+        amount = txn.get("aamt", 0)
+        asset = self.assets.get(assetID)
+        if asset is None:
+            raise LedgerError(
+                "asset {} does not exist or has been deleted".format(assetID)
+            )
+
+        if "asnd" in txn:
+            if sender != asset["params"].get("c"):
+                raise LedgerError(
+                    "clawback not allowed: sender {} != clawback".format(
+                        encode_address(sender)
+                    )
+                )
+            if "aclose" in txn:
+                raise LedgerError("clawback cannot close out an asset holding")
+            self.moveAsset(assetID, txn["asnd"], receiver, amount, True)
+            return [txn["asnd"], receiver]
+
+        account = self.account(sender)
+        if amount == 0 and receiver == sender and assetID not in account["assets"]:
+            # opt in
+            frozen = bool(asset["params"].get("df"))
+            self.journal.set(account["assets"], assetID, (0, frozen))
+            return []
+
+        self.moveAsset(assetID, sender, receiver, amount, False)
+        if "aclose" not in txn:
+            return [receiver]
+
+        if sender == asset["creator"]:
+            raise LedgerError("cannot close asset ID in allocating account")
+        remainder, _ = self.holding(sender, assetID)
+        self.moveAsset(assetID, sender, txn["aclose"], remainder, False)
+        self.journal.delete(self.accounts[sender]["assets"], assetID)
+        if remainder:
+            applyData["aca"] = remainder
+        return [receiver, txn["aclose"]]
+
+    def nextID(self) -> int:
+        self.journal.set(self.counters, "id", self.counters["id"] + 1)
+        return self.counters["id"]
+
+    def applyAssetConfig(self, t: EvalTxn, group: GroupState, applyData: Dict) -> None:
+        txn = t.fields
+        sender = txn["snd"]
+        assetID = txn.get("caid", 0)
+        params = dict(txn.get("apar", {}))
+        if assetID == 0:
+            assetID = self.nextID()
+            self.journal.set(
+                self.assets, assetID, {"creator": sender, "params": params}
+            )
+            account = self.account(sender)
+            self.journal.set(account["createdAssets"], assetID, True)
+            self.journal.set(account["assets"], assetID, (params.get("t", 0), False))
+            group.createdAssets.append(assetID)
+            t.createdAssetID = assetID
+            applyData["caid"] = assetID
+            return
+
+        asset = self.assets.get(assetID)
+        if asset is None:
+            raise LedgerError(
+                "asset {} does not exist or has been deleted".format(assetID)
+            )
+        if sender != asset["params"].get("m"):
+            raise LedgerError("this transaction should be issued by the manager")
+
+        if not params:
+            creator = asset["creator"]
+            amount, _ = self.holding(creator, assetID)
+            if amount != asset["params"].get("t", 0):
+                raise LedgerError("cannot destroy asset: creator is holding only part")
+            self.journal.delete(self.accounts[creator]["assets"], assetID)
+            self.journal.delete(self.accounts[creator]["createdAssets"], assetID)
+            self.journal.delete(self.assets, assetID)
+            return
+
+        updated = dict(asset["params"])
+        for key in ("m", "r", "f", "c"):
+            # addresses can only be cleared, not set again, once cleared
+            if key in params and not asset["params"].get(key):
+                raise LedgerError("cannot set an address that was cleared")
+            if key in params:
+                updated[key] = params[key]
+            else:
+                updated.pop(key, None)
+        self.journal.set(asset, "params", updated)
+
+    def applyAssetFreeze(self, txn: Dict[str, Any]) -> None:
+        assetID = txn.get("faid", 0)
+        asset = self.assets.get(assetID)
+        if asset is None:
+            raise LedgerError(
+                "asset {} does not exist or has been deleted".format(assetID)
+            )
+        if txn["snd"] != asset["params"].get("f"):
+            raise LedgerError("freeze not allowed: sender is not the freeze address")
+        target = txn.get("fadd", bytes(32))
+        amount, _ = self.holding(target, assetID)
+        self.journal.set(
+            self.accounts[target]["assets"], assetID, (amount, bool(txn.get("afrz")))
+        )
+
+    def applyAppCall(
+        self,
+        t: EvalTxn,
+        groupTxns: List[EvalTxn],
+        group: GroupState,
+        depth: int,
+        callerAppID: int,
+        applyData: Dict,
+    ) -> None:
+        txn = t.fields
+        sender = txn["snd"]
+        checkAppCall(txn)
+        appID = txn.get("apid", 0)
+        onCompletion = txn.get("apan", 0)
+
+        if appID == 0:
+            appID = self.nextID()
+            schema = lambda key: (  # noqa: E731
+                txn.get(key, {}).get("nui", 0),
+                txn.get(key, {}).get("nbs", 0),
+            )
+            app = {
+                "creator": sender,
+                "approval": txn.get("apap", b""),
+                "clear": txn.get("apsu", b""),
+                "globalSchema": schema("apgs"),
+                "localSchema": schema("apls"),
+                "extraPages": txn.get("apep", 0),
+                "global": {},
+            }
+            self.journal.set(self.apps, appID, app)
+            self.journal.set(self.account(sender)["apps"], appID, True)
+            group.createdApps.append(appID)
+            t.createdAppID = appID
+            applyData["apid"] = appID
+        app = self.apps.get(appID)
+        if app is None:
+            raise LedgerError("application {} does not exist".format(appID))
+        if appID in group.callStack:
+            raise LedgerError("attempt to re-enter {}".format(appID))
+
+        account = self.account(sender)
+        if onCompletion == 1:
+            if appID in account["local"]:
+                raise LedgerError(
+                    "account {} has already opted in to app {}".format(
+                        encode_address(sender), appID
+                    )
+                )
+            self.journal.set(account["local"], appID, {})
+        elif onCompletion in (2, 3) and appID not in account["local"]:
+            raise LedgerError(
+                "address {} has not opted in to application {}".format(
+                    encode_address(sender), appID
+                )
+            )
+
+        cx = AppCallContext(self, t, groupTxns, group, appID, depth, callerAppID)
+        group.callStack.append(appID)
+        try:
+            if onCompletion == 3:
+                # the clear program can fail, the account opts out regardless
+                mark = self.journal.mark()
+                try:
+                    approved = cx.run(app["clear"])
+                except (EvalError, LedgerError):
+                    approved = False
+                if not approved:
+                    self.journal.rollback(mark)
+                    cx = AppCallContext(
+                        self, t, groupTxns, group, appID, depth, callerAppID
+                    )
+            elif not cx.run(app["approval"]):
+                raise LedgerError("logic eval error: rejected by ApprovalProgram")
+        finally:
+            group.callStack.pop()
+
+        if onCompletion in (2, 3):
+            self.journal.delete(account["local"], appID)
+        elif onCompletion == 4:
+            self.journal.set(app, "approval", txn.get("apap", b""))
+            self.journal.set(app, "clear", txn.get("apsu", b""))
+        elif onCompletion == 5:
+            self.journal.delete(self.accounts[app["creator"]]["apps"], appID)
+            self.journal.delete(self.apps, appID)
+        else:
+            cx.checkSchemas()
+        applyData.update(cx.applyData())
+
+    def applyInner(
+        self, cx: "AppCallContext", txns: List[Dict[str, Any]]
+    ) -> List[EvalTxn]:
+        group = cx.groupState
+        budget = group.budget
+        evalTxns = []
+        for i, txn in enumerate(txns):
+            fee = txn.get("fee", 0)
+            if fee < MIN_TXN_FEE:
+                if budget.feeCredit < MIN_TXN_FEE - fee:
+                    raise LedgerError("fee too small {}".format(fee))
+            budget.feeCredit += fee - MIN_TXN_FEE
+            if txn.get("type") == "appl":
+                # every inner app call adds to the pooled budget
+                budget.remaining += APP_BUDGET
+            evalTxns.append(EvalTxn(txn, i, txnID(txn)))
+
+        for t in evalTxns:
+            applyData = self.applyTxn(t, evalTxns, group, cx.depth + 1, cx.appID)
+            cx.inner.append(dict(applyData, txn=t.fields))
+        return evalTxns
+
+    # endregion
+
+    # region Blocks
+
+    def commitBlock(self, stibs: List[Dict[str, Any]]) -> None:
+        # called with the lock held
+        self.round += 1
+        self.timestamp = max(self.timestamp, int(time.time()))
+        txns = []
+        for stib in stibs:
+            txn = {k: v for k, v in stib["txn"].items() if k not in ("gen", "gh")}
+            txns.append(dict(stib, txn=txn, hgi=True))
+        block = {
+            "rnd": self.round,
+            "ts": self.timestamp,
+            "gen": GENESIS_ID,
+            "gh": GENESIS_HASH,
+            "txns": txns,
+        }
+        self.blocks[self.round] = msgpack.packb({"block": block}, use_bin_type=True)
+        self.newRound.notify_all()
+
+    def waitForRound(self, round: int, timeout: float = STATUS_WAIT) -> int:
+        """Wait until the ledger is past round, returns the last round"""
+        with self.newRound:
+            self.newRound.wait_for(lambda: self.round > round, timeout)
+            return self.round
+
+    # endregion
+
+    # region Dryrun
+
+    def dryrun(self, stxns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Evaluate a group without committing it, signatures and fees aren't
+        checked. Returns the dryrun result of each transaction."""
+        with self.lock:
+            txns = [stxn["txn"] for stxn in stxns]
+            txIDs = [txnID(txn) for txn in txns]
+            group = GroupState(sum(1 for txn in txns if txn.get("type") == "appl"))
+            group.budget.feeCredit = MIN_TXN_FEE * MAX_INNER_TXNS * len(txns)
+            evalTxns = [
+                EvalTxn(txn, i, txID) for i, (txn, txID) in enumerate(zip(txns, txIDs))
+            ]
+
+            mark = self.journal.mark()
+            results = []
+            try:
+                for t in evalTxns:
+                    result: Dict[str, Any] = dict()
+                    before = group.budget.remaining
+                    try:
+                        applyData = self.applyTxn(t, evalTxns, group, 0, 0)
+                    except (EvalError, LedgerError) as e:
+                        if t.fields.get("type") == "appl":
+                            result["app-call-messages"] = ["REJECT", str(e)]
+                        results.append(result)
+                        break
+                    if t.fields.get("type") == "appl":
+                        response = blockTxnResponse(dict(applyData, txn=t.fields), 0)
+                        result["app-call-messages"] = ["PASS"]
+                        result["logs"] = response.get("logs", [])
+                        result["global-delta"] = response.get("global-state-delta", [])
+                        result["local-deltas"] = response.get("local-state-delta", [])
+                        result["budget-consumed"] = before - group.budget.remaining
+                    results.append(result)
+            finally:
+                self.journal.rollback(mark)
+            return results
+
+    # endregion
+
+    # region JSON views
+
+    def accountInfo(self, address: bytes) -> Dict[str, Any]:
+        with self.lock:
+            account = self.accounts.get(address, newAccount())
+            info: Dict[str, Any] = {
+                "address": encode_address(address),
+                "amount": account["amount"],
+                "amount-without-pending-rewards": account["amount"],
+                "min-balance": self.minBalance(address),
+                "pending-rewards": 0,
+                "rewards": 0,
+                "reward-base": 0,
+                "round": self.round,
+                "status": "Offline",
+                "assets": [
+                    {"asset-id": assetID, "amount": amount, "is-frozen": frozen}
+                    for assetID, (amount, frozen) in sorted(account["assets"].items())
+                ],
+                "created-assets": [
+                    self.assetInfo(assetID)
+                    for assetID in sorted(account["createdAssets"])
+                ],
+                "created-apps": [
+                    self.applicationInfo(appID) for appID in sorted(account["apps"])
+                ],
+                "apps-local-state": [
+                    self.localStateInfo(account, appID)
+                    for appID in sorted(account["local"])
+                ],
+                "total-apps-opted-in": len(account["local"]),
+                "total-assets-opted-in": len(account["assets"]),
+                "total-created-apps": len(account["apps"]),
+                "total-created-assets": len(account["createdAssets"]),
+            }
+            schema = [0, 0]
+            for appID in account["local"]:
+                nui, nbs = self.apps[appID]["localSchema"]
+                schema[0] += nui
+                schema[1] += nbs
+            info["apps-total-schema"] = {
+                "num-uint": schema[0],
+                "num-byte-slice": schema[1],
+            }
+            if "auth" in account:
+                info["auth-addr"] = encode_address(account["auth"])
+            return info
+
+    def localStateInfo(self, account: Dict[str, Any], appID: int) -> Dict[str, Any]:
+        nui, nbs = self.apps[appID]["localSchema"]
+        return {
+            "id": appID,
+            "schema": {"num-uint": nui, "num-byte-slice": nbs},
+            "key-value": stateInfo(account["local"][appID]),
+        }
+
+    def accountApplicationInfo(self, address: bytes, appID: int) -> Dict[str, Any]:
+        with self.lock:
+            account = self.accounts.get(address, newAccount())
+            info: Dict[str, Any] = {"round": self.round}
+            if appID in account["local"]:
+                info["app-local-state"] = self.localStateInfo(account, appID)
+            if appID in account["apps"]:
+                info["created-app"] = self.applicationInfo(appID)["params"]
+            if len(info) == 1:
+                raise LedgerError("account application info not found")
+            return info
+
+    def accountAssetInfo(self, address: bytes, assetID: int) -> Dict[str, Any]:
+        with self.lock:
+            account = self.accounts.get(address, newAccount())
+            info: Dict[str, Any] = {"round": self.round}
+            if assetID in account["assets"]:
+                amount, frozen = account["assets"][assetID]
+                info["asset-holding"] = {
+                    "asset-id": assetID,
+                    "amount": amount,
+                    "is-frozen": frozen,
+                }
+            if assetID in account["createdAssets"]:
+                info["created-asset"] = self.assetInfo(assetID)["params"]
+            if len(info) == 1:
+                raise LedgerError("account asset info not found")
+            return info
+
+    def assetInfo(self, assetID: int) -> Dict[str, Any]:
+        with self.lock:
+            asset = self.assets.get(assetID)
+            if asset is None:
+                raise LedgerError("asset does not exist")
+            p = asset["params"]
+            params: Dict[str, Any] = {
+                "creator": encode_address(asset["creator"]),
+                "total": p.get("t", 0),
+                "decimals": p.get("dc", 0),
+                "default-frozen": bool(p.get("df")),
+            }
+            for key, name in (("un", "unit-name"), ("an", "name"), ("au", "url")):
+                if key in p:
+                    params[name] = p[key]
+            if "am" in p:
+                params["metadata-hash"] = b64encode(p["am"]).decode()
+            for key, name in (
+                ("m", "manager"),
+                ("r", "reserve"),
+                ("f", "freeze"),
+                ("c", "clawback"),
+            ):
+                if key in p:
+                    params[name] = encode_address(p[key])
+            return {"index": assetID, "params": params}
+
+    def applicationInfo(self, appID: int) -> Dict[str, Any]:
+        with self.lock:
+            app = self.apps.get(appID)
+            if app is None:
+                raise LedgerError("application does not exist")
+            params: Dict[str, Any] = {
+                "creator": encode_address(app["creator"]),
+                "approval-program": b64encode(app["approval"]).decode(),
+                "clear-state-program": b64encode(app["clear"]).decode(),
+                "global-state-schema": {
+                    "num-uint": app["globalSchema"][0],
+                    "num-byte-slice": app["globalSchema"][1],
+                },
+                "local-state-schema": {
+                    "num-uint": app["localSchema"][0],
+                    "num-byte-slice": app["localSchema"][1],
+                },
+            }
+            if app["global"]:
+                params["global-state"] = stateInfo(app["global"])
+            if app["extraPages"]:
+                params["extra-program-pages"] = app["extraPages"]
+            return {"id": appID, "params": params}
+
+    def suggestedParams(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "consensus-version": CONSENSUS_VERSION,
+                "fee": 0,
+                "genesis-hash": b64encode(GENESIS_HASH).decode(),
+                "genesis-id": GENESIS_ID,
+                "last-round": self.round,
+                "min-fee": MIN_TXN_FEE,
+            }
+
+    def status(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "last-round": self.round,
+                "last-version": CONSENSUS_VERSION,
+                "next-version": CONSENSUS_VERSION,
+                "next-version-round": self.round + 1,
+                "next-version-supported": True,
+                "time-since-last-round": 0,
+                "catchup-time": 0,
+                "stopped-at-unsupported-round": False,
+            }
+
+    # endregion
+
+
+def isEmpty(account: Dict[str, Any]) -> bool:
+    return not (
+        account["assets"]
+        or account["createdAssets"]
+        or account["apps"]
+        or account["local"]
+    )
+
+
+def schemaMinBalance(schema: Tuple[int, int]) -> int:
+    nui, nbs = schema
+    return (SCHEMA_MIN_BALANCE + SCHEMA_UINT_MIN_BALANCE) * nui + (
+        SCHEMA_MIN_BALANCE + SCHEMA_BYTES_MIN_BALANCE
+    ) * nbs
+
+
+def groupID(txIDs: List[str]) -> bytes:
+    hashes = [decodeTxID(txID) for txID in txIDs]
+    encoded = b64decode(msgpack_encode({"txlist": hashes}))
+    return checksum(constants.tgid_prefix + encoded)
+
+
+def checkAppCall(txn: Dict[str, Any]) -> None:
+    args = txn.get("apaa", [])
+    if len(args) > MAX_APP_ARGS:
+        raise LedgerError("too many application args, max {}".format(MAX_APP_ARGS))
+    if sum(len(arg) for arg in args) > MAX_APP_TOTAL_ARG_LENGTH:
+        raise LedgerError("application args total length too long")
+    accounts = len(txn.get("apat", []))
+    apps = len(txn.get("apfa", []))
+    assets = len(txn.get("apas", []))
+    if accounts > MAX_APP_ACCOUNTS:
+        raise LedgerError("tx.Accounts too long, max number of accounts is 4")
+    if apps > MAX_APP_FOREIGN_APPS or assets > MAX_APP_FOREIGN_ASSETS:
+        raise LedgerError("tx.ForeignApps or tx.ForeignAssets too long")
+    if accounts + apps + assets > MAX_APP_TOTAL_REFERENCES:
+        raise LedgerError("tx references exceed MaxAppTotalTxnReferences = 8")
+    programLength = len(txn.get("apap", b"")) + len(txn.get("apsu", b""))
+    if programLength > MAX_APP_PROGRAM_LENGTH * (1 + txn.get("apep", 0)):
+        raise LedgerError("app programs too long")
+
+
+def stateInfo(state: Dict[bytes, StackValue]) -> List[Dict[str, Any]]:
+    info = []
+    for key, value in sorted(state.items()):
+        if isinstance(value, bytes):
+            entry = {"type": 1, "bytes": b64encode(value).decode(), "uint": 0}
+        else:
+            entry = {"type": 2, "bytes": "", "uint": value}
+        info.append({"key": b64encode(key).decode(), "value": entry})
+    return info
+
+
+class AppCallContext(EvalContext):
+    """An app call being evaluated against the ledger"""
+
+    def __init__(
+        self,
+        ledger: Ledger,
+        t: EvalTxn,
+        groupTxns: List[EvalTxn],
+        group: GroupState,
+        appID: int,
+        depth: int,
+        callerAppID: int,
+    ) -> None:
+        self.ledger = ledger
+        self.txn = t
+        self.group = groupTxns
+        self.groupState = group
+        self.budget = group.budget
+        self.createdAssets = group.createdAssets
+        self.createdApps = group.createdApps
+        self.appID = appID
+        self.appAddress = appAddress(appID)
+        self.creator = ledger.apps[appID]["creator"]
+        self.callerAppID = callerAppID
+        self.depth = depth
+        self.round = ledger.round + 1
+        self.timestamp = ledger.timestamp
+
+        self.logs: List[bytes] = []
+        self.globalDelta: Dict[bytes, Dict[str, Any]] = dict()
+        self.localDeltas: Dict[bytes, Dict[bytes, Dict[str, Any]]] = dict()
+        self.inner: List[Dict[str, Any]] = []
+
+    def run(self, program: bytes) -> bool:
+        if self.depth > MAX_APP_CALL_DEPTH:
+            raise LedgerError("too many levels of inner transactions")
+        evaluation = Evaluation(loadProgram(program), self)
+        try:
+            return evaluation.run()
+        finally:
+            self.logs = evaluation.logs
+            self.txn.logs = evaluation.logs
+            self.txn.scratch = evaluation.scratch
+
+    def app(self) -> Dict[str, Any]:
+        return self.ledger.apps[self.appID]
+
+    def checkSchemas(self) -> None:
+        app = self.ledger.apps.get(self.appID)
+        if app is None:
+            return
+        checkSchema(app["global"], app["globalSchema"], "global")
+        for address in self.localDeltas:
+            account = self.ledger.accounts.get(address)
+            if account is not None and self.appID in account["local"]:
+                checkSchema(account["local"][self.appID], app["localSchema"], "local")
+
+    def applyData(self) -> Dict[str, Any]:
+        delta: Dict[str, Any] = dict()
+        if self.globalDelta:
+            delta["gd"] = self.globalDelta
+        if self.localDeltas:
+            accounts = [self.txn.fields["snd"]] + self.txn.fields.get("apat", [])
+            delta["ld"] = {
+                accounts.index(address): changes
+                for address, changes in self.localDeltas.items()
+                if address in accounts
+            }
+        if self.logs:
+            delta["lg"] = self.logs
+        if self.inner:
+            delta["itx"] = self.inner
+        return {"dt": delta} if delta else {}
+
+    # EvalContext
+
+    def balance(self, address: bytes) -> int:
+        account = self.ledger.accounts.get(address)
+        return account["amount"] if account else 0
+
+    def minBalance(self, address: bytes) -> int:
+        return self.ledger.minBalance(address)
+
+    def authAddr(self, address: bytes) -> bytes:
+        return self.ledger.authAddr(address)
+
+    def optedIn(self, address: bytes, appID: int) -> bool:
+        account = self.ledger.accounts.get(address)
+        return account is not None and appID in account["local"]
+
+    def localGet(self, address: bytes, appID: int, key: bytes) -> Optional[StackValue]:
+        account = self.ledger.accounts.get(address)
+        if account is None or appID not in account["local"]:
+            return None
+        return account["local"][appID].get(key)
+
+    def localPut(self, address: bytes, key: bytes, value: StackValue) -> None:
+        self.ledger.journal.set(
+            self.ledger.accounts[address]["local"][self.appID], key, value
+        )
+        self.localDeltas.setdefault(address, {})[key] = deltaValue(value)
+
+    def localDel(self, address: bytes, key: bytes) -> None:
+        self.ledger.journal.delete(
+            self.ledger.accounts[address]["local"][self.appID], key
+        )
+        self.localDeltas.setdefault(address, {})[key] = {"at": 3}
+
+    def globalGet(self, appID: int, key: bytes) -> Optional[StackValue]:
+        app = self.ledger.apps.get(appID)
+        return None if app is None else app["global"].get(key)
+
+    def globalPut(self, key: bytes, value: StackValue) -> None:
+        self.ledger.journal.set(self.app()["global"], key, value)
+        self.globalDelta[key] = deltaValue(value)
+
+    def globalDel(self, key: bytes) -> None:
+        self.ledger.journal.delete(self.app()["global"], key)
+        self.globalDelta[key] = {"at": 3}
+
+    def assetHolding(self, address: bytes, assetID: int) -> Optional[Tuple[int, bool]]:
+        account = self.ledger.accounts.get(address)
+        return None if account is None else account["assets"].get(assetID)
+
+    def assetParams(self, assetID: int) -> Optional[Dict[str, StackValue]]:
+        asset = self.ledger.assets.get(assetID)
+        if asset is None:
+            return None
+        p = asset["params"]
+        text = lambda key: (  # noqa: E731
+            p[key].encode() if isinstance(p.get(key), str) else p.get(key, b"")
+        )
+        return {
+            "AssetTotal": p.get("t", 0),
+            "AssetDecimals": p.get("dc", 0),
+            "AssetDefaultFrozen": 1 if p.get("df") else 0,
+            "AssetUnitName": text("un"),
+            "AssetName": text("an"),
+            "AssetURL": text("au"),
+            "AssetMetadataHash": p.get("am", bytes(32)),
+            "AssetManager": p.get("m", bytes(32)),
+            "AssetReserve": p.get("r", bytes(32)),
+            "AssetFreeze": p.get("f", bytes(32)),
+            "AssetClawback": p.get("c", bytes(32)),
+            "AssetCreator": asset["creator"],
+        }
+
+    def appParams(self, appID: int) -> Optional[Dict[str, StackValue]]:
+        app = self.ledger.apps.get(appID)
+        if app is None:
+            return None
+        return {
+            "AppApprovalProgram": app["approval"],
+            "AppClearStateProgram": app["clear"],
+            "AppGlobalNumUint": app["globalSchema"][0],
+            "AppGlobalNumByteSlice": app["globalSchema"][1],
+            "AppLocalNumUint": app["localSchema"][0],
+            "AppLocalNumByteSlice": app["localSchema"][1],
+            "AppExtraProgramPages": app["extraPages"],
+            "AppCreator": app["creator"],
+            "AppAddress": appAddress(appID),
+        }
+
+    def submitInner(self, txns: List[Dict[str, Any]]) -> List[EvalTxn]:
+        return self.ledger.applyInner(self, txns)
+
+
+def deltaValue(value: StackValue) -> Dict[str, Any]:
+    if isinstance(value, bytes):
+        return {"at": 1, "bs": value}
+    return {"at": 2, "ui": value}
+
+
+def checkSchema(
+    state: Dict[bytes, StackValue], schema: Tuple[int, int], kind: str
+) -> None:
+    uints = sum(1 for value in state.values() if isinstance(value, int))
+    byteSlices = len(state) - uints
+    if uints > schema[0]:
+        raise LedgerError(
+            "store integer count {} exceeds {} schema integer count {}".format(
+                uints, kind, schema[0]
+            )
+        )
+    if byteSlices > schema[1]:
+        raise LedgerError(
+            "store bytes count {} exceeds {} schema bytes count {}".format(
+                byteSlices, kind, schema[1]
+            )
+        )
+
+
+# region Clients
+
+ROUTES = [
+    (re.compile(pattern), name)
+    for pattern, name in (
+        (r"^/transactions/params$", "params"),
+        (r"^/transactions$", "send"),
+        (r"^/transactions/pending/([A-Z2-7]+)$", "pending"),
+        (r"^/status$", "status"),
+        (r"^/status/wait-for-block-after/(\d+)$", "waitForBlock"),
+        (r"^/blocks/(\d+)$", "block"),
+        (r"^/accounts/([A-Z2-7]+)$", "account"),
+        (r"^/accounts/([A-Z2-7]+)/applications/(\d+)$", "accountApplication"),
+        (r"^/accounts/([A-Z2-7]+)/assets/(\d+)$", "accountAsset"),
+        (r"^/applications/(\d+)$", "application"),
+        (r"^/assets/(\d+)$", "asset"),
+        (r"^/teal/compile$", "compile"),
+        (r"^/teal/dryrun$", "dryrun"),
+        (r"^/health$", "health"),
+    )
+]
+
+
+def unpackAll(data: bytes) -> List[Dict[str, Any]]:
+    unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+    unpacker.feed(data)
+    return list(unpacker)
+
+
+class EmulatedAlgodClient(AlgodClient):
+    """AlgodClient answering requests from an in-memory Ledger"""
+
+    def __init__(self, ledger: Optional[Ledger] = None) -> None:
+        super().__init__("", "emulator://algod")
+        self.ledger = ledger if ledger is not None else Ledger()
+
+    def algod_request(
+        self,
+        method: str,
+        requrl: str,
+        params: Optional[Dict[str, Any]] = None,
+        data: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        response_format: str = "json",
+    ) -> Any:
+        for pattern, name in ROUTES:
+            match = pattern.match(requrl)
+            if match is not None:
+                break
+        else:
+            raise error.AlgodHTTPError("{} {} not found".format(method, requrl), 404)
+
+        try:
+            return getattr(self, "route" + name[0].upper() + name[1:])(
+                *match.groups(), data=data, response_format=response_format
+            )
+        except LedgerError as e:
+            if name == "send":
+                raise error.AlgodHTTPError(
+                    "TransactionPool.Remember: transaction {}: {}".format(e.txID, e),
+                    400,
+                )
+            raise error.AlgodHTTPError(str(e), 404)
+
+    def routeParams(self, **kwargs) -> Any:
+        return self.ledger.suggestedParams()
+
+    def routeSend(self, data: bytes, **kwargs) -> Any:
+        return {"txId": self.ledger.submit(unpackAll(data))[0]}
+
+    def routePending(self, txID: str, **kwargs) -> Any:
+        confirmed = self.ledger.confirmed.get(txID)
+        if confirmed is None:
+            raise LedgerError("txn does not exist")
+        return blockTxnResponse(*confirmed)
+
+    def routeStatus(self, **kwargs) -> Any:
+        return self.ledger.status()
+
+    def routeWaitForBlock(self, round: str, **kwargs) -> Any:
+        self.ledger.waitForRound(int(round))
+        return self.ledger.status()
+
+    def routeBlock(self, round: str, response_format: str, **kwargs) -> Any:
+        block = self.ledger.blocks.get(int(round))
+        if block is None:
+            raise LedgerError("failed to retrieve information from the ledger")
+        if response_format == "msgpack":
+            return block
+        return jsonValue(msgpack.unpackb(block, raw=False, strict_map_key=False))
+
+    def routeAccount(self, address: str, **kwargs) -> Any:
+        return self.ledger.accountInfo(decode_address(address))
+
+    def routeAccountApplication(self, address: str, appID: str, **kwargs) -> Any:
+        return self.ledger.accountApplicationInfo(decode_address(address), int(appID))
+
+    def routeAccountAsset(self, address: str, assetID: str, **kwargs) -> Any:
+        return self.ledger.accountAssetInfo(decode_address(address), int(assetID))
+
+    def routeApplication(self, appID: str, **kwargs) -> Any:
+        return self.ledger.applicationInfo(int(appID))
+
+    def routeAsset(self, assetID: str, **kwargs) -> Any:
+        return self.ledger.assetInfo(int(assetID))
+
+    def routeCompile(self, data: bytes, **kwargs) -> Any:
+        try:
+            program = assemble(data.decode("utf-8"))
+        except AssemblerError as e:
+            raise error.AlgodHTTPError(str(e), 400)
+        return {
+            "hash": encode_address(checksum(b"Program" + program)),
+            "result": b64encode(program).decode(),
+        }
+
+    def routeDryrun(self, data: bytes, **kwargs) -> Any:
+        request = msgpack.unpackb(data, raw=False, strict_map_key=False)
+        return {
+            "error": "",
+            "protocol-version": CONSENSUS_VERSION,
+            "txns": self.ledger.dryrun(request.get("txns", [])),
+        }
+
+    def routeHealth(self, **kwargs) -> Any:
+        return None
+
+
+WALLET_ID = "emulator-wallet"
+
+
+class EmulatedKMDClient(KMDClient):
+    """KMDClient serving the genesis accounts of every emulated Ledger"""
+
+    def __init__(self) -> None:
+        super().__init__("", "emulator://kmd")
+        self.keys = {encode_address(b64decode(key)[32:]): key for key in genesisKeys()}
+        self.handles: Dict[str, float] = dict()
+        self.lock = threading.Lock()
+
+    def kmd_request(
+        self,
+        method: str,
+        requrl: str,
+        params: Optional[Dict[str, Any]] = None,
+        data: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        from royalty_enforcer.utils.accounts import KMD_WALLET_NAME
+
+        data = data or {}
+        with self.lock:
+            if requrl == "/versions":
+                return {"versions": ["v1"]}
+            if requrl == "/wallets":
+                return {"wallets": [{"id": WALLET_ID, "name": KMD_WALLET_NAME}]}
+            if requrl == "/wallet/init":
+                if data.get("wallet_id") != WALLET_ID:
+                    raise error.KMDHTTPError("wallet not found")
+                handle = "handle-{}".format(len(self.handles))
+                self.handles[handle] = time.time()
+                return {"wallet_handle_token": handle}
+
+            handle = data.get("wallet_handle_token")
+            if handle not in self.handles:
+                raise error.KMDHTTPError("handle does not exist")
+            if requrl == "/wallet/renew":
+                return {"wallet_handle": {"wallet": {"id": WALLET_ID}}}
+            if requrl == "/key/list":
+                return {"addresses": list(self.keys)}
+            if requrl == "/key/export":
+                return {"private_key": self.keys[data["address"]]}
+            if requrl == "/wallet/release":
+                del self.handles[handle]
+                return {}
+        raise error.KMDHTTPError("{} {} is not supported".format(method, requrl))
+
+
+# endregion
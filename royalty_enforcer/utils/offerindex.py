@@ -0,0 +1,248 @@
+import threading
+from binascii import a2b_base64
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from algosdk.encoding import decode_address, encode_address
+from algosdk.error import AlgodHTTPError
+from algosdk.future.transaction import OnComplete
+from algosdk.v2client.algod import AlgodClient
+from algosdk.v2client.indexer import IndexerClient
+from royalty_enforcer.utils.state import (
+    OFFER_KEY,
+    OFFER_VALUE,
+    Offer,
+    decodeOffers,
+    decodeOffersBatch,
+)
+from royalty_enforcer.utils.transactions import (
+    ConfirmationTracker,
+    PendingTxnResponse,
+    decodeBlock,
+)
+
+# Local state delta action of a stored byte slice, see algod's EvalDelta
+DELTA_SET_BYTES = 1
+
+INDEXER_PAGE_SIZE = 1000
+
+
+class OfferIndex:
+    """Every open offer of one enforcer, indexed by asset, auth and owner.
+
+    load() scans the local state of all accounts opted in to the enforcer
+    through the indexer, loadAccounts() reads the given accounts from algod.
+    After that the index follows confirmed transactions: pass them to
+    observe(), or attach() the index to a ConfirmationTracker to see every
+    transaction in every block. Offers are updated from the local state
+    deltas, nothing is fetched again. Attach before loading so no block is
+    missed, blocks the loaded state already includes are skipped. When the
+    indexer is behind the blocks the index has seen, or a later page is
+    ahead of an earlier one, the rounds in between are replayed from algod
+    blocks so every owner ends up at the same round.
+    """
+
+    def __init__(self, appID: int) -> None:
+        self.appID = appID
+        self.lock = threading.Lock()
+        # held while a block is applied, so a replay isn't interleaved with one
+        self.blockLock = threading.Lock()
+        # blocks up to this round are already part of the index
+        self.round = 0
+
+        self.offers: Dict[Tuple[str, int], Offer] = dict()
+        self.owners: Dict[str, Set[int]] = dict()
+        self.assets: Dict[int, Set[str]] = dict()
+        self.auths: Dict[bytes, Set[Tuple[str, int]]] = dict()
+
+    def load(
+        self, indexer: IndexerClient, client: Optional[AlgodClient] = None
+    ) -> None:
+        """Index the offers of every account opted in to the enforcer. The
+        algod client is needed to replay blocks when the indexer's round
+        differs from the index's."""
+        nextPage = None
+        while True:
+            response = indexer.accounts(
+                application_id=self.appID,
+                limit=INDEXER_PAGE_SIZE,
+                next_page=nextPage,
+            )
+            owners: List[str] = []
+            states: List[List[Any]] = []
+            for account in response.get("accounts", []):
+                for localState in account.get("apps-local-state", []):
+                    if localState["id"] != self.appID or localState.get("deleted"):
+                        continue
+                    owners.append(account["address"])
+                    states.append(localState.get("key-value", []))
+
+            if owners:
+                self.loadPage(owners, states, response["current-round"], client)
+
+            nextPage = response.get("next-token")
+            if not nextPage or not response.get("accounts"):
+                return
+
+    def loadPage(
+        self,
+        owners: List[str],
+        states: List[List[Any]],
+        pageRound: int,
+        client: Optional[AlgodClient],
+    ) -> None:
+        with self.blockLock:
+            with self.lock:
+                # the owners of the page are at the page round, the others at
+                # the index round, whichever is older is caught up from blocks
+                first = min(pageRound, self.round) + 1
+                last = max(pageRound, self.round)
+                replay = self.round > 0 and first <= last
+                if replay and client is None:
+                    raise Exception(
+                        "Rounds {} to {} have to be replayed, load() needs an "
+                        "algod client".format(first, last)
+                    )
+                for owner, offers in zip(owners, decodeOffersBatch(states)):
+                    self.replaceOwner(owner, offers)
+            if replay:
+                assert client is not None
+                self.replay(client, first, last)
+            with self.lock:
+                self.round = last
+
+    def replay(self, client: AlgodClient, first: int, last: int) -> None:
+        # called with the block lock held
+        for round in range(first, last + 1):
+            data = client.block_info(round, response_format="msgpack")
+            for response in decodeBlock(data).values():
+                self.observe(response)
+
+    def loadAccounts(self, client: AlgodClient, addresses: List[str]) -> None:
+        """Index the offers of the given accounts"""
+        for address in addresses:
+            try:
+                info = client.account_application_info(address, self.appID)
+            except AlgodHTTPError as e:
+                if e.code != 404:
+                    raise
+                info = {}
+            localState = info.get("app-local-state", {}).get("key-value", [])
+            with self.lock:
+                self.replaceOwner(address, decodeOffers(localState))
+                self.round = max(self.round, info.get("round", 0))
+
+    def add(self, owner: str, offer: Offer) -> None:
+        # called with the lock held
+        self.remove(owner, offer.assetID)
+        self.offers[(owner, offer.assetID)] = offer
+        self.owners.setdefault(owner, set()).add(offer.assetID)
+        self.assets.setdefault(offer.assetID, set()).add(owner)
+        self.auths.setdefault(offer.auth, set()).add((owner, offer.assetID))
+
+    def remove(self, owner: str, assetID: int) -> None:
+        # called with the lock held
+        offer = self.offers.pop((owner, assetID), None)
+        if offer is None:
+            return
+        for index, key, member in [
+            (self.owners, owner, assetID),
+            (self.assets, assetID, owner),
+            (self.auths, offer.auth, (owner, assetID)),
+        ]:
+            members = index[key]
+            members.discard(member)
+            if not members:
+                del index[key]
+
+    def replaceOwner(self, owner: str, offers: List[Offer]) -> None:
+        # called with the lock held
+        for assetID in list(self.owners.get(owner, ())):
+            self.remove(owner, assetID)
+        for offer in offers:
+            self.add(owner, offer)
+
+    def get(self, owner: str, assetID: int) -> Optional[Offer]:
+        with self.lock:
+            return self.offers.get((owner, assetID))
+
+    def byAsset(self, assetID: int) -> Dict[str, Offer]:
+        """Owner address -> offer, for every offer of the asset"""
+        with self.lock:
+            return {
+                owner: self.offers[(owner, assetID)]
+                for owner in self.assets.get(assetID, ())
+            }
+
+    def byAuth(self, authAddress: str) -> Dict[Tuple[str, int], Offer]:
+        """(owner address, asset ID) -> offer, for every offer the address
+        is authorized to take"""
+        with self.lock:
+            return {
+                key: self.offers[key]
+                for key in self.auths.get(decode_address(authAddress), ())
+            }
+
+    def byOwner(self, owner: str) -> Dict[int, Offer]:
+        """Asset ID -> offer, for every offer of the owner"""
+        with self.lock:
+            return {
+                assetID: self.offers[(owner, assetID)]
+                for assetID in self.owners.get(owner, ())
+            }
+
+    def __len__(self) -> int:
+        return len(self.offers)
+
+    def observe(self, response: Union[PendingTxnResponse, Dict[str, Any]]) -> None:
+        """Apply the offer changes of a confirmed transaction"""
+        if isinstance(response, PendingTxnResponse):
+            response = response.raw
+
+        txn = response.get("txn", {}).get("txn", {})
+        if txn.get("apid") == self.appID:
+            with self.lock:
+                for accountDelta in response.get("local-state-delta", []):
+                    self.applyDelta(accountDelta["address"], accountDelta["delta"])
+
+                # Leaving the app drops all local state without a delta
+                if txn.get("apan") in (OnComplete.CloseOutOC, OnComplete.ClearStateOC):
+                    sender = txn["snd"]
+                    if isinstance(sender, bytes):
+                        sender = encode_address(sender)
+                    self.replaceOwner(sender, [])
+
+        for inner in response.get("inner-txns", []):
+            self.observe(inner)
+
+    def applyDelta(self, owner: str, delta: List[Dict[str, Any]]) -> None:
+        # called with the lock held
+        for change in delta:
+            key = a2b_base64(change["key"])
+            if len(key) != OFFER_KEY.size:
+                continue
+            (assetID,) = OFFER_KEY.unpack(key)
+            value = change["value"]
+            if value["action"] == DELTA_SET_BYTES:
+                raw = a2b_base64(value.get("bytes", ""))
+                if len(raw) == OFFER_VALUE.size:
+                    self.add(owner, Offer(assetID, *OFFER_VALUE.unpack(raw)))
+                    continue
+            self.remove(owner, assetID)
+
+    def observeBlock(
+        self, round: int, responses: Dict[str, PendingTxnResponse]
+    ) -> None:
+        with self.blockLock:
+            if round <= self.round:
+                # already part of the loaded state
+                return
+            for response in responses.values():
+                self.observe(response)
+            with self.lock:
+                self.round = round
+
+    def attach(self, tracker: ConfirmationTracker) -> None:
+        tracker.subscribe(self.observeBlock)
+
+    def detach(self, tracker: ConfirmationTracker) -> None:
+        tracker.unsubscribe(self.observeBlock)
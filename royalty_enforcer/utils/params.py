@@ -0,0 +1,124 @@
+import copy
+import os
+import threading
+import time
+import weakref
+from typing import Any, Optional
+
+from algosdk.future.transaction import SuggestedParams
+from algosdk.v2client.algod import AlgodClient
+
+# Rounds the cached params are reused for before fetching them again
+PARAMS_WINDOW = int(os.environ.get("ROYALTY_ENFORCER_PARAMS_WINDOW", "10"))
+
+# Seconds per round, used to estimate the last round between fetches
+ROUND_TIME = float(os.environ.get("ROYALTY_ENFORCER_ROUND_TIME", "3.7"))
+
+
+class ParamsProvider:
+    """Suggested params for one client, fetched once and shared by helpers.
+
+    The cached params are reused until the estimated last round has moved
+    PARAMS_WINDOW rounds past the round they were fetched at. The estimate is
+    based on the time since the fetch and on rounds observed in confirmed
+    transactions. While the network is congested the fee per byte can move
+    every round, so the params are refetched as soon as a new round is
+    expected.
+
+    Every call returns a copy, callers are free to change the fee. Clients
+    that can't fetch synchronously use cached() and store() instead of get().
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        window: int = PARAMS_WINDOW,
+        roundTime: float = ROUND_TIME,
+    ) -> None:
+        self.client = client
+        self.window = window
+        self.roundTime = roundTime
+
+        self.params: Optional[SuggestedParams] = None
+        self.fetchedAt = 0.0
+        self.observedRound = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.fetchLock = threading.Lock()
+
+    def estimatedRound(self) -> int:
+        assert self.params is not None
+        elapsed = int((time.monotonic() - self.fetchedAt) / self.roundTime)
+        return max(self.params.first + elapsed, self.observedRound)
+
+    def expired(self) -> bool:
+        if self.params is None:
+            return True
+        window = self.window
+        if self.params.fee > 0:
+            # congested, fee per byte is above zero and changes per round
+            window = 1
+        return self.estimatedRound() - self.params.first >= window
+
+    def cached(self) -> Optional[SuggestedParams]:
+        """Return the cached params, or None when they need to be fetched"""
+        with self.lock:
+            if self.expired():
+                return None
+            self.hits += 1
+            return self.current()
+
+    def store(self, params: SuggestedParams) -> SuggestedParams:
+        """Cache freshly fetched params and return a copy to use"""
+        with self.lock:
+            self.misses += 1
+            self.params = params
+            self.fetchedAt = time.monotonic()
+            return self.current()
+
+    def current(self) -> SuggestedParams:
+        sp = copy.copy(self.params)
+        # Only rounds seen on chain move the validity range forward. Keeping
+        # first valid current avoids duplicate txids for identical transactions
+        # sent in different rounds.
+        if self.observedRound > sp.first:
+            sp.last += self.observedRound - sp.first
+            sp.first = self.observedRound
+        return sp
+
+    def get(self) -> SuggestedParams:
+        # Serialize fetches so concurrent callers share one request
+        with self.fetchLock:
+            sp = self.cached()
+            if sp is None:
+                sp = self.store(self.client.suggested_params())
+        return sp
+
+    def observeRound(self, round: int) -> None:
+        with self.lock:
+            self.observedRound = max(self.observedRound, round)
+
+    def invalidate(self) -> None:
+        """Drop the cached params, e.g. after a transaction was rejected for its fee"""
+        with self.lock:
+            self.params = None
+
+
+providers: "weakref.WeakKeyDictionary[Any, ParamsProvider]"
+providers = weakref.WeakKeyDictionary()
+providersLock = threading.Lock()
+
+
+def getParamsProvider(client: Any) -> ParamsProvider:
+    with providersLock:
+        provider = providers.get(client)
+        if provider is None:
+            provider = ParamsProvider(client)
+            providers[client] = provider
+        return provider
+
+
+def getSuggestedParams(client: AlgodClient) -> SuggestedParams:
+    return getParamsProvider(client).get()
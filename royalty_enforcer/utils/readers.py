@@ -0,0 +1,145 @@
+from typing import Any, List, Optional, Tuple
+
+from algosdk.atomic_transaction_composer import (
+    AtomicTransactionComposer,
+    TransactionSigner,
+)
+from algosdk.encoding import encode_address
+from algosdk.future.transaction import SignedTransaction, Transaction, create_dryrun
+from algosdk.v2client.algod import AlgodClient
+from royalty_enforcer.utils.apps import App, decodeOffer, decodePolicy
+from royalty_enforcer.utils.params import getSuggestedParams
+from royalty_enforcer.utils.state import decodeState
+from royalty_enforcer.utils.transactions import decodeABIResult
+
+# Global state keys of the enforcer, see royalty_enforcer.contracts.enforcer.Keys
+ADMINISTRATOR_KEY = b"administrator"
+ROYALTY_BASIS_KEY = b"royalty_basis"
+ROYALTY_RECEIVER_KEY = b"royalty_receiver"
+
+
+def readEnforcerPolicy(client: AlgodClient, enforcer: App) -> Tuple[str, int]:
+    """Same result as getEnforcerPolicy, read from global state"""
+    state = decodeState(
+        client.application_info(enforcer.id)["params"].get("global-state", [])
+    )
+    receiver = state.get(ROYALTY_RECEIVER_KEY)
+    if not isinstance(receiver, bytes) or len(receiver) != 32:
+        raise Exception("Enforcer {} has no royalty policy".format(enforcer.id))
+    return encode_address(receiver), int(state.get(ROYALTY_BASIS_KEY, 0))
+
+
+def readEnforcerAdmin(client: AlgodClient, enforcer: App) -> str:
+    """Same result as getEnforcerAdmin, read from global state"""
+    params = client.application_info(enforcer.id)["params"]
+    admin = decodeState(params.get("global-state", [])).get(ADMINISTRATOR_KEY)
+    if isinstance(admin, bytes):
+        return encode_address(admin)
+    # the contract falls back to the creator when no administrator is stored
+    return params["creator"]
+
+
+def readEnforcerOffer(
+    client: AlgodClient, enforcer: App, nftID: int, sellerAddress: str
+) -> Tuple[str, int]:
+    """Same result as getEnforcerOffer, read from the seller's local state"""
+    info = client.account_application_info(sellerAddress, enforcer.id)
+    localState = info.get("app-local-state", {}).get("key-value", [])
+    offer = decodeState(localState).get(nftID.to_bytes(8, "big"))
+    if not isinstance(offer, bytes):
+        raise Exception("No offer for asset {} from {}".format(nftID, sellerAddress))
+    return decodeOfferValue(offer)
+
+
+def readMarketplaceListing(
+    client: AlgodClient, marketplace: App, nftID: int, sellerAddress: str
+) -> Tuple[int, int, int]:
+    """The enforcer app, amount and price an NFT is listed for, read from the
+    seller's local state"""
+    info = client.account_application_info(sellerAddress, marketplace.id)
+    localState = info.get("app-local-state", {}).get("key-value", [])
+    listing = decodeState(localState).get(nftID.to_bytes(8, "big"))
+    if not isinstance(listing, bytes):
+        raise Exception("No listing for asset {} from {}".format(nftID, sellerAddress))
+    # see list_nft in the contract
+    return (
+        int.from_bytes(listing[:8], "big"),
+        int.from_bytes(listing[8:16], "big"),
+        int.from_bytes(listing[16:24], "big"),
+    )
+
+
+def decodeOfferValue(offer: bytes) -> Tuple[str, int]:
+    # auth address followed by the amount, see update_offered in the contract
+    return encode_address(offer[:32]), int.from_bytes(offer[32:40], "big")
+
+
+class UnsignedSigner(TransactionSigner):
+    """Leaves transactions unsigned, dryrun doesn't check signatures"""
+
+    def sign_transactions(
+        self, txn_group: List[Transaction], indexes: List[int]
+    ) -> List[SignedTransaction]:
+        return [SignedTransaction(txn_group[i], None) for i in indexes]
+
+
+def dryrunMethod(
+    client: AlgodClient,
+    app: App,
+    senderAddress: str,
+    methodName: str,
+    args: Optional[List[Any]] = None,
+) -> Any:
+    """Evaluate a read-only ABI method with dryrun and return its result.
+
+    Nothing is signed or sent. Raises if the program rejects the call.
+    """
+    atc = AtomicTransactionComposer()
+    atc.add_method_call(
+        app.id,
+        app.getMethod(methodName),
+        senderAddress,
+        getSuggestedParams(client),
+        UnsignedSigner(),
+        args or [],
+    )
+    signedTxns = atc.gather_signatures()
+    response = client.dryrun(create_dryrun(client, signedTxns))
+
+    if response.get("error"):
+        raise Exception("Dryrun failed: {}".format(response["error"]))
+    txn = response["txns"][0]
+    messages = txn.get("app-call-messages", [])
+    if "PASS" not in messages:
+        raise Exception("Dryrun rejected: {}".format(", ".join(messages)))
+
+    result = decodeABIResult(signedTxns[0].get_txid(), txn, atc.method_dict[0])
+    if result.decode_error is not None:
+        raise result.decode_error
+    return result.return_value
+
+
+def dryrunEnforcerPolicy(
+    client: AlgodClient, enforcer: App, senderAddress: str
+) -> Tuple[str, int]:
+    return decodePolicy(dryrunMethod(client, enforcer, senderAddress, "get_policy"))
+
+
+def dryrunEnforcerAdmin(client: AlgodClient, enforcer: App, senderAddress: str) -> str:
+    adminAddress = dryrunMethod(client, enforcer, senderAddress, "get_administrator")
+    assert isinstance(adminAddress, str)
+    return adminAddress
+
+
+def dryrunEnforcerOffer(
+    client: AlgodClient,
+    enforcer: App,
+    senderAddress: str,
+    nftID: int,
+    sellerAddress: str,
+) -> Tuple[str, int]:
+    return decodeOffer(
+        dryrunMethod(
+            client, enforcer, senderAddress, "get_offer", [nftID, sellerAddress]
+        )
+    )
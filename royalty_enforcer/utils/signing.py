@@ -0,0 +1,186 @@
+import os
+from base64 import b64decode, b64encode
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import (
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from algosdk import constants, encoding
+from algosdk.account import address_from_private_key
+from algosdk.atomic_transaction_composer import (
+    AccountTransactionSigner,
+    AtomicTransactionComposer,
+    AtomicTransactionComposerStatus,
+    TransactionSigner,
+)
+from algosdk.future.transaction import SignedTransaction, Transaction
+from nacl.signing import SigningKey
+from royalty_enforcer.utils.accounts import Account
+from royalty_enforcer.utils.transactions import chunked
+
+# Worker processes signing transactions, 0 signs in the calling process
+SIGNING_PROCESSES = int(
+    os.environ.get("ROYALTY_ENFORCER_SIGNING_PROCESSES", str(os.cpu_count() or 1))
+)
+
+# Transactions sent to a worker at once
+SIGNING_BATCH_SIZE = 256
+
+Signer = Union[Account, AccountTransactionSigner, TransactionSigner, str]
+
+# private key -> (signing key, address), per process
+signingKeys: Dict[str, Tuple[SigningKey, str]] = dict()
+
+
+def signingKey(privateKey: str) -> Tuple[SigningKey, str]:
+    # Deriving the key pair costs as much as a signature, do it once per key
+    key = signingKeys.get(privateKey)
+    if key is None:
+        seed = b64decode(privateKey)[: constants.key_len_bytes]
+        key = (SigningKey(seed), address_from_private_key(privateKey))
+        signingKeys[privateKey] = key
+    return key
+
+
+def signTransactions(txns: List[Tuple[Transaction, str]]) -> List[SignedTransaction]:
+    """Same as txn.sign(privateKey) for each pair, without deriving the key
+    pair again for every transaction"""
+    signed = []
+    for txn, privateKey in txns:
+        key, address = signingKey(privateKey)
+        message = constants.txid_prefix + b64decode(encoding.msgpack_encode(txn))
+        signature = b64encode(key.sign(message).signature).decode()
+        # rekeyed senders are signed for by their auth address
+        authAddress = address if txn.sender != address else None
+        signed.append(SignedTransaction(txn, signature, authAddress))
+    return signed
+
+
+def privateKeyOf(signer: Signer) -> Optional[str]:
+    if isinstance(signer, str):
+        return signer
+    if isinstance(signer, Account):
+        return signer.getPrivateKey()
+    if isinstance(signer, AccountTransactionSigner):
+        return signer.private_key
+    # e.g. logic sig or multisig signers sign in the calling process
+    return None
+
+
+class SigningPool:
+    """Signs transactions in worker processes, in order.
+
+    Input is consumed lazily and signed transactions are yielded as soon as
+    they and every transaction before them are signed, so a submitter can
+    send groups while later ones are still being signed. Transactions are
+    signed as they are, group IDs must be assigned before.
+    """
+
+    def __init__(
+        self,
+        processes: int = SIGNING_PROCESSES,
+        batchSize: int = SIGNING_BATCH_SIZE,
+    ) -> None:
+        self.processes = processes
+        self.batchSize = batchSize
+        self.executor: Optional[ProcessPoolExecutor] = None
+        if processes > 0:
+            self.executor = ProcessPoolExecutor(processes)
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self) -> "SigningPool":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def submit(self, batch: List[Tuple[Transaction, Signer]]) -> "Future":
+        keyed = []
+        for txn, signer in batch:
+            privateKey = privateKeyOf(signer)
+            if privateKey is None:
+                # only account signers can be sent to another process
+                break
+            keyed.append((txn, privateKey))
+
+        future: Future
+        if len(keyed) == len(batch) and self.executor is not None:
+            future = self.executor.submit(signTransactions, keyed)
+        else:
+            future = Future()
+            future.set_result(
+                [signOne(txn, signer, privateKeyOf(signer)) for txn, signer in batch]
+            )
+        return future
+
+    def sign(
+        self, txns: Iterable[Tuple[Transaction, Signer]]
+    ) -> Iterator[SignedTransaction]:
+        """Sign each transaction with its signer"""
+        pending: Deque[Future] = deque()
+        # enough batches to keep every worker busy while results are consumed
+        maxPending = max(2 * self.processes, 1)
+
+        for batch in chunked(txns, self.batchSize):
+            pending.append(self.submit(batch))
+            if len(pending) > maxPending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+    def signGroups(
+        self, groups: Iterable[List[Tuple[Transaction, Signer]]]
+    ) -> Iterator[List[SignedTransaction]]:
+        """Sign groups of transactions, yielding each group once it's signed"""
+        sizes: Deque[int] = deque()
+
+        def flatten() -> Iterator[Tuple[Transaction, Signer]]:
+            for group in groups:
+                sizes.append(len(group))
+                yield from group
+
+        group: List[SignedTransaction] = []
+        for stxn in self.sign(flatten()):
+            group.append(stxn)
+            if len(group) == sizes[0]:
+                sizes.popleft()
+                yield group
+                group = []
+
+    def signComposers(
+        self, atcs: Iterable[AtomicTransactionComposer]
+    ) -> Iterator[AtomicTransactionComposer]:
+        """Sign composers, which can then be submitted or executed as usual"""
+        built: Deque[AtomicTransactionComposer] = deque()
+
+        def groups() -> Iterator[List[Tuple[Transaction, Signer]]]:
+            for atc in atcs:
+                built.append(atc)
+                yield [(t.txn, t.signer) for t in atc.build_group()]
+
+        for signedTxns in self.signGroups(groups()):
+            atc = built.popleft()
+            atc.signed_txns = signedTxns
+            atc.status = AtomicTransactionComposerStatus.SIGNED
+            yield atc
+
+
+def signOne(
+    txn: Transaction, signer: Signer, privateKey: Optional[str]
+) -> SignedTransaction:
+    if privateKey is not None:
+        return signTransactions([(txn, privateKey)])[0]
+    assert isinstance(signer, TransactionSigner)
+    return signer.sign_transactions([txn], [0])[0]
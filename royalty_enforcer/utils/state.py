@@ -0,0 +1,191 @@
+# Helpers for reading algod JSON responses. This module must not import
+# algosdk at runtime so that callers which only read state stay cheap to import.
+import struct
+from binascii import a2b_base64
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+
+if TYPE_CHECKING:
+    from algosdk.v2client.algod import AlgodClient
+
+
+def decodeState(stateArray: List[Any]) -> Dict[bytes, Union[int, bytes]]:
+    state: Dict[bytes, Union[int, bytes]] = dict()
+
+    for pair in stateArray:
+        key = a2b_base64(pair["key"])
+
+        value = pair["value"]
+        valueType = value["type"]
+
+        if valueType == 2:
+            # value is uint64
+            value = value.get("uint", 0)
+        elif valueType == 1:
+            # value is byte array
+            value = a2b_base64(value.get("bytes", ""))
+        else:
+            raise Exception(f"Unexpected state type: {valueType}")
+
+        state[key] = value
+
+    return state
+
+
+# Enforcer offers are stored under Itob(asset id) as auth address + Itob(amount)
+OFFER_KEY = struct.Struct(">Q")
+OFFER_VALUE = struct.Struct(">32sQ")
+
+# Length of an offer key and value in base64
+OFFER_KEY_B64 = 12
+OFFER_VALUE_B64 = 56
+
+ROYALTY_BASIS_KEY = "cm95YWx0eV9iYXNpcw=="  # base64 of b"royalty_basis"
+ROYALTY_RECEIVER_KEY = "cm95YWx0eV9yZWNlaXZlcg=="  # base64 of b"royalty_receiver"
+
+
+class Offer:
+    """An offer from an enforcer's local state, use authAddress for the
+    address string"""
+
+    __slots__ = ("assetID", "auth", "amount")
+
+    def __init__(self, assetID: int, auth: bytes, amount: int):
+        self.assetID = assetID
+        self.auth = auth
+        self.amount = amount
+
+    @property
+    def authAddress(self) -> str:
+        from algosdk.encoding import encode_address
+
+        return encode_address(self.auth)
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, Offer)
+            and self.assetID == other.assetID
+            and self.auth == other.auth
+            and self.amount == other.amount
+        )
+
+    def __repr__(self) -> str:
+        return "Offer(assetID={}, auth={}, amount={})".format(
+            self.assetID, self.authAddress, self.amount
+        )
+
+
+class Policy:
+    """The royalty policy from an enforcer's global state"""
+
+    __slots__ = ("receiver", "basis")
+
+    def __init__(self, receiver: bytes, basis: int):
+        self.receiver = receiver
+        self.basis = basis
+
+    @property
+    def receiverAddress(self) -> str:
+        from algosdk.encoding import encode_address
+
+        return encode_address(self.receiver)
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, Policy)
+            and self.receiver == other.receiver
+            and self.basis == other.basis
+        )
+
+    def __repr__(self) -> str:
+        return "Policy(receiver={}, basis={})".format(self.receiverAddress, self.basis)
+
+
+def decodeOffers(stateArray: List[Any]) -> List[Offer]:
+    """Offers in the key-value list of an account's enforcer local state,
+    entries that aren't offers are skipped"""
+    offers: List[Offer] = []
+    for pair in stateArray:
+        value = pair["value"]
+        if value["type"] != 1:
+            continue
+        key = a2b_base64(pair["key"])
+        value = a2b_base64(value.get("bytes", ""))
+        if len(key) == OFFER_KEY.size and len(value) == OFFER_VALUE.size:
+            offers.append(Offer(OFFER_KEY.unpack(key)[0], *OFFER_VALUE.unpack(value)))
+    return offers
+
+
+def decodeOffersBatch(stateArrays: List[List[Any]]) -> List[List[Offer]]:
+    """decodeOffers for many accounts' local states at once.
+
+    Every key and value is base64 decoded into one buffer each, which is then
+    unpacked in a single pass instead of slicing each value on its own.
+    """
+    keys: List[str] = []
+    values: List[str] = []
+    counts: List[int] = []
+    for stateArray in stateArrays:
+        count = 0
+        for pair in stateArray:
+            value = pair["value"]
+            if value["type"] != 1:
+                continue
+            key = pair["key"]
+            value = value.get("bytes", "")
+            if len(key) == OFFER_KEY_B64 and len(value) == OFFER_VALUE_B64:
+                keys.append(key)
+                values.append(value)
+                count += 1
+        counts.append(count)
+
+    keyBuffer = memoryview(b"".join(map(a2b_base64, keys)))
+    valueBuffer = memoryview(b"".join(map(a2b_base64, values)))
+    expected = (OFFER_KEY.size * len(keys), OFFER_VALUE.size * len(values))
+    if (len(keyBuffer), len(valueBuffer)) != expected:
+        # some base64 of the right length had padding for a different size
+        return [decodeOffers(stateArray) for stateArray in stateArrays]
+
+    offers = [
+        Offer(assetID, auth, amount)
+        for (assetID,), (auth, amount) in zip(
+            OFFER_KEY.iter_unpack(keyBuffer), OFFER_VALUE.iter_unpack(valueBuffer)
+        )
+    ]
+
+    decoded: List[List[Offer]] = []
+    start = 0
+    for count in counts:
+        decoded.append(offers[start : start + count])
+        start += count
+    return decoded
+
+
+def decodePolicyState(stateArray: List[Any]) -> Optional[Policy]:
+    """The royalty policy in an enforcer's global state, None if it isn't set"""
+    receiver = None
+    basis = 0
+    for pair in stateArray:
+        if pair["key"] == ROYALTY_RECEIVER_KEY:
+            receiver = a2b_base64(pair["value"].get("bytes", ""))
+        elif pair["key"] == ROYALTY_BASIS_KEY:
+            basis = pair["value"].get("uint", 0)
+    if receiver is None or len(receiver) != 32:
+        return None
+    return Policy(receiver, basis)
+
+
+def getBalances(client: "AlgodClient", account: str) -> Dict[int, int]:
+    balances: Dict[int, int] = dict()
+
+    accountInfo = client.account_info(account)
+
+    # set key 0 to Algo balance
+    balances[0] = accountInfo["amount"]
+
+    assets: List[Dict[str, Any]] = accountInfo.get("assets", [])
+    for assetHolding in assets:
+        assetID = assetHolding["asset-id"]
+        amount = assetHolding["amount"]
+        balances[assetID] = amount
+
+    return balances
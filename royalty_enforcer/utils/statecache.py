@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from base64 import b64decode
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Union
+
+from algosdk.encoding import encode_address
+from algosdk.error import AlgodHTTPError
+from algosdk.future.transaction import OnComplete
+from algosdk.v2client.algod import AlgodClient
+from royalty_enforcer.utils.readers import ROYALTY_BASIS_KEY, ROYALTY_RECEIVER_KEY
+from royalty_enforcer.utils.state import decodeOffers, decodeState
+from royalty_enforcer.utils.transactions import (
+    ConfirmationTracker,
+    PendingTxnResponse,
+)
+
+STATE_CACHE_SIZE = int(os.environ.get("ROYALTY_ENFORCER_STATE_CACHE_SIZE", "10000"))
+
+# Seconds an entry is trusted without seeing the transactions that change it
+STATE_CACHE_TTL = float(os.environ.get("ROYALTY_ENFORCER_STATE_CACHE_TTL", "30"))
+
+Offer = Optional[Tuple[str, int]]
+
+
+class EnforcerStateCache:
+    """Decoded enforcer global state and offers, shared by readers.
+
+    Entries are evicted least recently used first and expire after ttl
+    seconds. They are invalidated as soon as a transaction that changes them
+    is seen: pass confirmed transactions to observe(), or attach() the cache
+    to a ConfirmationTracker to see every transaction in every block.
+    Invalidation follows the state deltas, so an offer is only dropped when
+    that offer's key changed.
+    """
+
+    def __init__(
+        self,
+        client: AlgodClient,
+        maxEntries: int = STATE_CACHE_SIZE,
+        ttl: float = STATE_CACHE_TTL,
+    ) -> None:
+        self.client = client
+        self.maxEntries = maxEntries
+        self.ttl = ttl
+
+        # ("global", appID) or ("offer", appID, address, assetID) -> (expires, value)
+        self.entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+        # bumped on every invalidation, a fetch that raced one isn't stored
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return False, None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def store(self, generation: int, values: Dict[Hashable, Any]) -> None:
+        with self.lock:
+            if generation != self.generation:
+                return
+            expires = time.monotonic() + self.ttl
+            for key, value in values.items():
+                self.entries[key] = (expires, value)
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+
+    def cached(self, key: Hashable, fetch: Callable[[], Dict[Hashable, Any]]) -> Any:
+        found, value = self.lookup(key)
+        if found:
+            return value
+        generation = self.generation
+        values = fetch()
+        self.store(generation, values)
+        return values[key]
+
+    def getGlobalState(self, appID: int) -> Dict[bytes, Union[int, bytes]]:
+        key = ("global", appID)
+
+        def fetch() -> Dict[Hashable, Any]:
+            params = self.client.application_info(appID)["params"]
+            return {key: decodeState(params.get("global-state", []))}
+
+        return self.cached(key, fetch)
+
+    def getPolicy(self, appID: int) -> Tuple[str, int]:
+        state = self.getGlobalState(appID)
+        receiver = state.get(ROYALTY_RECEIVER_KEY)
+        if not isinstance(receiver, bytes) or len(receiver) != 32:
+            raise Exception("Enforcer {} has no royalty policy".format(appID))
+        return encode_address(receiver), int(state.get(ROYALTY_BASIS_KEY, 0))
+
+    def getOffer(self, appID: int, nftID: int, sellerAddress: str) -> Offer:
+        """The seller's offer for the asset, None if there is none"""
+        key = ("offer", appID, sellerAddress, nftID)
+
+        def fetch() -> Dict[Hashable, Any]:
+            # One request returns every offer of the seller, keep them all
+            try:
+                info = self.client.account_application_info(sellerAddress, appID)
+            except AlgodHTTPError as e:
+                if e.code != 404:
+                    raise
+                info = {}
+            localState = info.get("app-local-state", {}).get("key-value", [])
+            values: Dict[Hashable, Any] = {key: None}
+            for offer in decodeOffers(localState):
+                values[("offer", appID, sellerAddress, offer.assetID)] = (
+                    offer.authAddress,
+                    offer.amount,
+                )
+            return values
+
+        return self.cached(key, fetch)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self.lock:
+            self.generation += 1
+            self.entries.pop(key, None)
+
+    def invalidateAccount(self, appID: int, address: str) -> None:
+        with self.lock:
+            self.generation += 1
+            for key in [
+                k
+                for k in self.entries
+                if k[0] == "offer" and k[1:3] == (appID, address)
+            ]:
+                del self.entries[key]
+
+    def observe(self, response: Union[PendingTxnResponse, Dict[str, Any]]) -> None:
+        """Invalidate whatever a confirmed transaction changed"""
+        if isinstance(response, PendingTxnResponse):
+            response = response.raw
+
+        txn = response.get("txn", {}).get("txn", {})
+        appID = txn.get("apid", response.get("application-index", 0))
+        if appID:
+            if response.get("global-state-delta"):
+                self.invalidate(("global", appID))
+
+            for accountDelta in response.get("local-state-delta", []):
+                address = accountDelta["address"]
+                for change in accountDelta["delta"]:
+                    key = b64decode(change["key"])
+                    if len(key) == 8:
+                        assetID = int.from_bytes(key, "big")
+                        self.invalidate(("offer", appID, address, assetID))
+
+            # Leaving the app drops all local state without a delta
+            if txn.get("apan") in (OnComplete.CloseOutOC, OnComplete.ClearStateOC):
+                sender = txn["snd"]
+                if isinstance(sender, bytes):
+                    sender = encode_address(sender)
+                self.invalidateAccount(appID, sender)
+
+        for inner in response.get("inner-txns", []):
+            self.observe(inner)
+
+    def observeBlock(
+        self, round: int, responses: Dict[str, PendingTxnResponse]
+    ) -> None:
+        for response in responses.values():
+            self.observe(response)
+
+    def attach(self, tracker: ConfirmationTracker) -> None:
+        tracker.subscribe(self.observeBlock)
+
+    def detach(self, tracker: ConfirmationTracker) -> None:
+        tracker.unsubscribe(self.observeBlock)
@@ -1,15 +1,80 @@
-from base64 import b64decode
-from typing import Any, Dict, List, Optional
+import threading
+import time
+import weakref
+from base64 import b32encode, b64decode, b64encode
+from concurrent.futures import Future
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
 
-from algosdk.encoding import encode_address
-from algosdk.future.transaction import wait_for_confirmation
+import msgpack
+from algosdk import error
+from algosdk.abi import Method, Returns
+from algosdk.atomic_transaction_composer import (
+    ABI_RETURN_HASH,
+    ABIResult,
+    AtomicTransactionComposer,
+    AtomicTransactionComposerStatus,
+    AtomicTransactionResponse,
+)
+from algosdk.encoding import checksum, encode_address, msgpack_encode
 from algosdk.v2client.algod import AlgodClient
+from royalty_enforcer.utils.params import ROUND_TIME, getParamsProvider
 
 ZERO_ADDR = encode_address(bytes(32))
 
+# Maximum number of transactions in an atomic group
+MAX_GROUP_SIZE = 16
+
+# Consecutive failures to get a block before waiting transactions fail with it
+FAILURE_LIMIT = 3
+
+# Seconds to wait before getting a block again after a failure
+RETRY_DELAY = 1.0
+
+# Transaction fields holding addresses, the rest of the bytes are base64 in JSON
+ADDRESS_KEYS = {
+    "snd",
+    "rcv",
+    "close",
+    "asnd",
+    "arcv",
+    "aclose",
+    "rekey",
+    "fadd",
+    "sgnr",
+    "apat",
+    "m",
+    "r",
+    "f",
+    "c",
+}
+
+T = TypeVar("T")
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    chunk: List[T] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
 
 class PendingTxnResponse:
     def __init__(self, response: Dict[str, Any]) -> None:
+        self.raw = response
         self.poolError: str = response["pool-error"]
         self.txn: Dict[str, Any] = response["txn"]
 
@@ -27,7 +92,367 @@ class PendingTxnResponse:
         self.logs: List[bytes] = [b64decode(l) for l in response.get("logs", [])]
 
 
+def txnID(txn: Dict[str, Any]) -> str:
+    """ID of a transaction given as a msgpack decoded dict"""
+    data = b"TX" + b64decode(msgpack_encode(txn))
+    return b32encode(checksum(data)).decode().strip("=")
+
+
+def stateDelta(delta: Dict[bytes, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Convert a msgpack state delta to the JSON form algod returns"""
+    converted = []
+    for key, value in delta.items():
+        entry: Dict[str, Any] = {"action": value.get("at", 0)}
+        if "bs" in value:
+            entry["bytes"] = b64encode(value["bs"]).decode()
+        if "ui" in value:
+            entry["uint"] = value["ui"]
+        converted.append({"key": b64encode(key).decode(), "value": entry})
+    return converted
+
+
+def jsonValue(value: Any, key: str = "") -> Any:
+    """Convert a msgpack transaction value to algod's JSON form"""
+    if isinstance(value, dict):
+        return {k: jsonValue(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [jsonValue(v, key) for v in value]
+    if isinstance(value, bytes):
+        if key in ADDRESS_KEYS and len(value) == 32:
+            return encode_address(value)
+        return b64encode(value).decode()
+    return value
+
+
+def blockTxnResponse(stib: Dict[str, Any], round: int) -> Dict[str, Any]:
+    """Build a pending transaction response from a transaction in a block,
+    in the same JSON form as pending_transaction_info returns"""
+    response: Dict[str, Any] = {
+        "pool-error": "",
+        "confirmed-round": round,
+        "txn": jsonValue(
+            {
+                k: v
+                for k, v in stib.items()
+                if k in ("txn", "sig", "msig", "lsig", "sgnr")
+            }
+        ),
+    }
+    for key, name in (
+        ("apid", "application-index"),
+        ("caid", "asset-index"),
+        ("ca", "closing-amount"),
+        ("aca", "asset-closing-amount"),
+        ("rc", "close-rewards"),
+        ("rr", "receiver-rewards"),
+        ("rs", "sender-rewards"),
+    ):
+        if key in stib:
+            response[name] = stib[key]
+
+    evalDelta = stib.get("dt", {})
+    if "gd" in evalDelta:
+        response["global-state-delta"] = stateDelta(evalDelta["gd"])
+    if "ld" in evalDelta:
+        # local deltas are keyed by index into the accounts array, 0 is the
+        # sender, followed by accounts shared from other transactions
+        txn = stib["txn"]
+        accounts = [txn["snd"]] + txn.get("apat", []) + evalDelta.get("sa", [])
+        response["local-state-delta"] = [
+            {"address": encode_address(accounts[i]), "delta": stateDelta(delta)}
+            for i, delta in evalDelta["ld"].items()
+            if 0 <= i < len(accounts)
+        ]
+    if "lg" in evalDelta:
+        response["logs"] = [b64encode(log).decode() for log in evalDelta["lg"]]
+    if "itx" in evalDelta:
+        response["inner-txns"] = [blockTxnResponse(i, round) for i in evalDelta["itx"]]
+    return response
+
+
+def decodeBlock(data: bytes) -> Dict[str, Dict[str, Any]]:
+    """Pending transaction responses of every transaction in a msgpack block"""
+    block = msgpack.unpackb(data, raw=False, strict_map_key=False)["block"]
+    responses = dict()
+    for stib in block.get("txns", []):
+        txn = dict(stib["txn"])
+        # the block strips what every transaction in it has in common
+        if stib.get("hgi"):
+            txn["gen"] = block["gen"]
+        txn["gh"] = block["gh"]
+        stib = dict(stib, txn=txn)
+        response = blockTxnResponse(stib, block["rnd"])
+        # block timestamp, named as in indexer responses
+        response["round-time"] = block.get("ts", 0)
+        responses[txnID(txn)] = response
+    return responses
+
+
+BlockSubscriber = Callable[[int, Dict[str, PendingTxnResponse]], None]
+
+
+class ConfirmationTracker:
+    """Resolves pending transactions from blocks instead of polling each one.
+
+    A background thread waits for each new round with status_after_block,
+    fetches the block once and resolves every tracked transaction in it.
+    Transactions are checked once with pending_transaction_info when they are
+    tracked, in case they were confirmed before the tracker got to their
+    round, and once more when they time out, to report pool errors.
+
+    A transaction times out when its last round was processed without it, or
+    when the time those rounds should take has passed, whichever comes first.
+    The time limit is enforced by a second thread, so waiters don't hang while
+    blocks can't be fetched. Once getting a block failed FAILURE_LIMIT times in
+    a row, the waiting transactions fail with the error.
+
+    Subscribers are called with the round and the responses of every
+    transaction in each block, from the tracker thread.
+    """
+
+    def __init__(self, client: AlgodClient, roundTime: float = ROUND_TIME) -> None:
+        self.client = client
+        self.roundTime = roundTime
+        self.lock = threading.Lock()
+        self.deadlineChanged = threading.Condition(self.lock)
+        # txID -> waiters as (future, last round to wait for, monotonic deadline)
+        self.pending: Dict[str, List[Tuple[Future, int, float]]] = dict()
+        self.subscribers: List[BlockSubscriber] = []
+        self.lastRound = 0
+        self.thread: Optional[threading.Thread] = None
+        self.reaper: Optional[threading.Thread] = None
+
+        self.blocksFetched = 0
+
+    def subscribe(self, subscriber: BlockSubscriber) -> None:
+        with self.lock:
+            self.subscribers.append(subscriber)
+            self.start()
+
+    def unsubscribe(self, subscriber: BlockSubscriber) -> None:
+        with self.lock:
+            self.subscribers.remove(subscriber)
+
+    def start(self) -> None:
+        # called with the lock held
+        if self.thread is None:
+            # Rounds passed while stopped are covered by the check in track()
+            self.lastRound = self.client.status()["last-round"]
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def active(self) -> bool:
+        with self.lock:
+            if self.pending or self.subscribers:
+                return True
+            # the next track() or subscribe() starts a new thread
+            self.thread = None
+            return False
+
+    def run(self) -> None:
+        failures = 0
+        while self.active():
+            try:
+                status = self.client.status_after_block(self.lastRound)
+                for round in range(self.lastRound + 1, status["last-round"] + 1):
+                    self.processRound(round)
+                    self.lastRound = round
+                failures = 0
+            except Exception as e:
+                # the transport already retried, back off and try again
+                failures += 1
+                if failures >= FAILURE_LIMIT:
+                    self.fail(e)
+                time.sleep(RETRY_DELAY)
+
+    def fail(self, e: Exception) -> None:
+        """Fail every waiting transaction with the error"""
+        with self.lock:
+            futures = [f for waiters in self.pending.values() for f, _, _ in waiters]
+            self.pending.clear()
+        for future in futures:
+            future.set_exception(e)
+
+    def reap(self) -> None:
+        """Time out waiters past their deadline, whether or not blocks come in"""
+        while True:
+            expired = []
+            with self.lock:
+                if not self.pending:
+                    # the next track() starts a new thread
+                    self.reaper = None
+                    return
+                now = time.monotonic()
+                for txID in list(self.pending):
+                    waiters = self.pending[txID]
+                    expired += [(txID, f) for f, _, d in waiters if d <= now]
+                    waiters[:] = [w for w in waiters if w[2] > now]
+                    if not waiters:
+                        del self.pending[txID]
+                if not expired:
+                    nextDeadline = min(
+                        d for waiters in self.pending.values() for _, _, d in waiters
+                    )
+                    self.deadlineChanged.wait(nextDeadline - now)
+            for txID, future in expired:
+                self.expire(future, txID)
+
+    def processRound(self, round: int) -> None:
+        data = self.client.block_info(round, response_format="msgpack")
+        self.blocksFetched += 1
+        responses = {
+            txID: PendingTxnResponse(r) for txID, r in decodeBlock(data).items()
+        }
+        getParamsProvider(self.client).observeRound(round)
+
+        resolved = []
+        expired = []
+        with self.lock:
+            for txID in list(self.pending):
+                if txID in responses:
+                    resolved += [
+                        (f, responses[txID]) for f, _, _ in self.pending.pop(txID)
+                    ]
+                    continue
+                waiters = self.pending[txID]
+                expired += [(txID, f) for f, r, _ in waiters if r <= round]
+                waiters[:] = [w for w in waiters if w[1] > round]
+                if not waiters:
+                    del self.pending[txID]
+            subscribers = list(self.subscribers)
+
+        for future, response in resolved:
+            future.set_result(response)
+        for txID, future in expired:
+            self.expire(future, txID)
+        for subscriber in subscribers:
+            subscriber(round, responses)
+
+    def pendingInfo(self, txID: str) -> Dict[str, Any]:
+        try:
+            return self.client.pending_transaction_info(txID)
+        except error.AlgodHTTPError:
+            # not known to this node (yet)
+            return dict()
+
+    def expire(self, future: Future, txID: str) -> None:
+        try:
+            info = self.pendingInfo(txID)
+        except Exception:
+            # algod can't be reached, report the timeout
+            info = dict()
+        self.settle(future, txID, info, timedOut=True)
+
+    def settle(
+        self, future: Future, txID: str, info: Dict[str, Any], timedOut: bool
+    ) -> bool:
+        """Resolve the future from pending_transaction_info if it's final"""
+        if info.get("pool-error"):
+            future.set_exception(
+                error.TransactionRejectedError(
+                    "Transaction rejected: " + info["pool-error"]
+                )
+            )
+        elif info.get("confirmed-round", 0) > 0:
+            # confirmed before the tracker fetched its block, the round is new
+            getParamsProvider(self.client).observeRound(info["confirmed-round"])
+            future.set_result(PendingTxnResponse(info))
+        elif timedOut:
+            future.set_exception(
+                error.ConfirmationTimeoutError(
+                    "Wait for transaction id {} timed out".format(txID)
+                )
+            )
+        else:
+            return False
+        return True
+
+    def track(self, txID: str, waitRounds: int = 10) -> "Future[PendingTxnResponse]":
+        future: "Future[PendingTxnResponse]" = Future()
+        with self.lock:
+            self.start()
+            # a round of slack for the round in progress
+            deadline = time.monotonic() + (waitRounds + 1) * self.roundTime
+            waiter = (future, self.lastRound + waitRounds, deadline)
+            self.pending.setdefault(txID, []).append(waiter)
+            if self.reaper is None:
+                self.reaper = threading.Thread(target=self.reap, daemon=True)
+                self.reaper.start()
+            else:
+                self.deadlineChanged.notify()
+
+        # It may have been confirmed in a round the tracker already processed
+        info = self.pendingInfo(txID)
+        if info.get("pool-error") or info.get("confirmed-round", 0) > 0:
+            with self.lock:
+                waiters = self.pending.get(txID, [])
+                if waiter not in waiters:
+                    # resolved from a block in the meantime
+                    return future
+                waiters.remove(waiter)
+                if not waiters:
+                    del self.pending[txID]
+            self.settle(future, txID, info, timedOut=False)
+        return future
+
+    def wait(self, txID: str, waitRounds: int = 10) -> PendingTxnResponse:
+        return self.track(txID, waitRounds).result()
+
+
+trackers: "weakref.WeakKeyDictionary[AlgodClient, ConfirmationTracker]"
+trackers = weakref.WeakKeyDictionary()
+trackersLock = threading.Lock()
+
+
+def getConfirmationTracker(client: AlgodClient) -> ConfirmationTracker:
+    with trackersLock:
+        tracker = trackers.get(client)
+        if tracker is None:
+            tracker = ConfirmationTracker(client)
+            trackers[client] = tracker
+        return tracker
+
+
 def waitForTransaction(
     client: AlgodClient, txID: str, timeout: int = 10
 ) -> PendingTxnResponse:
-    return PendingTxnResponse(wait_for_confirmation(client, txID, timeout))
+    return getConfirmationTracker(client).wait(txID, timeout)
+
+
+def decodeABIResult(txID: str, info: Dict[str, Any], method: Method) -> ABIResult:
+    """Decode the return value logged by an ABI method call"""
+    rawValue = None
+    returnValue = None
+    decodeError = None
+    try:
+        if method.returns.type != Returns.VOID:
+            logs = info.get("logs", [])
+            result = b64decode(logs[-1]) if logs else b""
+            if result[:4] != ABI_RETURN_HASH:
+                raise error.AtomicTransactionComposerError(
+                    "app call transaction did not log a return value"
+                )
+            rawValue = result[4:]
+            returnValue = method.returns.type.decode(rawValue)
+    except Exception as e:
+        decodeError = e
+    return ABIResult(txID, rawValue, returnValue, decodeError, info, method)
+
+
+def executeComposer(
+    client: AlgodClient, atc: AtomicTransactionComposer, waitRounds: int = 2
+) -> AtomicTransactionResponse:
+    """Like atc.execute, but confirmed through the block tracker"""
+    txIDs = atc.submit(client)
+    tracker = getConfirmationTracker(client)
+    futures = {i: tracker.track(txIDs[i], waitRounds) for i in {0, *atc.method_dict}}
+    response = futures[0].result()
+    atc.status = AtomicTransactionComposerStatus.COMMITTED
+
+    results = []
+    for i, method in sorted(atc.method_dict.items()):
+        info = futures[i].result().raw
+        results.append(decodeABIResult(txIDs[i], info, method))
+
+    assert response.confirmedRound is not None
+    return AtomicTransactionResponse(response.confirmedRound, txIDs, results)
@@ -0,0 +1,289 @@
+import bisect
+import http.client
+import itertools
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+ROUND_ROBIN = "round-robin"
+LEAST_LATENCY = "least-latency"
+
+# Methods that can be sent again when a request fails
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Errors raised when a request never reached the server or got no response
+CONNECTION_ERRORS = (OSError, http.client.HTTPException)
+
+# Errors from sending on a keep-alive connection the server already closed
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+class LatencyHistogram:
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        # exponentially weighted moving average, used to pick endpoints
+        self.average: Optional[float] = None
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if self.average is None:
+            self.average = ms
+        else:
+            self.average = 0.8 * self.average + 0.2 * ms
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return (
+                    float(LATENCY_BUCKETS[i])
+                    if i < len(LATENCY_BUCKETS)
+                    else float("inf")
+                )
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": dict(
+                zip([str(b) for b in LATENCY_BUCKETS] + ["inf"], self.counts)
+            ),
+        }
+
+
+class Endpoint:
+    """One server address with a pool of keep-alive connections"""
+
+    def __init__(self, address: str, poolSize: int, timeout: float) -> None:
+        url = urlsplit(address)
+        self.address = address
+        self.https = url.scheme == "https"
+        self.host = url.hostname or "localhost"
+        self.port = url.port or (443 if self.https else 80)
+        self.basePath = url.path.rstrip("/")
+        self.poolSize = poolSize
+        self.timeout = timeout
+
+        self.idle: List[http.client.HTTPConnection] = []
+        self.lock = threading.Lock()
+        # guards the histogram and the failure count, updated from any thread
+        self.statsLock = threading.Lock()
+        self.latency = LatencyHistogram()
+        self.failures = 0
+
+    def connect(self) -> http.client.HTTPConnection:
+        if self.https:
+            return http.client.HTTPSConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """Return an idle connection if there is one, and whether it was reused"""
+        with self.lock:
+            if self.idle:
+                return self.idle.pop(), True
+        return self.connect(), False
+
+    def release(self, conn: http.client.HTTPConnection) -> None:
+        with self.lock:
+            if len(self.idle) < self.poolSize:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+    def observe(self, ms: float) -> None:
+        with self.statsLock:
+            self.latency.observe(ms)
+
+    def succeeded(self) -> None:
+        with self.statsLock:
+            self.failures = 0
+
+    def failed(self) -> None:
+        with self.statsLock:
+            self.failures += 1
+
+    def health(self) -> Tuple[int, float]:
+        """Failures in a row and average latency, lower is better"""
+        with self.statsLock:
+            return self.failures, self.latency.average or 0.0
+
+    def snapshot(self) -> Dict[str, object]:
+        with self.statsLock:
+            return self.latency.snapshot()
+
+
+class Transport:
+    """Sends requests over pooled connections to one of several endpoints.
+
+    Idempotent requests that fail to connect or get a 5xx response are sent
+    again, to the next endpoint when there is more than one, after a jittered
+    exponential backoff. Other requests are only sent again when they failed
+    on a reused connection the server had already closed.
+
+    Only stateless requests are spread over the endpoints. Pinned requests
+    all go to one endpoint, for state a node keeps between requests, like
+    KMD wallet handles or the transactions in algod's pool. The pin moves to
+    another endpoint when a request to the pinned one fails.
+    """
+
+    def __init__(
+        self,
+        addresses: List[str],
+        selection: str = ROUND_ROBIN,
+        poolSize: int = 8,
+        timeout: float = 30.0,
+        retries: int = 3,
+        backoff: float = 0.1,
+        maxBackoff: float = 2.0,
+    ) -> None:
+        if not addresses:
+            raise ValueError("At least one endpoint address is required")
+        if selection not in (ROUND_ROBIN, LEAST_LATENCY):
+            raise ValueError("Unknown endpoint selection: {}".format(selection))
+
+        self.endpoints = [Endpoint(a, poolSize, timeout) for a in addresses]
+        self.selection = selection
+        self.retries = retries
+        self.backoff = backoff
+        self.maxBackoff = maxBackoff
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.pinned = self.endpoints[0]
+
+    def choose(self, exclude: Optional[Endpoint] = None) -> Endpoint:
+        candidates = [e for e in self.endpoints if e is not exclude] or self.endpoints
+        if self.selection == LEAST_LATENCY:
+            # endpoints without samples go first, failing ones last
+            return min(candidates, key=lambda e: e.health())
+        return candidates[next(self.counter) % len(candidates)]
+
+    def repin(self, failed: Endpoint) -> Endpoint:
+        """Move the pin off the failed endpoint, returns the pinned one"""
+        with self.lock:
+            if self.pinned is failed:
+                self.pinned = self.choose(exclude=failed)
+            return self.pinned
+
+    def first(self, pinned: bool) -> Endpoint:
+        """Endpoint for the first attempt of a request"""
+        return self.pinned if pinned else self.choose()
+
+    def retry(
+        self, endpoint: Endpoint, method: str, attempt: int, pinned: bool
+    ) -> Optional[Endpoint]:
+        """Record a failed attempt, returns the endpoint for the next one or
+        None when the request should not be sent again"""
+        self.failed(endpoint, pinned)
+        if method not in IDEMPOTENT_METHODS or attempt >= self.retries:
+            return None
+        return self.pinned if pinned else self.choose(exclude=endpoint)
+
+    def delay(self, attempt: int) -> float:
+        """Jittered exponential backoff before the attempt after this one"""
+        return random.uniform(0, min(self.maxBackoff, self.backoff * 2**attempt))
+
+    def sleep(self, attempt: int) -> None:
+        time.sleep(self.delay(attempt))
+
+    def send(
+        self,
+        endpoint: Endpoint,
+        method: str,
+        path: str,
+        body: Optional[bytes],
+        headers: Dict[str, str],
+    ) -> Tuple[int, bytes]:
+        while True:
+            conn, reused = endpoint.acquire()
+            start = time.perf_counter()
+            try:
+                conn.request(method, endpoint.basePath + path, body, headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if reused:
+                    # the server closed the idle connection, try a fresh one
+                    continue
+                raise
+            except CONNECTION_ERRORS:
+                conn.close()
+                raise
+
+            endpoint.observe((time.perf_counter() - start) * 1000)
+            if resp.will_close:
+                conn.close()
+            else:
+                endpoint.release(conn)
+            return resp.status, data
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        pinned: bool = False,
+    ) -> Tuple[int, bytes]:
+        endpoint = self.first(pinned)
+        attempt = 0
+        while True:
+            try:
+                status, data = self.send(endpoint, method, path, body, headers or {})
+            except CONNECTION_ERRORS:
+                nextEndpoint = self.retry(endpoint, method, attempt, pinned)
+                if nextEndpoint is None:
+                    raise
+            else:
+                if status < 500:
+                    endpoint.succeeded()
+                    return status, data
+                nextEndpoint = self.retry(endpoint, method, attempt, pinned)
+                if nextEndpoint is None:
+                    return status, data
+
+            self.sleep(attempt)
+            attempt += 1
+            endpoint = nextEndpoint
+
+    def failed(self, endpoint: Endpoint, pinned: bool) -> None:
+        endpoint.failed()
+        if pinned:
+            self.repin(endpoint)
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        """Latency histogram of every endpoint, keyed by address"""
+        return {e.address: e.snapshot() for e in self.endpoints}
+
+    def close(self) -> None:
+        for endpoint in self.endpoints:
+            endpoint.close()
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from royalty_enforcer import aio
+from royalty_enforcer.utils.accounts import getBalances, getTemporaryAccount
+from royalty_enforcer.utils.assets import mintNFT
+from royalty_enforcer.utils.clients import BACKEND, getAlgodClient, getKmdClient
+
+if BACKEND == "emulator":
+    pytest.skip("the async client talks HTTP to algod", allow_module_level=True)
+
+
+def test_async_policy():
+    creator = getTemporaryAccount(getAlgodClient(), getKmdClient())
+    royalty = getTemporaryAccount(getAlgodClient(), getKmdClient())
+
+    async def run():
+        async with aio.AsyncAlgodClient() as client:
+            enforcer = await aio.deployEnforcer(client, creator)
+            await aio.setEnforcerPolicy(
+                client, enforcer, creator, 1000, royalty.getAddress()
+            )
+            return await asyncio.gather(
+                aio.getEnforcerPolicy(client, enforcer, creator),
+                aio.getEnforcerAdmin(client, enforcer, creator),
+            )
+
+    policy, admin = asyncio.run(run())
+    assert policy == (royalty.getAddress(), 1000)
+    assert admin == creator.getAddress()
+
+
+def test_async_list_and_buy():
+    creator = getTemporaryAccount(getAlgodClient(), getKmdClient())
+    seller = getTemporaryAccount(getAlgodClient(), getKmdClient())
+    royalty = getTemporaryAccount(getAlgodClient(), getKmdClient())
+    buyer = getTemporaryAccount(getAlgodClient(), getKmdClient())
+
+    async def run():
+        async with aio.AsyncAlgodClient() as client:
+            enforcer = await aio.deployEnforcer(client, creator)
+            marketplace = await aio.deployMarketplace(client, creator)
+            await aio.setEnforcerPolicy(
+                client, enforcer, creator, 1000, royalty.getAddress()
+            )
+            # offers and listings live in the seller's local state
+            await aio.optInToEnforcer(client, enforcer, seller)
+            await aio.optInToMarketplace(client, marketplace, seller)
+
+            nftID = mintNFT(getAlgodClient(), seller, enforcer.address)
+            await aio.marketplaceListNFT(
+                client, enforcer, marketplace, seller, nftID, 1, 1_000_000
+            )
+            await aio.marketplaceBuyNFT(
+                client,
+                enforcer,
+                marketplace,
+                seller.getAddress(),
+                royalty.getAddress(),
+                buyer,
+                nftID,
+                1,
+                1_000_000,
+            )
+            return nftID
+
+    nftID = asyncio.run(run())
+    assert getBalances(getAlgodClient(), buyer.getAddress())[nftID] == 1
+    assert getBalances(getAlgodClient(), seller.getAddress())[nftID] == 0
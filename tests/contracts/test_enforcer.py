@@ -1,19 +1,28 @@
+import pytest
+from algosdk import error
+
 from royalty_enforcer.utils.accounts import getBalances, getTemporaryAccount
 from royalty_enforcer.utils.apps import (
+    buildEnforcerTransferBatch,
     deployEnforcer,
+    deployEnforcers,
     enforcerRoyaltyFreeMove,
     enforcerTransfer,
+    enforcerTransferBatch,
     getAppGlobalState,
     getEnforcerAdmin,
     getEnforcerOffer,
     getEnforcerPolicy,
+    optInToEnforcer,
     setEnforcerAdmin,
     setEnforcerOffer,
+    setEnforcerOffers,
     setEnforcerPolicy,
 )
 from royalty_enforcer.utils.assets import mintNFT, optInToNFT
 from royalty_enforcer.utils.clients import getAlgodClient, getKmdClient
-from royalty_enforcer.utils.transactions import ZERO_ADDR
+from royalty_enforcer.utils.params import getSuggestedParams
+from royalty_enforcer.utils.transactions import ZERO_ADDR, executeComposer
 
 
 def test_create_enforcer():
@@ -28,6 +37,25 @@ def test_create_enforcer():
     assert actual == expected
 
 
+def test_deploy_enforcers():
+    client = getAlgodClient()
+    kmd = getKmdClient()
+    creator = getTemporaryAccount(client, kmd)
+
+    # stays within the per-account limit of created apps on older protocols,
+    # but still needs more than one funding group
+    apps, failures = deployEnforcers(client, creator, 10)
+
+    assert failures == {}
+    assert len({app.id for app in apps}) == 10
+    for app in apps:
+        assert getAppGlobalState(client, app.id) == {
+            b"administrator": creator.getDecodedAddress(),
+        }
+        assert getBalances(client, app.address)[0] >= 1_000_000
+        client.account_application_info(creator.getAddress(), app.id)
+
+
 def test_set_policy():
     client = getAlgodClient()
     kmd = getKmdClient()
@@ -100,6 +128,35 @@ def test_create_offer():
     ) == (auth_seller.getAddress(), 1)
 
 
+def test_create_offers():
+    client = getAlgodClient()
+    kmd = getKmdClient()
+    creator = getTemporaryAccount(client, kmd)
+    royalty = getTemporaryAccount(client, kmd)
+    auth_seller = getTemporaryAccount(client, kmd)
+    enforcer = deployEnforcer(client, creator)
+    nftAssetIDs = [mintNFT(client, creator, enforcer.address) for _ in range(3)]
+
+    setEnforcerPolicy(client, enforcer, creator, 1000, royalty.getAddress())
+
+    offers = [
+        (nftAssetID, 1, auth_seller.getAddress(), 0, ZERO_ADDR)
+        for nftAssetID in nftAssetIDs
+    ]
+    # Skip the first offer, as if resuming an interrupted run
+    results = list(
+        setEnforcerOffers(client, enforcer, creator, offers, start=1, maxInFlight=1)
+    )
+
+    assert [r.index for r in results] == [1, 2]
+    assert [r.nftID for r in results] == nftAssetIDs[1:]
+    assert all(r.error is None and r.confirmedRound > 0 for r in results)
+    for nftAssetID in nftAssetIDs[1:]:
+        assert getEnforcerOffer(
+            client, enforcer, creator, nftAssetID, creator.getAddress()
+        ) == (auth_seller.getAddress(), 1)
+
+
 def test_royalty_free_move():
     client = getAlgodClient()
     kmd = getKmdClient()
@@ -196,3 +253,122 @@ def test_transfer():
 
     assert seller_balances[nftAssetID] == 0
     assert buyer_balances[nftAssetID] == 1
+
+
+def offerForBatch(client, enforcer, owners, buyer):
+    """Mint an NFT for each owner and offer it to the buyer"""
+    nftIDs = []
+    for owner in owners:
+        nftID = mintNFT(client, owner, enforcer.address)
+        setEnforcerOffer(
+            client, enforcer, owner, nftID, 1, buyer.getAddress(), 0, ZERO_ADDR
+        )
+        optInToNFT(client, buyer, nftID)
+        nftIDs.append(nftID)
+    return nftIDs
+
+
+def test_transfer_batch():
+    client = getAlgodClient()
+    kmd = getKmdClient()
+    creator = getTemporaryAccount(client, kmd)
+    seller = getTemporaryAccount(client, kmd)
+    royalty = getTemporaryAccount(client, kmd)
+    buyer = getTemporaryAccount(client, kmd)
+
+    enforcer = deployEnforcer(client, creator)
+    setEnforcerPolicy(client, enforcer, creator, 1000, royalty.getAddress())
+    optInToEnforcer(client, enforcer, seller)
+    owners = [creator, seller, creator]
+    nftIDs = offerForBatch(client, enforcer, owners, buyer)
+
+    before = {
+        account.getAddress(): getBalances(client, account.getAddress())[0]
+        for account in (creator, seller, royalty)
+    }
+    enforcerBefore = getBalances(client, enforcer.address)[0]
+
+    # 1_000_005 paid, 10% royalty on all of it is 100_000
+    prices = [100_000, 200_000, 700_005]
+    enforcerTransferBatch(
+        client,
+        enforcer,
+        buyer,
+        [
+            (nftID, 1, owner.getAddress(), price)
+            for nftID, owner, price in zip(nftIDs, owners, prices)
+        ],
+        royalty.getAddress(),
+    )
+
+    for nftID in nftIDs:
+        assert getBalances(client, buyer.getAddress())[nftID] == 1
+    assert getBalances(client, royalty.getAddress())[0] == (
+        before[royalty.getAddress()] + 100_000
+    )
+    assert getBalances(client, seller.getAddress())[0] == (
+        before[seller.getAddress()] + 180_000
+    )
+    # 90_000 for the first asset, the last one gets what is left
+    assert getBalances(client, creator.getAddress())[0] == (
+        before[creator.getAddress()] + 90_000 + 630_005
+    )
+    # the call fees pay for the inner transactions, nothing stays behind
+    assert getBalances(client, enforcer.address)[0] == enforcerBefore
+
+
+def test_transfer_batch_remainder_underflow():
+    client = getAlgodClient()
+    kmd = getKmdClient()
+    creator = getTemporaryAccount(client, kmd)
+    royalty = getTemporaryAccount(client, kmd)
+    buyer = getTemporaryAccount(client, kmd)
+
+    enforcer = deployEnforcer(client, creator)
+    setEnforcerPolicy(client, enforcer, creator, 1000, royalty.getAddress())
+    nftIDs = offerForBatch(client, enforcer, [creator] * 3, buyer)
+
+    atc = buildEnforcerTransferBatch(
+        getSuggestedParams(client),
+        enforcer,
+        buyer,
+        [
+            (nftID, 1, creator.getAddress(), price)
+            for nftID, price in zip(nftIDs, [1_000_000, 1_000_000, 1])
+        ],
+        royalty.getAddress(),
+    )
+    # the first owner's 900_000 leaves nothing of the payment for the second
+    atc.txn_list[0].txn.amt = 1_000_000
+    with pytest.raises(error.AlgodHTTPError, match="would result negative"):
+        executeComposer(client, atc)
+
+    for nftID in nftIDs:
+        assert getBalances(client, buyer.getAddress())[nftID] == 0
+
+
+def test_transfer_batch_out_of_order():
+    client = getAlgodClient()
+    kmd = getKmdClient()
+    creator = getTemporaryAccount(client, kmd)
+    royalty = getTemporaryAccount(client, kmd)
+    buyer = getTemporaryAccount(client, kmd)
+
+    enforcer = deployEnforcer(client, creator)
+    setEnforcerPolicy(client, enforcer, creator, 1000, royalty.getAddress())
+    nftIDs = offerForBatch(client, enforcer, [creator] * 3, buyer)
+
+    atc = buildEnforcerTransferBatch(
+        getSuggestedParams(client),
+        enforcer,
+        buyer,
+        [(nftID, 1, creator.getAddress(), 100_000) for nftID in nftIDs],
+        royalty.getAddress(),
+    )
+    # a call ahead of the payment
+    atc.txn_list[0], atc.txn_list[1] = atc.txn_list[1], atc.txn_list[0]
+    with pytest.raises(error.AlgodHTTPError, match="assert failed"):
+        executeComposer(client, atc)
+
+    for nftID in nftIDs:
+        assert getBalances(client, buyer.getAddress())[nftID] == 0
@@ -1,15 +1,19 @@
+import pytest
+from algosdk import error
 from algosdk.encoding import is_valid_address
 from royalty_enforcer.utils.accounts import getBalances, getTemporaryAccount
 from royalty_enforcer.utils.apps import (
     deployEnforcer,
     deployMarketplace,
-    getAppGlobalState,
     marketplaceBuyNFT,
     marketplaceListNFT,
+    optInToEnforcer,
+    optInToMarketplace,
     setEnforcerPolicy,
 )
 from royalty_enforcer.utils.assets import mintNFT
 from royalty_enforcer.utils.clients import getAlgodClient, getKmdClient
+from royalty_enforcer.utils.readers import readMarketplaceListing
 
 
 def test_deploy_marketplace():
@@ -31,18 +35,11 @@ def test_list_nft():
     nftID = mintNFT(client, sender, enforcer.address)
 
     setEnforcerPolicy(client, enforcer, sender, 1000, royalty.getAddress())
+    optInToMarketplace(client, marketplace, sender)
     marketplaceListNFT(client, enforcer, marketplace, sender, nftID, 1, 10_000_000)
 
-    actual = getAppGlobalState(client, marketplace.id)
-    expected = {
-        b"app": enforcer.id,
-        b"asset": nftID,
-        b"amount": 1,
-        b"price": 10_000_000,
-        b"account": sender.getDecodedAddress(),
-    }
-
-    assert actual == expected
+    actual = readMarketplaceListing(client, marketplace, nftID, sender.getAddress())
+    assert actual == (enforcer.id, 1, 10_000_000)
 
 
 def test_buy_nft():
@@ -60,6 +57,7 @@ def test_buy_nft():
     price = 1_000_000
 
     setEnforcerPolicy(client, enforcer, sender, basisPoints, royalty.getAddress())
+    optInToMarketplace(client, marketplace, sender)
     marketplaceListNFT(client, enforcer, marketplace, sender, nftID, amount, price)
     marketplaceBuyNFT(
         client,
@@ -79,6 +77,63 @@ def test_buy_nft():
     assert sellerBalances[nftID] == 0
 
 
+def test_marketplace_holds_listings_of_many_sellers():
+    client = getAlgodClient()
+    kmd = getKmdClient()
+    creator = getTemporaryAccount(client, kmd)
+    royalty = getTemporaryAccount(client, kmd)
+    buyer = getTemporaryAccount(client, kmd)
+    sellers = [creator, getTemporaryAccount(client, kmd)]
+
+    enforcer = deployEnforcer(client, creator)
+    marketplace = deployMarketplace(client, creator)
+    setEnforcerPolicy(client, enforcer, creator, 1000, royalty.getAddress())
+    optInToEnforcer(client, enforcer, sellers[1])
+
+    listed = []
+    for seller in sellers:
+        optInToMarketplace(client, marketplace, seller)
+        for price in (1_000_000, 2_000_000):
+            nftID = mintNFT(client, seller, enforcer.address)
+            marketplaceListNFT(client, enforcer, marketplace, seller, nftID, 1, price)
+            listed.append((seller, nftID, price))
+
+    seller, nftID, price = listed[1]
+    # the price of another listing doesn't buy this one
+    with pytest.raises(error.AlgodHTTPError):
+        marketplaceBuyNFT(
+            client,
+            enforcer,
+            marketplace,
+            seller.getAddress(),
+            royalty.getAddress(),
+            buyer,
+            nftID,
+            1,
+            listed[0][2],
+        )
+    marketplaceBuyNFT(
+        client,
+        enforcer,
+        marketplace,
+        seller.getAddress(),
+        royalty.getAddress(),
+        buyer,
+        nftID,
+        1,
+        price,
+    )
+
+    assert getBalances(client, buyer.getAddress())[nftID] == 1
+    with pytest.raises(Exception, match="No listing"):
+        readMarketplaceListing(client, marketplace, nftID, seller.getAddress())
+    # the other listings are still there
+    for seller, nftID, price in listed[:1] + listed[2:]:
+        assert readMarketplaceListing(
+            client, marketplace, nftID, seller.getAddress()
+        ) == (enforcer.id, 1, price)
+
+
 def test_delist_nft():
     # TODO: implement
     pass
@@ -0,0 +1,73 @@
+from royalty_enforcer.utils.accounts import getTemporaryAccount
+from royalty_enforcer.utils.apps import (
+    deployEnforcer,
+    getEnforcerAdmin,
+    getEnforcerOffer,
+    getEnforcerPolicy,
+    setEnforcerAdmin,
+    setEnforcerOffer,
+    setEnforcerPolicy,
+)
+from royalty_enforcer.utils.assets import mintNFT
+from royalty_enforcer.utils.clients import getAlgodClient, getKmdClient
+from royalty_enforcer.utils.readers import (
+    dryrunEnforcerAdmin,
+    dryrunEnforcerOffer,
+    dryrunEnforcerPolicy,
+    readEnforcerAdmin,
+    readEnforcerOffer,
+    readEnforcerPolicy,
+)
+from royalty_enforcer.utils.transactions import ZERO_ADDR
+
+
+def test_policy_parity():
+    client = getAlgodClient()
+    kmd = getKmdClient()
+    creator = getTemporaryAccount(client, kmd)
+    royalty = getTemporaryAccount(client, kmd)
+    enforcer = deployEnforcer(client, creator)
+
+    setEnforcerPolicy(client, enforcer, creator, 1000, royalty.getAddress())
+
+    expected = getEnforcerPolicy(client, enforcer, creator)
+    assert expected == (royalty.getAddress(), 1000)
+    assert readEnforcerPolicy(client, enforcer) == expected
+    assert dryrunEnforcerPolicy(client, enforcer, creator.getAddress()) == expected
+
+
+def test_admin_parity():
+    client = getAlgodClient()
+    kmd = getKmdClient()
+    creator = getTemporaryAccount(client, kmd)
+    admin = getTemporaryAccount(client, kmd)
+    enforcer = deployEnforcer(client, creator)
+
+    for _ in range(2):
+        expected = getEnforcerAdmin(client, enforcer, creator)
+        assert readEnforcerAdmin(client, enforcer) == expected
+        assert dryrunEnforcerAdmin(client, enforcer, creator.getAddress()) == expected
+
+        setEnforcerAdmin(client, enforcer, creator, admin.getAddress())
+        creator = admin
+
+
+def test_offer_parity():
+    client = getAlgodClient()
+    kmd = getKmdClient()
+    creator = getTemporaryAccount(client, kmd)
+    royalty = getTemporaryAccount(client, kmd)
+    auth = getTemporaryAccount(client, kmd)
+    enforcer = deployEnforcer(client, creator)
+    nftID = mintNFT(client, creator, enforcer.address)
+
+    setEnforcerPolicy(client, enforcer, creator, 1000, royalty.getAddress())
+    setEnforcerOffer(
+        client, enforcer, creator, nftID, 1, auth.getAddress(), 0, ZERO_ADDR
+    )
+
+    seller = creator.getAddress()
+    expected = getEnforcerOffer(client, enforcer, creator, nftID, seller)
+    assert expected == (auth.getAddress(), 1)
+    assert readEnforcerOffer(client, enforcer, nftID, seller) == expected
+    assert dryrunEnforcerOffer(client, enforcer, seller, nftID, seller) == expected
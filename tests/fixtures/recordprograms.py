@@ -0,0 +1,67 @@
+"""Record the bytecode algod assembles for each contract program.
+
+Compiles the approval and clear TEAL of every contract with PyTeal, sends it
+to the algod compile endpoint and writes the TEAL and the bytecode to
+tests/fixtures/algod_programs.json. tests/test_assembler.py checks the
+local assembler against the recording, so it runs without an algod.
+Re-record after changing a contract or upgrading algod:
+
+    python tests/fixtures/recordprograms.py
+
+Uses the algod configured with ROYALTY_ENFORCER_ALGOD_ADDRESS (the sandbox by
+default). The emulator assembles with the local assembler, so it is refused.
+"""
+
+import json
+import os
+import sys
+from base64 import b64encode
+from importlib import import_module
+from typing import Any, Dict
+
+sys.path.insert(
+    0,
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+)
+
+from royalty_enforcer.utils.apps import fullyCompileContract  # noqa: E402
+from royalty_enforcer.utils.artifacts import CONTRACTS  # noqa: E402
+from royalty_enforcer.utils.clients import BACKEND, getAlgodClient  # noqa: E402
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "algod_programs.json")
+
+
+def main() -> int:
+    if BACKEND == "emulator":
+        print("The emulator has no algod assembler to record", file=sys.stderr)
+        return 1
+
+    client = getAlgodClient()
+    build = client.versions()["build"]
+    recording: Dict[str, Any] = {
+        "algod-version": "{}.{}.{}".format(
+            build["major"], build["minor"], build["build_number"]
+        ),
+        "programs": {},
+    }
+    for name, spec in CONTRACTS.items():
+        module = import_module(spec.module)
+        for program, compiler in [
+            ("approval", spec.approvalCompiler),
+            ("clear", spec.clearCompiler),
+        ]:
+            teal = getattr(module, compiler)()
+            recording["programs"]["{}_{}".format(name, program)] = {
+                "teal": teal,
+                "program": b64encode(fullyCompileContract(client, teal)).decode(),
+            }
+
+    with open(FIXTURE_PATH, "w") as f:
+        json.dump(recording, f, indent=2)
+        f.write("\n")
+    print("Recorded {} programs to {}".format(len(recording["programs"]), FIXTURE_PATH))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
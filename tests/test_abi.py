@@ -0,0 +1,63 @@
+from base64 import b64encode
+
+from algosdk.account import address_from_private_key, generate_account
+from algosdk.atomic_transaction_composer import AtomicTransactionComposer
+from algosdk.encoding import encode_address
+from algosdk.future.transaction import SuggestedParams
+
+from royalty_enforcer.utils.abi import getMethod, getMethodIndex
+from royalty_enforcer.utils.accounts import Account
+from royalty_enforcer.utils.apps import App, enforcerABI
+
+SP = SuggestedParams(fee=1000, first=1, last=1000, gh=b64encode(bytes(32)).decode())
+
+
+def buildCall(app: App, sender: Account, methodName: str, args):
+    atc = AtomicTransactionComposer()
+    atc.add_method_call(
+        app.id,
+        app.getMethod(methodName),
+        sender.getAddress(),
+        SP,
+        sender.getSigner(),
+        args,
+    )
+    return atc.build_group()[0].txn.dictify()
+
+
+def toJSON(txn):
+    # algod JSON: byte slices in base64, addresses in base32
+    txn = dict(txn)
+    txn["apaa"] = [b64encode(a).decode() for a in txn["apaa"]]
+    txn["snd"] = encode_address(txn["snd"])
+    if "apat" in txn:
+        txn["apat"] = [encode_address(a) for a in txn["apat"]]
+    return txn
+
+
+def test_method_lookup():
+    index = getMethodIndex(enforcerABI)
+    method = getMethod(enforcerABI, "transfer")
+
+    assert index is getMethodIndex(enforcerABI)
+    assert method.name == "transfer"
+    assert index.getMethodBySelector(method.get_selector()) is method
+    assert index.getSelector("transfer") == method.get_selector()
+
+
+def test_decode_call():
+    app = App(1234, enforcerABI)
+    sender = Account(generate_account()[0])
+    seller = address_from_private_key(generate_account()[0])
+
+    txn = buildCall(app, sender, "offer", [42, 1, seller, 0, encode_address(bytes(32))])
+
+    for form in (txn, toJSON(txn)):
+        method, args = app.decodeCall(form)
+        assert method.name == "offer"
+        assert args == [42, 1, seller, 0, encode_address(bytes(32))]
+
+    txn = buildCall(app, sender, "get_offer", [42, seller])
+    method, args = app.decodeCall(toJSON(txn))
+    assert method.name == "get_offer"
+    assert args == [42, seller]
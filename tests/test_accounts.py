@@ -0,0 +1,216 @@
+import threading
+import time
+from base64 import b64encode
+
+import pytest
+from algosdk.account import generate_account
+from algosdk.future.transaction import SuggestedParams
+
+from royalty_enforcer.utils import accounts
+from royalty_enforcer.utils.accounts import Account, AccountPool
+
+FUNDERS = [Account(generate_account()[0]) for _ in range(3)]
+
+
+class FundingClient:
+    """Confirms every group it is sent and keeps the balances"""
+
+    def __init__(self) -> None:
+        self.groups = []
+        self.balances = dict()
+        self.lock = threading.Lock()
+
+    def suggested_params(self):
+        return SuggestedParams(
+            fee=0,
+            first=1,
+            last=1000,
+            gh=b64encode(bytes(32)).decode(),
+            min_fee=1000,
+        )
+
+    def send_transactions(self, signedTxns):
+        with self.lock:
+            self.groups.append(signedTxns)
+            for stxn in signedTxns:
+                txn = stxn.transaction
+                self.balances[txn.receiver] = txn.amt
+
+    def pending_transaction_info(self, txID):
+        return {"pool-error": "", "confirmed-round": 2, "txn": {}}
+
+    def status(self):
+        return {"last-round": 1}
+
+    def status_after_block(self, round):
+        time.sleep(0.01)
+        return {"last-round": 1}
+
+    def account_info(self, address):
+        return {"amount": self.balances.get(address, 0)}
+
+
+@pytest.fixture(autouse=True)
+def funders(monkeypatch):
+    monkeypatch.setattr(accounts, "kmdAccounts", FUNDERS)
+
+
+def test_pool_funds_in_parallel_groups():
+    client = FundingClient()
+    pool = AccountPool(client, None, size=40, low=10, path=None)
+
+    first = [pool.get() for _ in range(30)]
+    # senders rotate through the genesis accounts, at most 16 per group
+    assert [len(g) for g in client.groups] == [16, 16, 8]
+    senders = [g[0].transaction.sender for g in client.groups]
+    assert senders == [f.getAddress() for f in FUNDERS]
+
+    # dropping to the low mark refilled the pool in the background
+    pool.get()
+    while pool.refilling:
+        time.sleep(0.01)
+    assert pool.funded == 40 + 31
+    assert len({a.getAddress() for a in first}) == 30
+
+
+def test_pool_shares_accounts_between_threads():
+    client = FundingClient()
+    pool = AccountPool(client, None, size=8, low=2, path=None)
+
+    handedOut = []
+
+    def take():
+        for _ in range(10):
+            handedOut.append(pool.get().getAddress())
+
+    threads = [threading.Thread(target=take) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(handedOut)) == 40
+
+
+def test_pool_reuses_saved_accounts(tmp_path):
+    client = FundingClient()
+    path = str(tmp_path / "accounts")
+    pool = AccountPool(client, None, size=4, low=0, path=path)
+    used = pool.get()
+    pool.save()
+
+    # one saved account was drained since
+    left = open(path).read().split()
+    assert len(left) == 3 * 25
+    drained = Account.FromMnemonic(" ".join(left[:25]))
+    client.balances[drained.getAddress()] = 0
+
+    reused = AccountPool(client, None, size=4, low=0, path=path)
+    account = reused.get()
+    while reused.refilling:
+        time.sleep(0.01)
+    assert reused.reused == 2
+    assert reused.funded == 2
+    assert account.getAddress() != used.getAddress()
+    assert open(path).read() == ""
+
+
+class WalletKMD:
+    kmd_address = "http://localhost:4002"
+
+    def __init__(self, accounts) -> None:
+        self.keys = {a.getAddress(): a.getPrivateKey() for a in accounts}
+        self.handles = set()
+        self.calls = []
+
+    def list_wallets(self):
+        return [{"name": accounts.KMD_WALLET_NAME, "id": "wallet"}]
+
+    def init_wallet_handle(self, walletID, password):
+        self.calls.append("init")
+        handle = "handle-{}".format(len(self.handles))
+        self.handles.add(handle)
+        return handle
+
+    def renew_wallet_handle(self, handle):
+        self.calls.append("renew")
+        if handle not in self.handles:
+            raise Exception("handle expired")
+        return {}
+
+    def list_keys(self, handle):
+        assert handle in self.handles
+        return list(self.keys)
+
+    def export_key(self, handle, password, address):
+        self.calls.append("export")
+        return self.keys[address]
+
+
+def test_pool_without_file_does_not_save(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pool = AccountPool(FundingClient(), None, size=2, low=0, path="")
+    pool.get()
+    pool.save()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_genesis_keys_are_cached_across_processes(monkeypatch, tmp_path):
+    monkeypatch.setattr(accounts, "KMD_KEY_CACHE", str(tmp_path / "kmd.json"))
+    kmd = WalletKMD(FUNDERS)
+
+    def freshProcess():
+        monkeypatch.setattr(accounts, "kmdAccounts", None)
+        kmd.calls = []
+        return accounts.getGenesisAccounts(kmd)
+
+    assert [a.getAddress() for a in freshProcess()] == list(kmd.keys)
+    assert kmd.calls == ["init", "export", "export", "export"]
+
+    # the handle is renewed and nothing is exported again
+    assert [a.getAddress() for a in freshProcess()] == list(kmd.keys)
+    assert kmd.calls == ["renew"]
+
+    # keys the wallet no longer lists are dropped, new ones exported
+    added = Account(generate_account()[0])
+    del kmd.keys[FUNDERS[0].getAddress()]
+    kmd.keys[added.getAddress()] = added.getPrivateKey()
+    kmd.handles.clear()
+    assert [a.getAddress() for a in freshProcess()] == list(kmd.keys)
+    assert kmd.calls == ["renew", "init", "export"]
+
+
+def test_genesis_accounts_are_loaded_once_across_threads(monkeypatch):
+    monkeypatch.setattr(accounts, "KMD_KEY_CACHE", "")
+    monkeypatch.setattr(accounts, "kmdAccounts", None)
+    kmd = WalletKMD(FUNDERS)
+    listWallets = kmd.list_wallets
+
+    def slowListWallets():
+        time.sleep(0.05)
+        return listWallets()
+
+    kmd.list_wallets = slowListWallets
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(accounts.getGenesisAccounts(kmd))
+        )
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert kmd.calls == ["init", "export", "export", "export"]
+    assert all(result is results[0] for result in results)
+
+
+def test_pool_funds_from_given_funders():
+    client = FundingClient()
+    funder = Account(generate_account()[0])
+    pool = AccountPool(client, None, size=20, low=0, path=None, funders=[funder])
+
+    pool.get()
+    senders = {g[0].transaction.sender for g in client.groups}
+    assert senders == {funder.getAddress()}
@@ -0,0 +1,186 @@
+import asyncio
+from base64 import b64encode
+from typing import Tuple
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from aiohttp import web
+
+from royalty_enforcer import aio
+from royalty_enforcer.aio import AsyncAlgodClient, getArtifact
+from royalty_enforcer.utils import artifacts, cache
+from royalty_enforcer.utils.assembler import assemble
+from royalty_enforcer.utils.cache import CompileCache
+
+
+class FakeAlgod:
+    def __init__(self) -> None:
+        self.round = 1
+        self.waits = 0
+        self.params = 0
+        self.compiles = 0
+        self.confirmedRound = 3
+
+    async def status(self, request: web.Request) -> web.Response:
+        return web.json_response({"last-round": self.round})
+
+    async def waitForBlock(self, request: web.Request) -> web.Response:
+        self.waits += 1
+        await asyncio.sleep(0.01)
+        self.round = max(self.round, int(request.match_info["round"]) + 1)
+        return web.json_response({"last-round": self.round})
+
+    async def pending(self, request: web.Request) -> web.Response:
+        # every transaction is confirmed in confirmedRound
+        confirmed = self.confirmedRound if self.round >= self.confirmedRound else 0
+        return web.json_response({"pool-error": "", "confirmed-round": confirmed})
+
+    async def compile(self, request: web.Request) -> web.Response:
+        self.compiles += 1
+        program = assemble((await request.read()).decode())
+        return web.json_response({"hash": "", "result": b64encode(program).decode()})
+
+    async def transactionParams(self, request: web.Request) -> web.Response:
+        self.params += 1
+        return web.json_response(
+            {
+                "consensus-version": "future",
+                "fee": 0,
+                "genesis-hash": b64encode(bytes(32)).decode(),
+                "genesis-id": "sandnet-v1",
+                "last-round": self.round,
+                "min-fee": 1000,
+            }
+        )
+
+
+def test_confirmations_share_block_waits():
+    async def run() -> None:
+        algod = FakeAlgod()
+        app = web.Application()
+        app.router.add_get("/v2/status", algod.status)
+        app.router.add_get(
+            "/v2/status/wait-for-block-after/{round}", algod.waitForBlock
+        )
+        app.router.add_get("/v2/transactions/pending/{txid}", algod.pending)
+        app.router.add_get("/v2/transactions/params", algod.transactionParams)
+
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        try:
+            async with AsyncAlgodClient(
+                "token", ["http://127.0.0.1:{}".format(port)]
+            ) as client:
+                infos = await asyncio.gather(
+                    *[client.waitForConfirmation(str(i), 5) for i in range(200)]
+                )
+                assert all(info["confirmed-round"] == 3 for info in infos)
+                # one task waited for the blocks on behalf of all 200
+                assert algod.waits <= 3
+
+                sps = await asyncio.gather(
+                    *[client.suggestedParams() for _ in range(50)]
+                )
+                assert algod.params == 1
+                assert len({(sp.first, sp.last) for sp in sps}) == 1
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+async def serve(app: web.Application) -> Tuple[web.AppRunner, str]:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, "http://127.0.0.1:{}".format(port)
+
+
+def test_confirmation_after_idle_rounds():
+    async def run() -> None:
+        algod = FakeAlgod()
+        app = web.Application()
+        app.router.add_get("/v2/status", algod.status)
+        app.router.add_get(
+            "/v2/status/wait-for-block-after/{round}", algod.waitForBlock
+        )
+        app.router.add_get("/v2/transactions/pending/{txid}", algod.pending)
+        runner, address = await serve(app)
+
+        try:
+            async with AsyncAlgodClient("token", [address]) as client:
+                info = await client.waitForConfirmation("first", 3)
+                assert info["confirmed-round"] == 3
+
+                # the chain moves on while nobody is waiting
+                algod.round = 20
+                algod.confirmedRound = 21
+                info = await client.waitForConfirmation("second", 3)
+                assert info["confirmed-round"] == 21
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_requests_retry_on_the_next_endpoint():
+    async def unavailable(request: web.Request) -> web.Response:
+        return web.Response(status=503)
+
+    async def run() -> None:
+        algod = FakeAlgod()
+        busy = web.Application()
+        busy.router.add_get("/v2/status", unavailable)
+        healthy = web.Application()
+        healthy.router.add_get("/v2/status", algod.status)
+        runners = [await serve(busy), await serve(healthy)]
+
+        try:
+            async with AsyncAlgodClient(
+                "token", [address for _, address in runners], backoff=0.001
+            ) as client:
+                for _ in range(4):
+                    assert (await client.status())["last-round"] == 1
+                stats = client.stats()
+                assert stats[runners[1][1]]["count"] == 4
+                assert client.transport.endpoints[0].failures > 0
+        finally:
+            for runner, _ in runners:
+                await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_artifact_without_bundle_compiles_with_algod(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifacts, "BUNDLES_DIR", str(tmp_path))
+    monkeypatch.setattr(aio, "ASSEMBLER", "algod")
+    monkeypatch.setattr(cache, "compileCache", CompileCache(str(tmp_path / "cache")))
+
+    async def run() -> None:
+        algod = FakeAlgod()
+        app = web.Application()
+        app.router.add_post("/v2/teal/compile", algod.compile)
+        runner, address = await serve(app)
+
+        try:
+            async with AsyncAlgodClient("token", [address]) as client:
+                artifact = await getArtifact(client, "enforcer_placeholder")
+                # the programs come from the compile cache the second time
+                again = await getArtifact(client, "enforcer_placeholder")
+        finally:
+            await runner.cleanup()
+
+        assert algod.compiles == 2
+        assert again.approvalProgram == artifact.approvalProgram
+        assert artifact.assembler == "algod"
+        assert artifact.approvalProgram == assemble(artifact.approvalTeal)
+
+    asyncio.run(run())
@@ -0,0 +1,92 @@
+import json
+import subprocess
+import sys
+from base64 import b64encode
+
+import pytest
+from algosdk.account import generate_account
+from algosdk.future.transaction import SuggestedParams
+
+from royalty_enforcer.contracts.enforcer import (
+    compile_enforcer_approval,
+    compile_enforcer_clear,
+)
+from royalty_enforcer.utils import artifacts
+from royalty_enforcer.utils.accounts import Account
+from royalty_enforcer.utils.apps import assembleArtifact, buildAppCreate
+from royalty_enforcer.utils.artifacts import (
+    ArtifactError,
+    loadArtifact,
+    readABI,
+    writeArtifact,
+)
+from royalty_enforcer.utils.assembler import assemble
+
+
+@pytest.fixture
+def enforcerArtifact(tmp_path, monkeypatch):
+    data = assembleArtifact(
+        None, "enforcer", compile_enforcer_approval(), compile_enforcer_clear()
+    )
+
+    monkeypatch.setattr(artifacts, "BUNDLES_DIR", str(tmp_path))
+    monkeypatch.setattr(artifacts, "loadedArtifacts", dict())
+    writeArtifact(data)
+    return tmp_path
+
+
+def test_load_artifact(enforcerArtifact):
+    artifact = loadArtifact("enforcer")
+
+    assert artifact.approvalProgram == assemble(artifact.approvalTeal)
+    assert artifact.clearProgram == assemble(artifact.clearTeal)
+    assert artifact.globalSchema == (1, 2)
+    assert artifact.localSchema == (0, 16)
+    assert artifact.abi.name == "Enforcer ABI (ARC-18)"
+    assert artifact.assembler == "local"
+
+
+def test_locally_assembled_artifact_is_not_deployed(enforcerArtifact):
+    with pytest.raises(ArtifactError, match="assembled locally"):
+        buildAppCreate(
+            SuggestedParams(0, 1, 1000, b64encode(bytes(32)).decode()),
+            loadArtifact("enforcer"),
+            Account(generate_account()[0]),
+        )
+
+
+def test_read_abi_from_artifact(enforcerArtifact, tmp_path_factory, monkeypatch):
+    # Installed packages only ship the bundles
+    monkeypatch.setattr(artifacts, "ASSETS_DIR", str(tmp_path_factory.mktemp("empty")))
+
+    assert readABI("enforcer_abi.json")["name"] == "Enforcer ABI (ARC-18)"
+
+
+def test_load_stale_artifact(enforcerArtifact):
+    path = enforcerArtifact / "enforcer_artifact.json"
+    data = json.loads(path.read_text())
+    data["source-hash"] = "0" * 64
+    path.write_text(json.dumps(data))
+
+    with pytest.raises(ArtifactError):
+        loadArtifact("enforcer")
+
+
+def test_load_missing_artifact(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifacts, "BUNDLES_DIR", str(tmp_path))
+    with pytest.raises(ArtifactError):
+        loadArtifact("marketplace")
+
+
+def test_deploy_path_does_not_import_pyteal(enforcerArtifact):
+    code = """
+import sys
+from royalty_enforcer.utils.apps import getArtifact
+getArtifact(None, "enforcer")
+assert "pyteal" not in sys.modules
+"""
+    subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        env={"ROYALTY_ENFORCER_BUNDLES": str(enforcerArtifact)},
+    )
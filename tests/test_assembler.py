@@ -0,0 +1,99 @@
+import json
+import os
+from base64 import b64decode
+from typing import Any, Dict
+
+import pytest
+from algosdk.encoding import encode_address
+
+from royalty_enforcer.utils.apps import DEPLOY_LOCAL_PROGRAMS
+from royalty_enforcer.utils.artifacts import CONTRACTS
+from royalty_enforcer.utils.assembler import AssemblerError, assemble
+
+ALGOD_PROGRAMS_PATH = os.path.join(
+    os.path.dirname(__file__), "fixtures", "algod_programs.json"
+)
+
+
+def test_assemble_singleton_is_pushed():
+    assert assemble("#pragma version 6\nint 1\nreturn\n") == bytes.fromhex("06810143")
+
+
+def test_assemble_constant_block_ordered_by_frequency():
+    teal = """#pragma version 6
+byte "a"
+pop
+int 7
+int 5
+int 5
++
+==
+return
+"""
+    expected = bytes.fromhex(
+        "06"  # version
+        "200105"  # intcblock 5
+        "80016148"  # pushbytes "a"; pop
+        "8107"  # pushint 7
+        "222208"  # intc_0; intc_0; +
+        "1243"  # ==; return
+    )
+    assert assemble(teal) == expected
+
+
+def test_assemble_branches_and_fields():
+    teal = """#pragma version 6
+txn OnCompletion
+int NoOp
+==
+bnz main_l2
+err
+main_l2:
+txna ApplicationArgs 0
+method "get_policy()(address,uint64)"
+==
+assert
+addr {}
+global ZeroAddress
+==
+return
+""".format(
+        encode_address(bytes(32))
+    )
+    program = assemble(teal)
+
+    # OnCompletion is field 25, ZeroAddress is global field 3
+    assert program[:4] == bytes.fromhex("06311981")
+    assert bytes.fromhex("400001" "00" "361a00") in program
+    assert bytes.fromhex("320312") in program
+
+
+def test_assemble_rejects_unknown_opcode():
+    with pytest.raises(AssemblerError):
+        assemble("#pragma version 6\nfrobnicate\n")
+
+
+def recordedPrograms() -> Dict[str, Any]:
+    if not os.path.exists(ALGOD_PROGRAMS_PATH):
+        message = "{} is missing, record it with tests/fixtures/recordprograms.py"
+        if DEPLOY_LOCAL_PROGRAMS:
+            pytest.fail(message.format(ALGOD_PROGRAMS_PATH))
+        # Locally assembled programs are refused by buildAppCreate until then
+        pytest.xfail(message.format(ALGOD_PROGRAMS_PATH))
+    with open(ALGOD_PROGRAMS_PATH) as f:
+        return json.load(f)["programs"]
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        "{}_{}".format(contract, program)
+        for contract in CONTRACTS
+        for program in ("approval", "clear")
+    ],
+)
+def test_assemble_matches_algod(name):
+    # Recorded from algod by tests/fixtures/recordprograms.py
+    recorded = recordedPrograms().get(name)
+    assert recorded is not None, "no algod recording of {}".format(name)
+    assert assemble(recorded["teal"]) == b64decode(recorded["program"])
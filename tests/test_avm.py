@@ -0,0 +1,153 @@
+import pytest
+
+from royalty_enforcer.utils.assembler import assemble
+from royalty_enforcer.utils.avm import (
+    APP_BUDGET,
+    Budget,
+    EvalContext,
+    EvalError,
+    EvalTxn,
+    Evaluation,
+    Program,
+    opCost,
+)
+
+
+class StateContext(EvalContext):
+    """A single app call with its global state in a dict"""
+
+    def __init__(self, appCalls: int = 1) -> None:
+        self.txn = EvalTxn({"type": "appl", "snd": bytes(32), "apid": 1})
+        self.group = [self.txn]
+        self.appID = 1
+        self.appAddress = bytes(32)
+        self.creator = bytes(32)
+        self.callerAppID = 0
+        self.round = 1
+        self.timestamp = 0
+        self.budget = Budget(appCalls)
+        self.depth = 0
+        self.createdAssets = []
+        self.createdApps = []
+        self.state = dict()
+
+    def globalGet(self, appID, key):
+        return self.state.get(key)
+
+    def globalPut(self, key, value):
+        self.state[key] = value
+
+
+def evaluate(body: str, cx=None):
+    cx = cx or StateContext()
+    evaluation = Evaluation(Program(assemble("#pragma version 6\n" + body)), cx)
+    return evaluation.run(), evaluation
+
+
+def test_branches_and_subroutines():
+    approved, evaluation = evaluate(
+        """int 3
+callsub double
+int 6
+==
+bnz ok
+err
+ok:
+int 1
+return
+double:
+dup
++
+retsub
+"""
+    )
+    assert approved
+    assert evaluation.callstack == []
+
+
+def test_global_state_round_trip():
+    cx = StateContext()
+    approved, _ = evaluate(
+        """byte "n"
+int 41
+app_global_put
+byte "n"
+app_global_get
+int 1
++
+int 42
+==
+""",
+        cx,
+    )
+    assert approved
+    assert cx.state == {b"n": 41}
+
+
+def test_wide_math():
+    # (2^64 - 1)^2 / 3 in 128 bit math, dropping the remainder
+    quotient = (2**64 - 1) ** 2 // 3
+    approved, _ = evaluate(
+        """int 18446744073709551615
+dup
+mulw
+int 0
+int 3
+divmodw
+pop
+pop
+int {}
+==
+swap
+int {}
+==
+&&
+""".format(
+            quotient & (2**64 - 1), quotient >> 64
+        )
+    )
+    assert approved
+
+
+def test_extract_and_hash_cost():
+    approved, evaluation = evaluate(
+        """byte "royalty"
+extract 1 3
+sha256
+len
+int 32
+==
+"""
+    )
+    assert approved
+    assert evaluation.cost == opCost("sha256") + 5
+
+
+def test_failures_report_the_pc():
+    with pytest.raises(EvalError) as failure:
+        evaluate("int 1\nint 2\n==\nassert\nint 1\n")
+    # after the version, intcblock 1, intc_0, pushint 2 and ==
+    assert str(failure.value) == "pc=8 assert failed"
+
+    with pytest.raises(EvalError, match="- would result negative"):
+        evaluate("int 1\nint 2\n-\n")
+
+
+def test_budget_is_pooled_across_app_calls():
+    loop = """int 0
+loop:
+int 1
++
+dup
+int 200
+<
+bnz loop
+"""
+    # 6 opcodes per iteration, 200 iterations don't fit in one app call
+    with pytest.raises(EvalError, match="dynamic cost budget exceeded"):
+        evaluate(loop)
+
+    cx = StateContext(appCalls=2)
+    approved, _ = evaluate(loop, cx)
+    assert approved
+    assert cx.budget.remaining == 2 * APP_BUDGET - 1 - 6 * 200
@@ -0,0 +1,59 @@
+import os
+import time
+from base64 import b64encode
+
+from royalty_enforcer.utils import cache
+from royalty_enforcer.utils.apps import compileProgram, compileTeal
+from royalty_enforcer.utils.cache import CompileCache
+
+
+class CountingClient:
+    def __init__(self) -> None:
+        self.compiled = 0
+
+    def compile(self, teal: str):
+        self.compiled += 1
+        return {"result": b64encode(teal.encode()).decode()}
+
+
+def test_cache_roundtrip(tmp_path):
+    c = CompileCache(str(tmp_path))
+    assert c.get("missing") is None
+
+    c.put("key", b"value")
+    assert c.get("key") == b"value"
+
+    # a fresh instance reads the entry back from disk
+    assert CompileCache(str(tmp_path)).get("key") == b"value"
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    c = CompileCache(str(tmp_path), maxBytes=20)
+    c.put("a", b"0123456789")
+    past = time.time() - 60
+    os.utime(c.path("a"), (past, past))
+    c.put("b", b"0123456789")
+    past = time.time() - 30
+    os.utime(c.path("b"), (past, past))
+
+    # reading "a" makes it the most recently used entry
+    assert CompileCache(str(tmp_path), maxBytes=20).get("a") == b"0123456789"
+
+    c.put("c", b"0123456789")
+    assert sorted(os.listdir(tmp_path)) == ["a", "c"]
+
+
+def test_compile_program_is_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "compileCache", CompileCache(str(tmp_path)))
+    client = CountingClient()
+
+    teal = compileTeal("royalty_enforcer.contracts.enforcer", "compile_enforcer_clear")
+    first = compileProgram(client, teal)
+    assert client.compiled == 1
+
+    # new process: nothing in memory, but everything on disk
+    monkeypatch.setattr(cache, "compileCache", CompileCache(str(tmp_path)))
+    teal = compileTeal("royalty_enforcer.contracts.enforcer", "compile_enforcer_clear")
+    second = compileProgram(client, teal)
+    assert client.compiled == 1
+    assert first == second
@@ -0,0 +1,124 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from algosdk.error import AlgodHTTPError
+
+from royalty_enforcer.utils.clients import PooledAlgodClient
+from royalty_enforcer.utils.transport import LEAST_LATENCY, Transport
+
+
+class FakeAlgod(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        server = self.server
+        server.ports.add(self.client_address[1])
+        server.paths.append(self.path)
+        if server.failures > 0:
+            server.failures -= 1
+            self.reply(503, {"message": "busy"})
+        elif self.path == "/v2/status":
+            self.reply(200, {"last-round": 42})
+        elif self.path.startswith("/v2/transactions/pending/"):
+            self.reply(200, {"pool-error": "", "confirmed-round": 42})
+        else:
+            self.reply(404, {"message": "not found"})
+
+    def do_POST(self) -> None:
+        self.server.paths.append(self.path)
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.reply(200, {"txId": "TXID"})
+
+
+@pytest.fixture
+def algod():
+    servers = []
+
+    def start(failures: int = 0) -> str:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakeAlgod)
+        server.daemon_threads = True
+        server.ports = set()
+        server.paths = []
+        server.failures = failures
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def address(server) -> str:
+    return "http://127.0.0.1:{}".format(server.server_address[1])
+
+
+def test_connections_are_reused(algod):
+    server = algod()
+    client = PooledAlgodClient("token", Transport([address(server)]))
+
+    for _ in range(5):
+        assert client.status() == {"last-round": 42}
+    assert len(server.ports) == 1
+    assert client.transport.stats()[address(server)]["count"] == 5
+
+    with pytest.raises(AlgodHTTPError) as e:
+        client.algod_request("GET", "/missing")
+    assert e.value.code == 404
+
+
+def test_retry_on_server_error(algod):
+    busy = algod(failures=100)
+    healthy = algod()
+    transport = Transport(
+        [address(busy), address(healthy)], selection=LEAST_LATENCY, backoff=0.001
+    )
+    client = PooledAlgodClient("token", transport)
+
+    assert client.status() == {"last-round": 42}
+    # the failing node is avoided from then on
+    assert client.status() == {"last-round": 42}
+    assert transport.endpoints[0].latency.count == 1
+    assert transport.endpoints[1].latency.count == 2
+
+
+def test_pool_requests_stay_on_one_node(algod):
+    servers = [algod(), algod()]
+    client = PooledAlgodClient("token", Transport([address(s) for s in servers]))
+
+    for _ in range(4):
+        client.status()
+        client.algod_request("POST", "/transactions", data=b"txn")
+        client.pending_transaction_info("TXID")
+    # only the stateless reads are spread over the nodes
+    assert servers[0].paths.count("/v2/status") == 2
+    assert servers[1].paths.count("/v2/status") == 2
+    assert len(servers[0].paths) == 10
+    assert len(servers[1].paths) == 2
+
+
+def test_pin_moves_off_a_failing_node(algod):
+    busy = algod(failures=100)
+    healthy = algod()
+    transport = Transport([address(busy), address(healthy)], backoff=0.001)
+    client = PooledAlgodClient("token", transport)
+
+    assert client.pending_transaction_info("TXID")["confirmed-round"] == 42
+    assert transport.pinned is transport.endpoints[1]
+    client.pending_transaction_info("TXID")
+    assert len(busy.paths) == 1
+    assert len(healthy.paths) == 2
@@ -0,0 +1,117 @@
+import pytest
+from algosdk.abi import Method
+
+from royalty_enforcer.utils.apps import getArtifact
+from royalty_enforcer.utils.costs import CostError, profileProgram
+
+COUNT = Method.from_signature("count()void")
+RESET = Method.from_signature("reset()void")
+
+ROUTER = """#pragma version 6
+txn ApplicationID
+int 0
+==
+bnz create
+txn OnCompletion
+int NoOp
+==
+bz reject
+txna ApplicationArgs 0
+method "count()void"
+==
+bnz count
+txna ApplicationArgs 0
+method "reset()void"
+==
+txn Sender
+global CreatorAddress
+==
+&&
+bnz reset
+reject:
+err
+create:
+int 1
+return
+count:
+byte "n"
+byte "n"
+app_global_get
+callsub increment
+app_global_put
+int 1
+return
+reset:
+byte "n"
+int 0
+app_global_put
+int 1
+return
+increment:
+dup
+int 10
+<
+bz done
+int 1
++
+done:
+retsub
+"""
+
+
+def test_routes_follow_the_selector():
+    profile = profileProgram("counter", ROUTER, [COUNT, RESET])
+
+    # both ways through increment, the cheap way skips the add
+    assert profile.routes["count"] == (26, 28)
+    # the sender check isn't known, the route is the one way through it
+    assert profile.routes["reset"] == (27, 27)
+    # the constant blocks count too
+    assert profile.routes["create"] == (8, 8)
+    assert profile.routes["opt_in"] is None
+
+    assert profile.subroutines["increment"] == (10, (5, 7))
+    assert profile.scratchSlots() == []
+
+
+def test_loops_are_refused():
+    with pytest.raises(CostError, match="loop"):
+        profileProgram("loop", "#pragma version 6\nloop:\nint 1\nbnz loop\n", [])
+
+
+def test_enforcer_routes_fit_the_budget():
+    artifact = getArtifact(None, "enforcer")
+    profile = profileProgram("enforcer", artifact.approvalTeal, artifact.abi.methods)
+
+    for method in (
+        "transfer",
+        "transfer_batch",
+        "offer",
+        "set_policy",
+        "get_offer",
+        "get_policy",
+    ):
+        low, high = profile.routes[method]
+        assert 0 < low <= high <= 700
+    # methods of the ABI the enforcer doesn't implement
+    assert profile.routes["asset_create"] is None
+    assert "transfer_18" in profile.subroutines
+
+
+def test_dispatch_cost_does_not_grow_with_position():
+    from pyteal import Int, MethodSignature, Mode, compileTeal
+
+    from royalty_enforcer.contracts.router import dispatch
+
+    methods = [Method.from_signature("m{}()void".format(i)) for i in range(27)]
+    teal = compileTeal(
+        dispatch([(MethodSignature(m.get_signature()), Int(1)) for m in methods]),
+        mode=Mode.Application,
+        version=6,
+    )
+    profile = profileProgram("router", teal, methods)
+
+    costs = [profile.routes[m.name][1] for m in methods]
+    # 27 methods are 4 or 5 comparisons deep, some jump once more than others
+    assert max(costs) - min(costs) <= 5
+    assert max(costs) <= 32
@@ -0,0 +1,292 @@
+import pytest
+from algosdk import error
+from algosdk.account import generate_account
+from algosdk.atomic_transaction_composer import TransactionWithSigner
+from algosdk.future.transaction import (
+    ApplicationNoOpTxn,
+    AssetCreateTxn,
+    PaymentTxn,
+)
+
+from royalty_enforcer.utils import accounts
+from royalty_enforcer.utils.accounts import Account
+from royalty_enforcer.utils.apps import (
+    buildEnforcerTransferBatch,
+    deployEnforcer,
+    deployMarketplace,
+    enforcerTransfer,
+    enforcerTransferBatch,
+    marketplaceBuyNFT,
+    marketplaceListNFT,
+    optInToEnforcer,
+    optInToMarketplace,
+    setEnforcerOffer,
+    setEnforcerPolicy,
+)
+from royalty_enforcer.utils.assets import mintNFT, optInToNFT
+from royalty_enforcer.utils.emulator import (
+    GENESIS_BALANCE,
+    EmulatedAlgodClient,
+    EmulatedKMDClient,
+    Ledger,
+)
+from royalty_enforcer.utils.params import getSuggestedParams
+from royalty_enforcer.utils.readers import dryrunEnforcerPolicy
+from royalty_enforcer.utils.state import getBalances
+from royalty_enforcer.utils.transactions import ZERO_ADDR, executeComposer
+
+
+@pytest.fixture
+def client():
+    return EmulatedAlgodClient(Ledger())
+
+
+def newAccount(client, amount=100_000_000):
+    account = Account(generate_account()[0])
+    client.ledger.fund(account.getDecodedAddress(), amount)
+    return account
+
+
+def test_enforcer_sale_pays_royalty(client):
+    creator = newAccount(client)
+    buyer = newAccount(client)
+    royalty = newAccount(client)
+
+    enforcer = deployEnforcer(client, creator)
+    setEnforcerPolicy(client, enforcer, creator, 1000, royalty.getAddress())
+    nftID = mintNFT(client, creator, enforcer.address)
+    setEnforcerOffer(
+        client, enforcer, creator, nftID, 1, buyer.getAddress(), 0, ZERO_ADDR
+    )
+    optInToNFT(client, buyer, nftID)
+    before = getBalances(client, creator.getAddress())[0]
+    enforcerTransfer(
+        client,
+        enforcer,
+        buyer,
+        1_000_000,
+        nftID,
+        1,
+        creator.getAddress(),
+        royalty.getAddress(),
+    )
+
+    assert getBalances(client, buyer.getAddress())[nftID] == 1
+    assert getBalances(client, royalty.getAddress())[0] == 100_000_000 + 100_000
+    assert getBalances(client, creator.getAddress())[0] == before + 900_000
+    assert dryrunEnforcerPolicy(client, enforcer, buyer.getAddress()) == (
+        royalty.getAddress(),
+        1000,
+    )
+
+
+def test_sales_pay_flat_fees(client):
+    creator = newAccount(client)
+    buyer = newAccount(client)
+    royalty = newAccount(client)
+
+    enforcer = deployEnforcer(client, creator)
+    marketplace = deployMarketplace(client, creator)
+    setEnforcerPolicy(client, enforcer, creator, 1000, royalty.getAddress())
+    nftID = mintNFT(client, creator, enforcer.address)
+    setEnforcerOffer(
+        client, enforcer, creator, nftID, 1, buyer.getAddress(), 0, ZERO_ADDR
+    )
+    optInToNFT(client, buyer, nftID)
+
+    # the fees cover the inner transactions, not a fee per byte
+    before = getBalances(client, buyer.getAddress())[0]
+    enforcerTransfer(
+        client,
+        enforcer,
+        buyer,
+        1_000_000,
+        nftID,
+        1,
+        creator.getAddress(),
+        royalty.getAddress(),
+    )
+    after = getBalances(client, buyer.getAddress())[0]
+    assert before - after == 1_000_000 + 1000 + 4000
+
+    nftID = mintNFT(client, creator, enforcer.address)
+    optInToMarketplace(client, marketplace, creator)
+    marketplaceListNFT(client, enforcer, marketplace, creator, nftID, 1, 1_000_000)
+    marketplaceBuyNFT(
+        client,
+        enforcer,
+        marketplace,
+        creator.getAddress(),
+        royalty.getAddress(),
+        buyer,
+        nftID,
+        1,
+        1_000_000,
+    )
+    # opt in to the NFT, payment and buy call
+    assert after - getBalances(client, buyer.getAddress())[0] == (
+        1_000_000 + 1000 + 1000 + 6000
+    )
+
+
+def test_rejected_group_changes_nothing(client):
+    creator = newAccount(client)
+    buyer = newAccount(client)
+    royalty = newAccount(client)
+
+    enforcer = deployEnforcer(client, creator)
+    setEnforcerPolicy(client, enforcer, creator, 1000, royalty.getAddress())
+    nftID = mintNFT(client, creator, enforcer.address)
+    optInToNFT(client, buyer, nftID)
+    before = getBalances(client, buyer.getAddress())
+
+    # nothing was offered to the buyer, the payment is undone with the call
+    with pytest.raises(error.AlgodHTTPError, match="logic eval error"):
+        enforcerTransfer(
+            client,
+            enforcer,
+            buyer,
+            1_000_000,
+            nftID,
+            1,
+            creator.getAddress(),
+            royalty.getAddress(),
+        )
+    assert getBalances(client, buyer.getAddress()) == before
+
+
+def test_signatures_are_verified(client):
+    sender = newAccount(client)
+    other = newAccount(client)
+    txn = PaymentTxn(
+        sender.getAddress(), getSuggestedParams(client), ZERO_ADDR, 100_000
+    )
+
+    with pytest.raises(error.AlgodHTTPError, match="should have been authorized"):
+        client.send_transaction(txn.sign(other.getPrivateKey()))
+    client.send_transaction(txn.sign(sender.getPrivateKey()))
+
+    # the same transaction can only be confirmed once
+    with pytest.raises(error.AlgodHTTPError, match="already in ledger"):
+        client.send_transaction(txn.sign(sender.getPrivateKey()))
+
+
+def test_execute_takes_unsigned_transactions():
+    ledger = Ledger(verifySignatures=False)
+    client = EmulatedAlgodClient(ledger)
+    creator = newAccount(client)
+
+    [response] = ledger.execute(
+        [
+            AssetCreateTxn(
+                creator.getAddress(),
+                getSuggestedParams(client),
+                1,
+                0,
+                False,
+                unit_name="NFT",
+            )
+        ]
+    )
+    assert response["confirmed-round"] == ledger.round
+    assert getBalances(client, creator.getAddress())[response["asset-index"]] == 1
+
+
+def test_kmd_serves_the_funded_genesis_accounts(monkeypatch, client):
+    monkeypatch.setattr(accounts, "KMD_KEY_CACHE", "")
+    monkeypatch.setattr(accounts, "kmdAccounts", None)
+
+    genesis = accounts.getGenesisAccounts(EmulatedKMDClient())
+    assert len(genesis) == 3
+    for account in genesis:
+        assert getBalances(client, account.getAddress())[0] == GENESIS_BALANCE
+
+
+def test_enforcer_rejects_other_callers_and_selectors(client):
+    creator = newAccount(client)
+    other = newAccount(client)
+    enforcer = deployEnforcer(client, creator)
+
+    with pytest.raises(error.AlgodHTTPError, match="assert failed"):
+        setEnforcerPolicy(client, enforcer, other, 1000, other.getAddress())
+
+    call = ApplicationNoOpTxn(
+        creator.getAddress(),
+        getSuggestedParams(client),
+        enforcer.id,
+        [bytes.fromhex("01020304")],
+    )
+    with pytest.raises(error.AlgodHTTPError, match="assert failed"):
+        client.send_transaction(call.sign(creator.getPrivateKey()))
+
+
+def test_batch_transfer_pays_royalty_once(client):
+    creator = newAccount(client)
+    seller = newAccount(client)
+    buyer = newAccount(client)
+    royalty = newAccount(client)
+
+    enforcer = deployEnforcer(client, creator)
+    setEnforcerPolicy(client, enforcer, creator, 1000, royalty.getAddress())
+    optInToEnforcer(client, enforcer, seller)
+    transfers = []
+    for owner, price in [(creator, 333_333), (seller, 333_333), (creator, 333_334)]:
+        nftID = mintNFT(client, owner, enforcer.address)
+        setEnforcerOffer(
+            client, enforcer, owner, nftID, 1, buyer.getAddress(), 0, ZERO_ADDR
+        )
+        optInToNFT(client, buyer, nftID)
+        transfers.append((nftID, 1, owner.getAddress(), price))
+    creatorBefore = getBalances(client, creator.getAddress())[0]
+    sellerBefore = getBalances(client, seller.getAddress())[0]
+
+    enforcerTransferBatch(client, enforcer, buyer, transfers, royalty.getAddress())
+
+    for nftID, _, _, _ in transfers:
+        assert getBalances(client, buyer.getAddress())[nftID] == 1
+    # 10% of the 1_000_000 paid, not the 99_999 of each price on its own
+    assert getBalances(client, royalty.getAddress())[0] == 100_000_000 + 100_000
+    assert getBalances(client, seller.getAddress())[0] == sellerBefore + 300_000
+    # the last one takes the rounding
+    assert getBalances(client, creator.getAddress())[0] == creatorBefore + 600_000
+
+
+def test_batch_transfer_calls_must_follow_each_other(client):
+    creator = newAccount(client)
+    buyer = newAccount(client)
+    royalty = newAccount(client)
+
+    enforcer = deployEnforcer(client, creator)
+    setEnforcerPolicy(client, enforcer, creator, 1000, royalty.getAddress())
+    nftID = mintNFT(client, creator, enforcer.address)
+    setEnforcerOffer(
+        client, enforcer, creator, nftID, 1, buyer.getAddress(), 0, ZERO_ADDR
+    )
+    optInToNFT(client, buyer, nftID)
+
+    # a payment after the call would keep the remainder of the first one from
+    # being paid out
+    atc = buildEnforcerTransferBatch(
+        getSuggestedParams(client),
+        enforcer,
+        buyer,
+        [(nftID, 1, creator.getAddress(), 1_000_000)],
+        royalty.getAddress(),
+    )
+    atc.add_transaction(
+        TransactionWithSigner(
+            PaymentTxn(
+                buyer.getAddress(),
+                getSuggestedParams(client),
+                enforcer.address,
+                1_000_000,
+            ),
+            buyer.getSigner(),
+        )
+    )
+    with pytest.raises(error.AlgodHTTPError, match="logic eval error"):
+        executeComposer(client, atc)
+    assert getBalances(client, buyer.getAddress())[nftID] == 0
+
+    with pytest.raises(ValueError, match="Between 1 and 15"):
+        enforcerTransferBatch(client, enforcer, buyer, [], royalty.getAddress())
@@ -0,0 +1,266 @@
+from base64 import b64encode
+
+import itertools
+
+import msgpack
+import pytest
+
+pytest.importorskip("numpy")
+
+from algosdk.account import address_from_private_key, generate_account
+from algosdk.encoding import decode_address
+
+from royalty_enforcer.ledger import SECONDS_PER_DAY, RoyaltyLedger
+from royalty_enforcer.utils.transactions import blockTxnResponse
+
+APP_ID = 1234
+NFT_ID = 42
+USDC_ID = 31566704
+SELLER, BUYER, RECEIVER, APP_ADDRESS = [
+    address_from_private_key(generate_account()[0]) for _ in range(4)
+]
+DAY = 19000 * SECONDS_PER_DAY
+
+calls = itertools.count()
+
+
+def payment(receiver, amount, paymentAsset=0):
+    if paymentAsset:
+        fields = {"type": "axfer", "xaid": paymentAsset, "aamt": amount}
+        fields["arcv"] = decode_address(receiver)
+    else:
+        fields = {"type": "pay", "amt": amount, "rcv": decode_address(receiver)}
+    return {"txn": dict(fields, snd=decode_address(APP_ADDRESS))}
+
+
+def assetMove(nftID):
+    return {
+        "txn": {
+            "type": "axfer",
+            "snd": decode_address(APP_ADDRESS),
+            "xaid": nftID,
+            "aamt": 1,
+            "asnd": decode_address(SELLER),
+            "arcv": decode_address(BUYER),
+        }
+    }
+
+
+def transferCall(ledger, price, royalty, paymentAsset=0):
+    """A transfer app call with its inner transactions, in msgpack form"""
+    appArgs = [
+        ledger.transferSelector,
+        (0).to_bytes(1, "big"),  # asset
+        (1).to_bytes(8, "big"),
+        (1).to_bytes(1, "big"),  # owner
+        (2).to_bytes(1, "big"),  # buyer
+        (3).to_bytes(1, "big"),  # royalty receiver
+        (1).to_bytes(1, "big"),  # payment asset
+        (1).to_bytes(8, "big"),
+    ]
+    txn = {
+        "type": "appl",
+        "snd": decode_address(BUYER),
+        "apid": APP_ID,
+        "apaa": appArgs,
+        "apat": [decode_address(a) for a in (SELLER, BUYER, RECEIVER)],
+        "apas": [NFT_ID, paymentAsset],
+        # distinct transaction IDs
+        "note": next(calls).to_bytes(8, "big"),
+    }
+
+    inners = [payment(SELLER, price - royalty, paymentAsset)]
+    if royalty:
+        inners.append(payment(RECEIVER, royalty, paymentAsset))
+    inners.append(assetMove(NFT_ID))
+    return {"txn": txn, "dt": {"itx": inners}}
+
+
+def batchCall(ledger, group, nftID, price, paid, royalty=0):
+    """A transfer_batch app call of the group paying the owner paid out of
+    the payment, and first paying the royalty on the whole batch if given"""
+    appArgs = [
+        ledger.batchSelector,
+        (0).to_bytes(1, "big"),  # asset
+        (1).to_bytes(8, "big"),
+        (1).to_bytes(1, "big"),  # owner
+        (2).to_bytes(1, "big"),  # buyer
+        (3).to_bytes(1, "big"),  # royalty receiver
+        (1).to_bytes(1, "big"),  # payment asset
+        (1).to_bytes(8, "big"),
+        price.to_bytes(8, "big"),
+    ]
+    txn = {
+        "type": "appl",
+        "snd": decode_address(BUYER),
+        "apid": APP_ID,
+        "apaa": appArgs,
+        "apat": [decode_address(a) for a in (SELLER, BUYER, RECEIVER)],
+        "apas": [nftID, 0],
+        "grp": group,
+        "note": next(calls).to_bytes(8, "big"),
+    }
+    inners = [payment(RECEIVER, royalty)] if royalty else []
+    inners += [payment(SELLER, paid), assetMove(nftID)]
+    return {"txn": txn, "dt": {"itx": inners}}
+
+
+class BlockClient:
+    def __init__(self, blocks) -> None:
+        self.blocks = blocks
+
+    def block_info(self, round, response_format):
+        assert response_format == "msgpack"
+        return msgpack.packb(
+            {
+                "block": {
+                    "gen": "sandnet-v1",
+                    "gh": bytes(32),
+                    "rnd": round,
+                    "ts": DAY + round * SECONDS_PER_DAY // 2,
+                    "txns": self.blocks[round],
+                }
+            },
+            use_bin_type=True,
+        )
+
+
+def test_ledger_ingests_blocks():
+    ledger = RoyaltyLedger([APP_ID])
+    client = BlockClient(
+        {
+            1: [transferCall(ledger, 1000, 100)],
+            2: [transferCall(ledger, 5000, 500), transferCall(ledger, 1000, 0)],
+            3: [transferCall(ledger, 2000, 20, paymentAsset=USDC_ID)],
+        }
+    )
+    assert ledger.ingestBlocks(client, 1, 3) == 4
+
+    sales = ledger.sales()
+    assert sales["price"].tolist() == [1000, 5000, 1000, 2000]
+    assert ledger.address(int(sales["seller"][0])) == SELLER
+    assert ledger.address(int(sales["buyer"][0])) == BUYER
+
+    assert ledger.totalsByReceiver() == {RECEIVER: 600}
+    assert ledger.totalsByReceiver(USDC_ID) == {RECEIVER: 20}
+    assert ledger.totalsByAsset() == {NFT_ID: 600}
+    # round 1 is half a day later than round 0, round 2 a full day
+    assert ledger.totalsByDay() == {19000: 100, 19001: 500}
+    assert ledger.totalsByDay(start=DAY + SECONDS_PER_DAY) == {19001: 500}
+
+
+def test_ledger_ingests_rounds_once(tmp_path):
+    ledger = RoyaltyLedger([APP_ID], directory=str(tmp_path))
+    blocks = {r: [transferCall(ledger, 1000, 100)] for r in range(1, 5)}
+    client = BlockClient(blocks)
+    assert ledger.ingestBlocks(client, 1, 2) == 2
+    # overlapping ranges and the tracker replaying a round add nothing twice
+    assert ledger.ingestBlocks(client, 1, 3) == 1
+    ledger.observeBlock(3, {"": blockTxnResponse(blocks[3][0], 3)})
+    assert len(ledger) == 3
+    ledger.flush()
+
+    reopened = RoyaltyLedger([APP_ID], directory=str(tmp_path))
+    assert reopened.ingestBlocks(client, 1, 4) == 1
+    assert reopened.sales()["round"].tolist() == [1, 2, 3, 4]
+
+
+def test_ledger_backfills_while_attached():
+    ledger = RoyaltyLedger([APP_ID])
+    blocks = {r: [transferCall(ledger, 1000, 100)] for r in range(1, 6)}
+
+    class TrackedClient(BlockClient):
+        def block_info(self, round, response_format):
+            if round == 2:
+                # the tracker gets to a new block during the backfill
+                ledger.observeBlock(5, {"": blockTxnResponse(blocks[5][0], 5)})
+            return super().block_info(round, response_format)
+
+    assert ledger.ingestBlocks(TrackedClient(blocks), 1, 4) == 5
+    assert sorted(ledger.sales()["round"].tolist()) == [1, 2, 3, 4, 5]
+    assert ledger.rounds == [[1, 5]]
+
+
+def test_ledger_records_inner_calls_at_their_round():
+    ledger = RoyaltyLedger([APP_ID])
+    call = blockTxnResponse(transferCall(ledger, 1000, 100), 0)
+    del call["confirmed-round"]
+    # a marketplace call with the enforcer call as an inner transaction
+    response = {
+        "pool-error": "",
+        "confirmed-round": 7,
+        "txn": {"txn": {"type": "appl", "apid": APP_ID + 1}},
+        "inner-txns": [call],
+    }
+    assert ledger.observe(response, timestamp=DAY)
+    assert ledger.sales()["round"].tolist() == [7]
+
+
+def test_ledger_records_batch_sales():
+    ledger = RoyaltyLedger([APP_ID])
+    first, second = bytes(32), bytes([1]) * 32
+    # 6005 for assets priced 1000, 2000 and 3000 at 10%: the first call pays
+    # the 600 royalty, the owners get their price less 10%, the last one what
+    # is left, with the overpayment
+    client = BlockClient(
+        {
+            1: [
+                batchCall(ledger, first, 1, 1000, 900, royalty=600),
+                batchCall(ledger, first, 2, 2000, 1800),
+                batchCall(ledger, first, 3, 3000, 2705),
+                batchCall(ledger, second, 4, 500, 450, royalty=50),
+            ]
+        }
+    )
+    assert ledger.ingestBlocks(client, 1, 1) == 4
+
+    sales = ledger.sales()
+    assert sales["asset"].tolist() == [1, 2, 3, 4]
+    assert sales["price"].tolist() == [1000, 2000, 3005, 500]
+    assert sales["royalty"].tolist() == [100, 200, 300, 50]
+    assert ledger.totalsByAsset() == {1: 100, 2: 200, 3: 300, 4: 50}
+    assert ledger.totalsByReceiver() == {RECEIVER: 650}
+
+
+def test_ledger_observes_json_responses():
+    ledger = RoyaltyLedger()
+
+    def toJSON(value):
+        if isinstance(value, bytes):
+            return b64encode(value).decode()
+        if isinstance(value, list):
+            return [toJSON(v) for v in value]
+        return value
+
+    call = transferCall(ledger, 1000, 100)
+    txn = {k: toJSON(v) for k, v in call["txn"].items()}
+    txn["apat"] = [SELLER, BUYER, RECEIVER]
+    response = {
+        "pool-error": "",
+        "confirmed-round": 5,
+        "txn": {"txn": txn},
+        "inner-txns": [
+            {"txn": {"txn": {k: toJSON(v) for k, v in i["txn"].items()}}}
+            for i in call["dt"]["itx"]
+        ],
+    }
+    assert ledger.observe(response, timestamp=DAY)
+    assert not ledger.observe({"pool-error": "", "txn": {"txn": {"apid": APP_ID}}})
+    assert ledger.totalsByDay() == {19000: 100}
+
+
+def test_ledger_saves_chunks(tmp_path):
+    ledger = RoyaltyLedger(directory=str(tmp_path), chunkSize=2)
+    for royalty in range(1, 6):
+        ledger.observe(
+            dict(
+                blockTxnResponse(transferCall(ledger, 1000, royalty), 1),
+                **{"round-time": DAY}
+            )
+        )
+    ledger.flush()
+    assert len(ledger.chunks) == 3
+
+    reopened = RoyaltyLedger(directory=str(tmp_path), chunkSize=2)
+    assert len(reopened) == 5
+    assert reopened.totalsByReceiver() == {RECEIVER: 15}
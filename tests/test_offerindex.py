@@ -0,0 +1,214 @@
+from base64 import b64encode
+
+import msgpack
+import pytest
+from algosdk.account import address_from_private_key, generate_account
+from algosdk.encoding import decode_address
+from algosdk.future.transaction import OnComplete
+
+from royalty_enforcer.utils.offerindex import OfferIndex
+from royalty_enforcer.utils.transactions import PendingTxnResponse
+
+APP_ID = 1234
+MARKETPLACE = address_from_private_key(generate_account()[0])
+OTHER = address_from_private_key(generate_account()[0])
+SELLERS = [address_from_private_key(generate_account()[0]) for _ in range(3)]
+
+
+def offerKey(assetID: int) -> str:
+    return b64encode(assetID.to_bytes(8, "big")).decode()
+
+
+def offerValue(auth: str, amount: int) -> str:
+    return b64encode(decode_address(auth) + amount.to_bytes(8, "big")).decode()
+
+
+def offerState(assetID: int, auth: str, amount: int):
+    return {
+        "key": offerKey(assetID),
+        "value": {"type": 1, "bytes": offerValue(auth, amount)},
+    }
+
+
+class Indexer:
+    """Serves the opted in accounts one per page"""
+
+    def __init__(self, optedIn, round=10) -> None:
+        self.optedIn = optedIn
+        self.round = round
+        self.pages = 0
+
+    def accounts(self, application_id, limit, next_page):
+        assert application_id == APP_ID
+        self.pages += 1
+        start = int(next_page or 0)
+        page = self.optedIn[start : start + 1]
+        response = {"accounts": page, "current-round": self.round}
+        if page:
+            response["next-token"] = str(start + 1)
+        return response
+
+
+def account(address, offers, appID=APP_ID):
+    return {
+        "address": address,
+        "apps-local-state": [
+            {"id": appID, "key-value": [offerState(*offer) for offer in offers]}
+        ],
+    }
+
+
+def appCall(sender, apan=OnComplete.NoOpOC, **response):
+    txn = {"apid": APP_ID, "snd": decode_address(sender), "apan": apan}
+    return PendingTxnResponse(dict({"pool-error": "", "txn": {"txn": txn}}, **response))
+
+
+def loadedIndex():
+    indexer = Indexer(
+        [
+            account(SELLERS[0], [(1, MARKETPLACE, 1), (2, MARKETPLACE, 5)]),
+            account(SELLERS[1], [(1, OTHER, 1)]),
+            account(SELLERS[2], [(3, MARKETPLACE, 2)], appID=APP_ID + 1),
+        ]
+    )
+    index = OfferIndex(APP_ID)
+    index.load(indexer)
+    assert indexer.pages == 4
+    return index
+
+
+def test_load_indexes_every_offer():
+    index = loadedIndex()
+
+    assert len(index) == 3
+    assert index.round == 10
+    assert sorted(index.byAsset(1)) == sorted(SELLERS[:2])
+    assert sorted(index.byAuth(MARKETPLACE)) == [(SELLERS[0], 1), (SELLERS[0], 2)]
+    assert index.byOwner(SELLERS[0])[2].amount == 5
+    assert index.get(SELLERS[1], 1).authAddress == OTHER
+    assert index.byOwner(SELLERS[2]) == {}
+
+
+def test_index_follows_deltas():
+    index = loadedIndex()
+
+    # seller 1 moves the offer to the marketplace, seller 0 drops asset 2
+    index.observeBlock(
+        11,
+        {
+            "a": appCall(
+                SELLERS[1],
+                **{
+                    "local-state-delta": [
+                        {
+                            "address": SELLERS[1],
+                            "delta": [
+                                {
+                                    "key": offerKey(1),
+                                    "value": {
+                                        "action": 1,
+                                        "bytes": offerValue(MARKETPLACE, 1),
+                                    },
+                                }
+                            ],
+                        },
+                        {
+                            "address": SELLERS[0],
+                            "delta": [{"key": offerKey(2), "value": {"action": 3}}],
+                        },
+                    ]
+                }
+            )
+        },
+    )
+    assert index.round == 11
+    assert sorted(index.byAuth(MARKETPLACE)) == sorted(
+        [(SELLERS[0], 1), (SELLERS[1], 1)]
+    )
+    assert index.byAuth(OTHER) == {}
+    assert index.get(SELLERS[0], 2) is None
+
+    # blocks the index already includes are skipped
+    index.observeBlock(11, {"b": appCall(SELLERS[0], apan=OnComplete.ClearStateOC)})
+    assert index.get(SELLERS[0], 1) is not None
+
+    # leaving the app drops every offer without a delta
+    index.observe(appCall(SELLERS[0], apan=OnComplete.CloseOutOC))
+    assert index.byOwner(SELLERS[0]) == {}
+    assert list(index.byAsset(1)) == [SELLERS[1]]
+
+
+class Algod:
+    def account_application_info(self, address, appID):
+        assert appID == APP_ID
+        return {
+            "round": 7,
+            "app-local-state": {"key-value": [offerState(4, MARKETPLACE, 9)]},
+        }
+
+
+def test_load_accounts_from_algod():
+    index = OfferIndex(APP_ID)
+    index.loadAccounts(Algod(), SELLERS[:2])
+
+    assert index.round == 7
+    assert sorted(index.byAsset(4)) == sorted(SELLERS[:2])
+    assert len(index.byAuth(MARKETPLACE)) == 2
+
+
+class BlockClient:
+    """Serves blocks in which the given sellers delete their offers"""
+
+    def __init__(self, deletes) -> None:
+        self.deletes = deletes
+        self.fetched = []
+
+    def block_info(self, round, response_format):
+        assert response_format == "msgpack"
+        self.fetched.append(round)
+        stibs = [
+            {
+                "txn": {
+                    "type": "appl",
+                    "snd": decode_address(seller),
+                    "apid": APP_ID,
+                    "note": round.to_bytes(8, "big"),
+                },
+                "dt": {"ld": {0: {assetID.to_bytes(8, "big"): {"at": 3}}}},
+            }
+            for seller, assetID in self.deletes.get(round, [])
+        ]
+        return msgpack.packb(
+            {"block": {"gh": bytes(32), "rnd": round, "txns": stibs}},
+            use_bin_type=True,
+        )
+
+
+def test_load_replays_rounds_the_indexer_is_behind():
+    index = OfferIndex(APP_ID)
+    # the tracker got to round 12 before the indexer did
+    index.observeBlock(12, {})
+    indexer = Indexer(
+        [account(SELLERS[0], [(1, MARKETPLACE, 1), (2, MARKETPLACE, 5)])], round=10
+    )
+    client = BlockClient({11: [(SELLERS[0], 2)]})
+
+    with pytest.raises(Exception, match="needs an algod client"):
+        index.load(indexer)
+
+    index.load(indexer, client)
+    assert client.fetched == [11, 12]
+    assert index.round == 12
+    assert list(index.byOwner(SELLERS[0])) == [1]
+
+
+def test_load_replays_rounds_earlier_pages_missed():
+    index = OfferIndex(APP_ID)
+    index.load(Indexer([account(SELLERS[0], [(1, MARKETPLACE, 1)])], round=10))
+    # a later load sees round 11, in which seller 0 deleted its offer
+    client = BlockClient({11: [(SELLERS[0], 1)]})
+    index.load(Indexer([account(SELLERS[1], [(1, OTHER, 1)])], round=11), client)
+
+    assert client.fetched == [11]
+    assert index.round == 11
+    assert list(index.byAsset(1)) == [SELLERS[1]]
@@ -0,0 +1,69 @@
+from base64 import b64encode
+
+from algosdk.future.transaction import SuggestedParams
+
+from royalty_enforcer.utils.params import ParamsProvider, getParamsProvider
+
+
+class ParamsClient:
+    def __init__(self, fee: int = 0) -> None:
+        self.fee = fee
+        self.round = 100
+        self.fetched = 0
+
+    def suggested_params(self) -> SuggestedParams:
+        self.fetched += 1
+        return SuggestedParams(
+            fee=self.fee,
+            first=self.round,
+            last=self.round + 1000,
+            gh=b64encode(bytes(32)).decode(),
+            min_fee=1000,
+        )
+
+
+def test_params_are_shared():
+    client = ParamsClient()
+    provider = ParamsProvider(client, window=10, roundTime=60)
+
+    sp = provider.get()
+    sp.fee = 4000
+    # callers get copies, changing one doesn't leak into the cache
+    assert provider.get().fee == 0
+    assert client.fetched == 1
+    assert (provider.hits, provider.misses) == (1, 1)
+
+    assert getParamsProvider(client) is getParamsProvider(client)
+
+
+def test_observed_rounds_move_validity():
+    client = ParamsClient()
+    provider = ParamsProvider(client, window=10, roundTime=60)
+    provider.get()
+
+    provider.observeRound(103)
+    sp = provider.get()
+    assert (sp.first, sp.last) == (103, 1103)
+    assert client.fetched == 1
+
+    # past the window the params are fetched again
+    client.round = 110
+    provider.observeRound(110)
+    assert provider.get().first == 110
+    assert client.fetched == 2
+
+
+def test_refresh_every_round_when_congested():
+    client = ParamsClient(fee=10)
+    provider = ParamsProvider(client, window=10, roundTime=60)
+    provider.get()
+    provider.get()
+    assert client.fetched == 1
+
+    provider.observeRound(101)
+    provider.get()
+    assert client.fetched == 2
+
+    provider.invalidate()
+    provider.get()
+    assert client.fetched == 3
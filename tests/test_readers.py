@@ -0,0 +1,72 @@
+from base64 import b64encode
+
+import pytest
+from algosdk.account import address_from_private_key, generate_account
+from algosdk.encoding import decode_address
+
+from royalty_enforcer.utils.apps import App, enforcerABI
+from royalty_enforcer.utils.readers import (
+    readEnforcerAdmin,
+    readEnforcerOffer,
+    readEnforcerPolicy,
+)
+
+CREATOR = address_from_private_key(generate_account()[0])
+SELLER = address_from_private_key(generate_account()[0])
+
+
+def uintValue(key: bytes, value: int):
+    return {"key": b64encode(key).decode(), "value": {"type": 2, "uint": value}}
+
+
+def bytesValue(key: bytes, value: bytes):
+    return {
+        "key": b64encode(key).decode(),
+        "value": {"type": 1, "bytes": b64encode(value).decode()},
+    }
+
+
+class StateClient:
+    def __init__(self, globalState, localState) -> None:
+        self.globalState = globalState
+        self.localState = localState
+
+    def application_info(self, appID):
+        return {"params": {"creator": CREATOR, "global-state": self.globalState}}
+
+    def account_application_info(self, address, appID):
+        assert address == SELLER
+        return {"app-local-state": {"key-value": self.localState}}
+
+
+def test_read_enforcer_state():
+    client = StateClient(
+        [
+            uintValue(b"royalty_basis", 1000),
+            bytesValue(b"royalty_receiver", decode_address(SELLER)),
+        ],
+        [
+            bytesValue(
+                (42).to_bytes(8, "big"),
+                decode_address(CREATOR) + (1).to_bytes(8, "big"),
+            )
+        ],
+    )
+    enforcer = App(1234, enforcerABI)
+
+    assert readEnforcerPolicy(client, enforcer) == (SELLER, 1000)
+    # no administrator stored, the contract reports the creator
+    assert readEnforcerAdmin(client, enforcer) == CREATOR
+    assert readEnforcerOffer(client, enforcer, 42, SELLER) == (CREATOR, 1)
+
+    with pytest.raises(Exception):
+        readEnforcerOffer(client, enforcer, 43, SELLER)
+
+
+def test_read_enforcer_without_policy():
+    client = StateClient([bytesValue(b"administrator", decode_address(SELLER))], [])
+    enforcer = App(1234, enforcerABI)
+
+    assert readEnforcerAdmin(client, enforcer) == SELLER
+    with pytest.raises(Exception):
+        readEnforcerPolicy(client, enforcer)
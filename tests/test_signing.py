@@ -0,0 +1,85 @@
+from base64 import b64encode
+
+from algosdk.account import generate_account
+from algosdk.atomic_transaction_composer import (
+    AtomicTransactionComposer,
+    LogicSigTransactionSigner,
+    TransactionWithSigner,
+)
+from algosdk.future.transaction import (
+    LogicSigAccount,
+    PaymentTxn,
+    SuggestedParams,
+    assign_group_id,
+)
+
+from royalty_enforcer.utils.accounts import Account
+from royalty_enforcer.utils.signing import SigningPool
+
+SP = SuggestedParams(
+    fee=1000,
+    first=1,
+    last=1000,
+    gh=b64encode(bytes(32)).decode(),
+    gen="sandnet-v1",
+    flat_fee=True,
+)
+
+ACCOUNTS = [Account(generate_account()[0]) for _ in range(3)]
+
+
+def payments(count):
+    return [
+        PaymentTxn(ACCOUNTS[i % 2].getAddress(), SP, ACCOUNTS[2].getAddress(), i + 1)
+        for i in range(count)
+    ]
+
+
+def test_pool_signs_like_sign():
+    txns = payments(50)
+    expected = [t.sign(ACCOUNTS[i % 2].getPrivateKey()) for i, t in enumerate(txns)]
+
+    with SigningPool(processes=2, batchSize=8) as pool:
+        signed = list(pool.sign((t, ACCOUNTS[i % 2]) for i, t in enumerate(txns)))
+    assert [s.dictify() for s in signed] == [e.dictify() for e in expected]
+
+    # rekeyed: account 0 signs for account 1
+    rekeyed = PaymentTxn(ACCOUNTS[1].getAddress(), SP, ACCOUNTS[2].getAddress(), 1)
+    with SigningPool(processes=0) as pool:
+        (signed,) = pool.sign([(rekeyed, ACCOUNTS[0].getSigner())])
+    assert signed.dictify() == rekeyed.sign(ACCOUNTS[0].getPrivateKey()).dictify()
+    assert signed.authorizing_address == ACCOUNTS[0].getAddress()
+
+
+def test_pool_keeps_groups():
+    groups = [assign_group_id(payments(n)) for n in (1, 16, 5, 16)]
+    with SigningPool(processes=2, batchSize=7) as pool:
+        signed = list(
+            pool.signGroups(
+                [[(t, ACCOUNTS[i % 2]) for i, t in enumerate(g)] for g in groups]
+            )
+        )
+    assert [len(g) for g in signed] == [1, 16, 5, 16]
+    for group, signedGroup in zip(groups, signed):
+        assert [s.transaction.group for s in signedGroup] == [t.group for t in group]
+
+
+def test_pool_signs_composers():
+    lsig = LogicSigAccount(bytes([6, 129, 1]))  # #pragma version 6; int 1
+    atcs = []
+    for i in range(3):
+        atc = AtomicTransactionComposer()
+        sender, other = payments(2)
+        atc.add_transaction(TransactionWithSigner(sender, ACCOUNTS[0].getSigner()))
+        other.sender = lsig.address()
+        atc.add_transaction(
+            TransactionWithSigner(other, LogicSigTransactionSigner(lsig))
+        )
+        atcs.append(atc)
+    expected = [atc.clone().gather_signatures() for atc in atcs]
+
+    with SigningPool(processes=1) as pool:
+        signed = [atc.gather_signatures() for atc in pool.signComposers(atcs)]
+    assert [[s.dictify() for s in g] for g in signed] == [
+        [s.dictify() for s in g] for g in expected
+    ]
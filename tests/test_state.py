@@ -0,0 +1,70 @@
+from base64 import b64encode
+
+from algosdk.account import address_from_private_key, generate_account
+from algosdk.encoding import decode_address
+
+from royalty_enforcer.utils.state import (
+    Offer,
+    Policy,
+    decodeOffers,
+    decodeOffersBatch,
+    decodePolicyState,
+)
+
+AUTH = address_from_private_key(generate_account()[0])
+
+
+def uintValue(key: bytes, value: int):
+    return {"key": b64encode(key).decode(), "value": {"type": 2, "uint": value}}
+
+
+def bytesValue(key: bytes, value: bytes):
+    return {
+        "key": b64encode(key).decode(),
+        "value": {"type": 1, "bytes": b64encode(value).decode()},
+    }
+
+
+def offerValue(assetID: int, amount: int):
+    return bytesValue(
+        assetID.to_bytes(8, "big"), decode_address(AUTH) + amount.to_bytes(8, "big")
+    )
+
+
+def test_decode_offers():
+    offers = decodeOffers(
+        [
+            offerValue(42, 3),
+            uintValue((7).to_bytes(8, "big"), 1),
+            # same base64 lengths as an offer, but 7 and 41 bytes
+            bytesValue(b"1234567", bytes(41)),
+            offerValue(2**64 - 1, 2**64 - 1),
+        ]
+    )
+    assert offers == [
+        Offer(42, decode_address(AUTH), 3),
+        Offer(2**64 - 1, decode_address(AUTH), 2**64 - 1),
+    ]
+    assert offers[0].authAddress == AUTH
+
+
+def test_decode_offers_batch():
+    states = [[offerValue(i * 10 + j, j) for j in range(i)] for i in range(5)]
+    assert decodeOffersBatch(states) == [decodeOffers(state) for state in states]
+    assert [len(offers) for offers in decodeOffersBatch(states)] == [0, 1, 2, 3, 4]
+
+    # falls back to decoding each entry when lengths don't add up
+    states[2].append(bytesValue(b"1234567", bytes(41)))
+    assert decodeOffersBatch(states) == [decodeOffers(state) for state in states]
+
+
+def test_decode_policy_state():
+    assert decodePolicyState([uintValue(b"royalty_basis", 1000)]) is None
+    policy = decodePolicyState(
+        [
+            uintValue(b"royalty_basis", 1000),
+            bytesValue(b"royalty_receiver", decode_address(AUTH)),
+        ]
+    )
+    assert policy == Policy(decode_address(AUTH), 1000)
+    assert policy.receiverAddress == AUTH
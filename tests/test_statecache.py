@@ -0,0 +1,123 @@
+from base64 import b64encode
+
+from algosdk.account import address_from_private_key, generate_account
+from algosdk.encoding import decode_address
+
+from royalty_enforcer.utils.statecache import EnforcerStateCache
+from royalty_enforcer.utils.transactions import PendingTxnResponse
+
+SELLER = address_from_private_key(generate_account()[0])
+AUTH = address_from_private_key(generate_account()[0])
+APP_ID = 1234
+
+
+def stateValue(key: bytes, value):
+    if isinstance(value, int):
+        return {"key": b64encode(key).decode(), "value": {"type": 2, "uint": value}}
+    return {
+        "key": b64encode(key).decode(),
+        "value": {"type": 1, "bytes": b64encode(value).decode()},
+    }
+
+
+def offerKey(assetID: int) -> bytes:
+    return assetID.to_bytes(8, "big")
+
+
+class StateClient:
+    def __init__(self) -> None:
+        self.offers = {1: 1, 2: 5}
+        self.basis = 1000
+        self.calls = 0
+
+    def application_info(self, appID):
+        self.calls += 1
+        return {
+            "params": {
+                "global-state": [
+                    stateValue(b"royalty_basis", self.basis),
+                    stateValue(b"royalty_receiver", decode_address(AUTH)),
+                ]
+            }
+        }
+
+    def account_application_info(self, address, appID):
+        self.calls += 1
+        return {
+            "app-local-state": {
+                "key-value": [
+                    stateValue(
+                        offerKey(a), decode_address(AUTH) + amount.to_bytes(8, "big")
+                    )
+                    for a, amount in self.offers.items()
+                ]
+            }
+        }
+
+
+def appCall(**response):
+    return PendingTxnResponse(
+        dict({"pool-error": "", "txn": {"txn": {"apid": APP_ID}}}, **response)
+    )
+
+
+def localDelta(assetID: int):
+    return [
+        {
+            "address": SELLER,
+            "delta": [{"key": b64encode(offerKey(assetID)).decode(), "value": {}}],
+        }
+    ]
+
+
+def test_offers_are_invalidated_by_key():
+    client = StateClient()
+    cache = EnforcerStateCache(client)
+
+    assert cache.getOffer(APP_ID, 1, SELLER) == (AUTH, 1)
+    # one request filled in every offer of the seller
+    assert cache.getOffer(APP_ID, 2, SELLER) == (AUTH, 5)
+    assert cache.getOffer(APP_ID, 3, SELLER) is None
+    assert client.calls == 2
+
+    client.offers[2] = 4
+    cache.observe(appCall(**{"local-state-delta": localDelta(2)}))
+    assert cache.getOffer(APP_ID, 1, SELLER) == (AUTH, 1)
+    assert client.calls == 2
+    assert cache.getOffer(APP_ID, 2, SELLER) == (AUTH, 4)
+    assert client.calls == 3
+
+
+def test_policy_is_invalidated_by_inner_call():
+    client = StateClient()
+    cache = EnforcerStateCache(client)
+
+    assert cache.getPolicy(APP_ID) == (AUTH, 1000)
+    assert cache.getPolicy(APP_ID) == (AUTH, 1000)
+    assert client.calls == 1
+
+    # e.g. a marketplace call that called the enforcer
+    client.basis = 500
+    inner = {
+        "txn": {"txn": {"apid": APP_ID}},
+        "global-state-delta": [{"key": "", "value": {}}],
+    }
+    cache.observe(
+        PendingTxnResponse(
+            {"pool-error": "", "txn": {"txn": {"apid": 1}}, "inner-txns": [inner]}
+        )
+    )
+    assert cache.getPolicy(APP_ID) == (AUTH, 500)
+    assert client.calls == 2
+
+
+def test_entries_expire_and_are_bounded():
+    client = StateClient()
+    cache = EnforcerStateCache(client, maxEntries=2, ttl=0)
+    cache.getPolicy(APP_ID)
+    cache.getPolicy(APP_ID)
+    assert client.calls == 2
+
+    cache = EnforcerStateCache(client, maxEntries=2)
+    cache.getOffer(APP_ID, 3, SELLER)
+    assert len(cache.entries) == 2
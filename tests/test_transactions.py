@@ -0,0 +1,215 @@
+import threading
+from base64 import b64encode
+from collections import Counter
+
+import msgpack
+import pytest
+from algosdk.account import generate_account
+from algosdk.encoding import decode_address
+from algosdk.error import AlgodHTTPError, ConfirmationTimeoutError
+from algosdk.future.transaction import (
+    ApplicationCallTxn,
+    OnComplete,
+    PaymentTxn,
+    SuggestedParams,
+)
+
+from royalty_enforcer.utils.accounts import Account
+from royalty_enforcer.utils.params import getParamsProvider
+from royalty_enforcer.utils import transactions
+from royalty_enforcer.utils.transactions import ConfirmationTracker, blockTxnResponse
+
+GENESIS_HASH = bytes(range(32))
+SP = SuggestedParams(
+    fee=1000,
+    first=1,
+    last=1000,
+    gh=b64encode(GENESIS_HASH).decode(),
+    gen="sandnet-v1",
+    flat_fee=True,
+)
+
+
+class BlockClient:
+    """Serves one block at round 5 and answers nothing from the pool"""
+
+    def __init__(self, stibs) -> None:
+        self.block = msgpack.packb(
+            {
+                "block": {
+                    "gen": "sandnet-v1",
+                    "gh": GENESIS_HASH,
+                    "rnd": 5,
+                    "txns": stibs,
+                }
+            },
+            use_bin_type=True,
+        )
+        self.round = 4
+        self.blocks: Counter = Counter()
+        self.pending = 0
+        # blocks are only produced once the test has tracked everything
+        self.produce = threading.Event()
+
+    def status(self):
+        return {"last-round": self.round}
+
+    def status_after_block(self, round):
+        self.produce.wait()
+        self.round = max(self.round, round + 1)
+        return {"last-round": self.round}
+
+    def block_info(self, round, response_format):
+        assert response_format == "msgpack"
+        self.blocks[round] += 1
+        if round == 5:
+            return self.block
+        return msgpack.packb({"block": {"rnd": round}}, use_bin_type=True)
+
+    def pending_transaction_info(self, txID):
+        self.pending += 1
+        raise AlgodHTTPError("not found", 404)
+
+
+def inBlock(stxn, **applyData):
+    # as stored in a block: genesis ID and hash stripped
+    stib = stxn.dictify()
+    del stib["txn"]["gen"]
+    del stib["txn"]["gh"]
+    stib["hgi"] = True
+    stib.update(applyData)
+    return stib
+
+
+def test_tracker_resolves_from_block():
+    sender = Account(generate_account()[0])
+    other = Account(generate_account()[0])
+    payment = PaymentTxn(sender.getAddress(), SP, other.getAddress(), 1).sign(
+        sender.getPrivateKey()
+    )
+    call = ApplicationCallTxn(
+        sender.getAddress(),
+        SP,
+        1234,
+        OnComplete.NoOpOC,
+        accounts=[other.getAddress()],
+    ).sign(sender.getPrivateKey())
+
+    client = BlockClient(
+        [
+            inBlock(payment),
+            inBlock(
+                call,
+                dt={
+                    "gd": {b"royalty_basis": {"at": 2, "ui": 1000}},
+                    "ld": {1: {b"offer": {"at": 1, "bs": b"value"}}},
+                    "lg": [b"log"],
+                },
+            ),
+        ]
+    )
+    tracker = ConfirmationTracker(client)
+    seen = []
+    subscriber = lambda round, responses: seen.append((round, set(responses)))
+    tracker.subscribe(subscriber)
+
+    futures = [tracker.track(payment.get_txid()) for _ in range(20)]
+    future = tracker.track(call.get_txid())
+    client.produce.set()
+    response = future.result()
+
+    assert all(f.result().confirmedRound == 5 for f in futures)
+    assert response.confirmedRound == 5
+    # same form as pending_transaction_info
+    assert response.txn["txn"]["snd"] == sender.getAddress()
+    assert response.txn["txn"]["apat"] == [other.getAddress()]
+    assert response.txn["txn"]["gh"] == b64encode(GENESIS_HASH).decode()
+    assert response.txn["sig"] == call.signature
+    assert response.logs == [b"log"]
+    assert response.globalStateDelta == [
+        {
+            "key": b64encode(b"royalty_basis").decode(),
+            "value": {"action": 2, "uint": 1000},
+        }
+    ]
+    assert response.localStateDelta == [
+        {
+            "address": other.getAddress(),
+            "delta": [
+                {
+                    "key": b64encode(b"offer").decode(),
+                    "value": {"action": 1, "bytes": b64encode(b"value").decode()},
+                }
+            ],
+        }
+    ]
+    # one block fetch and one pool check per tracked transaction
+    assert client.blocks[5] == 1
+    assert client.pending == 21
+    assert (5, {payment.get_txid(), call.get_txid()}) in seen
+    tracker.unsubscribe(subscriber)
+
+
+def test_tracker_times_out():
+    client = BlockClient([])
+    client.produce.set()
+    tracker = ConfirmationTracker(client)
+    with pytest.raises(ConfirmationTimeoutError):
+        tracker.wait("MISSING", waitRounds=2)
+
+
+def test_tracker_observes_round_of_already_confirmed_transaction():
+    # no blocks come in, the round is only known from the pending info
+    client = BlockClient([])
+    client.pending_transaction_info = lambda txID: {
+        "pool-error": "",
+        "txn": {},
+        "confirmed-round": 9,
+    }
+    provider = getParamsProvider(client)
+    provider.store(SuggestedParams(0, SP.first, SP.last, SP.gh, SP.gen))
+
+    tracker = ConfirmationTracker(client)
+    assert tracker.wait("CONFIRMED").confirmedRound == 9
+    # identical transactions sent next get a new first valid round, and txid
+    sp = provider.cached()
+    assert sp is not None
+    assert (sp.first, sp.last) == (9, 1008)
+
+
+def test_tracker_times_out_without_blocks():
+    # blocks never come in
+    client = BlockClient([])
+    tracker = ConfirmationTracker(client, roundTime=0.01)
+    with pytest.raises(ConfirmationTimeoutError):
+        tracker.wait("MISSING", waitRounds=2)
+
+
+class FailingClient(BlockClient):
+    def block_info(self, round, response_format):
+        raise OSError("algod is down")
+
+
+def test_tracker_fails_waiters_when_blocks_fail(monkeypatch):
+    monkeypatch.setattr(transactions, "RETRY_DELAY", 0.01)
+    client = FailingClient([])
+    client.produce.set()
+    tracker = ConfirmationTracker(client)
+    with pytest.raises(OSError, match="algod is down"):
+        tracker.wait("MISSING")
+
+
+def test_block_response_resolves_local_delta_accounts():
+    sender, other, shared = (generate_account()[1] for _ in range(3))
+    delta = {b"offer": {"at": 3}}
+    stib = {
+        "txn": {"type": "appl", "snd": decode_address(sender)},
+        "dt": {
+            # 0 is the sender, 1 the first shared account, 9 is out of range
+            "ld": {0: delta, 1: delta, 9: delta},
+            "sa": [decode_address(shared)],
+        },
+    }
+    response = blockTxnResponse(stib, 5)
+    assert [d["address"] for d in response["local-state-delta"]] == [sender, shared]
+    assert response["txn"]["txn"]["snd"] == sender